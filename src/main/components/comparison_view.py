@@ -0,0 +1,465 @@
+import os
+
+import matplotlib
+import numpy as np
+from PyQt6.QtCore import Qt, QCoreApplication, pyqtSignal
+from PyQt6.QtGui import QImage, QPixmap, QTransform, QPen, QColor
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QLabel, QComboBox, QPushButton,
+                             QGraphicsView, QGraphicsScene, QGraphicsPixmapItem, QSizePolicy, QMessageBox)
+
+from components.nifti_file_dialog import NiftiFileDialog
+from logger import get_logger
+from threads.nifti_utils_threads import FrameCache, RenderQueue, RenderWorkerThread, ImageLoadThread
+
+log = get_logger()
+
+
+def render_volume_slice(data, plane_idx, slice_idx, frame, lut):
+    """
+    Colormap a slice of a normalized volume, in display orientation.
+
+    Uses only numpy, so that several slices can be rendered concurrently by the
+    workers of a rendering pool.
+
+    Args:
+        data (np.ndarray): Normalized volume (X, Y, Z) or (X, Y, Z, T), values in 0–1.
+        plane_idx (int): 0=axial (Z fixed), 1=coronal (Y fixed), 2=sagittal (X fixed).
+        slice_idx (int): Slice index along the plane normal.
+        frame (int): Time frame for 4D data.
+        lut (np.ndarray): Float RGBA lookup table (N, 4) of the colormap.
+
+    Returns:
+        np.ndarray: uint8 RGBA image (H, W, 4), transposed and flipped like the viewer slices.
+    """
+    volume = data[..., frame] if data.ndim == 4 else data
+    index = [slice(None)] * 3
+    index[2 - plane_idx] = slice_idx
+    slice_data = np.flipud(np.asarray(volume[tuple(index)], dtype=np.float32).T)
+    bins = np.clip((np.nan_to_num(slice_data) * len(lut)).astype(np.int32), 0, len(lut) - 1)
+    return np.ascontiguousarray((lut[bins] * 255).astype(np.uint8))
+
+
+class ComparisonVolume:
+    """
+    A volume of the comparison grid, with its own voxel grid and affine.
+
+    Args:
+        name (str): Name shown above the view.
+        data (np.ndarray): Normalized volume (X, Y, Z) or (X, Y, Z, T) in RAS+ orientation.
+        affine (np.ndarray): Voxel to world (mm) affine.
+        series (DicomSeries, optional): Lazily decoded DICOM series providing `data`.
+    """
+
+    def __init__(self, name, data, affine, series=None):
+        self.name = name
+        self.data = data
+        self.affine = np.asarray(affine, dtype=float)
+        self.inverse_affine = np.linalg.inv(self.affine)
+        self.series = series
+        self.shape = data.shape[:3]
+        self.n_frames = data.shape[3] if data.ndim == 4 else 1
+        self.voxel_sizes = np.sqrt((self.affine[:3, :3] ** 2).sum(axis=0))
+
+    def world_to_voxel(self, world):
+        """
+        Nearest voxel to a world position, clamped to the volume.
+
+        Args:
+            world (np.ndarray): Position in mm (3,).
+
+        Returns:
+            list[int]: Voxel indices [x, y, z].
+        """
+        voxel = self.inverse_affine @ np.append(world, 1.0)
+        return [int(np.clip(round(voxel[i]), 0, self.shape[i] - 1)) for i in range(3)]
+
+    def voxel_to_world(self, voxel):
+        """World position (mm) of a voxel center."""
+        return (self.affine @ np.append(np.asarray(voxel, dtype=float), 1.0))[:3]
+
+    def render(self, plane_idx, slice_idx, frame, lut):
+        """Render a slice (see `render_volume_slice`), decoding it first for DICOM series."""
+        if self.series is not None:
+            self.series.ensure_slice(plane_idx, slice_idx, frame)
+        return render_volume_slice(self.data, plane_idx, slice_idx, frame, lut)
+
+
+class ComparisonCell(QGraphicsView):
+    """
+    View of one volume of the comparison grid, with a crosshair.
+
+    Signals:
+        hovered (int): Emitted with the cell index when the mouse enters the view.
+        clicked (int, float, float): Emitted with the cell index and the scene position of a click.
+    """
+
+    hovered = pyqtSignal(int)
+    """**Signal(int):** Emitted when the mouse enters the cell (parameter: cell index)."""
+
+    clicked = pyqtSignal(int, float, float)
+    """**Signal(int, float, float):** Emitted on a left click (parameters: cell index, scene x, scene y)."""
+
+    def __init__(self, index, parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.setScene(QGraphicsScene(self))
+        self.setStyleSheet("background-color: black;")
+        self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+        self.setMouseTracking(True)
+
+        self.pixmap_item = QGraphicsPixmapItem()
+        self.scene().addItem(self.pixmap_item)
+        pen = QPen(QColor(255, 255, 0, 180), 0)
+        self.crosshair_h = self.scene().addLine(0, 0, 0, 0, pen)
+        self.crosshair_v = self.scene().addLine(0, 0, 0, 0, pen)
+
+    def set_image(self, image, stretch):
+        """
+        Display a rendered slice.
+
+        Args:
+            image (np.ndarray): uint8 RGBA image (H, W, 4).
+            stretch (float): Vertical scale converting pixels to mm proportions.
+        """
+        height, width = image.shape[:2]
+        qimage = QImage(image.data, width, height, width * 4, QImage.Format.Format_RGBA8888)
+        self.pixmap_item.setPixmap(QPixmap.fromImage(qimage))
+        self.pixmap_item.setTransform(QTransform.fromScale(1.0, stretch))
+        self.scene().setSceneRect(0, 0, width, height * stretch)
+        self.fitInView(self.scene().sceneRect(), Qt.AspectRatioMode.KeepAspectRatio)
+
+    def set_crosshair(self, x, y):
+        """Move the crosshair to a scene position."""
+        rect = self.scene().sceneRect()
+        self.crosshair_h.setLine(rect.left(), y, rect.right(), y)
+        self.crosshair_v.setLine(x, rect.top(), x, rect.bottom())
+
+    def enterEvent(self, event):
+        super().enterEvent(event)
+        self.hovered.emit(self.index)
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            pos = self.mapToScene(event.position().toPoint())
+            self.clicked.emit(self.index, pos.x(), pos.y())
+        super().mousePressEvent(event)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.fitInView(self.scene().sceneRect(), Qt.AspectRatioMode.KeepAspectRatio)
+
+
+class ComparisonView(QWidget):
+    """
+    Grid of 2–4 volumes linked to the viewer crosshair in world coordinates.
+
+    The first volume is the viewer image; the others are loaded from files. Every
+    volume is sampled on its own voxel grid at the voxel nearest to the viewer
+    crosshair, mapped through the volume affine, so images with different
+    resolutions or fields of view can be compared side by side. Clicking a view
+    moves the viewer crosshair to the clicked world position.
+
+    All views render through one shared slice cache and one pool of worker
+    threads. Each view has at most one pending job, so the combined cost is
+    bounded by the number of views whatever the navigation speed, and the view
+    under the mouse is rendered first.
+
+    Args:
+        viewer (NiftiViewer): Viewer providing the base image, crosshair, frame and colormap.
+        cache_capacity (int, optional): Maximum number of cached slices. Defaults to 192.
+        n_workers (int, optional): Number of rendering threads. Defaults to 2.
+    """
+
+    MAX_VOLUMES = 4
+
+    def __init__(self, viewer, cache_capacity=192, n_workers=2):
+        super().__init__(viewer, Qt.WindowType.Window)
+        self.viewer = viewer
+        self.cache = FrameCache(cache_capacity)
+        self.queue = RenderQueue()
+        self.n_workers = n_workers
+        self.workers = []
+        self.load_threads = []
+        self.volumes = []
+        self.cells = []
+        self.titles = []
+        self.wanted_keys = {}
+        self.stretches = {}
+
+        self.setWindowTitle(QCoreApplication.translate("ComparisonView", "Compare Volumes"))
+        self.resize(1000, 900)
+        layout = QVBoxLayout(self)
+
+        controls = QHBoxLayout()
+        self.plane_combo = QComboBox()
+        self.plane_combo.addItems([
+            QCoreApplication.translate("ComparisonView", "Axial"),
+            QCoreApplication.translate("ComparisonView", "Coronal"),
+            QCoreApplication.translate("ComparisonView", "Sagittal"),
+        ])
+        controls.addWidget(self.plane_combo)
+        self.add_btn = QPushButton(QCoreApplication.translate("ComparisonView", "Add Volume..."))
+        controls.addWidget(self.add_btn)
+        self.clear_btn = QPushButton(QCoreApplication.translate("ComparisonView", "Remove Added Volumes"))
+        controls.addWidget(self.clear_btn)
+        controls.addStretch()
+        layout.addLayout(controls)
+
+        self.grid = QGridLayout()
+        layout.addLayout(self.grid)
+
+        self.plane_combo.currentIndexChanged.connect(lambda _: self.refresh())
+        self.add_btn.clicked.connect(lambda: self.add_volume_file())
+        self.clear_btn.clicked.connect(self.reset_volumes)
+
+        self.reset_volumes()
+
+    @property
+    def plane_idx(self):
+        """Plane shown in the views (0=axial, 1=coronal, 2=sagittal)."""
+        return self.plane_combo.currentIndex()
+
+    def reset_volumes(self):
+        """Keep only the viewer image in the grid (e.g. after a new image is loaded)."""
+        self.volumes = []
+        self.cache.clear()
+        self.queue.clear()
+        viewer = self.viewer
+        if viewer is not None and viewer.img_data is not None:
+            name = os.path.basename(viewer.file_path) if viewer.file_path else "Image"
+            self.volumes.append(ComparisonVolume(name, viewer.img_data, viewer.affine, viewer.dicom_series))
+        self.rebuild_grid()
+
+    def add_volume_file(self, file_path=None):
+        """
+        Load a NIfTI file in background and add it to the grid.
+
+        Args:
+            file_path (str, optional): Path of the file. A file dialog is shown if None.
+        """
+        if len(self.volumes) >= self.MAX_VOLUMES:
+            QMessageBox.warning(
+                self,
+                QCoreApplication.translate("ComparisonView", "Warning"),
+                QCoreApplication.translate("ComparisonView", "At most {0} volumes can be compared").format(
+                    self.MAX_VOLUMES)
+            )
+            return
+        if not file_path:
+            result = NiftiFileDialog.get_files(
+                self.viewer.context,
+                allow_multiple=False,
+                has_existing_func=False,
+                label=None,
+                forced_filters=None
+            )
+            if not result:
+                return
+            file_path = result[0]
+
+        thread = ImageLoadThread(file_path, False)
+        thread.finished.connect(
+            lambda img_data, dims, affine, is_4d, is_overlay, path=file_path, t=thread:
+            self.on_volume_loaded(t, path, img_data, affine)
+        )
+        thread.error.connect(lambda message, t=thread: self.on_volume_error(t, message))
+        self.load_threads.append(thread)
+        thread.start()
+
+    def on_volume_loaded(self, thread, file_path, img_data, affine):
+        """Add a volume loaded by `add_volume_file`."""
+        if thread in self.load_threads:
+            self.load_threads.remove(thread)
+        self.add_volume(os.path.basename(file_path), img_data, affine)
+
+    def on_volume_error(self, thread, message):
+        """Report a volume that could not be loaded."""
+        if thread in self.load_threads:
+            self.load_threads.remove(thread)
+        log.error(f"Error loading comparison volume: {message}")
+
+    def add_volume(self, name, data, affine, series=None):
+        """
+        Add a volume to the grid.
+
+        Args:
+            name (str): Name shown above the view.
+            data (np.ndarray): Normalized volume in RAS+ orientation.
+            affine (np.ndarray): Voxel to world affine.
+            series (DicomSeries, optional): Lazily decoded DICOM series providing `data`.
+
+        Returns:
+            bool: False if the grid is already full.
+        """
+        if len(self.volumes) >= self.MAX_VOLUMES:
+            return False
+        self.volumes.append(ComparisonVolume(name, data, affine, series))
+        self.rebuild_grid()
+        return True
+
+    def rebuild_grid(self):
+        """Create one view per volume, two per row."""
+        for widget in self.cells + self.titles:
+            self.grid.removeWidget(widget)
+            widget.deleteLater()
+        self.cells, self.titles = [], []
+        self.wanted_keys = {}
+
+        for i in range(len(self.volumes)):
+            row, col = divmod(i, 2)
+            title = QLabel()
+            title.setStyleSheet("font-size: 10px;")
+            cell = ComparisonCell(i)
+            cell.hovered.connect(self.queue.set_focus)
+            cell.clicked.connect(self.cell_clicked)
+            self.grid.addWidget(title, 2 * row, col)
+            self.grid.addWidget(cell, 2 * row + 1, col)
+            self.titles.append(title)
+            self.cells.append(cell)
+        self.add_btn.setEnabled(len(self.volumes) < self.MAX_VOLUMES)
+        self.refresh()
+
+    def world_point(self):
+        """World position (mm) of the viewer crosshair."""
+        viewer = self.viewer
+        return (viewer.affine @ np.append(np.asarray(viewer.current_coordinates, dtype=float), 1.0))[:3]
+
+    def display_position(self, volume, voxel):
+        """
+        Scene position of a voxel in the view of a volume.
+
+        Args:
+            volume (ComparisonVolume): Volume of the view.
+            voxel (list[int]): Voxel indices [x, y, z].
+
+        Returns:
+            tuple[float, float, float]: (x, y, stretch) where stretch is the vertical pixel scale.
+        """
+        nx, ny, nz = volume.shape
+        sx, sy, sz = volume.voxel_sizes
+        plane_idx = self.plane_idx
+        if plane_idx == 0:
+            col, row, stretch = voxel[0], ny - 1 - voxel[1], sy / sx
+        elif plane_idx == 1:
+            col, row, stretch = voxel[0], nz - 1 - voxel[2], sz / sx
+        else:
+            col, row, stretch = voxel[1], nz - 1 - voxel[2], sz / sy
+        return col + 0.5, (row + 0.5) * stretch, stretch
+
+    def refresh(self):
+        """
+        Bring all views up to date with the viewer crosshair, frame and colormap.
+
+        Cached slices are shown immediately; the others are queued for the workers.
+        """
+        viewer = self.viewer
+        if not self.volumes or viewer.img_data is None or not self.isVisible():
+            return
+        self.start_workers()
+
+        plane_idx = self.plane_idx
+        world = self.world_point()
+        colormap = viewer.colormap
+        lut = None
+        for i, (volume, cell, title) in enumerate(zip(self.volumes, self.cells, self.titles)):
+            voxel = volume.world_to_voxel(world)
+            frame = min(viewer.current_time, volume.n_frames - 1)
+            slice_idx = voxel[2 - plane_idx]
+            key = (id(volume), plane_idx, slice_idx, frame, colormap)
+            title.setText(f"{volume.name}  ({voxel[0]}, {voxel[1]}, {voxel[2]})")
+
+            x, y, stretch = self.display_position(volume, voxel)
+            self.stretches[i] = stretch
+            if self.wanted_keys.get(i) != key:
+                self.wanted_keys[i] = key
+                image = self.cache.get(key)
+                viewer.profiler.cache("comparison", image is not None)
+                if image is not None:
+                    cell.set_image(image, stretch)
+                else:
+                    if lut is None:
+                        lut = self.colormap_lut(colormap)
+                    self.queue.submit(
+                        i, key,
+                        lambda volume=volume, slice_idx=slice_idx, frame=frame, lut=lut:
+                        volume.render(plane_idx, slice_idx, frame, lut)
+                    )
+            cell.set_crosshair(x, y)
+
+    @staticmethod
+    def colormap_lut(colormap_name):
+        """Float RGBA lookup table of a matplotlib colormap."""
+        cmap = matplotlib.colormaps.get_cmap(colormap_name)
+        return cmap(np.arange(cmap.N)).astype(np.float32)
+
+    def on_rendered(self, target, key, image):
+        """Show a slice rendered by a worker if its view still displays it."""
+        if target < len(self.cells) and self.wanted_keys.get(target) == key:
+            self.cells[target].set_image(image, self.stretches.get(target, 1.0))
+
+    def cell_clicked(self, index, x, y):
+        """
+        Move the viewer crosshair to the world position clicked in a view.
+
+        Args:
+            index (int): Cell index.
+            x (float): Scene x of the click.
+            y (float): Scene y of the click.
+        """
+        if index >= len(self.volumes):
+            return
+        volume = self.volumes[index]
+        nx, ny, nz = volume.shape
+        current = volume.world_to_voxel(self.world_point())
+        col = int(np.clip(x, 0, None))
+        row = int(np.clip(y / self.stretches.get(index, 1.0), 0, None))
+        plane_idx = self.plane_idx
+        if plane_idx == 0:
+            voxel = [col, ny - 1 - row, current[2]]
+        elif plane_idx == 1:
+            voxel = [col, current[1], nz - 1 - row]
+        else:
+            voxel = [current[0], col, nz - 1 - row]
+        voxel = [int(np.clip(v, 0, n - 1)) for v, n in zip(voxel, volume.shape)]
+
+        viewer = self.viewer
+        world = volume.voxel_to_world(voxel)
+        target = np.linalg.inv(viewer.affine) @ np.append(world, 1.0)
+        shape = viewer.img_data.shape[:3]
+        viewer.set_current_coordinates([int(np.clip(round(target[i]), 0, shape[i] - 1)) for i in range(3)])
+
+    def start_workers(self):
+        """Start the rendering pool if it is not running."""
+        if self.workers:
+            return
+        for _ in range(self.n_workers):
+            worker = RenderWorkerThread(self.queue, self.cache)
+            worker.rendered.connect(self.on_rendered)
+            worker.start()
+            self.workers.append(worker)
+
+    def stop_workers(self):
+        """Stop the rendering pool and drop the pending jobs."""
+        self.queue.clear()
+        for worker in self.workers:
+            worker.cancel()
+        for worker in self.workers:
+            worker.wait()
+        self.workers = []
+        self.wanted_keys = {}
+
+    def retranslate(self):
+        """Update static texts after a language change."""
+        self.setWindowTitle(QCoreApplication.translate("ComparisonView", "Compare Volumes"))
+        for i, name in enumerate(["Axial", "Coronal", "Sagittal"]):
+            self.plane_combo.setItemText(i, QCoreApplication.translate("ComparisonView", name))
+        self.add_btn.setText(QCoreApplication.translate("ComparisonView", "Add Volume..."))
+        self.clear_btn.setText(QCoreApplication.translate("ComparisonView", "Remove Added Volumes"))
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+
+    def closeEvent(self, event):
+        self.stop_workers()
+        super().closeEvent(event)
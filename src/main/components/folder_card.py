@@ -19,6 +19,8 @@ class FolderCard(QWidget):
 
     # Signal emitted when the user requests to open the folder externally
     open_folder_requested = pyqtSignal(str)
+    # Signal emitted when the user requests the QC folder (its QC may still have to be rendered)
+    qc_requested = pyqtSignal(str)
 
     def __init__(self, context, folder):
         """
@@ -31,6 +33,7 @@ class FolderCard(QWidget):
         super().__init__()
 
         self.folder = folder
+        self.qc_folder = os.path.join(folder, "qc")
         self.files = []  # Tracks new files added since the last check
         self.is_finished = False
         # self.existing_files = set(os.listdir(folder)) if os.path.isdir(folder) else set()
@@ -133,6 +136,29 @@ class FolderCard(QWidget):
         self.action_btn.setEnabled(False)
         card_layout.addWidget(self.action_btn)
 
+        # QC button: shown once the folder is complete and has a QC folder
+        self.qc_btn = QPushButton(QCoreApplication.translate("Components", "QC"))
+        self.qc_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #ecf0f1;
+                color: #2c3e50;
+                border: 1px solid #bdc3c7;
+                border-radius: 8px;
+                padding: 8px 20px;
+                font-size: 13px;
+                font-weight: 600;
+            }
+            QPushButton:hover {
+                background-color: #e0e0e0;
+            }
+            QPushButton:disabled {
+                color: #7f8c8d;
+            }
+        """)
+        self.qc_btn.clicked.connect(lambda: self.qc_requested.emit(self.qc_folder))
+        self.qc_btn.setVisible(False)
+        card_layout.addWidget(self.qc_btn)
+
         layout.addWidget(self.card_frame)
 
     # -------------------------------------------------------------------------
@@ -431,6 +457,7 @@ class FolderCard(QWidget):
         """)
 
         self.action_btn.setEnabled(False)
+        self.qc_btn.setVisible(os.path.isdir(self.qc_folder))
 
         self.folder_icon.setText("✓")
         self.folder_icon.setStyleSheet("""
@@ -448,3 +475,25 @@ class FolderCard(QWidget):
                 border: 2px solid #27ae60;
             }
         """)
+
+    def set_qc_locked(self, locked):
+        """
+        Keep the QC button disabled while the pipeline may still write the QC folder.
+
+        Args:
+            locked (bool): True while the pipeline process is running.
+        """
+        self.qc_btn.setEnabled(not locked)
+
+    def set_qc_rendering(self, rendering):
+        """
+        Show whether the QC of the folder is being rendered.
+
+        Args:
+            rendering (bool): True while the QC products are rendered; the QC button is disabled.
+        """
+        self.qc_btn.setEnabled(not rendering)
+        self.qc_btn.setText(
+            QCoreApplication.translate("Components", "Rendering QC...") if rendering
+            else QCoreApplication.translate("Components", "QC")
+        )
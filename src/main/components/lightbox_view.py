@@ -0,0 +1,256 @@
+import time
+
+import numpy as np
+from PyQt6.QtCore import Qt, QCoreApplication
+from PyQt6.QtGui import QImage, QPixmap, QTransform
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QSpinBox, QPushButton,
+                             QGraphicsView, QGraphicsScene, QGraphicsPixmapItem, QSizePolicy)
+
+from threads.nifti_utils_threads import FrameCache
+
+
+class LightboxView(QWidget):
+    """
+    Mosaic of evenly spaced slices of one plane, with the viewer overlays.
+
+    Tiles are rendered by the viewer in two steps, each cached separately:
+
+    - base tiles (colormapped slices), rendered in parallel for all the missing
+      tiles of a page and keyed by (plane, slice, frame, colormap, derived volume);
+    - composite tiles (base + overlays), keyed by the base key and the viewer
+      overlay state.
+
+    Paging back to a page or moving the crosshair reuses the cached composites,
+    while changing the overlays (e.g. their alpha) only re-blends the tiles of the
+    visible page from their cached bases.
+
+    Args:
+        viewer (NiftiViewer): Viewer providing the data and the rendering functions.
+        base_capacity (int, optional): Maximum number of cached base tiles. Defaults to 128.
+        tile_capacity (int, optional): Maximum number of cached composite tiles. Defaults to 256.
+    """
+
+    def __init__(self, viewer, base_capacity=128, tile_capacity=256):
+        super().__init__(viewer, Qt.WindowType.Window)
+        self.viewer = viewer
+        self.base_cache = FrameCache(base_capacity)
+        self.tile_cache = FrameCache(tile_capacity)
+        self.page = 0
+        self.tile_items = []
+        self.tile_keys = []
+
+        self.setWindowTitle(QCoreApplication.translate("LightboxView", "Lightbox"))
+        self.resize(900, 900)
+        layout = QVBoxLayout(self)
+
+        controls = QHBoxLayout()
+        self.plane_combo = QComboBox()
+        self.plane_combo.addItems([
+            QCoreApplication.translate("LightboxView", "Axial"),
+            QCoreApplication.translate("LightboxView", "Coronal"),
+            QCoreApplication.translate("LightboxView", "Sagittal"),
+        ])
+        controls.addWidget(self.plane_combo)
+
+        self.grid_label = QLabel(QCoreApplication.translate("LightboxView", "Grid:"))
+        controls.addWidget(self.grid_label)
+        self.rows_spin = QSpinBox()
+        self.rows_spin.setRange(1, 8)
+        self.rows_spin.setValue(4)
+        controls.addWidget(self.rows_spin)
+        self.cols_spin = QSpinBox()
+        self.cols_spin.setRange(1, 8)
+        self.cols_spin.setValue(4)
+        controls.addWidget(self.cols_spin)
+
+        self.step_label = QLabel(QCoreApplication.translate("LightboxView", "Step:"))
+        controls.addWidget(self.step_label)
+        self.step_spin = QSpinBox()
+        self.step_spin.setRange(0, 512)
+        self.step_spin.setSpecialValueText(QCoreApplication.translate("LightboxView", "Auto"))
+        controls.addWidget(self.step_spin)
+
+        self.prev_btn = QPushButton("<")
+        self.prev_btn.setMaximumWidth(30)
+        controls.addWidget(self.prev_btn)
+        self.page_label = QLabel()
+        controls.addWidget(self.page_label)
+        self.next_btn = QPushButton(">")
+        self.next_btn.setMaximumWidth(30)
+        controls.addWidget(self.next_btn)
+        controls.addStretch()
+        layout.addLayout(controls)
+
+        self.scene = QGraphicsScene()
+        self.view = QGraphicsView(self.scene)
+        self.view.setStyleSheet("background-color: black;")
+        self.view.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+        layout.addWidget(self.view)
+
+        self.plane_combo.currentIndexChanged.connect(self.layout_changed)
+        self.rows_spin.valueChanged.connect(self.layout_changed)
+        self.cols_spin.valueChanged.connect(self.layout_changed)
+        self.step_spin.valueChanged.connect(self.layout_changed)
+        self.prev_btn.clicked.connect(lambda: self.set_page(self.page - 1))
+        self.next_btn.clicked.connect(lambda: self.set_page(self.page + 1))
+
+    @property
+    def plane_idx(self):
+        """Plane shown in the mosaic (0=axial, 1=coronal, 2=sagittal)."""
+        return self.plane_combo.currentIndex()
+
+    @property
+    def tiles_per_page(self):
+        """Number of tiles in the grid."""
+        return self.rows_spin.value() * self.cols_spin.value()
+
+    def mosaic_slices(self):
+        """
+        Slices of the whole mosaic, evenly spaced along the plane normal.
+
+        With the automatic step, a single page covers the whole volume.
+
+        Returns:
+            list[int]: Slice indices.
+        """
+        n_slices = self.viewer.img_data.shape[2 - self.plane_idx]
+        step = self.step_spin.value() or max(1, -(-n_slices // self.tiles_per_page))
+        first = ((n_slices - 1) % step) // 2  # Center the sampled slices in the volume
+        return list(range(first, n_slices, step))
+
+    def page_count(self):
+        """Number of pages of the mosaic."""
+        return max(1, -(-len(self.mosaic_slices()) // self.tiles_per_page))
+
+    def page_slices(self):
+        """Slices of the current page."""
+        start = self.page * self.tiles_per_page
+        return self.mosaic_slices()[start:start + self.tiles_per_page]
+
+    def set_page(self, page):
+        """
+        Show another page of the mosaic.
+
+        Args:
+            page (int): Page index (clamped to the valid range).
+        """
+        self.page = int(np.clip(page, 0, self.page_count() - 1))
+        self.refresh()
+
+    def layout_changed(self):
+        """Rebuild the grid after a change of plane, grid size or step."""
+        self.page = 0
+        self.scene.clear()
+        self.tile_items = []
+        self.tile_keys = []
+        self.refresh()
+
+    def clear_cache(self):
+        """Drop all cached tiles (e.g. when a new image is loaded)."""
+        self.base_cache.clear()
+        self.tile_cache.clear()
+        self.layout_changed()
+
+    def refresh(self):
+        """
+        Bring the visible tiles up to date with the viewer state.
+
+        Only tiles whose composite key changed are re-blended, and only bases
+        missing from the cache are rendered.
+        """
+        viewer = self.viewer
+        if viewer.img_data is None or not self.isVisible():
+            return
+
+        plane_idx = self.plane_idx
+        frame = viewer.current_time if viewer.is_4d else 0
+        slices = self.page_slices()
+        self.page_label.setText(f"{self.page + 1}/{self.page_count()}")
+        self.prev_btn.setEnabled(self.page > 0)
+        self.next_btn.setEnabled(self.page < self.page_count() - 1)
+
+        base_keys = [(plane_idx, s, frame, viewer.colormap, id(viewer.derived_volume)) for s in slices]
+        overlay_key = viewer.overlay_state_key()
+        tile_keys = [(base_key, overlay_key) for base_key in base_keys]
+
+        # Render the missing bases of the page in one parallel pass
+        t = time.perf_counter()
+        missing = [i for i, key in enumerate(base_keys) if key not in self.base_cache]
+        for key in base_keys:
+            viewer.profiler.cache("lightbox_base", key in self.base_cache)
+        if missing:
+            with viewer.render_lock:
+                bases = viewer.render_lightbox_bases(plane_idx, [slices[i] for i in missing], frame)
+            for i, base in zip(missing, bases):
+                self.base_cache.put(base_keys[i], base)
+        t = viewer.profiler.lap("lightbox_base", t)
+
+        spacing = viewer.voxel_sizes
+        pixel_spacing = [(spacing[0], spacing[1]), (spacing[0], spacing[2]), (spacing[1], spacing[2])][plane_idx]
+        stretch = pixel_spacing[1] / pixel_spacing[0]
+
+        for i, (s, tile_key) in enumerate(zip(slices, tile_keys)):
+            if i < len(self.tile_keys) and self.tile_keys[i] == tile_key:
+                continue  # Tile already displayed
+
+            tile = self.tile_cache.get(tile_key)
+            viewer.profiler.cache("lightbox_tile", tile is not None)
+            if tile is None:
+                base = self.base_cache.get(tile_key[0])
+                with viewer.render_lock:
+                    rgba = viewer.composite_overlays(base.copy(), viewer.overlay_slices(plane_idx, s))
+                tile = (np.clip(rgba, 0, 1) * 255).astype(np.uint8)
+                self.tile_cache.put(tile_key, tile)
+            self.set_tile(i, tile, stretch)
+            if i < len(self.tile_keys):
+                self.tile_keys[i] = tile_key
+            else:
+                self.tile_keys.append(tile_key)
+        viewer.profiler.lap("lightbox_blend", t)
+
+        # Hide the cells left empty on the last page
+        for i, item in enumerate(self.tile_items):
+            item.setVisible(i < len(slices))
+        if len(slices) < len(self.tile_keys):
+            self.tile_keys = self.tile_keys[:len(slices)]
+        self.view.fitInView(self.scene.itemsBoundingRect(), Qt.AspectRatioMode.KeepAspectRatio)
+
+    def set_tile(self, index, tile, stretch):
+        """
+        Display a composite tile in its grid cell.
+
+        Args:
+            index (int): Cell index, row-major.
+            tile (np.ndarray): RGBA uint8 image (H, W, 4).
+            stretch (float): Vertical scale converting pixels to mm proportions.
+        """
+        height, width = tile.shape[:2]
+        qimage = QImage(tile.data, width, height, width * 4, QImage.Format.Format_RGBA8888)
+        pixmap = QPixmap.fromImage(qimage)
+
+        while index >= len(self.tile_items):
+            item = QGraphicsPixmapItem()
+            self.scene.addItem(item)
+            self.tile_items.append(item)
+        item = self.tile_items[index]
+        item.setPixmap(pixmap)
+        item.setTransform(QTransform.fromScale(1.0, stretch))
+        row, col = divmod(index, self.cols_spin.value())
+        item.setPos(col * (width + 2), row * (height * stretch + 2))
+
+    def retranslate(self):
+        """Update static texts after a language change."""
+        self.setWindowTitle(QCoreApplication.translate("LightboxView", "Lightbox"))
+        for i, name in enumerate(["Axial", "Coronal", "Sagittal"]):
+            self.plane_combo.setItemText(i, QCoreApplication.translate("LightboxView", name))
+        self.grid_label.setText(QCoreApplication.translate("LightboxView", "Grid:"))
+        self.step_label.setText(QCoreApplication.translate("LightboxView", "Step:"))
+        self.step_spin.setSpecialValueText(QCoreApplication.translate("LightboxView", "Auto"))
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.view.fitInView(self.scene.itemsBoundingRect(), Qt.AspectRatioMode.KeepAspectRatio)
@@ -0,0 +1,175 @@
+import json
+import time
+from collections import deque
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QLabel
+
+
+class RenderProfiler:
+    """
+    Lightweight collector of viewer rendering timings.
+
+    Every stage (slice extraction, colormap, overlay blending, scaling, ...) keeps
+    its most recent durations in a ring buffer, so memory stays bounded however
+    long the viewer runs. Completed frames are timestamped to compute the achieved
+    frame rate, and caches report hits/misses to compute their hit rate.
+
+    Stages are timed by passing a start time and getting back the new one, which
+    keeps instrumented code flat and works with nested calls:
+
+        t = time.perf_counter()
+        ...
+        t = profiler.lap("slice", t)
+
+    Args:
+        capacity (int, optional): Number of samples kept per stage. Defaults to 256.
+    """
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.reset()
+
+    def reset(self):
+        """Drop all recorded samples and counters."""
+        self.samples = {}
+        self.frame_times = deque(maxlen=self.capacity)
+        self.cache_counters = {}
+
+    def record(self, stage, seconds):
+        """
+        Record a duration for a stage.
+
+        Args:
+            stage (str): Stage name.
+            seconds (float): Duration in seconds.
+        """
+        buffer = self.samples.get(stage)
+        if buffer is None:
+            buffer = self.samples[stage] = deque(maxlen=self.capacity)
+        buffer.append(seconds)
+
+    def lap(self, stage, start):
+        """
+        Record the time elapsed since `start` for a stage.
+
+        Args:
+            stage (str): Stage name.
+            start (float): Start time from `time.perf_counter()`.
+
+        Returns:
+            float: Current time, to be used as start of the next stage.
+        """
+        now = time.perf_counter()
+        self.record(stage, now - start)
+        return now
+
+    def frame(self):
+        """Mark a completed frame (a full refresh of the views)."""
+        self.frame_times.append(time.perf_counter())
+
+    def cache(self, name, hit):
+        """
+        Count a cache lookup.
+
+        Args:
+            name (str): Cache name.
+            hit (bool): Whether the lookup was a hit.
+        """
+        counters = self.cache_counters.setdefault(name, [0, 0])
+        counters[0 if hit else 1] += 1
+
+    def fps(self, window=1.0):
+        """
+        Achieved frame rate over the last `window` seconds of rendered frames.
+
+        Args:
+            window (float, optional): Length of the window in seconds. Defaults to 1.0.
+
+        Returns:
+            float: Frames per second (0 with less than two frames).
+        """
+        if len(self.frame_times) < 2:
+            return 0.0
+        last = self.frame_times[-1]
+        recent = [t for t in self.frame_times if t >= last - window]
+        if len(recent) < 2:
+            return 0.0
+        return (len(recent) - 1) / (recent[-1] - recent[0])
+
+    def summary(self):
+        """
+        Aggregate the recorded samples.
+
+        Returns:
+            dict: "stages" maps each stage to its sample count and last/mean/max
+            durations in ms; "fps" is the achieved frame rate; "caches" maps each
+            cache to its hits, misses and hit rate.
+        """
+        stages = {}
+        for stage, buffer in self.samples.items():
+            values = list(buffer)
+            stages[stage] = {
+                "count": len(values),
+                "last_ms": values[-1] * 1000.0,
+                "mean_ms": sum(values) / len(values) * 1000.0,
+                "max_ms": max(values) * 1000.0,
+            }
+        caches = {
+            name: {"hits": hits, "misses": misses, "hit_rate": hits / (hits + misses)}
+            for name, (hits, misses) in self.cache_counters.items()
+        }
+        return {"stages": stages, "fps": self.fps(), "caches": caches}
+
+    def export_json(self, path, extra=None):
+        """
+        Write the summary and the raw samples (in ms) to a JSON file.
+
+        Args:
+            path (str): Output file path.
+            extra (dict, optional): Additional JSON-serializable entries to include.
+        """
+        data = self.summary()
+        data.update(extra or {})
+        data["samples_ms"] = {stage: [v * 1000.0 for v in buffer] for stage, buffer in self.samples.items()}
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+
+
+class RenderHud(QLabel):
+    """
+    Semi-transparent label drawn on top of a view, showing render timings.
+
+    The HUD ignores mouse events so that it never interferes with the view below.
+    """
+
+    def __init__(self, parent=None):
+        """
+        Initialize the HUD.
+
+        Args:
+            parent (QWidget, optional): Widget on which the HUD is drawn.
+        """
+        super().__init__(parent)
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.setStyleSheet(
+            "background-color: rgba(0, 0, 0, 160); color: #00ff00; "
+            "font-family: monospace; font-size: 9px; padding: 3px;"
+        )
+        self.move(4, 4)
+        self.hide()
+
+    def set_summary(self, summary):
+        """
+        Show the given profiler summary.
+
+        Args:
+            summary (dict): Output of `RenderProfiler.summary`.
+        """
+        lines = [f"fps: {summary['fps']:.1f}"]
+        for stage, stats in summary["stages"].items():
+            lines.append(f"{stage}: {stats['mean_ms']:.2f} ms (max {stats['max_ms']:.1f})")
+        for name, stats in summary["caches"].items():
+            lines.append(f"{name} cache: {stats['hit_rate'] * 100:.0f}% hit")
+        self.setText("\n".join(lines))
+        self.adjustSize()
@@ -0,0 +1,211 @@
+import numpy as np
+from PyQt6.QtCore import QCoreApplication
+from PyQt6.QtWidgets import QFrame, QVBoxLayout, QLabel, QSizePolicy
+
+
+class IncrementalRoiStats:
+    """
+    Running statistics of the image intensities inside an editable ROI.
+
+    Instead of rescanning the volume at every edit, the ROI mask is compared with
+    the previous one (optionally only inside a bounding box) and the added/removed
+    voxels update running sums, sums of squares and histograms. For 4D images all
+    accumulators are kept per frame, which gives the ROI TAC for free.
+
+    Max and percentiles are derived from the histograms, so their resolution is
+    one bin (`bins` bins over the image intensity range).
+
+    Args:
+        data (np.ndarray): Raw image intensities, 3D (X, Y, Z) or 4D (X, Y, Z, T).
+        voxel_volume_ml (float): Volume of a voxel in ml.
+        bins (int, optional): Number of histogram bins. Defaults to 4096.
+    """
+
+    def __init__(self, data, voxel_volume_ml, bins=4096):
+        self.data = data
+        self.voxel_volume_ml = voxel_volume_ml
+        self.bins = bins
+        self.n_frames = data.shape[3] if data.ndim == 4 else 1
+
+        finite = data[np.isfinite(data)]
+        self.vmin = float(finite.min()) if finite.size else 0.0
+        self.vmax = float(finite.max()) if finite.size else 1.0
+        if self.vmax <= self.vmin:
+            self.vmax = self.vmin + 1.0
+        self.bin_width = (self.vmax - self.vmin) / bins
+
+        self.mask = np.zeros(data.shape[:3], dtype=bool)
+        self.reset()
+
+    def reset(self):
+        """Empty the ROI and all accumulators."""
+        self.mask[:] = False
+        self.count = 0
+        self.sums = np.zeros(self.n_frames, dtype=np.float64)
+        self.sumsq = np.zeros(self.n_frames, dtype=np.float64)
+        self.hist = np.zeros((self.n_frames, self.bins), dtype=np.int64)
+
+    def update(self, new_mask, bbox=None):
+        """
+        Bring the statistics in sync with a new ROI mask.
+
+        Args:
+            new_mask (np.ndarray): Boolean mask of the new ROI. Full volume if `bbox`
+                is None, otherwise only the region covered by `bbox`.
+            bbox (tuple[slice, slice, slice], optional): Region where the ROI may have
+                changed; voxels outside it are assumed unchanged.
+
+        Returns:
+            tuple[int, int]: Number of voxels added and removed.
+        """
+        bbox = bbox if bbox is not None else (slice(None),) * 3
+        old_mask = self.mask[bbox]
+        added = new_mask & ~old_mask
+        removed = old_mask & ~new_mask
+        offset = np.array([s.start or 0 for s in bbox])
+
+        n_added, n_removed = int(added.sum()), int(removed.sum())
+        if n_added:
+            self._accumulate(tuple(np.array(np.nonzero(added)) + offset[:, None]), 1)
+        if n_removed:
+            self._accumulate(tuple(np.array(np.nonzero(removed)) + offset[:, None]), -1)
+        self.mask[bbox] = new_mask
+        return n_added, n_removed
+
+    def _accumulate(self, coords, sign):
+        """Add (sign=1) or remove (sign=-1) the contributions of the voxels at `coords`."""
+        values = self.data[coords].reshape(len(coords[0]), self.n_frames).astype(np.float64)
+        values = np.nan_to_num(values, nan=self.vmin, posinf=self.vmax, neginf=self.vmin)
+
+        self.count += sign * values.shape[0]
+        self.sums += sign * values.sum(axis=0)
+        self.sumsq += sign * (values ** 2).sum(axis=0)
+
+        # One bincount for all frames: flat index = frame * bins + bin
+        bin_idx = np.clip(((values - self.vmin) / self.bin_width).astype(np.int64), 0, self.bins - 1)
+        flat_idx = (bin_idx + np.arange(self.n_frames) * self.bins).ravel()
+        counts = np.bincount(flat_idx, minlength=self.n_frames * self.bins)
+        self.hist += sign * counts.reshape(self.n_frames, self.bins)
+
+    def percentile(self, q, frame=0):
+        """
+        Approximate percentile of the ROI intensities from the histogram.
+
+        Args:
+            q (float): Percentile (0–100).
+            frame (int, optional): Frame index for 4D images.
+
+        Returns:
+            float | None: Intensity value, or None for an empty ROI.
+        """
+        if self.count <= 0:
+            return None
+        cumulative = np.cumsum(self.hist[frame])
+        idx = int(np.searchsorted(cumulative, q / 100.0 * self.count))
+        idx = min(idx, self.bins - 1)
+        return min(self.vmin + (idx + 0.5) * self.bin_width, self.vmax)
+
+    def tac(self):
+        """
+        Mean ROI intensity for every frame.
+
+        Returns:
+            np.ndarray | None: Array of length T, or None for an empty ROI.
+        """
+        if self.count <= 0:
+            return None
+        return self.sums / self.count
+
+    def summary(self, frame=0):
+        """
+        Collect the statistics of the ROI for one frame.
+
+        Args:
+            frame (int, optional): Frame index for 4D images.
+
+        Returns:
+            dict | None: count, volume_ml, mean, std, max, p5, p50, p95 and, for 4D
+            images, the TAC peak (tac_peak, tac_peak_frame). None for an empty ROI.
+        """
+        if self.count <= 0:
+            return None
+        mean = self.sums[frame] / self.count
+        variance = max(self.sumsq[frame] / self.count - mean ** 2, 0.0)
+        summary = {
+            "count": self.count,
+            "volume_ml": self.count * self.voxel_volume_ml,
+            "mean": mean,
+            "std": np.sqrt(variance),
+            "max": self.percentile(100, frame),
+            "p5": self.percentile(5, frame),
+            "p50": self.percentile(50, frame),
+            "p95": self.percentile(95, frame),
+        }
+        if self.n_frames > 1:
+            tac = self.tac()
+            summary["tac_peak_frame"] = int(np.argmax(tac))
+            summary["tac_peak"] = float(tac.max())
+        return summary
+
+
+class RoiStatsPanel(QFrame):
+    """
+    Compact panel displaying the live statistics of the ROI being drawn.
+
+    The panel only formats the dictionary produced by `IncrementalRoiStats.summary`.
+    """
+
+    def __init__(self, parent=None):
+        """
+        Initialize the panel.
+
+        Args:
+            parent (QWidget, optional): Parent widget.
+        """
+        super().__init__(parent)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(5, 5, 5, 5)
+
+        self.title_label = QLabel(QCoreApplication.translate("RoiStatsPanel", "ROI Statistics:"))
+        self.title_label.setStyleSheet("font-size: 10px; font-weight: bold;")
+        self.title_label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        layout.addWidget(self.title_label)
+
+        self.stats_label = QLabel()
+        self.stats_label.setStyleSheet("font-size: 10px;")
+        self.stats_label.setWordWrap(True)
+        self.stats_label.setSizePolicy(QSizePolicy.Policy.Ignored, QSizePolicy.Policy.Minimum)
+        layout.addWidget(self.stats_label)
+
+        self.set_summary(None)
+
+    def set_summary(self, summary):
+        """
+        Show the given statistics.
+
+        Args:
+            summary (dict | None): Output of `IncrementalRoiStats.summary`, or None for no ROI.
+        """
+        if summary is None:
+            self.stats_label.setText(QCoreApplication.translate("RoiStatsPanel", "No ROI"))
+            return
+
+        lines = [
+            QCoreApplication.translate("RoiStatsPanel", "Voxels") + f": {summary['count']}",
+            QCoreApplication.translate("RoiStatsPanel", "Volume") + f": {summary['volume_ml']:.2f} ml",
+            QCoreApplication.translate("RoiStatsPanel", "Mean") + f": {summary['mean']:.3g} ± {summary['std']:.3g}",
+            QCoreApplication.translate("RoiStatsPanel", "Max") + f": {summary['max']:.3g}",
+            f"P5/P50/P95: {summary['p5']:.3g} / {summary['p50']:.3g} / {summary['p95']:.3g}",
+        ]
+        if "tac_peak" in summary:
+            lines.append(
+                QCoreApplication.translate("RoiStatsPanel", "TAC peak") +
+                f": {summary['tac_peak']:.3g} @ " +
+                QCoreApplication.translate("RoiStatsPanel", "frame") + f" {summary['tac_peak_frame']}"
+            )
+        self.stats_label.setText("\n".join(lines))
+
+    def retranslate(self):
+        """Update static texts after a language change."""
+        self.title_label.setText(QCoreApplication.translate("RoiStatsPanel", "ROI Statistics:"))
@@ -1,30 +1,13 @@
 import matplotlib 
 matplotlib.rcParams['figure.facecolor'] = '1.'
 matplotlib.use('Agg')
-import ants
-import time
 import numpy as np
 import nibabel as nib
 import matplotlib.pyplot as plt
-import matplotlib.animation as animation
+from PIL import Image
 from skimage.filters import threshold_otsu
-from nibabel.processing import resample_to_output, resample_from_to
-from scipy.ndimage.filters import gaussian_filter
-from skimage.transform import resize
-
-def load_3d(fn, t=0, verbose=False):
-    if verbose : print('Reading Frame %d'%t,'from', fn)
-    img = nib.load(fn)
-    vol = img.get_fdata() 
-    if len(vol.shape) == 4 :
-        vol = vol[:,:,:,t]
-    vol = vol.reshape(vol.shape[0:3] )
-    img = nib.Nifti1Image(vol, img.affine)
-    return img, vol
-
-def get_spacing(aff, i) : 
-    return aff[i, np.argmax(np.abs(aff[i,0:3]))] 
-
+from nibabel.processing import resample_from_to
+from scipy.ndimage import gaussian_filter
 
 def get_slices(vol,  dim, i) :
 
@@ -36,6 +19,125 @@ def get_slices(vol,  dim, i) :
         r = vol[ :, :, i ]
     return r
 
+def colormap_lut(cmap):
+    '''
+    Inputs:
+        cmap: matplotlib colormap
+    Outputs:
+        lut: float array (256, 4), RGBA colors of the colormap
+    '''
+    return cmap(np.linspace(0, 1, 256))
+
+def lut_index(img, vmin, vmax):
+    '''
+    Inputs:
+        img: 2D array
+        vmin, vmax: values mapped to the first and last colors
+    Outputs:
+        index: uint8 array, colormap entry of every pixel (as matplotlib maps them)
+    '''
+    scale = 256. / (vmax - vmin) if vmax > vmin else 0.
+    return np.clip((img - vmin) * scale, 0, 255).astype(np.uint8)
+
+def pack_rgb(rgb):
+    '''
+    Inputs:
+        rgb: float array (..., 3), colors in [0, 1]
+    Outputs:
+        packed: uint32 array (...), RGBX bytes of every color, so that a LUT lookup gathers one word per pixel
+    '''
+    rgbx = np.full(rgb.shape[:-1] + (4,), 255, dtype=np.uint8)
+    rgbx[..., :3] = np.round(rgb * 255)
+    return rgbx.view(np.uint32)[..., 0]
+
+def palette_image(frame):
+    '''
+    Inputs:
+        frame: uint8 RGBX image (height, width, 4)
+    Outputs:
+        image: PIL palette image of the frame, with its exact colors when it has at most 256 of them
+    '''
+    packed = frame.view(np.uint32)[..., 0]
+    colors, index = np.unique(packed, return_inverse=True)
+    if colors.size <= 256 :
+        image = Image.fromarray(index.reshape(packed.shape).astype(np.uint8), 'P')
+        image.putpalette(colors.view(np.uint8).reshape(-1, 4)[:, :3].tobytes())
+        return image
+    # Blended overlays: the fast octree quantizer bands the gradients, but only those frames
+    rgb = Image.frombuffer('RGBX', frame.shape[1::-1], frame, 'raw', 'RGBX', 0, 1).convert('RGB')
+    return rgb.quantize(colors=256, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+
+def blend_lut(lut1, lut2, alpha):
+    '''
+    Inputs:
+        lut1: float array (256, 4), colors of the volume
+        lut2: float array (256, 4), colors of the overlay, drawn over the volume
+        alpha: float, opacity of the overlay
+    Outputs:
+        lut: packed uint32 array (256*256), color of every (volume, overlay) pair of entries, at index i1*256 + i2
+    '''
+    a = alpha * lut2[None, :, 3:]
+    rgb = lut1[:, None, :3] * (1 - a) + lut2[None, :, :3] * a
+    return pack_rgb(rgb).ravel()
+
+def edges(slices, sigma):
+    '''
+    Edges of the slices of a volume: gradient magnitude of the smoothed slices, thresholded
+    with the Otsu threshold of all the slices.
+    '''
+    slices = [gaussian_filter(r, sigma) for r in slices]
+    slices = [np.sqrt(np.sum(np.abs(np.gradient(r)), axis=0)) for r in slices]
+    threshold = threshold_otsu(np.concatenate([r.ravel() for r in slices]))
+    for r in slices:
+        r[r < threshold] = 0
+    return slices
+
+def display_slice(vol, dim, idx):
+    '''Slice of a volume in RAS orientation, displayed with the inferior/posterior side down.'''
+    return np.flipud(get_slices(vol, dim, idx).T)
+
+def resize_matrix(n_in, n_out):
+    '''
+    Outputs:
+        matrix: float32 array (n_out, n_in), linear interpolation from n_in to n_out pixels
+    '''
+    x = np.clip((np.arange(n_out) + 0.5) * n_in / n_out - 0.5, 0, n_in - 1)
+    i0 = np.floor(x).astype(int)
+    i1 = np.minimum(i0 + 1, n_in - 1)
+    matrix = np.zeros((n_out, n_in), dtype=np.float32)
+    matrix[np.arange(n_out), i0] += 1 - (x - i0)
+    matrix[np.arange(n_out), i1] += x - i0
+    return matrix
+
+def panel_resizers(shape, spacing, height):
+    '''
+    Inputs:
+        shape: tuple, shape of the volume
+        spacing: list, voxel size along each axis
+        height: int, height of the panels in pixels
+    Outputs:
+        resizers: list, for each axis, (rows, cols) matrices resizing its displayed slices r to
+                  rows @ r @ cols.T, with the height and isotropic pixels
+    '''
+    resizers = []
+    for dim in [0,1,2]:
+        axes = [i for i in range(3) if i != dim]
+        n_rows, n_cols = shape[axes[1]], shape[axes[0]]
+        width = max(1, int(round(height * (n_cols * spacing[axes[0]]) / (n_rows * spacing[axes[1]]))))
+        resizers.append((resize_matrix(n_rows, height), resize_matrix(n_cols, width)))
+    return resizers
+
+def load_canonical(img):
+    '''
+    Inputs:
+        img: nibabel image
+    Outputs:
+        vol: float32 volume in the closest RAS orientation (flips and axis swaps, no interpolation)
+        img: the image in that orientation
+    '''
+    img = nib.as_closest_canonical(img)
+    return np.asanyarray(img.dataobj, dtype=np.float32), img
+
 class ImageParam():
     def __init__(self, in_fn, out_fn, overlay_fn=None, alpha=[1.], dpi=100, duration=100, cmap1=plt.cm.nipy_spectral, cmap2=plt.cm.gray, colorbar=False, edge_1=-1, edge_2=-1,nframes=15, time_frames=1, ndim=3):
         self.in_fn = in_fn
@@ -53,88 +155,98 @@ class ImageParam():
         self.ndim = ndim
         self.time_frames=time_frames
 
-    def load_isotropic(self,in_fn,t=0):
-        aff = nib.load(in_fn).affine
-        vol_img, vol = load_3d(in_fn,t)
-        sep =[ get_spacing(vol_img.affine, i) for i in range(3) ]
-        min_unit=np.min(np.abs(sep))
-        #new_units=[min_unit*np.sign(sep[0]), min_unit*np.sign(sep[1]), min_unit*np.sign(sep[2]) ] 
-        vol_img = resample_to_output(vol_img, [min_unit]*3,order=1 )
-        vol=vol_img.get_fdata()
-        return vol_img, vol
-
     def volume2gif(self):
-        in_fn = self.in_fn
-        out_fn = self.out_fn
-        overlay_fn = self.overlay_fn
-        alpha  = self.alpha
-        dpi = self.dpi
-        duration  = self.duration
-        cmap1 = self.cmap1
-        cmap2 = self.cmap2
-
-        def apply_tfm(img, sigma):
-            if sigma >= 0  : 
-                img = gaussian_filter(img, sigma)
-                img = np.sqrt(np.sum(np.abs(np.gradient(img)),axis=0)) 
-                img[ img < threshold_otsu(img) ] =0 
-            return img
-        img = nib.load(in_fn)
-        ndim=len(img.shape)
-        full_vol = img.get_fdata()
+        '''
+        Write the QC animation: sagittal, coronal and axial slices side by side, sweeping through the
+        volume (nframes slices for every alpha level of the overlay).
+
+        Only the displayed slices are extracted, in the RAS orientation of the volume, and resized to
+        isotropic pixels; they are colored with the colormap LUTs, blended with the overlay in NumPy,
+        and the frames are written by Pillow.
+        '''
+        in_img = nib.load(self.in_fn)
+        full_vol, img = load_canonical(in_img)
         vmin, vmax  = (np.min(full_vol)*.02, np.max(full_vol)*0.98 )
+        spacing = np.abs(img.header.get_zooms()[:3])
+        # Panel height in pixels (dpi 100 -> 200 pixels)
+        height = max(32, int(2 * self.dpi))
+
+        overlay_vol = None
+        if self.overlay_fn != None :
+            overlay_img = nib.load(self.overlay_fn)
+            overlay_vol = np.asanyarray(overlay_img.dataobj, dtype=np.float32)
+            if overlay_vol.ndim == 4 :
+                overlay_vol = overlay_vol[..., 0]
+            overlay_img = nib.Nifti1Image(overlay_vol.reshape(overlay_vol.shape[:3]), overlay_img.affine)
+            if overlay_img.shape != in_img.shape[:3] or not np.allclose(overlay_img.affine, in_img.affine) :
+                # Overlay in another grid: resampled to the grid of the volume
+                overlay_img = resample_from_to(overlay_img, (in_img.shape[:3], in_img.affine), order=1)
+            overlay_vol, _ = load_canonical(overlay_img)
 
-        tmax=1
-        if ndim == 4 :
-            tmax = nib.load(in_fn).shape[3]
+        tmax = img.shape[3] if len(img.shape) == 4 else 1
         for t in range(tmax) :
-            vol_img, vol = self.load_isotropic(in_fn,t)
-            vol = apply_tfm(vol,self.edge_1)
-
-            if overlay_fn != None :
-                overlay_img, overlay_vol = self.load_isotropic(overlay_fn)
-                overlay_vol = resample_from_to(overlay_img, vol_img).get_fdata()
-                overlay_vol = apply_tfm(overlay_vol,self.edge_2)
-                omin, omax  = (np.min(overlay_vol), np.max(overlay_vol) )#np.percentile(vol, [1,99])
-
-            frames=[]
-            plt.clf()
-            fig = plt.figure()
-
-            axes=[fig.add_subplot(1, 3, ii) for ii in [1,2,3]]
-            axes[0].axis("off")
-            axes[1].axis("off")
-            axes[2].axis("off")
-
-            frame=[ axes[ii].imshow(get_slices(vol,ii,0), cmap=cmap1, animated=True,origin='lower', vmin=vmin, vmax=vmax, interpolation='gaussian' ) for ii in [0,1,2]]
-            nframes_per_alpha= self.nframes
-            total_frames = nframes_per_alpha * len(alpha) 
-            def animate(i):
-                alpha_level = int(i / nframes_per_alpha)
-                ii = i % nframes_per_alpha
-                for dim in [0,1,2] :
-                    idx = np.round(vol.shape[dim] * ii / (self.nframes+0.0)).astype(int)
-                    r = get_slices(vol, dim, idx)
-
-                    frame[dim] = axes[dim].imshow(r.T, cmap=cmap1, animated=True,origin='lower', vmin=vmin, vmax=vmax, interpolation='gaussian' )
-
-                    if overlay_fn != None :
-                        m = get_slices(overlay_vol, dim, idx)
-                        frame[dim] = axes[dim].imshow(m.T,alpha=alpha[alpha_level], cmap=cmap2, vmin=omin, vmax=omax, interpolation='gaussian', origin='lower', animated=True)
-                return frame
-
-            if self.colorbar :
-                fig.colorbar(frame[2], shrink=0.35 )
-            plt.tight_layout()
-            stime=time.time()
-            ani = animation.FuncAnimation(fig, animate, frames=total_frames, interval=duration, blit=True, repeat_delay=1000)
-            if ndim == 4 :
-                out_fn = self.out_fn[t]
-            ani.save(out_fn, dpi=self.dpi) #, writer='imagemagick')
-            plt.close(fig)
-            #print(time.time()-stime)  
+            vol = full_vol[..., t] if len(img.shape) == 4 else full_vol.reshape(img.shape[:3])
+            frames = self._render_frames(vol, overlay_vol, spacing, vmin, vmax, height)
+
+            out_fn = self.out_fn[t] if len(img.shape) == 4 else self.out_fn
+            images = [palette_image(frame) for frame in frames]
+            images[0].save(out_fn, save_all=True, append_images=images[1:], duration=self.duration, loop=0)
             print('Writing', out_fn)
 
+    def _render_frames(self, vol, overlay_vol, spacing, vmin, vmax, height):
+        '''
+        Outputs:
+            frames: list of uint8 RGBX images (height, width, 4), one per animation frame
+        '''
+        # Slices shown in the frames of every alpha level
+        indices = [[int(np.round(vol.shape[dim] * ii / (self.nframes+0.0))) for ii in range(self.nframes)] for dim in [0,1,2]]
+        indices = [[min(idx, vol.shape[dim] - 1) for idx in indices[dim]] for dim in [0,1,2]]
+        resizers = panel_resizers(vol.shape, spacing, height)
+
+        def panels(volume, sigma):
+            stack = [[display_slice(volume, dim, idx) for idx in indices[dim]] for dim in [0,1,2]]
+            if sigma >= 0 :
+                flat = edges([r for dim_slices in stack for r in dim_slices], sigma)
+                stack = [flat[dim * self.nframes:(dim + 1) * self.nframes] for dim in [0,1,2]]
+            return [[resizers[dim][0] @ r.astype(np.float32) @ resizers[dim][1].T for r in stack[dim]] for dim in [0,1,2]]
+
+        base = [[lut_index(p, vmin, vmax) for p in dim_panels] for dim_panels in panels(vol, self.edge_1)]
+        lut1 = colormap_lut(self.cmap1)
+
+        if overlay_vol is not None :
+            overlay = panels(overlay_vol, self.edge_2)
+            if self.edge_2 >= 0 :
+                omin = min(np.min(p) for dim_panels in overlay for p in dim_panels)
+                omax = max(np.max(p) for dim_panels in overlay for p in dim_panels)
+            else :
+                omin, omax  = (np.min(overlay_vol), np.max(overlay_vol) )
+            # Index of the (volume, overlay) pair of colors of every pixel in the blended LUT
+            pairs = [[b.astype(np.uint16) * 256 + lut_index(p, omin, omax) for b, p in zip(base[dim], overlay[dim])] for dim in [0,1,2]]
+            luts = [blend_lut(lut1, colormap_lut(self.cmap2), alpha) for alpha in self.alpha]
+        else :
+            pairs = base
+            # Same frames for every alpha level
+            luts = [pack_rgb(lut1[:, :3])] * len(self.alpha)
+
+        colorbar = None
+        if self.colorbar :
+            colorbar = pack_rgb(lut1[::-1, :3])[resize_matrix(256, height).argmax(axis=1)]
+            colorbar = np.repeat(colorbar[:, None], max(8, height // 25), axis=1)
+
+        gap = np.full((height, max(4, height // 20)), pack_rgb(np.ones(3)), dtype=np.uint32)
+        frames = []
+        for lut in luts :
+            for ii in range(self.nframes) :
+                row = []
+                for dim in [0,1,2] :
+                    row += [gap, np.take(lut, pairs[dim][ii])]
+                if colorbar is not None :
+                    row += [gap, colorbar]
+                row.append(gap)
+                frame = np.concatenate(row, axis=1)
+                frames.append(frame.view(np.uint8).reshape(frame.shape + (4,)))
+        return frames
+
 '''
         visual_qc_images=[  
                 ImageParam(self.inputs.pet_3d , self.inputs.pet_3d_gif, self.inputs.pet_brain_mask, cmap1=plt.cm.Greys, cmap2=plt.cm.Reds, alpha=[0.3], duration=300),
@@ -0,0 +1,291 @@
+"""
+Lazily evaluated volumes derived from the loaded images.
+
+A derived volume is an expression over other volumes (plain arrays or derived
+volumes themselves) that is only evaluated where it is looked at: a displayed
+slice of a frame, or the voxels of an ROI. Evaluated slices are cached, and the
+full derived array (possibly 4D) is never materialized.
+
+Supported expressions:
+    - `RatioToRoiMean`: division by the mean of a reference ROI (e.g. SUVr).
+    - `WeightedFrameSum`: frame sum weighted by the PET `FrameDuration`.
+    - `VolumeDifference`: voxel-wise difference of two volumes.
+"""
+import json
+import os
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from logger import get_logger
+from threads.nifti_utils_threads import FrameCache
+
+log = get_logger()
+
+
+class ArrayVolume:
+    """
+    Adapter exposing a 3D or 4D array through the derived volume interface.
+
+    Args:
+        data (np.ndarray): Image data (X, Y, Z) or (X, Y, Z, T).
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.shape = data.shape[:3]
+        self.n_frames = data.shape[3] if data.ndim == 4 else 1
+
+    def get_slice(self, plane_idx, slice_idx, frame=0):
+        """
+        Extract a slice in array orientation (not transposed or flipped).
+
+        Args:
+            plane_idx (int): 0=axial (Z fixed), 1=coronal (Y fixed), 2=sagittal (X fixed).
+            slice_idx (int): Slice index along the plane normal.
+            frame (int, optional): Time frame for 4D data.
+
+        Returns:
+            np.ndarray: 2D float array.
+        """
+        index = [slice(None)] * 3
+        index[2 - plane_idx] = slice_idx
+        if self.data.ndim == 4:
+            index.append(min(frame, self.n_frames - 1))
+        return np.asarray(self.data[tuple(index)], dtype=np.float32)
+
+    def get_values(self, coords, frame=0):
+        """
+        Evaluate the volume at a set of voxels.
+
+        Args:
+            coords (tuple[np.ndarray, np.ndarray, np.ndarray]): Voxel indices, as returned by `np.nonzero`.
+            frame (int, optional): Time frame for 4D data.
+
+        Returns:
+            np.ndarray: 1D float array of values.
+        """
+        if self.data.ndim == 4:
+            return np.asarray(self.data[coords + (min(frame, self.n_frames - 1),)], dtype=np.float32)
+        return np.asarray(self.data[coords], dtype=np.float32)
+
+
+class DerivedVolume(ABC):
+    """
+    Base class of the lazily evaluated expressions.
+
+    Subclasses must implement `_compute_slice` and `get_values` (a subclass missing
+    either cannot be instantiated); slices are cached per (plane, slice, frame)
+    in a bounded cache.
+
+    Args:
+        shape (tuple[int, int, int]): Spatial shape.
+        n_frames (int): Number of frames of the result.
+        cache_capacity (int, optional): Maximum number of cached slices. Defaults to 256.
+    """
+
+    def __init__(self, shape, n_frames, cache_capacity=256):
+        self.shape = tuple(shape)
+        self.n_frames = n_frames
+        self.cache = FrameCache(cache_capacity)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._display_range = None
+
+    def get_slice(self, plane_idx, slice_idx, frame=0):
+        """
+        Evaluate a slice of the expression, from the cache when available.
+
+        Args:
+            plane_idx (int): 0=axial (Z fixed), 1=coronal (Y fixed), 2=sagittal (X fixed).
+            slice_idx (int): Slice index along the plane normal.
+            frame (int, optional): Time frame (ignored for 3D results).
+
+        Returns:
+            np.ndarray: 2D float32 slice in array orientation.
+        """
+        key = (plane_idx, slice_idx, frame if self.n_frames > 1 else 0)
+        result = self.cache.get(key)
+        if result is None:
+            self.cache_misses += 1
+            result = self._compute_slice(plane_idx, slice_idx, key[2])
+            self.cache.put(key, result)
+        else:
+            self.cache_hits += 1
+        return result
+
+    @abstractmethod
+    def _compute_slice(self, plane_idx, slice_idx, frame):
+        """Evaluate a slice of the expression (2D float32, array orientation)."""
+
+    @abstractmethod
+    def get_values(self, coords, frame=0):
+        """Evaluate the expression at a set of voxels (1D float32)."""
+
+    def display_range(self, stride=4):
+        """
+        Intensity range used to display the volume, estimated without evaluating it fully.
+
+        The expression is evaluated on a regular subsample of the voxels (every
+        `stride`-th voxel along each axis) of a few frames, and the same 0.1–99.9
+        percentiles used to normalize loaded images are taken.
+
+        Args:
+            stride (int, optional): Subsampling step along each axis. Defaults to 4.
+
+        Returns:
+            tuple[float, float]: (vmin, vmax).
+        """
+        if self._display_range is None:
+            grid = np.meshgrid(*[np.arange(0, n, stride) for n in self.shape], indexing="ij")
+            coords = tuple(g.ravel() for g in grid)
+            frames = np.unique(np.linspace(0, self.n_frames - 1, min(self.n_frames, 5)).astype(int))
+            values = np.concatenate([self.get_values(coords, int(t)) for t in frames])
+            values = values[np.isfinite(values)]
+            vmin, vmax = np.percentile(values, [0.1, 99.9]) if values.size else (0.0, 1.0)
+            if vmax <= vmin:
+                vmax = vmin + 1.0
+            self._display_range = (float(vmin), float(vmax))
+        return self._display_range
+
+
+def as_volume(volume):
+    """Wrap plain arrays so that they can be used as operands of derived volumes."""
+    return volume if isinstance(volume, (ArrayVolume, DerivedVolume)) else ArrayVolume(volume)
+
+
+class RatioToRoiMean(DerivedVolume):
+    """
+    Volume divided by the mean of a reference ROI (e.g. SUVr with a reference region).
+
+    The ROI mean is computed per frame, from the ROI voxels only.
+
+    Args:
+        source (np.ndarray | ArrayVolume | DerivedVolume): Numerator volume.
+        roi_mask (np.ndarray): 3D boolean mask of the reference region.
+    """
+
+    def __init__(self, source, roi_mask, **kwargs):
+        self.source = as_volume(source)
+        super().__init__(self.source.shape, self.source.n_frames, **kwargs)
+        if roi_mask.shape != self.shape:
+            raise ValueError(f"ROI shape {roi_mask.shape} does not match volume shape {self.shape}")
+        self.roi_coords = np.nonzero(roi_mask)
+        if len(self.roi_coords[0]) == 0:
+            raise ValueError("Reference ROI is empty")
+        self._roi_means = {}
+
+    def roi_mean(self, frame=0):
+        """
+        Mean of the source volume in the reference ROI.
+
+        Args:
+            frame (int, optional): Time frame.
+
+        Returns:
+            float: ROI mean.
+        """
+        if frame not in self._roi_means:
+            self._roi_means[frame] = float(np.nanmean(self.source.get_values(self.roi_coords, frame)))
+        return self._roi_means[frame]
+
+    def _scale(self, frame):
+        mean = self.roi_mean(frame)
+        return 1.0 / mean if mean != 0 else np.nan
+
+    def _compute_slice(self, plane_idx, slice_idx, frame):
+        return self.source.get_slice(plane_idx, slice_idx, frame) * np.float32(self._scale(frame))
+
+    def get_values(self, coords, frame=0):
+        return self.source.get_values(coords, frame) * np.float32(self._scale(frame))
+
+
+class WeightedFrameSum(DerivedVolume):
+    """
+    Weighted sum of the frames of a 4D volume (a 3D result).
+
+    With weights `FrameDuration / sum(FrameDuration)` this is the static image the
+    pipeline computes from the dynamic PET; restricting the frames gives e.g. the
+    early-frame sum used for the sinus sagittalis.
+
+    Args:
+        source (np.ndarray | ArrayVolume | DerivedVolume): 4D volume.
+        weights (array-like): One weight per frame; frames with weight 0 are skipped.
+    """
+
+    def __init__(self, source, weights, **kwargs):
+        self.source = as_volume(source)
+        super().__init__(self.source.shape, 1, **kwargs)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        if len(self.weights) != self.source.n_frames:
+            raise ValueError(f"{len(self.weights)} weights given for {self.source.n_frames} frames")
+        self.frames = [int(t) for t in np.nonzero(self.weights)[0]]
+
+    def _compute_slice(self, plane_idx, slice_idx, frame):
+        result = None
+        for t in self.frames:
+            contribution = self.source.get_slice(plane_idx, slice_idx, t) * self.weights[t]
+            result = contribution if result is None else result + contribution
+        if result is None:
+            return np.zeros_like(self.source.get_slice(plane_idx, slice_idx, 0))
+        return result
+
+    def get_values(self, coords, frame=0):
+        result = np.zeros(len(coords[0]), dtype=np.float32)
+        for t in self.frames:
+            result += self.source.get_values(coords, t) * self.weights[t]
+        return result
+
+
+class VolumeDifference(DerivedVolume):
+    """
+    Voxel-wise difference `a - b` of two volumes with the same spatial shape.
+
+    A 3D operand is broadcast over the frames of a 4D one.
+
+    Args:
+        a (np.ndarray | ArrayVolume | DerivedVolume): Minuend.
+        b (np.ndarray | ArrayVolume | DerivedVolume): Subtrahend.
+    """
+
+    def __init__(self, a, b, **kwargs):
+        self.a = as_volume(a)
+        self.b = as_volume(b)
+        if self.a.shape != self.b.shape:
+            raise ValueError(f"Volume shapes {self.a.shape} and {self.b.shape} do not match")
+        if self.a.n_frames > 1 and self.b.n_frames > 1 and self.a.n_frames != self.b.n_frames:
+            raise ValueError(f"Frame counts {self.a.n_frames} and {self.b.n_frames} do not match")
+        super().__init__(self.a.shape, max(self.a.n_frames, self.b.n_frames), **kwargs)
+
+    def _compute_slice(self, plane_idx, slice_idx, frame):
+        return self.a.get_slice(plane_idx, slice_idx, frame) - self.b.get_slice(plane_idx, slice_idx, frame)
+
+    def get_values(self, coords, frame=0):
+        return self.a.get_values(coords, frame) - self.b.get_values(coords, frame)
+
+
+def frame_duration_weights(nifti_path, n_frames):
+    """
+    Frame weights `FrameDuration / sum(FrameDuration)` from the BIDS JSON sidecar of a PET image.
+
+    Args:
+        nifti_path (str): Path of the .nii/.nii.gz image; the sidecar has the same name with .json.
+        n_frames (int): Number of frames of the image.
+
+    Returns:
+        np.ndarray | None: Weights, or None if the sidecar or a consistent FrameDuration is missing.
+    """
+    base = nifti_path[:-7] if nifti_path.endswith(".nii.gz") else os.path.splitext(nifti_path)[0]
+    json_path = base + ".json"
+    if not os.path.exists(json_path):
+        return None
+    try:
+        with open(json_path, "r") as f:
+            durations = np.asarray(json.load(f).get("FrameDuration", []), dtype=float)
+    except Exception as e:
+        log.error(f"Error reading FrameDuration from {json_path}: {e}")
+        return None
+    if durations.ndim != 1 or len(durations) != n_frames or durations.sum() <= 0:
+        log.warning(f"FrameDuration in {json_path} does not match the {n_frames} frames of the image")
+        return None
+    return durations / durations.sum()
@@ -0,0 +1,290 @@
+"""
+Lazy assembly of a DICOM series folder into a (possibly 4D) volume.
+
+Opening a series only reads the file headers (without pixel data) to sort the
+slices, group them into frames and build the affine. Pixel data is decoded on
+demand, file by file, when a slice or a frame is actually looked at, so a large
+dynamic PET series can be displayed without converting it first.
+
+Decoded slices are written into preallocated buffers that act as the decode
+cache: every file is decoded at most once. The buffers are allocated with
+`np.zeros`, whose pages are only committed by the OS once written, so memory
+grows with the decoded slices rather than with the series size.
+"""
+import os
+import threading
+from collections import Counter
+
+import nibabel as nib
+import numpy as np
+import pydicom
+from pydicom.errors import InvalidDicomError
+
+from logger import get_logger
+
+log = get_logger()
+
+REQUIRED_TAGS = ("ImagePositionPatient", "ImageOrientationPatient", "PixelSpacing", "Rows", "Columns")
+
+
+def _frame_sort_key(header):
+    """Order of the files sharing a slice position: frame start time, acquisition time, instance number."""
+    return (
+        float(getattr(header, "FrameReferenceTime", 0) or 0),
+        str(getattr(header, "AcquisitionTime", "") or ""),
+        int(getattr(header, "InstanceNumber", 0) or 0),
+    )
+
+
+class DicomSeries:
+    """
+    DICOM series whose pixel data is decoded lazily.
+
+    The volume is exposed in the same RAS+ canonical orientation as the NIfTI
+    images loaded by the viewer, both normalized to [0, 1] (`data`) and in the
+    original units (`raw`). Both arrays are views on the decode buffers: voxels
+    of slices not decoded yet read as 0, so callers must `ensure_*` the region
+    they are about to read.
+
+    Normalization uses the 0.1–99.9 percentiles of each frame, like
+    `ImageLoadThread`, estimated on a few evenly spaced slices of the frame.
+
+    Args:
+        folder (str): Folder containing the single-frame DICOM files of the series.
+        sample_slices (int, optional): Number of slices used to estimate the
+            normalization range of a frame. Defaults to 8.
+        progress (callable, optional): Called with the header reading progress (0–100).
+
+    Raises:
+        ValueError: If the folder contains no usable DICOM image, or an incomplete series.
+    """
+
+    def __init__(self, folder, sample_slices=8, progress=None):
+        self.folder = folder
+        self.sample_slices = sample_slices
+        self._lock = threading.RLock()
+
+        headers = self._read_headers(folder, progress)
+        self.files, native_affine = self._sort_series(headers)
+        n_frames, n_slices = len(self.files), len(self.files[0])
+        rows, columns = int(headers[0][1].Rows), int(headers[0][1].Columns)
+
+        # Native voxel axes: (column, row, slice, frame)
+        self.native_shape = (columns, rows, n_slices, n_frames)
+        self._raw = np.zeros(self.native_shape, dtype=np.float32)
+        self._data = np.zeros(self.native_shape, dtype=np.float32)
+        self.decoded = np.zeros((n_slices, n_frames), dtype=bool)
+        self.normalized = np.zeros((n_slices, n_frames), dtype=bool)
+        self.decode_count = 0
+        self._ranges = {}
+
+        # Canonical (RAS+) views of the buffers, as nib.as_closest_canonical would produce
+        self.ornt = nib.orientations.io_orientation(native_affine)
+        self.affine = native_affine @ nib.orientations.inv_ornt_aff(self.ornt, self.native_shape[:3])
+        self.data = nib.orientations.apply_orientation(self._data, self.ornt)
+        self.raw = nib.orientations.apply_orientation(self._raw, self.ornt)
+        if n_frames == 1:
+            self.data, self.raw = self.data[..., 0], self.raw[..., 0]
+        self.shape = self.data.shape
+        self.n_frames = n_frames
+
+        # Canonical axis -> (native axis, flipped)
+        self._axis_map = {int(a): (i, f < 0) for i, (a, f) in enumerate(self.ornt)}
+
+    @staticmethod
+    def _read_headers(folder, progress=None):
+        """
+        Read the headers of the DICOM images of the folder (largest series only).
+
+        Returns:
+            list[tuple[str, pydicom.Dataset]]: (path, header) pairs.
+        """
+        paths = sorted(
+            os.path.join(folder, name) for name in os.listdir(folder)
+            if os.path.isfile(os.path.join(folder, name))
+        )
+        headers = []
+        for i, path in enumerate(paths):
+            try:
+                header = pydicom.dcmread(path, stop_before_pixels=True)
+            except (InvalidDicomError, OSError):
+                continue  # Not a DICOM file (e.g. a JSON sidecar or a README)
+            if all(hasattr(header, tag) for tag in REQUIRED_TAGS):
+                headers.append((path, header))
+            if progress is not None and (i % 50 == 0 or i == len(paths) - 1):
+                progress(int(100 * (i + 1) / len(paths)))
+
+        if not headers:
+            raise ValueError(f"No DICOM image found in {folder}")
+
+        series = Counter(str(getattr(h, "SeriesInstanceUID", "")) for _, h in headers)
+        if len(series) > 1:
+            uid = series.most_common(1)[0][0]
+            log.warning(f"{len(series)} series found in {folder}, showing the largest one ({uid})")
+            headers = [(p, h) for p, h in headers if str(getattr(h, "SeriesInstanceUID", "")) == uid]
+        return headers
+
+    @staticmethod
+    def _sort_series(headers):
+        """
+        Sort the files by slice position and frame and compute the RAS affine.
+
+        Args:
+            headers (list[tuple[str, pydicom.Dataset]]): Output of `_read_headers`.
+
+        Returns:
+            tuple[list[list[str]], np.ndarray]: Files indexed by [frame][slice], and
+            the affine of the native voxel axes (column, row, slice).
+        """
+        first = headers[0][1]
+        orientation = np.asarray(first.ImageOrientationPatient, dtype=float)
+        row_dir, col_dir = orientation[:3], orientation[3:]
+        normal = np.cross(row_dir, col_dir)
+        row_spacing, col_spacing = (float(v) for v in first.PixelSpacing)
+
+        # Group the files by position along the slice normal
+        positions = {}
+        for path, header in headers:
+            position = np.asarray(header.ImagePositionPatient, dtype=float)
+            key = round(float(position @ normal), 2)
+            positions.setdefault(key, []).append((path, header, position))
+
+        locations = sorted(positions)
+        counts = {len(group) for group in positions.values()}
+        if len(counts) != 1:
+            raise ValueError(
+                f"Incomplete series: the {len(locations)} slice positions have {sorted(counts)} files each"
+            )
+        n_frames = counts.pop()
+
+        files = [[None] * len(locations) for _ in range(n_frames)]
+        for k, location in enumerate(locations):
+            group = sorted(positions[location], key=lambda item: _frame_sort_key(item[1]))
+            for t, (path, _, _) in enumerate(group):
+                files[t][k] = path
+
+        first_position = positions[locations[0]][0][2]
+        if len(locations) > 1:
+            last_position = positions[locations[-1]][0][2]
+            slice_step = (last_position - first_position) / (len(locations) - 1)
+        else:
+            slice_step = normal * float(getattr(first, "SliceThickness", 1.0) or 1.0)
+
+        # DICOM patient coordinates are LPS; the viewer works in RAS
+        affine = np.eye(4)
+        affine[:3, 0] = row_dir * col_spacing
+        affine[:3, 1] = col_dir * row_spacing
+        affine[:3, 2] = slice_step
+        affine[:3, 3] = first_position
+        return files, np.diag([-1.0, -1.0, 1.0, 1.0]) @ affine
+
+    def _decode(self, k, t):
+        """Decode the file of slice `k` of frame `t` into the raw buffer (if not already done)."""
+        if self.decoded[k, t]:
+            return
+        dataset = pydicom.dcmread(self.files[t][k])
+        pixels = dataset.pixel_array.astype(np.float32)
+        slope = float(getattr(dataset, "RescaleSlope", 1.0) or 1.0)
+        intercept = float(getattr(dataset, "RescaleIntercept", 0.0) or 0.0)
+        self._raw[:, :, k, t] = pixels.T * slope + intercept
+        self.decoded[k, t] = True
+        self.decode_count += 1
+
+    def frame_range(self, t):
+        """
+        Normalization range of a frame, estimated on a few evenly spaced slices.
+
+        Args:
+            t (int): Frame index.
+
+        Returns:
+            tuple[float, float]: (vmin, vmax).
+        """
+        with self._lock:
+            if t not in self._ranges:
+                n_slices = self.native_shape[2]
+                sample = np.unique(np.linspace(0, n_slices - 1, min(n_slices, self.sample_slices)).astype(int))
+                for k in sample:
+                    self._decode(int(k), t)
+                values = self._raw[:, :, sample, t]
+                values = values[np.isfinite(values)]
+                vmin, vmax = np.percentile(values, [0.1, 99.9]) if values.size else (0.0, 1.0)
+                if vmax <= vmin:
+                    vmax = vmin + 1.0
+                self._ranges[t] = (float(vmin), float(vmax))
+            return self._ranges[t]
+
+    def _ensure_native(self, slices, t):
+        """Decode and normalize the given native slices of frame `t`."""
+        with self._lock:
+            missing = [k for k in slices if not self.normalized[k, t]]
+            if not missing:
+                return
+            vmin, vmax = self.frame_range(t)
+            for k in missing:
+                self._decode(k, t)
+                self._data[:, :, k, t] = np.clip((self._raw[:, :, k, t] - vmin) / (vmax - vmin), 0, 1)
+                self.normalized[k, t] = True
+
+    def ensure_frame(self, frame=0):
+        """
+        Decode all the slices of a frame.
+
+        Args:
+            frame (int, optional): Frame index.
+        """
+        self._ensure_native(range(self.native_shape[2]), min(frame, self.n_frames - 1))
+
+    def ensure_slice(self, plane_idx, slice_idx, frame=0):
+        """
+        Decode the files needed to display a slice of the canonical volume.
+
+        When the plane is the acquisition plane a single file is decoded; other
+        planes cut through every slice of the frame.
+
+        Args:
+            plane_idx (int): 0=axial (Z fixed), 1=coronal (Y fixed), 2=sagittal (X fixed).
+            slice_idx (int): Slice index along the plane normal, in canonical orientation.
+            frame (int, optional): Frame index.
+        """
+        native_axis, flipped = self._axis_map[2 - plane_idx]
+        if native_axis != 2:
+            self.ensure_frame(frame)
+            return
+        k = self.native_shape[2] - 1 - slice_idx if flipped else slice_idx
+        self._ensure_native([k], min(frame, self.n_frames - 1))
+
+    def ensure_voxel(self, x, y, z):
+        """
+        Decode the files containing a voxel in every frame (e.g. for its time activity curve).
+
+        Args:
+            x (int): Canonical X index.
+            y (int): Canonical Y index.
+            z (int): Canonical Z index.
+        """
+        coords = (x, y, z)
+        for canonical_axis in range(3):
+            native_axis, flipped = self._axis_map[canonical_axis]
+            if native_axis == 2:
+                idx = coords[canonical_axis]
+                k = self.native_shape[2] - 1 - idx if flipped else idx
+                for t in range(self.n_frames):
+                    self._ensure_native([k], t)
+                return
+
+    def ensure_all(self, progress=None):
+        """
+        Decode the whole series.
+
+        Args:
+            progress (callable, optional): Called with the decoding progress (0–100) after each frame.
+        """
+        for t in range(self.n_frames):
+            self.ensure_frame(t)
+            if progress is not None:
+                progress(int(100 * (t + 1) / self.n_frames))
+
+    def is_fully_decoded(self):
+        """Whether every file of the series has been decoded and normalized."""
+        return bool(self.normalized.all())
@@ -0,0 +1,139 @@
+"""
+Time activity curves of all the regions of an atlas, computed in one pass.
+
+Instead of masking the 4D image once per region (one full scan of the volume
+per label), the voxels are flattened to (voxels, frames) rows and a single scan
+accumulates the sums and sums of squares of every (label, frame) pair, so the
+cost no longer grows with the number of regions.
+"""
+import csv
+
+import numpy as np
+from numba import njit
+
+
+@njit
+def accumulate_label_sums_numba(labels, frames, n_labels):
+    """
+    Accumulate per-label sums and sums of squares of every frame in one scan.
+
+    Serial on purpose: it runs in a background thread while the viewer renders
+    with its own parallel kernels.
+
+    Args:
+        labels (np.ndarray): Flat integer labels, one per voxel (0 = background).
+        frames (np.ndarray): Voxel values, shape (voxels, frames).
+        n_labels (int): Largest label + 1.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Sums and sums of squares, shape (n_labels, frames).
+            Non-finite values count as 0.
+    """
+    n_frames = frames.shape[1]
+    sums = np.zeros((n_labels, n_frames))
+    sumsq = np.zeros((n_labels, n_frames))
+    for i in range(labels.shape[0]):
+        label = labels[i]
+        if label <= 0:
+            continue
+        for t in range(n_frames):
+            value = np.float64(frames[i, t])
+            if not np.isfinite(value):
+                value = 0.0
+            sums[label, t] += value
+            sumsq[label, t] += value * value
+    return sums, sumsq
+
+
+class LabelTacTable:
+    """
+    Mean and standard deviation TACs of every label of an atlas.
+
+    Args:
+        labels (np.ndarray): Labels present in the atlas (background excluded).
+        counts (np.ndarray): Number of voxels of each label.
+        mean (np.ndarray): Mean TACs, shape (n_labels, n_frames).
+        std (np.ndarray): Standard deviation TACs, shape (n_labels, n_frames).
+    """
+
+    def __init__(self, labels, counts, mean, std):
+        self.labels = np.asarray(labels)
+        self.counts = np.asarray(counts)
+        self.mean = mean
+        self.std = std
+        self._rows = {int(label): i for i, label in enumerate(self.labels)}
+
+    @property
+    def n_frames(self):
+        """Number of frames of the curves."""
+        return self.mean.shape[1]
+
+    def __contains__(self, label):
+        return int(label) in self._rows
+
+    def curve(self, label):
+        """
+        TAC of a label.
+
+        Args:
+            label (int): Label value.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray] | None: (mean, std) curves, or None if the label is absent.
+        """
+        row = self._rows.get(int(label))
+        if row is None:
+            return None
+        return self.mean[row], self.std[row]
+
+    def to_csv(self, path, frame_times=None):
+        """
+        Write the table in long format, one row per (region, frame).
+
+        The columns follow the TAC files of the pipeline: frame, (time,) region,
+        voxels, value, std.
+
+        Args:
+            path (str): Output CSV path.
+            frame_times (array-like, optional): Start time of each frame, written as a `time` column.
+        """
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            header = ["frame"] + (["time"] if frame_times is not None else []) + ["region", "voxels", "value", "std"]
+            writer.writerow(header)
+            for i, label in enumerate(self.labels):
+                for frame in range(self.n_frames):
+                    time = [frame_times[frame]] if frame_times is not None else []
+                    writer.writerow([frame] + time + [int(label), int(self.counts[i]),
+                                                      float(self.mean[i, frame]), float(self.std[i, frame])])
+
+
+def compute_label_tacs(labels, data):
+    """
+    Compute the mean and standard deviation TACs of all the labels of an atlas.
+
+    Args:
+        labels (np.ndarray): 3D integer atlas (X, Y, Z); 0 is background.
+        data (np.ndarray): 4D image (X, Y, Z, T) or 3D image (a single frame).
+
+    Returns:
+        LabelTacTable: TACs of the labels present in the atlas. Non-finite values count as 0.
+
+    Raises:
+        ValueError: If the atlas and the image do not have the same spatial shape.
+    """
+    if data.shape[:3] != labels.shape:
+        raise ValueError(f"Atlas shape {labels.shape} does not match image shape {data.shape[:3]}")
+    n_frames = data.shape[3] if data.ndim == 4 else 1
+    flat_labels = np.ascontiguousarray(labels.reshape(-1), dtype=np.int64)
+    frames = np.ascontiguousarray(data.reshape(-1, n_frames))
+
+    counts = np.bincount(flat_labels, minlength=1)
+    sums, sumsq = accumulate_label_sums_numba(flat_labels, frames, len(counts))
+
+    present = np.nonzero(counts)[0]
+    present = present[present > 0]
+    n = counts[present, None].astype(np.float64)
+    mean = sums[present] / n
+    std = np.sqrt(np.maximum(sumsq[present] / n - mean ** 2, 0.0))
+    return LabelTacTable(present, counts[present], mean, std)
@@ -5,27 +5,32 @@ import numpy as np
 import nibabel as nib
 import pandas as pd
 import os
-import statistics
 from pediatric_fdopa_pipeline.ref_tumor_seg import ref_seg, binary_mask
+from pediatric_fdopa_pipeline.label_stats import get_label_stats, atlas_copy
 
 def get_stats_for_labels(vol, atlas, labels):
+    '''
+    Inputs:
+        vol: 3D volume
+        atlas: LabelIndex, or integer 3D volume of labels
+        labels: list of atlas labels
+    Outputs:
+        average and maximum over the voxels of all the labels, std and median of the last label
+    '''
+    stats = get_label_stats(vol, atlas, labels)
     total=0
     n=0
-    maximum=np.min(vol)
+    maximum=None
 
     for l in labels :
-        idx = atlas == l
-        
-        label_n = np.sum(idx)
-        if label_n > 0 :
-            pet_values_in_label = vol[ idx ]
-            total += np.sum(vol[idx])
-            max_in_label = np.max(vol[idx])
-            median_in_label = statistics.median(vol[idx])
-            l_std = np.std(vol[idx])
-            maximum = max_in_label if max_in_label > maximum else maximum
-
-            n += label_n
+        label_stats = stats[l]
+        if label_stats is not None :
+            total += label_stats['sum']
+            maximum = label_stats['max'] if maximum is None or label_stats['max'] > maximum else maximum
+            l_std = label_stats['std']
+            median_in_label = label_stats['median']
+
+            n += label_stats['n']
         else :
             print(f'Error: label {l} not found in atlas volume where it was expected. Skipping')
             exit(1)
@@ -44,51 +49,49 @@ def get_new_atlas(atlas_vol, roi_labels):
     # Striatum is defined by the OR operaton between the masks of Pallidum, Caudato and Putamen
     index_striatum = index_caudato | index_putamen | index_pallidum
 
-    striatum_label = np.max(atlas_vol) + 1
-    striatum_atlas_vol = np.copy(atlas_vol)
+    striatum_label = int(np.max(atlas_vol)) + 1
+    striatum_atlas_vol = atlas_copy(atlas_vol, striatum_label)
     striatum_atlas_vol[index_striatum] = striatum_label
     
     return striatum_atlas_vol, striatum_label
 
 def get_tumor_lab(atlas_vol,suvr_max):
     
-    tumor_label = np.max(atlas_vol) + 1
-    tumor_atlas_vol = np.copy(atlas_vol)
+    tumor_label = int(np.max(atlas_vol)) + 1
+    tumor_atlas_vol = atlas_copy(atlas_vol, tumor_label)
     # Condition for creating tumor VOI
     tumor_atlas_vol[suvr_max > 1] = tumor_label
     
     return tumor_atlas_vol, tumor_label
 
-def get_H_Uptake_lab(atlas_vol, mT, sT, vol, tum_atlas,tumor_label):
-
-    HU_label = np.max(atlas_vol) + 1
-    new_atlas_vol = np.copy(atlas_vol)
-    # Finding the tumor region with higher uptake
-    H_mask = (tum_atlas == tumor_label) & (vol > mT + 2*sT) 
-    new_atlas_vol[H_mask] = HU_label
-    
-    return new_atlas_vol, HU_label
-
-def get_M_Uptake_lab(atlas_vol, mT, sT, vol, tum_atlas,tumor_label):
-
-    MU_label = np.max(atlas_vol) + 2
-    new_atlas_vol = np.copy(atlas_vol)
-    # Finding the tumor region with medium uptake
-    M_mask = (tum_atlas == tumor_label) & (vol > mT)  & (vol < mT +2*sT)
-    new_atlas_vol[M_mask] = MU_label
-    
-    
-    return new_atlas_vol, MU_label
-
-def get_L_Uptake_lab(atlas_vol, mT, sT, vol, tum_atlas,tumor_label):
-
-    LU_label = np.max(atlas_vol) + 3
-    new_atlas_vol = np.copy(atlas_vol)
-    # Finding the tumor region with lower uptake
-    L_mask = (tum_atlas == tumor_label) & (vol > mT -2*sT) & (vol < mT)
-    new_atlas_vol[L_mask] = LU_label
-    
-    return new_atlas_vol, LU_label
+def get_uptake_sub_regions(atlas_vol, mT, sT, vol, tum_atlas, tumor_label):
+    '''
+    Inputs:
+        atlas_vol: integer 3D volume of labels, the sub-region labels follow its highest label
+        mT, sT: mean and std of the tumor uptake
+        vol: 3D PET volume
+        tum_atlas: integer 3D volume of the tumor
+        tumor_label: label of the tumor in tum_atlas
+    Outputs:
+        sub_region_vol: uint8 volume, 1, 2 and 3 in the tumor voxels of higher, medium and lower uptake, 0 elsewhere
+        sub_region_labels: list, labels of the higher, medium and lower uptake regions
+    '''
+    first_label = int(np.max(atlas_vol)) + 1
+
+    tumor_mask = tum_atlas == tumor_label
+    tumor_values = vol[tumor_mask]
+    sub_region = np.zeros(tumor_values.shape, dtype=np.uint8)
+    # Tumor region with higher uptake
+    sub_region[tumor_values > mT + 2*sT] = 1
+    # Tumor region with medium uptake
+    sub_region[(tumor_values > mT) & (tumor_values < mT + 2*sT)] = 2
+    # Tumor region with lower uptake
+    sub_region[(tumor_values > mT - 2*sT) & (tumor_values < mT)] = 3
+
+    sub_region_vol = np.zeros(tumor_mask.shape, dtype=np.uint8)
+    sub_region_vol[tumor_mask] = sub_region
+
+    return sub_region_vol, [first_label, first_label + 1, first_label + 2]
 
 def control_ratio(tumor_MRI_vol, tumor_max, tumor_max_manuale, ref_max, roi_max, tumor_atlas_vol, tumor_labels):
     
@@ -108,17 +111,18 @@ def control_ratio(tumor_MRI_vol, tumor_max, tumor_max_manuale, ref_max, roi_max,
 def variable_def(subj):
 
     ### Input data ###    
-    pet_hd = nib.load(subj.pet)
-    pet_3d = pet_hd.get_fdata()
+    # Copy: the voxels outside the brain are set to 0
+    pet_3d = np.copy(subj.volumes.intensities(subj.pet))
     
-    atlas_hd = nib.load(subj.atlas_space_pet)
-    atlas_vol = np.rint(atlas_hd.get_fdata()).astype(int)
+    atlas_hd = subj.volumes.image(subj.atlas_space_pet)
+    atlas_vol = subj.volumes.labels(subj.atlas_space_pet)
+    atlas_index = subj.volumes.label_index(subj.atlas_space_pet)
 
     brain_mask,_ = binary_mask(subj)
     pet_3d[(brain_mask == 0)] = 0
     
     # Static parameters for tumor definition
-    _, ref_max, _, _ = get_stats_for_labels(pet_3d, atlas_vol, [subj.ref_labels])
+    _, ref_max, _, _ = get_stats_for_labels(pet_3d, atlas_index, [subj.ref_labels])
     
     # Striatum definition
     s_atlas_vol, striatum_label = get_new_atlas(atlas_vol, subj.roi_labels)
@@ -126,28 +130,28 @@ def variable_def(subj):
     subj.striatum_label = striatum_label
     _, roi_max, _, _ = get_stats_for_labels(pet_3d, subj.striatum_atlas, [subj.striatum_label])
     
-    # SUVr volume
+    # SUVr volume: thresholded in float64 like the original pipeline, kept as float32
     suvr_max = pet_3d / ref_max
-    subj.suvr_m = suvr_max
-    tumor_atlas_vol, tumor_labels = get_tumor_lab(subj.striatum_atlas, subj.suvr_m)
+    subj.suvr_m = suvr_max.astype(np.float32)
+    tumor_atlas_vol, tumor_labels = get_tumor_lab(subj.striatum_atlas, suvr_max)
     
     ### just in case tumors is located in both hemispheres ###
     if(not(np.any(tumor_atlas_vol == tumor_labels))):
         subj.ref_labels = 47 
-        _, ref_max, _, _ = get_stats_for_labels(pet_3d, atlas_vol, [subj.ref_labels])
+        _, ref_max, _, _ = get_stats_for_labels(pet_3d, atlas_index, [subj.ref_labels])
         suvr_max = pet_3d / ref_max
-        subj.suvr_m = suvr_max
-        tumor_atlas_vol, tumor_labels = get_tumor_lab(subj.striatum_atlas, subj.suvr_m)
+        subj.suvr_m = suvr_max.astype(np.float32)
+        tumor_atlas_vol, tumor_labels = get_tumor_lab(subj.striatum_atlas, suvr_max)
 
     # tumor volume from MRI
-    tumor_MRI_hd = nib.load(subj.volume_MRI)
-    tumor_MRI_vol = np.rint(tumor_MRI_hd.get_fdata()).astype(int)
+    # Copy: it may become the tumor atlas, which is edited below
+    tumor_MRI_vol = np.copy(subj.volumes.labels(subj.volume_MRI))
 
     # Comparing of tumor parameters between PET and FLAIR tumor
     _, tumor_max, _, _ = get_stats_for_labels(pet_3d, tumor_atlas_vol, [tumor_labels])
     _, tumor_max_manuale, _, _ = get_stats_for_labels(pet_3d, tumor_MRI_vol, [1])
     subj.tumor_atlas, subj.tumor_label = control_ratio(tumor_MRI_vol,tumor_max,tumor_max_manuale, ref_max, roi_max, tumor_atlas_vol, tumor_labels)
-    nib.Nifti1Image(subj.tumor_atlas, nib.load(subj.atlas_space_pet).affine, dtype = np.int64).to_filename(subj.ref_prefix+'original_tum_volume.nii.gz')
+    nib.Nifti1Image(subj.tumor_atlas, atlas_hd.affine).to_filename(subj.ref_prefix+'original_tum_volume.nii.gz')
     
     if (subj.tumor_label != 1):
         ### elimination of controlateral striatum ####
@@ -181,21 +185,20 @@ def tumor_striatum_analysis(subject, roi_labels, ref_labels):
 
     if not os.path.exists(subject.pet_suvr) or not os.path.exists(subject.suvr_csv) or subject.clobber :
         
-        pet_hd = nib.load(subject.pet)
-        pet_vol = pet_hd.get_fdata()
+        pet_vol = subject.volumes.intensities(subject.pet)
 
-        atlas_hd = nib.load(subject.atlas_space_pet)
-        atlas_vol = np.rint(atlas_hd.get_fdata()).astype(int)
+        atlas_hd = subject.volumes.image(subject.atlas_space_pet)
+        atlas_index = subject.volumes.label_index(subject.atlas_space_pet)
       
         ### Static parameters ###
         roi_avg, roi_max, _, _ = get_stats_for_labels(pet_vol, subject.striatum_atlas, [subject.striatum_label])
-        ref_avg, ref_max, _, _ = get_stats_for_labels(pet_vol, atlas_vol, [ref_labels])
+        ref_avg, ref_max, _, _ = get_stats_for_labels(pet_vol, atlas_index, [ref_labels])
         tumor_avg, tumor_max, _, _ = get_stats_for_labels(pet_vol,  subject.tumor_atlas, [subject.tumor_label])
 
         ts_ratio = np.round(tumor_max / roi_max,3)
         tn_ratio = np.round(tumor_max / ref_max,3)
 
-        nib.Nifti1Image(subject.suvr_m, nib.load(subject.pet).affine).to_filename(subject.pet_suvr)
+        nib.Nifti1Image(subject.suvr_m, subject.volumes.image(subject.pet).affine).to_filename(subject.pet_suvr)
         nib.Nifti1Image(subject.tumor_atlas, atlas_hd.affine , header = atlas_hd.header).to_filename(subject.data_prefix+'tumor_atlas.nii.gz')
         
         suvr_dict = {'sub':[subject.sub],'tumor_label':[subject.tumor_label],'tumor_max':[tumor_max],'tumor_avg':[tumor_avg], 'striatum_label':[subject.striatum_label], 'striatum_max':[roi_max], 'straitum_avg':[roi_avg], 'ts_ratio':[ts_ratio], 'reference_label':[ref_labels], 'reference_max':[ref_max], 'reference_avg':[ref_avg], 'tn_ratio': [tn_ratio]}
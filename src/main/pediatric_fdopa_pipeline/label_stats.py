@@ -0,0 +1,130 @@
+'''
+Statistics of the voxels of atlas labels.
+
+A LabelIndex finds the bounding box of every label of an atlas in one pass (ndimage.find_objects),
+so the voxels of a label are gathered from its bounding box instead of comparing the whole atlas
+with the label. The index of an atlas that does not change (e.g. the atlas in PET space of the
+VolumeStore) is built once and reused by all the statistics of the subject.
+
+Label volumes are kept in the smallest integer dtype holding their labels (uint8 or uint16 for the
+atlases of the pipeline); the statistics are accumulated in float64 whatever the volume dtype.
+'''
+import numpy as np
+from scipy.ndimage import find_objects
+
+
+def label_dtype(vmin, vmax):
+    '''
+    Inputs:
+        vmin: int, lowest label
+        vmax: int, highest label
+    Outputs:
+        dtype: smallest integer dtype holding the labels from vmin to vmax (unsigned if vmin >= 0)
+    '''
+    if vmin >= 0:
+        return np.min_scalar_type(int(vmax))
+    # Signed type of vmax: the one holding -vmax-1
+    return np.result_type(np.min_scalar_type(int(vmin)), np.min_scalar_type(-max(int(vmax), 0) - 1))
+
+
+def compact_labels(vol):
+    '''
+    Inputs:
+        vol: 3D volume of labels, integer or float (rounded to the nearest integer)
+    Outputs:
+        labels: the labels in the smallest integer dtype holding them
+    '''
+    if not np.issubdtype(vol.dtype, np.integer):
+        vol = np.rint(vol)
+    if vol.size == 0:
+        return vol.astype(np.uint8)
+    return vol.astype(label_dtype(vol.min(), vol.max()), copy=False)
+
+
+def atlas_copy(atlas_vol, new_label):
+    '''
+    Inputs:
+        atlas_vol: integer 3D volume of labels
+        new_label: int, label that will be added to the copy
+    Outputs:
+        atlas_vol: copy of the atlas, in a dtype that also holds new_label
+    '''
+    return atlas_vol.astype(np.promote_types(atlas_vol.dtype, np.min_scalar_type(int(new_label))))
+
+
+class LabelIndex():
+
+    def __init__(self, atlas):
+        '''
+        Inputs:
+            atlas: integer 3D volume of labels (0 = background)
+        '''
+        self.atlas = atlas
+        self.shape = atlas.shape
+        self._objects = find_objects(atlas) if np.issubdtype(atlas.dtype, np.integer) and atlas.size else []
+        self._masks = {}
+
+    def _voxels(self, label):
+        '''Bounding box of a label and the mask of the label inside it, None if the label is absent.'''
+        label = int(label)
+        if label not in self._masks:
+            if 0 < label <= len(self._objects):
+                box = self._objects[label - 1]
+                voxels = None if box is None else (box, self.atlas[box] == label)
+            else:
+                # Background or label that find_objects does not index
+                mask = self.atlas == label
+                voxels = (tuple(slice(None) for _ in self.shape), mask) if mask.any() else None
+            self._masks[label] = voxels
+        return self._masks[label]
+
+    def count(self, label):
+        '''
+        Outputs:
+            n: int, number of voxels of the label
+        '''
+        voxels = self._voxels(label)
+        return 0 if voxels is None else int(np.count_nonzero(voxels[1]))
+
+    def values(self, vol, label):
+        '''
+        Inputs:
+            vol: 3D volume in the space of the atlas
+            label: int, atlas label
+        Outputs:
+            values: 1D array of the voxels of the label, in the order of vol[atlas == label]
+        '''
+        voxels = self._voxels(label)
+        if voxels is None:
+            return np.empty(0, dtype=vol.dtype)
+        box, mask = voxels
+        return vol[box][mask]
+
+
+def get_label_stats(vol, atlas, labels):
+    '''
+    Statistics of the voxels of several labels, computed once per label.
+
+    Inputs:
+        vol: 3D volume in the space of the atlas
+        atlas: LabelIndex, or integer 3D volume of labels
+        labels: list of int, atlas labels
+    Outputs:
+        stats: dict, label -> dict with n, sum, mean, max, std and median of its voxels (None if the label is absent)
+    '''
+    index = atlas if isinstance(atlas, LabelIndex) else LabelIndex(atlas)
+    stats = {}
+    for label in labels:
+        values = index.values(vol, label).astype(np.float64, copy=False)
+        if values.size == 0:
+            stats[label] = None
+            continue
+        total = np.sum(values)
+        stats[label] = {'n': values.size,
+                        'sum': total,
+                        'mean': total / values.size,
+                        'max': np.max(values),
+                        'std': np.std(values),
+                        # Sort-based median, equal to statistics.median
+                        'median': np.median(values)}
+    return stats
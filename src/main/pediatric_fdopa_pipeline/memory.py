@@ -0,0 +1,71 @@
+'''
+Peak memory accounting of the subjects.
+
+The pipeline runs on Linux (WSL): the peak resident memory of the process is read from /proc and
+reset before each subject through /proc/self/clear_refs, so that it measures one subject at a time
+even when a worker process handles several. Elsewhere the peak covers the whole process, when known.
+'''
+try:
+    import resource
+except ImportError:
+    resource = None
+
+DEFAULT_MEMORY_WARNING_MB = 4096
+
+
+def reset_peak_memory():
+    '''Start measuring the peak memory from the current resident memory.'''
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def peak_memory_mb():
+    '''
+    Outputs:
+        peak: float, peak resident memory (MB) since the last reset, None if unknown
+    '''
+    # VmHWM follows the reset; ru_maxrss also keeps the peak recorded when a thread exits
+    value = _read_kb('/proc/self/status', 'VmHWM:')
+    if value is not None:
+        return value / 1024
+    if resource is not None:
+        # ru_maxrss is in kB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return None
+
+
+def available_memory_mb():
+    '''
+    Outputs:
+        available: float, memory (MB) available for new processes, None if unknown
+    '''
+    value = _read_kb('/proc/meminfo', 'MemAvailable:')
+    return None if value is None else value / 1024
+
+
+def _read_kb(path, field):
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith(field):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def max_jobs_for_memory(jobs, memory_warning_mb):
+    '''
+    Inputs:
+        jobs: int, requested number of subjects processed in parallel
+        memory_warning_mb: float, expected peak memory of one subject (its warning threshold)
+    Outputs:
+        jobs: int, number of parallel subjects whose expected peaks fit the available memory (at least 1)
+    '''
+    available = available_memory_mb()
+    if available is None or memory_warning_mb <= 0:
+        return jobs
+    return max(1, min(jobs, int(available // memory_warning_mb)))
@@ -1,22 +1,254 @@
 import os
-import json
 import sys
 import argparse
+
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "VECLIB_MAXIMUM_THREADS",
+                   "NUMEXPR_NUM_THREADS", "ITK_GLOBAL_DEFAULT_NUMBER_OF_THREADS")
+
+
+def set_thread_budget(n_threads):
+    '''
+    Limit the threads used by numpy/BLAS, OpenMP and ITK (ANTs registrations).
+
+    numpy/BLAS and OpenMP read the variables when they are loaded: the budget of the runner itself is
+    set from --threads before its imports (see thread_budget_from_argv), the budget of the parallel
+    workers before they are started. ITK reads its variable at the first registration.
+    '''
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(max(1, int(n_threads)))
+
+
+def thread_budget_from_argv(argv):
+    '''
+    Inputs:
+        argv: list of str, command line arguments of the runner
+    Outputs:
+        threads: int, value of --threads, None if it is not given
+    '''
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--threads', type=int, default=None)
+    return parser.parse_known_args(argv)[0].threads
+
+
+if __name__ == "__main__" and thread_budget_from_argv(sys.argv[1:]):
+    # Before numpy, pandas and ANTs are imported below
+    set_thread_budget(thread_budget_from_argv(sys.argv[1:]))
+
+import json
+import itertools
+import multiprocessing
+import queue
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
 
 from pediatric_fdopa_pipeline.analysis import tumor_striatum_analysis
 from pediatric_fdopa_pipeline.subject import Subject
-from pediatric_fdopa_pipeline.utils import log_progress,log_message,log_error
+from pediatric_fdopa_pipeline.registration_cache import RegistrationCache, default_cache_dir, DEFAULT_MAX_SIZE_MB
+from pediatric_fdopa_pipeline.tumor_refinement import RefinementSettings, MODES as REFINEMENT_MODES
+from pediatric_fdopa_pipeline.qc_stage import QC_POLICIES, BackgroundQC, render_pending
+from pediatric_fdopa_pipeline.memory import reset_peak_memory, peak_memory_mb, max_jobs_for_memory, DEFAULT_MEMORY_WARNING_MB
+from pediatric_fdopa_pipeline.utils import log_progress,log_message,log_error,set_progress_handler
+
+
+def process_patient(patient_id, files, work_dir, out_dir, atlas_dir, progress, registration_cache=None,
+                    memory_warning_mb=DEFAULT_MEMORY_WARNING_MB, refinement=None, qc_policy='inline'):
+    '''
+    Build the Subject of a patient and run its processing.
+
+    Inputs:
+        patient_id: str, patient folder name (sub-XX)
+        files: dict, input files of the patient from the configuration
+        work_dir: str, workspace directory
+        out_dir: str, output directory
+        atlas_dir: str, directory of the stereotaxic template and atlas
+        progress: list, [start, span] of the global progress covered by this patient
+        registration_cache: RegistrationCache, registrations reused across runs (None disables it)
+        memory_warning_mb: float, peak memory above which a warning is logged for the patient (not enforced)
+        refinement: RefinementSettings, classifier of the tumour refinement (default: 'exact' mode)
+        qc_policy: str, when the QC products of the patient are rendered (see qc_stage)
+    Outputs:
+        subj: processed Subject
+    '''
+    flair_tumor = files.get("tumor_mri")
+    pet_file = files.get("pet")
+    pet4d_file = files.get("pet4d")
+    pet_json_file = files.get("pet4d_json")
+    mri_file = files.get("mri")
+    mri_str_file = files.get("mri_str")
+
+    # Estrai solo il numero dopo "sub-"
+    sub_number = patient_id.replace("sub-", "")
+
+    log_message(f"  - Creating Subject object for {patient_id}")
+
+    # Costruisci l'oggetto Subject
+    subj = Subject(
+        work_dir=work_dir,
+        out_dir=out_dir,
+        sub=sub_number,
+        stx_fn=os.path.join(atlas_dir, "mni_icbm152_t1_tal_nlin_asym_09c.nii.gz"),
+        atlas_fn=os.path.join(atlas_dir, "dka_atlas_eroded.nii.gz"),
+        flair_tumor=flair_tumor,
+        pet_file=pet_file,
+        pet_json_file=pet_json_file,
+        pet4d_file=pet4d_file,
+        mri_file=mri_file,
+        mri_str_file=mri_str_file,
+        progress = progress,
+        registration_cache=registration_cache,
+        refinement=refinement,
+        qc_policy=qc_policy
+    )
+
+    log_message(f"  - Processing {patient_id}...")
+    reset_peak_memory()
+    subj.process()
+
+    peak = peak_memory_mb()
+    # Read by the parallel runs to serialise the remaining patients
+    subj.peak_memory_mb = peak
+    if peak is not None:
+        log_message(f"  - Peak memory for {patient_id}: {peak:.0f} MB (warning threshold {memory_warning_mb:.0f} MB)")
+        if memory_warning_mb > 0 and peak > memory_warning_mb:
+            log_message(f"  - WARNING: {patient_id} exceeded the memory warning threshold")
+    return subj
+
+
+class ProgressAggregator:
+    '''
+    Combine the progress of subjects processed concurrently into one monotonic PROGRESS stream.
+
+    Each worker reports the progress of its subject on a 0-100 scale; the global
+    progress is start + span * (average subject progress).
+    '''
+
+    def __init__(self, patient_ids, start=10, span=90):
+        self.start = start
+        self.span = span
+        self.done = {patient_id: 0.0 for patient_id in patient_ids}
+        self.last = start
+
+    def update(self, patient_id, percent):
+        self.done[patient_id] = max(self.done[patient_id], min(float(percent), 100.0))
+        current = int(self.start + self.span * sum(self.done.values()) / (100 * len(self.done)))
+        if current > self.last:
+            self.last = current
+            log_progress(current)
+
+
+_progress_queue = None
+
+
+def line_buffered_output():
+    '''
+    Write every output line in a single write, even when Python runs unbuffered.
+
+    The parallel workers share the stdout pipe read line by line by the application, so a line
+    written in pieces could be split by the lines of another process.
+    '''
+    for stream in (sys.stdout, sys.stderr):
+        if hasattr(stream, 'reconfigure'):
+            stream.reconfigure(line_buffering=True, write_through=False)
 
-os.environ["OMP_NUM_THREADS"] = "30"
-os.environ["OPENBLAS_NUM_THREADS"] = "30"
-os.environ["MKL_NUM_THREADS"] = "30"
-os.environ["VECLIB_MAXIMUM_THREADS"] = "30"
-os.environ["NUMEXPR_NUM_THREADS"] = "30"
 
+def _init_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+    line_buffered_output()
 
-def run_pipeline_from_config(config_path, work_dir, out_dir):
+
+def _process_patient_worker(process, patient_id, files, work_dir, out_dir, atlas_dir, registration_cache, memory_warning_mb, refinement,
+                            qc_policy):
+    # Progress goes to the parent, which aggregates the subjects running concurrently
+    set_progress_handler(lambda current, total: _progress_queue.put((patient_id, 100 * current / total)))
+    # process is process_patient, passed by the parent (pickled by name)
+    return process(patient_id, files, work_dir, out_dir, atlas_dir, progress=[0, 100],
+                   registration_cache=registration_cache, memory_warning_mb=memory_warning_mb, refinement=refinement,
+                   qc_policy=qc_policy)
+
+
+def process_patients_parallel(pipeline_config, work_dir, out_dir, atlas_dir, jobs, threads, registration_cache=None,
+                              memory_warning_mb=DEFAULT_MEMORY_WARNING_MB, refinement=None, qc_policy='inline'):
+    '''
+    Process the patients in a pool of worker processes.
+
+    The thread budget is split across the workers, and the subjects are returned
+    in configuration order so that the outputs match a serial run. Once a patient
+    exceeds the memory threshold, the remaining patients are processed one at a time.
+
+    Inputs:
+        pipeline_config: dict, patient_id -> input files
+        jobs: int, number of worker processes
+        threads: int, total number of threads shared by the workers
+        registration_cache: RegistrationCache, registrations reused across runs (None disables it)
+        memory_warning_mb: float, expected peak memory of one patient, the run is serialised when exceeded (0 disables it)
+        refinement: RefinementSettings, classifier of the tumour refinement
+        qc_policy: str, when the QC products of the patients are rendered
+    Outputs:
+        subject_list: processed Subjects, in configuration order
+    '''
+    jobs = min(jobs, len(pipeline_config))
+    threads_per_job = max(1, threads // jobs)
+    log_message(f"Running {jobs} patients in parallel with {threads_per_job} threads each")
+    # Inherited by the spawned workers before they import numpy/ANTs
+    set_thread_budget(threads_per_job)
+
+    context = multiprocessing.get_context("spawn")
+    progress_queue = context.Queue()
+    aggregator = ProgressAggregator(pipeline_config.keys())
+    subjects = {}
+
+    remaining = iter(pipeline_config.items())
+    futures = {}
+    pending = set()
+    # Number of patients processed at the same time, 1 once a patient exceeded the memory threshold
+    running = jobs
+
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=context, initializer=_init_worker,
+                             initargs=(progress_queue,)) as executor:
+        try:
+            while True:
+                for patient_id, files in itertools.islice(remaining, max(0, running - len(pending))):
+                    future = executor.submit(_process_patient_worker, process_patient, patient_id, files, work_dir,
+                                             out_dir, atlas_dir, registration_cache, memory_warning_mb, refinement,
+                                             qc_policy)
+                    futures[future] = patient_id
+                    pending.add(future)
+                if not pending:
+                    break
+                finished, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                _drain_progress(progress_queue, aggregator)
+                for future in finished:
+                    patient_id = futures[future]
+                    subj = future.result()
+                    subjects[patient_id] = subj
+                    aggregator.update(patient_id, 100)
+                    log_message(f"  - Completed processing for {patient_id} ({len(subjects)}/{len(pipeline_config)})")
+                    print(f"PATIENT: {patient_id}", flush=True)
+                    peak = getattr(subj, 'peak_memory_mb', None)
+                    if running > 1 and memory_warning_mb > 0 and peak is not None and peak > memory_warning_mb:
+                        running = 1
+                        log_message(f"  - {patient_id} exceeded the memory threshold of {memory_warning_mb:.0f} MB: "
+                                    f"processing the remaining patients one at a time")
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    return [subjects[patient_id] for patient_id in pipeline_config]
+
+
+def _drain_progress(progress_queue, aggregator):
+    while True:
+        try:
+            patient_id, percent = progress_queue.get_nowait()
+        except queue.Empty:
+            return
+        aggregator.update(patient_id, percent)
+
+
+def run_pipeline_from_config(config_path, work_dir, out_dir, jobs=1, threads=None, cache_size_mb=DEFAULT_MAX_SIZE_MB,
+                             memory_warning_mb=DEFAULT_MEMORY_WARNING_MB, refinement=None, qc_policy='inline'):
     log_message("Loading configuration file...")
 
     with open(config_path, "r", encoding="utf-8") as f:
@@ -33,57 +265,51 @@ def run_pipeline_from_config(config_path, work_dir, out_dir):
     log_message(f"  - Dynamic Parameters: {os.path.basename(dynamic_parameters)}")
     log_message(f"  - H tumor percentage: {os.path.basename(H_tumor_percentage)}")
 
-    subject_list = []
-    total_patients = len(pipeline_config)
-    current_patient = 0
+    atlas_dir = os.path.join(os.path.dirname(sys.argv[0]), "atlas")
+    threads = threads or os.cpu_count() or 1
+    registration_cache = None
+    if cache_size_mb > 0:
+        registration_cache = RegistrationCache(default_cache_dir(work_dir), cache_size_mb)
+        log_message(f"Registration cache: {registration_cache.cache_dir} (max {cache_size_mb} MB)")
 
     log_message("Starting patient processing...")
     log_progress(10)
 
-    progress_per_patient = int(90/total_patients)
-    current_progress = 10
-
-    for patient_id, files in pipeline_config.items():
-        current_patient += 1
-        log_message(f"Processing patient {current_patient}/{total_patients}: {patient_id}")
-
-        flair_tumor = files.get("tumor_mri")
-        pet_file = files.get("pet")
-        pet4d_file = files.get("pet4d")
-        pet_json_file = files.get("pet4d_json")
-        mri_file = files.get("mri")
-        mri_str_file = files.get("mri_str")
-
-        # Estrai solo il numero dopo "sub-"
-        sub_number = patient_id.replace("sub-", "")
-
-        log_message(f"  - Creating Subject object for {patient_id}")
-
-        # Costruisci l'oggetto Subject
-        subj = Subject(
-            work_dir=work_dir,
-            out_dir=out_dir,
-            sub=sub_number,
-            stx_fn=os.path.join(os.path.dirname(sys.argv[0]), "atlas", "mni_icbm152_t1_tal_nlin_asym_09c.nii.gz"),
-            atlas_fn=os.path.join(os.path.dirname(sys.argv[0]), "atlas", "dka_atlas_eroded.nii.gz"),
-            flair_tumor=flair_tumor,
-            pet_file=pet_file,
-            pet_json_file=pet_json_file,
-            pet4d_file=pet4d_file,
-            mri_file=mri_file,
-            mri_str_file=mri_str_file,
-            progress = [current_progress,progress_per_patient]
-        )
-
-        log_message(f"  - Processing {patient_id}...")
-        subj.process()
-        current_progress = current_progress + progress_per_patient
-
-        log_progress(current_progress)
-
-        subject_list.append(subj)
-        log_message(f"  - Completed processing for {patient_id}")
-        print(f"PATIENT: {patient_id}")
+    if jobs > 1:
+        # Every parallel patient may reach the warning threshold
+        max_jobs = max_jobs_for_memory(jobs, memory_warning_mb)
+        if max_jobs < jobs:
+            log_message(f"Reducing parallel patients from {jobs} to {max_jobs}: "
+                        f"not enough memory available for {memory_warning_mb:.0f} MB per patient")
+            jobs = max_jobs
+
+    if jobs > 1 and len(pipeline_config) > 1:
+        subject_list = process_patients_parallel(pipeline_config, work_dir, out_dir, atlas_dir, jobs, threads,
+                                                 registration_cache, memory_warning_mb, refinement, qc_policy)
+    else:
+        # numpy/BLAS are already loaded: only ITK still reads the budget (see set_thread_budget)
+        set_thread_budget(threads)
+        subject_list = []
+        total_patients = len(pipeline_config)
+        current_patient = 0
+
+        progress_per_patient = int(90/total_patients)
+        current_progress = 10
+
+        for patient_id, files in pipeline_config.items():
+            current_patient += 1
+            log_message(f"Processing patient {current_patient}/{total_patients}: {patient_id}")
+
+            subj = process_patient(patient_id, files, work_dir, out_dir, atlas_dir,
+                                   [current_progress, progress_per_patient], registration_cache, memory_warning_mb,
+                                   refinement, qc_policy)
+            current_progress = current_progress + progress_per_patient
+
+            log_progress(current_progress)
+
+            subject_list.append(subj)
+            log_message(f"  - Completed processing for {patient_id}")
+            print(f"PATIENT: {patient_id}")
 
     log_message("Patient processing completed. Starting analysis phase...")
 
@@ -124,16 +350,92 @@ def run_pipeline_from_config(config_path, work_dir, out_dir):
 
     log_message("All analysis completed successfully!")
 
+    if qc_policy == 'background':
+        # The numeric results are written: the QC products are rendered now, out of the critical path
+        render_qc_background([subject.qc_dir for subject in subject_list], jobs)
+    elif qc_policy == 'on-demand':
+        log_message("QC products will be rendered when the QC folder of a patient is opened")
+
+
+def render_qc_background(qc_dirs, jobs=1):
+    '''
+    Render the pending QC products of the patients in a pool of processes.
+
+    Inputs:
+        qc_dirs: list of str, QC directories of the patients
+        jobs: int, number of rendering processes
+    '''
+    log_message(f"Results are available. Rendering QC products of {len(qc_dirs)} patients in the background...")
+    pool = BackgroundQC(min(jobs, len(qc_dirs)))
+    for qc_dir in qc_dirs:
+        pool.submit(qc_dir)
+    report_qc(pool.close())
+
+
+def report_qc(results):
+    '''
+    Inputs:
+        results: dict, qc_dir -> (n_done, errors) of the rendered QC directories
+    '''
+    for qc_dir, (n_done, errors) in results.items():
+        log_message(f"  - QC: {n_done} products rendered in {qc_dir}")
+        for error in errors:
+            log_message(f"  - WARNING: QC product not rendered, kept for later ({error})")
+
+
 def main():
     parser = argparse.ArgumentParser(description='Run FDOPA pipeline')
-    parser.add_argument('--config', required=True, help='Path to configuration file')
-    parser.add_argument('--work-dir', required=True, help='Working directory')
-    parser.add_argument('--out-dir', required=True, help='Output directory')
+    parser.add_argument('--config', help='Path to configuration file')
+    parser.add_argument('--work-dir', help='Working directory')
+    parser.add_argument('--out-dir', help='Output directory')
+    parser.add_argument('--jobs', type=int, default=1, help='Number of patients processed in parallel')
+    parser.add_argument('--threads', type=int, default=None,
+                        help='Total number of threads shared by the parallel patients (default: all CPUs)')
+    parser.add_argument('--registration-cache-mb', type=float, default=DEFAULT_MAX_SIZE_MB,
+                        help='Size limit of the registration cache shared by the runs of the workspace (0 disables it)')
+    parser.add_argument('--memory-warning-mb', type=float, default=DEFAULT_MEMORY_WARNING_MB,
+                        help='Expected peak memory of one patient: --jobs is limited to the patients that fit the '
+                             'available memory, and once a patient exceeds it a warning is logged and the remaining '
+                             'patients are processed one at a time. The memory of a single patient is not capped '
+                             '(0 disables it)')
+    parser.add_argument('--refinement-mode', choices=REFINEMENT_MODES, default='exact',
+                        help='Classifier of the tumour refinement: exact fits every voxel (default); subsample and '
+                             'approximate bound the cost of large tumours, auto chooses by tumour size')
+    parser.add_argument('--refinement-report', action='store_true',
+                        help='Also fit the exact classifier and write its agreement with the refinement of each patient')
+    parser.add_argument('--qc-policy', choices=QC_POLICIES, default='inline',
+                        help='When the QC animations and plots are rendered: inline with the processing (default), by a '
+                             'pool of processes once the numeric results of all patients are written (the run ends '
+                             'when they are rendered), or on demand when the QC folder is opened')
+    parser.add_argument('--render-qc', nargs='+', metavar='QC_DIR',
+                        help='Only render the pending QC products of these patient QC folders')
 
     args = parser.parse_args()
+    if not args.render_qc and not (args.config and args.work_dir and args.out_dir):
+        parser.error('--config, --work-dir and --out-dir are required')
+    line_buffered_output()
+
+    if args.render_qc:
+        results = {}
+        failed = False
+        for qc_dir in args.render_qc:
+            try:
+                results[qc_dir] = render_pending(qc_dir)
+            except Exception as e:
+                # Busy (rendered by another process) or unreadable: the other folders are still rendered
+                log_error(f"QC of {qc_dir} not rendered: {str(e)}")
+                failed = True
+        report_qc(results)
+        if failed:
+            sys.exit(1)
+        print("FINISHED: QC rendered", flush=True)
+        return
 
     try:
-        run_pipeline_from_config(args.config, args.work_dir, args.out_dir)
+        run_pipeline_from_config(args.config, args.work_dir, args.out_dir, jobs=args.jobs, threads=args.threads,
+                                 cache_size_mb=args.registration_cache_mb, memory_warning_mb=args.memory_warning_mb,
+                                 refinement=RefinementSettings(args.refinement_mode, report=args.refinement_report),
+                                 qc_policy=args.qc_policy)
         print("FINISHED: Pipeline completed successfully")
     except Exception as e:
         import traceback
@@ -143,4 +445,6 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Needed by the spawned worker processes of the compiled executable
+    multiprocessing.freeze_support()
+    main()
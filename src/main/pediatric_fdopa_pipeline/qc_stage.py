@@ -0,0 +1,257 @@
+'''
+QC stage of the pipeline: the GIF animations and plots of a subject, decoupled from its numeric results.
+
+The steps of a subject submit their QC products to its QCQueue instead of drawing them. Each product
+is a job naming a rendering function of the package and its arguments (file names and plain values),
+so it can be rendered later, in another process. Three policies are available:
+
+    inline:     the job is rendered as soon as it is submitted (the products are drawn on the critical
+                path, as before)
+    background: the jobs are recorded in the QC directory of the subject, and rendered by a pool of
+                processes once the numeric results (CSV) of all the subjects are written, before the
+                runner exits
+    on-demand:  the jobs are recorded and left pending; they are rendered when the QC folder is opened
+                (pipeline_runner --render-qc <qc_dir>)
+
+The pending jobs of a subject are kept in QC_MANIFEST, in its QC directory; jobs that fail stay there
+so that they can be rendered again. The manifest and the products of a directory are only written by
+the holder of its QC_LOCK, so that the runner and a --render-qc launched from the GUI never render the
+same directory at the same time.
+'''
+import os
+import json
+import time
+import threading
+import importlib
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+
+QC_POLICIES = ('inline', 'background', 'on-demand')
+QC_MANIFEST = 'qc_pending.json'
+QC_LOCK = 'qc_pending.lock'
+# Seconds a subject waits to record a job while its directory is being rendered
+QC_LOCK_TIMEOUT = 600
+# Only the rendering functions of the pipeline can be named by a manifest
+QC_PACKAGE = 'pediatric_fdopa_pipeline.'
+
+
+class QCQueue():
+
+    def __init__(self, qc_dir=None, policy='inline'):
+        '''
+        Inputs:
+            qc_dir: str, QC directory of the subject, holding the manifest of the pending jobs
+            policy: str, one of QC_POLICIES
+        '''
+        if policy not in QC_POLICIES:
+            raise ValueError(f'Unknown QC policy: {policy} (expected one of {", ".join(QC_POLICIES)})')
+        if policy != 'inline' and qc_dir is None:
+            raise ValueError(f'The {policy} QC policy needs a QC directory')
+        self.qc_dir = qc_dir
+        self.policy = policy
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Subjects are sent back from the worker processes: the lock is not pickled
+        return {'qc_dir': self.qc_dir, 'policy': self.policy}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    @property
+    def deferred(self):
+        return self.policy != 'inline'
+
+    def submit(self, function, **kwargs):
+        '''
+        Render a QC product now, or record it for later, depending on the policy.
+
+        Inputs:
+            function: rendering function of the package, e.g. qc.render_gif
+            kwargs:   JSON-serializable arguments of the function (file names, lists, numbers, strings)
+        '''
+        if not self.deferred:
+            function(**kwargs)
+            return
+        job = {'function': f'{function.__module__}:{function.__qualname__}', 'kwargs': kwargs}
+        with self._lock, qc_lock(self.qc_dir, timeout=QC_LOCK_TIMEOUT):
+            jobs = [j for j in load_jobs(self.qc_dir) if j != job]
+            save_jobs(self.qc_dir, jobs + [job])
+
+
+class QCBusyError(RuntimeError):
+    '''The QC directory is held by another process.'''
+
+
+def manifest_file(qc_dir):
+    return os.path.join(qc_dir, QC_MANIFEST)
+
+
+def lock_file(qc_dir):
+    return os.path.join(qc_dir, QC_LOCK)
+
+
+@contextmanager
+def qc_lock(qc_dir, timeout=0):
+    '''
+    Hold the QC directory of a subject: only one process renders it or writes its manifest.
+
+    The lock file is created atomically (O_EXCL) and holds the pid of its owner; a lock left by a
+    process that no longer exists (e.g. a stopped pipeline) is taken over.
+
+    Inputs:
+        qc_dir:  str, QC directory of the subject
+        timeout: float, seconds to wait for the lock before raising QCBusyError
+    '''
+    fn = lock_file(qc_dir)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(fn, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            if _stale_lock(fn):
+                _remove(fn)
+            elif time.monotonic() >= deadline:
+                raise QCBusyError(f'The QC of {qc_dir} is being rendered by another process')
+            else:
+                time.sleep(0.1)
+    with os.fdopen(fd, 'w') as f:
+        f.write(str(os.getpid()))
+    try:
+        yield
+    finally:
+        _remove(fn)
+
+
+def _stale_lock(fn):
+    '''
+    Outputs:
+        stale: bool, True if the owner of the lock file is known to have exited
+    '''
+    try:
+        with open(fn) as f:
+            pid = int(f.read())
+    except FileNotFoundError:
+        return False
+    except ValueError:
+        # Being written by its owner
+        return False
+    # The pipeline runs on Linux (WSL): without /proc the owner cannot be checked
+    return os.path.isdir('/proc/self') and not os.path.isdir(f'/proc/{pid}')
+
+
+def _remove(fn):
+    try:
+        os.remove(fn)
+    except FileNotFoundError:
+        pass
+
+
+def load_jobs(qc_dir):
+    '''
+    Outputs:
+        jobs: list of the pending QC jobs of the directory (empty if there are none)
+    '''
+    try:
+        with open(manifest_file(qc_dir), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def save_jobs(qc_dir, jobs):
+    '''
+    Write the pending QC jobs of the directory, removing the manifest when there are none left.
+    The caller holds the qc_lock of the directory.
+    '''
+    fn = manifest_file(qc_dir)
+    if not jobs:
+        if os.path.exists(fn):
+            os.remove(fn)
+        return
+    tmp = fn + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(jobs, f, indent=4)
+    # Replaced in one step: a reader never sees a partial manifest
+    os.replace(tmp, fn)
+
+
+def has_pending(qc_dir):
+    return os.path.exists(manifest_file(qc_dir))
+
+
+def resolve(name):
+    '''
+    Inputs:
+        name: str, 'module:function' of a rendering function of the package
+    Outputs:
+        function: the rendering function
+    '''
+    module, _, function = name.partition(':')
+    if not module.startswith(QC_PACKAGE):
+        raise ValueError(f'QC job outside of the pipeline: {name}')
+    return getattr(importlib.import_module(module), function)
+
+
+def render_pending(qc_dir):
+    '''
+    Render the pending QC jobs of a subject. Failed jobs are kept in the manifest.
+    Raises QCBusyError if the directory is already being rendered.
+
+    Inputs:
+        qc_dir: str, QC directory of the subject
+    Outputs:
+        n_done: int, number of rendered jobs
+        errors: list of str, one message per failed job
+    '''
+    n_done = 0
+    errors = []
+    failed = []
+    with qc_lock(qc_dir):
+        for job in load_jobs(qc_dir):
+            try:
+                resolve(job['function'])(**job['kwargs'])
+                n_done += 1
+            except Exception as e:
+                errors.append(f"{job['function']}: {e}")
+                failed.append(job)
+        save_jobs(qc_dir, failed)
+    return n_done, errors
+
+
+class BackgroundQC():
+
+    def __init__(self, jobs=1):
+        '''
+        Pool of processes rendering the pending QC of the subjects whose numeric results are written.
+
+        Inputs:
+            jobs: int, number of rendering processes
+        '''
+        self.executor = ProcessPoolExecutor(max_workers=max(1, jobs), mp_context=multiprocessing.get_context('spawn'))
+        self.futures = {}
+
+    def submit(self, qc_dir):
+        '''Render the pending QC of a subject in the pool.'''
+        if has_pending(qc_dir):
+            self.futures[qc_dir] = self.executor.submit(render_pending, qc_dir)
+
+    def close(self):
+        '''
+        Wait for the pool.
+
+        Outputs:
+            results: dict, qc_dir -> (n_done, errors) of every subject rendered in the pool
+        '''
+        results = {}
+        try:
+            for qc_dir, future in self.futures.items():
+                try:
+                    results[qc_dir] = future.result()
+                except Exception as e:
+                    results[qc_dir] = (0, [str(e)])
+        finally:
+            self.executor.shutdown(wait=True)
+        return results
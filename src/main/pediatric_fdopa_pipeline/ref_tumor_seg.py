@@ -7,13 +7,11 @@ import nibabel as nib
 import pandas as pd
 import re
 import os
-import ants
 import argparse
 import csv
 import statistics
 from scipy.ndimage import distance_transform_edt
 from scipy.ndimage import label
-from scipy.ndimage import center_of_mass
 from scipy.ndimage import gaussian_filter
 from sklearn.mixture import GaussianMixture
 from sklearn.linear_model import LogisticRegression
@@ -25,19 +23,53 @@ from skimage.morphology import dilation, erosion
 from sys import argv
 from glob import glob
 import seaborn as sns
+from pediatric_fdopa_pipeline.tumor_refinement import refine_tumor
+
+# The distance map is a gaussian filter of the tumour (FWHM 5 voxels); scipy truncates the kernel
+# at 4 sigma, so the map is 0 farther than DISTANCE_RADIUS voxels from the tumour
+DISTANCE_SIGMA = 5 / 2.355
+DISTANCE_RADIUS = int(4.0 * DISTANCE_SIGMA + 0.5)
+
+def bounding_box(mask, margin=0):
+    '''
+    Inputs:
+        mask: 3D volume, the box encloses its nonzero voxels
+        margin: int, voxels added on each side of the box
+    Outputs:
+        box: tuple of slices, bounding box padded by margin and clipped to the volume (the whole volume if the mask is empty)
+    '''
+    mask = mask != 0
+    box = []
+    for axis in range(mask.ndim):
+        other_axes = tuple(i for i in range(mask.ndim) if i != axis)
+        nonzero = np.flatnonzero(np.any(mask, axis=other_axes))
+        if nonzero.size == 0:
+            return tuple(slice(0, n) for n in mask.shape)
+        box.append(slice(max(nonzero[0] - margin, 0), min(nonzero[-1] + 1 + margin, mask.shape[axis])))
+    return tuple(box)
+
+def embed(local, box, shape):
+    '''
+    Inputs:
+        local: 3D volume computed in a bounding box
+        box: tuple of slices, bounding box in the full volume
+        shape: tuple, shape of the full volume
+    Outputs:
+        vol: full volume, 0 outside the box
+    '''
+    vol = np.zeros(shape, dtype=local.dtype)
+    vol[box] = local
+    return vol
 
 def binary_mask(subject):
     '''
     This function cretates a binary mask of FLAIR MRI skull stripped. This mask is used to eliminate skull from [18F]F-DOPA PET. 
+    The masks are computed once per subject and shared by its steps (read-only).
     '''
-    brain_mask_hd = nib.load(subject.brain)
-    brain_mask = brain_mask_hd.get_fdata()
-    brain_mask[brain_mask != 0] = 1
-    kernel = np.ones([3,3])
-    brain_mask_eroded = np.zeros_like(brain_mask)
-
-    for i in range(brain_mask.shape[0]):
-        brain_mask_eroded[i,:,:] = erosion(brain_mask[i,:,:], kernel)
+    brain_mask = subject.volumes.derived(subject.brain, 'brain_mask', lambda: (subject.volumes.volume(subject.brain) != 0).astype(np.uint8))
+    # 3x3 erosion of every sagittal slice, as one 3D erosion with a planar structuring element
+    kernel = np.ones([1,3,3])
+    brain_mask_eroded = subject.volumes.derived(subject.brain, 'brain_mask_eroded', lambda: erosion(brain_mask, kernel))
     return brain_mask_eroded, brain_mask
 
 def create_tumor_label_volume(atlas, tumor_label, tumor_flair):
@@ -45,18 +77,18 @@ def create_tumor_label_volume(atlas, tumor_label, tumor_flair):
     This function eliminate small connceted components from PET tumour and combined this mask with the FLAIR tumour. the output will be used for 
     calculation of the probability distance map
     '''
-    tumor_label_volume = np.zeros_like(atlas)
-    tumor_label_volume[(atlas == tumor_label) | (tumor_flair == 1)] = 1
+    tumor_label_volume = np.zeros(atlas.shape, dtype=np.uint8)
+    tumor_mask = (atlas == tumor_label) | (tumor_flair == 1)
 
-    labels, _ = label(tumor_label_volume)
-    label_ids, counts = np.unique(labels, return_counts=True)
-    label_ids = label_ids[1:] 
-    counts = counts[1:] 
+    # The connected components are labelled in the bounding box of the tumour only
+    box = bounding_box(tumor_mask)
+    labels, _ = label(tumor_mask[box])
+    counts = np.bincount(labels.ravel())[1:]
 
     # Remove small connected components
-    for label_id, count in zip(label_ids, counts):
-        if count < np.max(counts):
-            tumor_label_volume[labels == label_id] = 0
+    if counts.size:
+        largest = np.concatenate([[False], counts == np.max(counts)])
+        tumor_label_volume[box] = largest[labels]
             
     return tumor_label_volume
 
@@ -65,46 +97,39 @@ def sinus_sag(subj):
     The static image representing sinus sagittallis is obtained by a weighted sum of the first two frames of 4D PET.
     From this image, the sinus probability map is obtained by normalizing its maximum value.
     '''
-    img = nib.load(subj.pet4d)
-    vol_4d = img.get_fdata()
-    sinus = np.sum(vol_4d[:, :, :, :2] * subj.frame_weight[:2], axis=3)
+    # Only the first two frames are read from the 4D PET
+    sinus = None
+    for frame, weight in zip(subj.volumes.frames(subj.pet4d, stop=2), subj.frame_weight[:2]):
+        weighted_frame = frame.astype(np.float64) * weight
+        sinus = weighted_frame if sinus is None else sinus + weighted_frame
     _,brain_mask = binary_mask(subj)
     sinus[brain_mask == 0] = 0
     sinus_max = np.max(sinus)
-    sinus_map = sinus/sinus_max
+    sinus_map = (sinus/sinus_max).astype(np.float32)
     
     return sinus_map
 
-def calculate_distance_map(volume:np.array, step:list, exponent:float=2):
+def calculate_distance_map(volume:np.array, box:tuple=None):
     '''
     Probability distance map is obtained by applying a gaussian filter to tumour label volume.
-    '''
-    volume = volume.astype(float)
-    x,y,z = np.rint(center_of_mass(volume)).astype(int)
-
-    xstep, ystep, zstep = step
-
-    volume_inverse = np.ones_like(volume) 
-    volume_inverse[x,y,z] = 0
 
-    X, Y, Z = np.meshgrid(np.arange(volume.shape[0]), np.arange(volume.shape[1]), np.arange(volume.shape[2]), indexing='ij')
-
-    distance_map = np.sqrt( 
-            (xstep*(X - x))**2 + 
-            (ystep*(Y - y))**2 + 
-            (zstep*(Z - z))**2
-            ) 
-
-    distance_map = np.power(distance_map, exponent)
-
-    fwhm = 5
-    sigma = fwhm / 2.355
+    The filter is only applied in a bounding box of the tumour padded by DISTANCE_RADIUS (the map is 0 outside it),
+    so the cost follows the size of the tumour rather than the size of the image.
+    Inputs:
+        volume: 3D tumour label volume
+        box: tuple of slices, box enclosing the tumour padded by DISTANCE_RADIUS (default: bounding box of the tumour)
+    Outputs:
+        distance_map: float32 map inside the box, normalized by its maximum
+        box: tuple of slices, position of the map in the volume
+    '''
+    if box is None:
+        box = bounding_box(volume, DISTANCE_RADIUS)
 
-    distance_map = gaussian_filter(volume, sigma=sigma)
+    distance_map = gaussian_filter(volume[box].astype(np.float32), sigma=DISTANCE_SIGMA)
 
     distance_map /=np.max(distance_map)
 
-    return distance_map
+    return distance_map, box
 
 def create_tumor_dictionary(distance_map, sinus_map, tumor_index, tumor_idx):
     '''
@@ -124,6 +149,19 @@ def create_tumor_dictionary(distance_map, sinus_map, tumor_index, tumor_idx):
 
     return df_tumor
 
+def plot_clusters(clusters_csv, hue, qc_png):
+    '''
+    Inputs:
+        clusters_csv: csv file of the distance, sinus, label and label_svm of the tumour voxels
+        hue: str, column of the classes ('label' for KMeans, 'label_svm' for the SVM)
+        qc_png: scatter plot image
+    '''
+    df_tumor = pd.read_csv(clusters_csv)
+    plt.figure()
+    sns.scatterplot(data=df_tumor, x='distance', y='sinus', hue=hue, alpha=0.1)
+    plt.savefig(qc_png)
+    plt.close()
+
 def ref_seg(subj):
 
     subj.sinus = subj.ref_prefix + 'sinus_map.nii.gz'
@@ -131,105 +169,77 @@ def ref_seg(subj):
     subj.distance_map = subj.ref_prefix + 'distance_map.nii.gz'
     subj.volume_seg = subj.ref_prefix + 'segmented_volume.nii.gz'
 
-    atlas_hd = nib.load(subj.atlas_space_pet)
-    atlas_vol = np.rint(atlas_hd.get_fdata()).astype(int)
+    atlas_hd = subj.volumes.image(subj.atlas_space_pet)
 
-    tumor_MRI_hd = nib.load(subj.volume_MRI)
-    tumor_MRI_vol = np.rint(tumor_MRI_hd.get_fdata()).astype(int)
+    tumor_MRI_vol = subj.volumes.labels(subj.volume_MRI)
 
     if not os.path.exists(subj.tumor_lab):
         tumor_label_volume = create_tumor_label_volume(subj.tumor_atlas, subj.tumor_label, tumor_MRI_vol)
-        nib.Nifti1Image(tumor_label_volume, nib.load(subj.atlas_space_pet).affine, dtype = np.int64).to_filename(subj.tumor_lab)
+        nib.Nifti1Image(tumor_label_volume, atlas_hd.affine).to_filename(subj.tumor_lab)
     else:
-        tumorlab_hd = nib.load(subj.atlas_space_pet)
-        tumor_label_volume = np.rint(tumorlab_hd.get_fdata()).astype(int)
+        tumor_label_volume = subj.volumes.labels(subj.atlas_space_pet)
 
-    xstep, ystep, zstep = atlas_hd.header.get_zooms()
+    # The refinement works in the bounding box of the tumour, padded by the support of the distance map;
+    # the full volumes are only rebuilt to be written
+    tumor_mask = subj.tumor_atlas == subj.tumor_label
+    box = bounding_box(tumor_mask | (tumor_label_volume != 0), DISTANCE_RADIUS)
+    tumor_box = tumor_mask[box]
 
     if not os.path.exists(subj.distance_map):
-        distance_map = calculate_distance_map(tumor_label_volume, [xstep, ystep, zstep])
-        nib.Nifti1Image(distance_map, nib.load(subj.atlas_space_pet).affine).to_filename(subj.distance_map)
+        distance_map, _ = calculate_distance_map(tumor_label_volume, box)
+        nib.Nifti1Image(embed(distance_map, box, atlas_hd.shape), atlas_hd.affine).to_filename(subj.distance_map)
     else:
         distance_hd = nib.load(subj.distance_map)
-        distance_map = distance_hd.get_fdata()
+        distance_map = np.asarray(distance_hd.dataobj[box], dtype=np.float32)
 
     if (Path(subj.data_dir+'/sub-'+subj.sub+'/ses-02').is_dir()):
 
-        tumor_idx = (subj.tumor_atlas == subj.tumor_label).ravel()
-        nvox = np.prod(subj.tumor_atlas.shape)
-        index_range = np.arange(nvox).astype(int)
-        tumor_index = index_range[tumor_idx]
+        # Flat indices of the tumour voxels in the full volume, in the order of the voxels of the box
+        tumor_index = np.ravel_multi_index([idx + s.start for idx, s in zip(np.nonzero(tumor_box), box)], atlas_hd.shape)
 
         if not os.path.exists(subj.sinus):
             sinus_map = sinus_sag(subj)
-            nib.Nifti1Image(sinus_map, nib.load(subj.pet).affine).to_filename(subj.sinus)
+            nib.Nifti1Image(sinus_map, subj.volumes.image(subj.pet).affine).to_filename(subj.sinus)
         else:
             sinus_hd = nib.load(subj.sinus)
-            sinus_map = sinus_hd.get_fdata()
+            sinus_map = sinus_hd.get_fdata(dtype=np.float32)
 
-        distance_map = distance_map.ravel()
-        sinus_map = sinus_map.ravel()
-        df_tumor = create_tumor_dictionary(distance_map, sinus_map, tumor_index, tumor_idx)
+        df_tumor = create_tumor_dictionary(distance_map, sinus_map[box], tumor_index, tumor_box)
 
         if not os.path.exists(subj.volume_seg):
             
-            ### K-means ###
-            np.random.seed(42)
-            from sklearn.cluster import KMeans
-
-            n_clusters = 2
-            kmeans = KMeans(n_clusters=n_clusters, init='k-means++', n_init = 10)
-            kmeans.fit(df_tumor[['distance', 'sinus']])
-            df_tumor['label'] = kmeans.predict(df_tumor.iloc[:, :2])
-
+            # KMeans clusters learnt by the SVM, with a cost bounded for large tumours
+            df_tumor['label'], df_tumor['label_svm'] = refine_tumor(df_tumor[['distance', 'sinus']].to_numpy(), subj.refinement,
+                                                                    model_file=subj.ref_prefix + 'refinement_model.joblib',
+                                                                    report_file=subj.ref_prefix + 'refinement_agreement.json')
             
-            plt.figure()
-            sns.scatterplot(data=df_tumor, x='distance', y='sinus', hue='label', alpha=0.1)
-            plt.savefig(subj.ref_prefix + '_clusters.png')
-            plt.close()
-
-            from sklearn.svm import SVC
-            from sklearn.model_selection import GridSearchCV
-
-            svm_model = SVC()
-            param_grid = {
-                'C': [0.1, 1, 10, 100],    # Regularization
-                'gamma': [1, 0.1, 0.01, 0.001],  # Kernel Parameter
-                'kernel': ['rbf']  # Kernel RBF
-            }
-
-            grid_search = GridSearchCV(svm_model, param_grid, cv=5)
-            grid_search.fit(df_tumor[['distance', 'sinus']], df_tumor['label'])
-            best_svm_model = grid_search.best_estimator_
-            df_tumor['label_svm'] = best_svm_model.predict(df_tumor.iloc[:, :2])
             mean_distances_svm = df_tumor.groupby('label_svm')[['distance', 'sinus']].mean()
             max_mean_label_svm = mean_distances_svm.idxmax().iloc[0]
             df_tumor['label_svm'] = df_tumor['label_svm'].apply(lambda x: 1 if x == max_mean_label_svm else 0)
 
-            plt.figure()
-            sns.scatterplot(data=df_tumor, x='distance', y='sinus', hue='label_svm', alpha=0.1)
-            plt.savefig(subj.ref_prefix + '_clusters_SVM.png')
-            plt.close()
-            segmented_volume = np.zeros_like(atlas_vol).reshape(-1,)
+            segmented_volume = np.zeros(atlas_hd.shape, dtype=np.uint16).reshape(-1,)
             segmented_volume[df_tumor['index'].values] = df_tumor['label_svm'].values + 1
             segmented_volume = segmented_volume.reshape(atlas_hd.shape)
             segmented_volume[segmented_volume == 1] = 0
             segmented_volume[segmented_volume == 2] = 2037
-            nib.Nifti1Image(segmented_volume, atlas_hd.affine, dtype= np.int64).to_filename(subj.volume_seg)
+            nib.Nifti1Image(segmented_volume, atlas_hd.affine).to_filename(subj.volume_seg)
+
+            # Features and classes of the tumour voxels, plotted by the QC stage
+            clusters_csv = subj.ref_prefix + 'clusters.csv'
+            df_tumor[['distance', 'sinus', 'label', 'label_svm']].to_csv(clusters_csv, index=False)
+            subj.qc.submit(plot_clusters, clusters_csv=clusters_csv, hue='label', qc_png=subj.ref_prefix + '_clusters.png')
+            subj.qc.submit(plot_clusters, clusters_csv=clusters_csv, hue='label_svm', qc_png=subj.ref_prefix + '_clusters_SVM.png')
 
         else:
-            segmented_volume_hd = nib.load(subj.volume_seg)
-            segmented_volume = np.rint(segmented_volume_hd.get_fdata()).astype(int) 
+            segmented_volume = subj.volumes.labels(subj.volume_seg)
             
     else:
         if not os.path.exists(subj.volume_seg):
-            distance_mask = distance_map > 0
-            mask = (subj.tumor_atlas == subj.tumor_label) & (distance_mask)
-            segmented_volume = np.zeros_like(atlas_vol)
-            segmented_volume[mask == 1] = 2037
-            nib.Nifti1Image(segmented_volume, atlas_hd.affine, dtype= np.int64).to_filename(subj.volume_seg)
+            mask = tumor_box & (distance_map > 0)
+            segmented_volume = np.zeros(atlas_hd.shape, dtype=np.uint16)
+            segmented_volume[box][mask] = 2037
+            nib.Nifti1Image(segmented_volume, atlas_hd.affine).to_filename(subj.volume_seg)
         else:
-            segmented_volume_hd = nib.load(subj.volume_seg)
-            segmented_volume = np.rint(segmented_volume_hd.get_fdata()).astype(int) 
+            segmented_volume = subj.volumes.labels(subj.volume_seg)
     
     return segmented_volume
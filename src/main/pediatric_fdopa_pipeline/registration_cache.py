@@ -0,0 +1,171 @@
+'''
+Content-addressed cache of ANTs registrations shared by the pipeline runs of a workspace.
+
+An entry is keyed by the content hashes of the fixed and moving images, every argument passed to
+ants.registration (files, such as the initial transforms, by their content), the ANTs version and
+the cache format version, so a patient processed again in a new configuration (new output
+directory) reuses its registrations as long as the images and the registration are unchanged. Entries hold the warped images and the Composite/InverseComposite transforms; the
+least recently used entries are evicted when the cache exceeds its size limit.
+'''
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+
+CACHE_VERSION = 2
+# Arguments of ants.registration that do not change its result: where the outputs are written, logging
+UNHASHED_ARGUMENTS = ('outprefix', 'verbose')
+DEFAULT_MAX_SIZE_MB = 10240
+
+_digests = {}
+_digests_lock = threading.Lock()
+
+
+def file_digest(path):
+    '''
+    Inputs:
+        path: str, file path
+    Outputs:
+        digest: str, sha256 of the file content (memoized while the file is unchanged)
+    '''
+    stat = os.stat(path)
+    memo_key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+    with _digests_lock:
+        if memo_key in _digests:
+            return _digests[memo_key]
+
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+
+    with _digests_lock:
+        _digests[memo_key] = digest
+    return digest
+
+
+def _content(value):
+    '''Argument of the registration with its files replaced by their content hash.'''
+    if isinstance(value, dict):
+        return {str(k): _content(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_content(v) for v in value]
+    if isinstance(value, str) and os.path.isfile(value):
+        return 'sha256:' + file_digest(value)
+    return value
+
+
+def default_cache_dir(work_dir):
+    '''Registration cache of a workspace, next to the pipeline outputs.'''
+    return os.path.join(work_dir, 'pipeline', '.registration_cache')
+
+
+class RegistrationCache():
+
+    def __init__(self, cache_dir, max_size_mb=DEFAULT_MAX_SIZE_MB):
+        '''
+        Inputs:
+            cache_dir:   str, directory of the cache entries
+            max_size_mb: float, size above which the least recently used entries are evicted
+        '''
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+
+    def key(self, fx, mv, registration_kwargs, version):
+        '''
+        Inputs:
+            fx: str, fixed image
+            mv: str, moving image
+            registration_kwargs: dict, the other arguments of ants.registration
+            version: str, ANTs version
+        Outputs:
+            key: str, hash identifying the registration
+        '''
+        arguments = {k: v for k, v in registration_kwargs.items() if k not in UNHASHED_ARGUMENTS}
+        parts = [f'v{CACHE_VERSION}', str(version), file_digest(fx), file_digest(mv),
+                 json.dumps(_content(arguments), sort_keys=True, default=str)]
+        return hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+
+    def fetch(self, key, output_files):
+        '''
+        Copy the files of an entry to the registration outputs.
+
+        Inputs:
+            key: str, registration key
+            output_files: tuple, destination of each stored file, in the order they were stored
+        Outputs:
+            hit: bool, True if the entry existed and was copied
+        '''
+        entry = os.path.join(self.cache_dir, key)
+        stored = [os.path.join(entry, str(i)) for i in range(len(output_files))]
+        if not all(os.path.exists(fn) for fn in stored):
+            return False
+        try:
+            for src, dst in zip(stored, output_files):
+                shutil.copyfile(src, dst)
+            # Mark the entry as recently used
+            os.utime(entry)
+        except OSError:
+            # Evicted while copying: the registration is computed again
+            for dst in output_files:
+                if os.path.exists(dst):
+                    os.remove(dst)
+            return False
+        return True
+
+    def store(self, key, output_files):
+        '''
+        Add the outputs of a registration to the cache, then evict the oldest entries over the size limit.
+
+        The entry is written in a temporary directory and renamed, so concurrent runs never read a
+        partial entry; if another run stored the same key meanwhile, its entry is kept.
+
+        Inputs:
+            key: str, registration key
+            output_files: tuple, files produced by the registration
+        '''
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry = os.path.join(self.cache_dir, key)
+        if os.path.isdir(entry):
+            return
+        tmp_dir = tempfile.mkdtemp(prefix='.tmp_', dir=self.cache_dir)
+        try:
+            for i, fn in enumerate(output_files):
+                shutil.copyfile(fn, os.path.join(tmp_dir, str(i)))
+            os.rename(tmp_dir, entry)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+        self.evict()
+
+    def entries(self):
+        '''
+        Outputs:
+            entries: list of (last use time, size in bytes, path), least recently used first
+        '''
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith('.') or not os.path.isdir(path):
+                continue
+            try:
+                size = sum(os.path.getsize(os.path.join(path, fn)) for fn in os.listdir(path))
+                entries.append((os.path.getmtime(path), size, path))
+            except OSError:
+                continue
+        return sorted(entries)
+
+    def evict(self):
+        '''Remove the least recently used entries until the cache fits its size limit.'''
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
@@ -9,21 +9,38 @@ Regions of Interests:
 10 & 49: Left and Right Thalamus
 '''
 
+def max_in_label(distance_map, box_labels, atlas_index, label):
+    '''
+    Inputs:
+        distance_map: map computed in a bounding box, 0 outside it
+        box_labels: atlas labels in the same box
+        atlas_index: LabelIndex of the whole atlas
+        label: int, atlas label
+    Outputs:
+        maximum of the map over the voxels of the label
+    '''
+    values = distance_map[box_labels == label]
+    if atlas_index.count(label) > values.size:
+        # Voxels of the label outside the box
+        values = np.append(values, 0)
+    return np.max(values)
+
 def region_selection(subject):
 
-    tumor_MRI_hd = nib.load(subject.volume_MRI)
-    tum_flair = np.rint(tumor_MRI_hd.get_fdata()).astype(int)
-    atlas_hd = nib.load(subject.atlas_space_pet)
-    atlas_vol = np.rint(atlas_hd.get_fdata()).astype(int)
+    tum_flair = subject.volumes.labels(subject.volume_MRI)
+    atlas_vol = subject.volumes.labels(subject.atlas_space_pet)
+    atlas_index = subject.volumes.label_index(subject.atlas_space_pet)
     
-    xstep, ystep, zstep = atlas_hd.header.get_zooms()
-    distance_map = calculate_distance_map(tum_flair, [xstep, ystep, zstep])
+    # The regions are compared in the bounding box of the tumor, padded by the support of the distance map
+    distance_map, box = calculate_distance_map(tum_flair)
+    atlas_vol = atlas_vol[box]
+    tum_flair = tum_flair[box]
         
-    max_prob_41 = np.max(distance_map[atlas_vol == 41])
-    max_prob_2 = np.max(distance_map[atlas_vol == 2])
-    max_prob_16 = np.max(distance_map[atlas_vol == 16])
-    max_prob_10 = np.max(distance_map[atlas_vol == 10])
-    max_prob_49 = np.max(distance_map[atlas_vol == 49])
+    max_prob_41 = max_in_label(distance_map, atlas_vol, atlas_index, 41)
+    max_prob_2 = max_in_label(distance_map, atlas_vol, atlas_index, 2)
+    max_prob_16 = max_in_label(distance_map, atlas_vol, atlas_index, 16)
+    max_prob_10 = max_in_label(distance_map, atlas_vol, atlas_index, 10)
+    max_prob_49 = max_in_label(distance_map, atlas_vol, atlas_index, 49)
         
     mask_2_41 = (atlas_vol == 2) | (atlas_vol == 41)
     mask_2 = (atlas_vol == 2)
@@ -0,0 +1,131 @@
+'''
+Dependency graph of processing steps.
+
+Every step declares the attributes it reads (inputs) and writes (outputs) on a shared object
+(the Subject). A step depends on the latest earlier step producing one of its inputs, so the
+list order is a valid serial order and the graph can never contain a cycle. Steps whose
+dependencies are done run concurrently in a thread pool, as long as the sum of their thread
+costs fits the thread budget.
+
+ANTs holds the GIL during a registration and its ITK threads are shared by the whole process, so
+two ANTs steps never overlap in one process: a step can run its work in a process of its own,
+limited to its share of the budget, with run_in_process.
+'''
+import os
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+ITK_THREADS_VAR = 'ITK_GLOBAL_DEFAULT_NUMBER_OF_THREADS'
+
+
+class Step():
+
+    def __init__(self, name, func, inputs=(), outputs=(), threads=1):
+        '''
+        Inputs:
+            name:    str, step name used in the logs
+            func:    callable without arguments, runs the step and stores its outputs
+            inputs:  tuple, attributes read by the step
+            outputs: tuple, attributes written by the step
+            threads: int, threads used by the step, counted against the thread budget
+        '''
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.threads = max(1, int(threads))
+
+
+def get_thread_budget():
+    '''
+    Threads available to the steps of one subject: the ITK thread limit set by the
+    pipeline runner, or all the CPUs.
+    '''
+    budget = os.environ.get(ITK_THREADS_VAR)
+    if budget and budget.isdigit() and int(budget) > 0:
+        return int(budget)
+    return os.cpu_count() or 1
+
+
+def step_dependencies(steps):
+    '''
+    Inputs:
+        steps: list of Step, in a valid serial order
+    Outputs:
+        dependencies: dict, step name -> set of the names of the steps it waits for
+    '''
+    producers = {}
+    dependencies = {}
+    for step in steps:
+        if step.name in dependencies:
+            raise ValueError(f'Duplicate step name: {step.name}')
+        dependencies[step.name] = {producers[name] for name in step.inputs if name in producers}
+        for name in step.outputs:
+            producers[name] = step.name
+    return dependencies
+
+
+def run_steps(steps, threads=None, on_step_done=None):
+    '''
+    Run the steps of a graph, starting every step as soon as its dependencies are done.
+
+    A step whose cost exceeds the whole budget still runs, alone. If a step fails, no new
+    step is started, the running ones are awaited and the first error is raised.
+
+    Inputs:
+        steps:        list of Step, in a valid serial order
+        threads:      int, thread budget (default: get_thread_budget())
+        on_step_done: callable(step, n_done, n_steps), called from the calling thread
+    '''
+    budget = threads or get_thread_budget()
+    dependencies = step_dependencies(steps)
+    waiting = list(steps)
+    done = set()
+    running = {}
+    used = 0
+
+    with ThreadPoolExecutor(max_workers=len(steps) or 1) as executor:
+        while waiting or running:
+            for step in list(waiting):
+                if not dependencies[step.name] <= done:
+                    continue
+                if running and used + step.threads > budget:
+                    continue
+                waiting.remove(step)
+                running[executor.submit(step.func)] = step
+                used += step.threads
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                step = running.pop(future)
+                used -= step.threads
+                if future.exception() is not None:
+                    wait(running)
+                    raise future.exception()
+                done.add(step.name)
+                if on_step_done is not None:
+                    on_step_done(step, len(done), len(steps))
+
+
+def run_in_process(func, *args, threads=1, **kwargs):
+    '''
+    Run func(*args, **kwargs) in a new process whose ITK threads are limited to `threads`.
+
+    The calling thread waits without holding the GIL, so the other steps keep running. func, its
+    arguments and its result are pickled: the function only returns values (e.g. file names), the
+    caller stores them.
+
+    Inputs:
+        func:    module-level function
+        threads: int, ITK threads of the process (its share of the thread budget)
+    Outputs:
+        result: return value of func
+    '''
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_limit_itk_threads, initargs=(threads,)) as executor:
+        return executor.submit(func, *args, **kwargs).result()
+
+
+def _limit_itk_threads(threads):
+    # Read by ITK at the first registration of the process
+    os.environ[ITK_THREADS_VAR] = str(max(1, int(threads)))
@@ -6,18 +6,23 @@ import ants
 import argparse
 import json
 from argparse import ArgumentParser
+from functools import partial
 from pathlib import Path
 from sys import argv
 from glob import glob
-from pediatric_fdopa_pipeline.utils import get_file, align, transform, get_tacs, get_dynamic_parameters
+from pediatric_fdopa_pipeline.utils import get_file, align, transform, TransformSession, get_tacs, get_dynamic_parameters
 from pediatric_fdopa_pipeline.analysis import variable_def
 from pediatric_fdopa_pipeline.roi_selection import region_selection
 from pediatric_fdopa_pipeline.qc import ImageParam
 from pediatric_fdopa_pipeline.utils import log_progress,log_message,log_error
+from pediatric_fdopa_pipeline.scheduler import Step, run_steps, run_in_process, get_thread_budget
+from pediatric_fdopa_pipeline.volume_store import VolumeStore
+from pediatric_fdopa_pipeline.tumor_refinement import RefinementSettings
+from pediatric_fdopa_pipeline.qc_stage import QCQueue
 
 class Subject():
 
-    def __init__(self, work_dir, out_dir, sub, stx_fn, atlas_fn, flair_tumor, pet_file, pet_json_file, pet4d_file, mri_file, mri_str_file,progress,clobber=False):
+    def __init__(self, work_dir, out_dir, sub, stx_fn, atlas_fn, flair_tumor, pet_file, pet_json_file, pet4d_file, mri_file, mri_str_file,progress,clobber=False,registration_cache=None,refinement=None,qc_policy='inline'):
         
         '''
         Inputs:
@@ -28,12 +33,19 @@ class Subject():
             atlat_fn:   str, file path to stereotaxic atlas
             labels:     dict, labels to use for extracting tacs 
             clobber:    bool, overwrite
+            registration_cache: RegistrationCache, registrations shared across runs (None disables it)
+            refinement: RefinementSettings, classifier of the tumour refinement (default: 'exact' mode)
+            qc_policy:  str, when the QC animations and plots are rendered: 'inline', 'background' or 'on-demand'
         '''
 
         # Inputs :
         self.work_dir = work_dir
         self.sub = sub
         self.clobber = clobber
+        self.registration_cache = registration_cache
+        self.refinement = refinement or RefinementSettings()
+        # Volumes read by the analysis steps, loaded once
+        self.volumes = VolumeStore()
 
         self.pet = os.path.join(self.work_dir, pet_file)
 
@@ -52,6 +64,8 @@ class Subject():
         self.coreg_dir = self.sub_dir + os.sep + 'coregistration/'
         self.ref_dir = self.sub_dir + os.sep + 'refinement/'
         self.data_dir = self.sub_dir + os.sep + 'data/'
+        # QC products of the steps, rendered inline or recorded for the QC stage
+        self.qc = QCQueue(self.qc_dir, qc_policy)
 
         self.pet_json = pet_json_file
         if self.pet_json is not None:
@@ -108,69 +122,81 @@ class Subject():
         if (Path(self.work_dir+'/sub-'+self.sub+'/ses-02').is_dir()):
             self.frame_duration, self.frame_time_start, self.frame_weight = self.set_frame_times()
 
-    def process(self):
-
-        progress_per_process = int(self.progress[1]/9)
-
-        # Align MRI to PET with Rigid Alignment
-        self.mri2pet()
-
-        current_progress = self.progress[0] + progress_per_process
-        log_progress(current_progress)
-
-        # Align Stereotaxic template to MRI with non-linear SyN transformation
-        self.stx2mri()
-
-        current_progress = current_progress + progress_per_process
-        log_progress(current_progress)
-        # Combine transformations so that we can transform from stereotaxic to PET coord space
-        self.stx2pet_tfm = [self.mri2pet_tfm,self.stx2mri_tfm ]
-        
-        # Apply stx2pet transformation to get a brain mask
-        self.brain = transform(self.coreg_prefix, self.pet, self.mri_str, self.mri2pet_tfm, qc_filename=f'{self.qc_dir}/pet_brain.gif', clobber=self.clobber )
-
-        current_progress = current_progress + progress_per_process
-        log_progress(current_progress)
-
-        # Apply mri2pet transformation to get tumor volume in PET space
-        self.volume_MRI = transform(self.coreg_prefix, self.pet, self.tumor_MRI, self.mri2pet_tfm, interpolator='nearestNeighbor',qc_filename=f'{self.qc_dir}/volume_MRI.gif', clobber=self.clobber )
-
-        current_progress = current_progress + progress_per_process
-        log_progress(current_progress)
-
-        # Apply stx2pet transformation to stereotaxic atlas
-        self.atlas_space_pet = transform(self.coreg_prefix, self.pet, self.atlas_fn, self.stx2pet_tfm, interpolator='nearestNeighbor', qc_filename=f'{self.qc_dir}/atlas_pet_space.gif', clobber=self.clobber )
+    def process(self, threads=None):
+        '''
+        Run the processing steps of the subject, each one as soon as the steps it depends on are done.
+        With a budget of two threads or more, the two registrations run at the same time, each in a
+        process of its own with half of the budget; the MRI resampling runs in this process while
+        the stereotaxic registration goes on.
 
-        current_progress = current_progress + progress_per_process
-        log_progress(current_progress)
+        Inputs:
+            threads: int, thread budget of the subject (default: the ITK thread limit, or all CPUs)
+        '''
+        threads = threads or get_thread_budget()
 
-        # Apply stx2pet transformation to stereotaxic template
-        self.stx_space_pet = transform(self.coreg_prefix, self.pet, self.stx, self.stx2pet_tfm,  qc_filename=f'{self.qc_dir}/template_pet_space.gif', clobber=self.clobber)
+        def step_done(step, n_done, n_steps):
+            log_message(f"  - sub-{self.sub}: {step.name} done ({n_done}/{n_steps})")
+            log_progress(self.progress[0] + int(self.progress[1] * n_done / (n_steps + 1)))
 
-        current_progress = current_progress + progress_per_process
-        log_progress(current_progress)
+        run_steps(self.steps(threads), threads, on_step_done=step_done)
+        # The volumes are loaded again if needed by the group analysis
+        self.volumes.clear()
 
-        # Roi and Ref selection
-        self = region_selection(self)
+        log_progress(int(self.progress[0]+self.progress[1]))
 
-        current_progress = current_progress + progress_per_process
-        log_progress(current_progress)
+    def steps(self, threads):
+        '''
+        Processing steps of the subject, in serial order, with the attributes each one reads and writes.
 
-        # Defining attributes for static and dynamic analysis
-        self.tumor_atlas, self.tumor_label, self.striatum_atlas, self.striatum_label, self.suvr_m = variable_def(self)
+        Inputs:
+            threads: int, thread budget
+        Outputs:
+            steps: list of Step
+        '''
+        # ants.registration holds the GIL and the ITK threads are shared by the whole process: the
+        # registrations only overlap in processes of their own, each with its share of the budget.
+        # The resamplings run in this process, with its ITK threads; the short MRI resampling is counted in
+        # the share of the MRI registration, while the stereotaxic registration goes on.
+        if threads >= 2:
+            mri_threads, stx_threads = threads // 2, threads - threads // 2
+            mri2pet, stx2mri = partial(self.mri2pet, threads=mri_threads), partial(self.stx2mri, threads=stx_threads)
+        else:
+            mri_threads = stx_threads = threads
+            mri2pet, stx2mri = self.mri2pet, self.stx2mri
+        steps = [
+            # Align MRI to PET with Rigid Alignment
+            Step('mri2pet', mri2pet, outputs=('mri_space_pet', 'pet_space_mri', 'mri2pet_tfm', 'pet2mri_tfm'),
+                 threads=mri_threads),
+            # Align Stereotaxic template to MRI with non-linear SyN transformation
+            Step('stx2mri', stx2mri, outputs=('stx_space_mri', 'mri_space_stx', 'stx2mri_tfm', 'mri2stx_tfm'),
+                 threads=stx_threads),
+            # Combine transformations so that we can transform from stereotaxic to PET coord space
+            Step('stx2pet', self.stx2pet, inputs=('mri2pet_tfm', 'stx2mri_tfm'), outputs=('stx2pet_tfm',)),
+            # Apply mri2pet transformation to get a brain mask and the tumor volume in PET space
+            Step('mri2pet_resample', self.mri2pet_resample, inputs=('mri2pet_tfm',), outputs=('brain', 'volume_MRI'),
+                 threads=mri_threads),
+            # Apply stx2pet transformation to stereotaxic atlas and template
+            Step('stx2pet_resample', self.stx2pet_resample, inputs=('stx2pet_tfm',),
+                 outputs=('atlas_space_pet', 'stx_space_pet'), threads=threads),
+            # Roi and Ref selection
+            Step('region_selection', self.select_regions, inputs=('volume_MRI', 'atlas_space_pet'),
+                 outputs=('ref_labels', 'roi_labels')),
+            # Defining attributes for static and dynamic analysis
+            Step('variable_def', self.define_variables,
+                 inputs=('brain', 'volume_MRI', 'atlas_space_pet', 'ref_labels', 'roi_labels'),
+                 outputs=('ref_labels', 'tumor_atlas', 'tumor_label', 'striatum_atlas', 'striatum_label', 'suvr_m')),
+        ]
 
         if (Path(self.work_dir+'/sub-'+self.sub+'/ses-02').is_dir()):
-            # Extract time-activity curves (TACs) from PET image using atlas in PET space 
-            self.tacs = get_tacs(self, self.roi_labels, self.ref_labels ,  self.frame_time_start, self.tacs_csv, self.tacs_qc_plot, self.tacs_sub_regions_qc_plot)
-            current_progress = current_progress + progress_per_process
-            log_progress(current_progress)
-            #Extract Dynamic Parameters from TACs
-            self = get_dynamic_parameters(self, self.regline_plot)
-
-            current_progress = current_progress + progress_per_process
-            log_progress(current_progress)
-
-        log_progress(int(self.progress[0]+self.progress[1]))
+            steps += [
+                # Extract time-activity curves (TACs) from PET image using atlas in PET space
+                Step('tacs', self.extract_tacs,
+                     inputs=('atlas_space_pet', 'ref_labels', 'roi_labels', 'tumor_atlas', 'tumor_label', 'striatum_label'),
+                     outputs=('tacs',)),
+                #Extract Dynamic Parameters from TACs
+                Step('dynamic_parameters', self.dynamic_parameters, inputs=('tacs', 'suvr_m'), outputs=('dy_df',)),
+            ]
+        return steps
 
     def set_frame_times(self):
         frame_duration = np.array(self.pet_header['FrameDuration']).astype(float)
@@ -185,8 +211,49 @@ class Subject():
         nib.Nifti1Image(vol, img.affine).to_filename(self.pet3d)
 
     ### Co-Registration ###
-    def mri2pet(self):
-        self.mri_space_pet, self.pet_space_mri, self.mri2pet_tfm, self.pet2mri_tfm = align(self.pet, self.mri, transform_method='Rigid', outprefix=f'{self.coreg_dir}/sub-{self.sub}_mri2pet_Rigid_', qc_filename = self.mri2pet_qc_gif)
+    def register(self, fx, mv, threads=None, **kwargs):
+        '''
+        align() the images with the registration cache and the QC queue of the subject.
+
+        Inputs:
+            threads: int, run the registration in a process of its own limited to these ITK threads
+                     (None: in this process)
+        Outputs:
+            the file names returned by align()
+        '''
+        if threads is None:
+            return align(fx, mv, cache=self.registration_cache, qc=self.qc, **kwargs)
+        return run_in_process(align, fx, mv, threads=threads, cache=self.registration_cache, qc=self.qc, **kwargs)
+
+    def mri2pet(self, threads=None):
+        self.mri_space_pet, self.pet_space_mri, self.mri2pet_tfm, self.pet2mri_tfm = self.register(self.pet, self.mri, threads=threads, transform_method='Rigid', outprefix=f'{self.coreg_dir}/sub-{self.sub}_mri2pet_Rigid_', qc_filename = self.mri2pet_qc_gif)
+
+    def stx2mri(self, threads=None):
+        self.stx_space_mri, self.mri_space_stx, self.stx2mri_tfm, self.mri2stx_tfm = self.register(self.mri, self.stx, threads=threads, transform_method='SyNAggro', outprefix=f'{self.coreg_dir}/sub-{self.sub}_stx2mri_SyN_', qc_filename = self.stx2mri_qc_gif)
+
+    def stx2pet(self):
+        self.stx2pet_tfm = [self.mri2pet_tfm, self.stx2mri_tfm]
+
+    ### Resampling to PET space ###
+    def mri2pet_resample(self):
+        with TransformSession(self.coreg_prefix, self.pet, self.mri2pet_tfm, clobber=self.clobber, store=self.volumes, qc=self.qc) as session:
+            self.brain = session.transform(self.mri_str, qc_filename=f'{self.qc_dir}/pet_brain.gif')
+            self.volume_MRI = session.transform(self.tumor_MRI, interpolator='nearestNeighbor', qc_filename=f'{self.qc_dir}/volume_MRI.gif')
+
+    def stx2pet_resample(self):
+        with TransformSession(self.coreg_prefix, self.pet, self.stx2pet_tfm, clobber=self.clobber, store=self.volumes, qc=self.qc) as session:
+            self.atlas_space_pet = session.transform(self.atlas_fn, interpolator='nearestNeighbor', qc_filename=f'{self.qc_dir}/atlas_pet_space.gif')
+            self.stx_space_pet = session.transform(self.stx, qc_filename=f'{self.qc_dir}/template_pet_space.gif')
+
+    ### Analysis ###
+    def select_regions(self):
+        region_selection(self)
+
+    def define_variables(self):
+        self.tumor_atlas, self.tumor_label, self.striatum_atlas, self.striatum_label, self.suvr_m = variable_def(self)
+
+    def extract_tacs(self):
+        self.tacs = get_tacs(self, self.roi_labels, self.ref_labels ,  self.frame_time_start, self.tacs_csv, self.tacs_qc_plot, self.tacs_sub_regions_qc_plot)
 
-    def stx2mri(self):
-        self.stx_space_mri, self.mri_space_stx, self.stx2mri_tfm, self.mri2stx_tfm = align(self.mri, self.stx, transform_method='SyNAggro', outprefix=f'{self.coreg_dir}/sub-{self.sub}_stx2mri_SyN_', qc_filename = self.stx2mri_qc_gif)
\ No newline at end of file
+    def dynamic_parameters(self):
+        get_dynamic_parameters(self, self.regline_plot)
@@ -0,0 +1,259 @@
+'''
+Classifier refining the tumour voxels in ref_seg.
+
+The tumour voxels are clustered on their distance and sinus probabilities (KMeans), then an RBF SVM
+chosen by a cross-validated grid search learns the clusters and labels every voxel ('exact', the
+default). The cost of the SVM grows faster than the number of voxels, so the cost of large tumours
+can be bounded on request: the models are fitted on a stratified sample of the voxels
+('subsample'), the RBF kernel is approximated by Nystroem features and a linear SVM
+('approximate'), or the mode is chosen by tumour size ('auto'). The grid search runs in parallel,
+the prediction in batches, and the fitted models are saved in the refinement directory of the
+subject, to be reused while the voxels are unchanged.
+'''
+import os
+import json
+import time
+import hashlib
+import joblib
+import numpy as np
+from sklearn.cluster import KMeans
+from sklearn.svm import SVC, LinearSVC
+from sklearn.pipeline import Pipeline
+from sklearn.kernel_approximation import Nystroem
+from sklearn.model_selection import GridSearchCV
+from pediatric_fdopa_pipeline.scheduler import get_thread_budget
+
+MODES = ('auto', 'exact', 'subsample', 'approximate')
+# Voxels fitted by the exact and subsampled SVM
+MAX_FIT_SAMPLES = 10000
+# Tumours from this size on use the approximate kernel in 'auto' mode
+APPROXIMATE_MIN_VOXELS = 100000
+# Voxels fitted by the approximate kernel, whose cost is linear in the samples
+APPROXIMATE_MAX_SAMPLES = 50000
+NYSTROEM_COMPONENTS = 100
+PREDICT_BATCH = 65536
+MODEL_VERSION = 1
+
+PARAM_GRID = {
+    'C': [0.1, 1, 10, 100],    # Regularization
+    'gamma': [1, 0.1, 0.01, 0.001],  # Kernel Parameter
+}
+
+
+class RefinementSettings():
+
+    def __init__(self, mode='exact', report=False, max_samples=MAX_FIT_SAMPLES, approximate_min_voxels=APPROXIMATE_MIN_VOXELS):
+        '''
+        Inputs:
+            mode:        str, 'exact' (all the voxels, as the original refinement), 'subsample', 'approximate',
+                         or 'auto' (exact up to max_samples voxels, then subsample, then approximate)
+            report:      bool, also fit the exact SVM and write its agreement with the bounded model
+            max_samples: int, voxels fitted by the exact SVM in 'auto' and 'subsample' modes
+            approximate_min_voxels: int, tumour size from which 'auto' uses the approximate kernel
+        '''
+        if mode not in MODES:
+            raise ValueError(f'Unknown refinement mode: {mode} (expected one of {", ".join(MODES)})')
+        self.mode = mode
+        self.report = report
+        self.max_samples = max_samples
+        self.approximate_min_voxels = approximate_min_voxels
+
+    def select_mode(self, n_voxels):
+        '''
+        Inputs:
+            n_voxels: int, number of tumour voxels
+        Outputs:
+            mode: str, 'exact', 'subsample' or 'approximate'
+        '''
+        if self.mode != 'auto':
+            return self.mode
+        if n_voxels <= self.max_samples:
+            return 'exact'
+        return 'approximate' if n_voxels >= self.approximate_min_voxels else 'subsample'
+
+    def fit_size(self, mode, n_voxels):
+        '''Number of voxels fitted in a mode.'''
+        if mode == 'exact':
+            return n_voxels
+        return min(n_voxels, APPROXIMATE_MAX_SAMPLES if mode == 'approximate' else self.max_samples)
+
+
+def stratified_sample(labels, n_samples, seed=42):
+    '''
+    Inputs:
+        labels: 1D array, class of every voxel
+        n_samples: int, size of the sample
+        seed: int, random seed
+    Outputs:
+        index: sorted indices of the sample, every class keeping its share of the voxels
+               (at least the 5 voxels needed by the cross-validation, when it has them)
+    '''
+    if labels.size <= n_samples:
+        return np.arange(labels.size)
+    rng = np.random.default_rng(seed)
+    classes, counts = np.unique(labels, return_counts=True)
+    index = []
+    for c, count in zip(classes, counts):
+        k = min(count, max(5, int(round(n_samples * count / labels.size))))
+        index.append(rng.choice(np.flatnonzero(labels == c), k, replace=False))
+    return np.sort(np.concatenate(index))
+
+
+def predict_batched(model, X, batch_size=PREDICT_BATCH):
+    '''
+    Inputs:
+        model: fitted classifier
+        X: 2D array, features of the voxels
+    Outputs:
+        labels: 1D array, predicted class of every voxel, predicted batch_size voxels at a time
+    '''
+    if len(X) == 0:
+        return np.empty(0, dtype=int)
+    return np.concatenate([model.predict(X[i:i + batch_size]) for i in range(0, len(X), batch_size)])
+
+
+def grid_search(mode, n_jobs, seed=42):
+    '''
+    Inputs:
+        mode: str, 'approximate' for the Nystroem kernel and linear SVM, otherwise the RBF SVM
+        n_jobs: int, parallel fits of the grid search
+    Outputs:
+        search: GridSearchCV over the regularization and kernel parameters, 5-fold cross-validated
+    '''
+    if mode == 'approximate':
+        model = Pipeline([('kernel', Nystroem(kernel='rbf', n_components=NYSTROEM_COMPONENTS, random_state=seed)),
+                          ('svm', LinearSVC(dual=False))])
+        param_grid = {'kernel__gamma': PARAM_GRID['gamma'], 'svm__C': PARAM_GRID['C']}
+    else:
+        model = SVC()
+        param_grid = dict(PARAM_GRID, kernel=['rbf'])
+    return GridSearchCV(model, param_grid, cv=5, n_jobs=n_jobs)
+
+
+def fit_kmeans(X, seed=42):
+    '''
+    Outputs:
+        kmeans: KMeans fitted on the voxels X, two clusters
+    '''
+    return KMeans(n_clusters=2, init='k-means++', n_init=10, random_state=seed).fit(X)
+
+
+def agreement(X, labels_a, labels_b):
+    '''
+    Inputs:
+        X: 2D array, features of the tumour voxels, the distance first
+        labels_a, labels_b: 1D arrays, two labelings of the voxels
+    Outputs:
+        agreement: float, fraction of the voxels on which the classes of highest mean distance agree
+    '''
+    if len(X) == 0:
+        return 1.0
+    return float(np.mean(_farthest_class(X, labels_a) == _farthest_class(X, labels_b)))
+
+
+def _farthest_class(X, labels):
+    classes = np.unique(labels)
+    farthest = classes[np.argmax([X[labels == c, 0].mean() for c in classes])]
+    return labels == farthest
+
+
+def model_key(X, mode, n_fit):
+    '''Hash of the voxel features and of the fitting parameters, identifying a fitted model.'''
+    sha = hashlib.sha256(f'v{MODEL_VERSION}:{mode}:{n_fit}:{X.shape}'.encode())
+    sha.update(np.ascontiguousarray(X, dtype=np.float64).tobytes())
+    return sha.hexdigest()
+
+
+def refine_tumor(X, settings=None, model_file=None, report_file=None, n_jobs=None, seed=42):
+    '''
+    Cluster the tumour voxels and label them with the SVM learning the clusters.
+
+    Inputs:
+        X: 2D array, (distance, sinus) features of the tumour voxels
+        settings: RefinementSettings (default: 'exact' mode)
+        model_file: str, file caching the fitted models (None disables the cache)
+        report_file: str, JSON agreement report with the exact SVM, written if settings.report
+        n_jobs: int, parallel fits of the grid search (default: thread budget of the subject)
+        seed: int, random seed of the clustering and sampling
+    Outputs:
+        cluster_labels: 1D array, KMeans cluster of every voxel
+        svm_labels: 1D array, SVM class of every voxel
+    '''
+    settings = settings or RefinementSettings()
+    n_jobs = n_jobs or get_thread_budget()
+    X = np.asarray(X, dtype=np.float64)
+    mode = settings.select_mode(len(X))
+    n_fit = settings.fit_size(mode, len(X))
+    print(f'\t\tTumour refinement: {len(X)} voxels, {mode} mode, fitted on {n_fit} voxels')
+
+    key = model_key(X, mode, n_fit)
+    models = None
+    if model_file is not None and os.path.exists(model_file):
+        try:
+            models = joblib.load(model_file)
+        except Exception:
+            models = None
+        if models is not None and models.get('key') != key:
+            models = None
+
+    start = time.perf_counter()
+    if models is None:
+        ### K-means ###
+        if n_fit < len(X):
+            kmeans = fit_kmeans(X[np.sort(np.random.default_rng(seed).choice(len(X), n_fit, replace=False))], seed)
+        else:
+            kmeans = fit_kmeans(X, seed)
+        cluster_labels = predict_batched(kmeans, X)
+
+        ### SVM ###
+        sample = stratified_sample(cluster_labels, n_fit, seed)
+        search = grid_search(mode, n_jobs, seed)
+        search.fit(X[sample], cluster_labels[sample])
+        models = {'key': key, 'mode': mode, 'kmeans': kmeans, 'svm': search.best_estimator_, 'params': search.best_params_}
+        if model_file is not None:
+            joblib.dump(models, model_file)
+    else:
+        cluster_labels = predict_batched(models['kmeans'], X)
+    svm_labels = predict_batched(models['svm'], X)
+    fit_seconds = time.perf_counter() - start
+
+    if settings.report and report_file is not None:
+        write_agreement_report(report_file, X, cluster_labels, svm_labels, models, fit_seconds, n_fit, n_jobs, seed)
+
+    return cluster_labels, svm_labels
+
+
+def write_agreement_report(report_file, X, cluster_labels, svm_labels, models, fit_seconds, n_fit, n_jobs, seed=42):
+    '''
+    Run the exact refinement (KMeans and SVM fitted on all the voxels) and write its agreement with
+    the labels of the bounded model. As in ref_seg, the classes are compared by their mean distance.
+
+    Inputs:
+        report_file: str, JSON file
+        X: 2D array, features of the tumour voxels
+        cluster_labels: 1D array, KMeans clusters of the bounded model
+        svm_labels: 1D array, labels of the bounded model
+        models: dict, fitted models of the bounded refinement
+        fit_seconds: float, time of the bounded refinement
+        n_fit: int, voxels fitted by the bounded model
+        n_jobs: int, parallel fits of the grid search
+        seed: int, random seed of the clustering
+    '''
+    start = time.perf_counter()
+    exact_clusters = predict_batched(fit_kmeans(X, seed), X)
+    exact = grid_search('exact', n_jobs).fit(X, exact_clusters)
+    exact_labels = predict_batched(exact.best_estimator_, X)
+    report = {
+        'n_voxels': len(X),
+        'mode': models['mode'],
+        'n_fit': int(n_fit),
+        'params': {k: float(v) if isinstance(v, (int, float)) else v for k, v in models['params'].items()},
+        'seconds': round(fit_seconds, 3),
+        'exact_params': {k: float(v) if isinstance(v, (int, float)) else v for k, v in exact.best_params_.items()},
+        'exact_seconds': round(time.perf_counter() - start, 3),
+        'cluster_agreement': agreement(X, exact_clusters, cluster_labels),
+        'agreement': agreement(X, exact_labels, svm_labels),
+    }
+    with open(report_file, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f'\t\tTumour refinement agreement with the exact SVM: {100 * report["agreement"]:.2f}%')
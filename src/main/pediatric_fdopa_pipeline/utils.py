@@ -13,9 +13,12 @@ import skimage.transform as skTrans
 import csv
 from skimage.morphology import dilation, erosion
 from scipy.stats import linregress
-from pediatric_fdopa_pipeline.qc import ImageParam
-from pediatric_fdopa_pipeline.analysis import get_stats_for_labels,get_H_Uptake_lab, get_M_Uptake_lab, get_L_Uptake_lab
+from pediatric_fdopa_pipeline.qc import render_gif
+from pediatric_fdopa_pipeline.qc_stage import QCQueue
+from pediatric_fdopa_pipeline.analysis import get_stats_for_labels, get_uptake_sub_regions
+from pediatric_fdopa_pipeline.label_stats import label_dtype
 from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from sys import argv
 from glob import glob
@@ -23,6 +26,53 @@ import seaborn
 
 ### Utility functions
 
+_progress_handler = None
+
+def get_region_tacs(frames, masks, labels, times):
+    '''
+    Mean and standard deviation of every region in every frame.
+
+    The voxels of all the regions are gathered from each frame of the 4D PET, read one at a time,
+    into one (frames, region voxels) matrix; the statistics of all the regions and frames are then
+    reduced from it at once. Only the voxels of the regions are kept in memory, not the 4D PET.
+
+    Inputs:
+        frames: iterable of 3D PET frames (e.g. VolumeStore.frames)
+        masks: list of boolean 3D volumes, one per region
+        labels: list, region label of each mask
+        times: initial time frames (seconds)
+    Outputs:
+        df: time, frame, region, value and std of each (region, frame); empty regions and frames with
+            only zero voxels have value and std 0
+    '''
+    # Voxel indices of each region, computed once for all the frames, regions one after the other
+    indices = [np.flatnonzero(mask) for mask in masks]
+    counts = np.array([len(index) for index in indices])
+    voxels = np.concatenate(indices) if indices else np.empty(0, dtype=int)
+    rows = [np.ravel(frame)[voxels] for frame in frames]
+    n_frames = len(rows)
+    tacs = np.array(rows, dtype=np.float64).reshape(n_frames, len(voxels))
+
+    value = np.zeros((n_frames, len(masks)))
+    std = np.zeros((n_frames, len(masks)))
+    filled = counts > 0
+    if n_frames and np.any(filled):
+        starts = (np.cumsum(counts) - counts)[filled]
+        n = counts[filled]
+        mean = np.add.reduceat(tacs, starts, axis=1) / n
+        deviation = tacs - np.repeat(mean, n, axis=1)
+        active = np.add.reduceat(np.abs(tacs), starts, axis=1) > 0
+        value[:, filled] = np.where(active, mean, 0)
+        std[:, filled] = np.where(active, np.sqrt(np.add.reduceat(deviation * deviation, starts, axis=1) / n), 0)
+
+    n_rows = len(labels) * n_frames
+    return pd.DataFrame({'time': np.tile(np.asarray(times)[:n_frames], len(labels)),
+                         'frame': np.tile(np.arange(n_frames), len(labels)),
+                         'region': np.repeat(np.asarray(labels), n_frames),
+                         'value': value.T.ravel(),
+                         'std': std.T.ravel()},
+                        index=np.zeros(n_rows, dtype=int))
+
 def get_tacs(subj, roi, ref, times, tac_csv, qc_png= None, qc_sub_region_png = None, clobber= False):
 
     '''
@@ -44,14 +94,10 @@ def get_tacs(subj, roi, ref, times, tac_csv, qc_png= None, qc_sub_region_png = N
     df_sub_r = pd.DataFrame({'frame':[], 'label':[],'region':[], 'value':[],'std':[]})
     
     ### Variables for Dynamic analysis ### 
-    img = nib.load(subj.pet4d)
-    vol_4d = img.get_fdata()
-    
-    pet_hd = nib.load(subj.pet)
-    pet_3d = pet_hd.get_fdata()
+    pet_3d = subj.volumes.intensities(subj.pet)
     
-    atlas_hd = nib.load(subj.atlas_space_pet)
-    atlas_vol = np.rint(atlas_hd.get_fdata()).astype(int)
+    atlas_hd = subj.volumes.image(subj.atlas_space_pet)
+    atlas_vol = subj.volumes.labels(subj.atlas_space_pet)
 
     tumor_avg, _, t_std, _ = get_stats_for_labels(pet_3d, subj.tumor_atlas, [subj.tumor_label])
     
@@ -68,162 +114,145 @@ def get_tacs(subj, roi, ref, times, tac_csv, qc_png= None, qc_sub_region_png = N
     print('\t\tTAC QC:', qc_png)
     print()
 
-    clobber=True
-    if not os.path.exists(tac_csv) or clobber :
-
-        rows = []
-        rows_sub_r = []
-    
     for label in all_lab:
+        assert np.sum(subj.tumor_atlas == label) > 0 or np.sum(subj.striatum_atlas == label) > 0  , f'Error: could not find {label} in atlas'
 
-           for frame in range(vol_4d.shape[3]) :
-
-               pet_frame = vol_4d[:,:,:,frame]
-               assert np.sum(subj.tumor_atlas == label) > 0 or np.sum(subj.striatum_atlas == label) > 0  , f'Error: could not find {label} in atlas'
+    masks = [subj.tumor_atlas == label if label == subj.tumor_label else subj.striatum_atlas == label for label in all_lab]
 
-               if label == subj.tumor_label:
-                   values = pet_frame[subj.tumor_atlas == label]
-               else:
-                   values = pet_frame[subj.striatum_atlas == label]
+    # calculating atlases for tumor sub-regions
+    sub_region_vol, all_new_lab = get_uptake_sub_regions(subj.striatum_atlas, tumor_avg, t_std, pet_3d, subj.tumor_atlas, subj.tumor_label)
+    sub_region_masks = []
+    if((np.any(sub_region_vol == 1))):
+        sub_region_masks = [sub_region_vol == l for l in (1, 2, 3)]
+        for l in range(0, 3):
+            assert np.any(sub_region_masks[l]), f'Error: could not find {all_new_lab[l]} in atlas'
 
-               if np.sum(np.abs(values)) > 0 :
-                   avg = np.mean(values)
-                   dev = np.std(values)
-               else:
-                    avg=0
-                    dev = 0
-                    
-               new_row = pd.DataFrame({'time':[times[frame]],'frame':[frame], 'region':[label], 'value':[avg],'std':[dev]})
-               rows.append(new_row)
-             
-    df = pd.concat(rows)
+    # The regions and tumor sub-regions TACs are extracted in one pass over the frames of the 4D PET;
+    # without a QC plot, the TACs of the regions are read back from tac_csv instead
+    extract_regions = type(qc_png) == str
+    region_labels = (all_lab if extract_regions else []) + (all_new_lab if sub_region_masks else [])
+    region_masks = (masks if extract_regions else []) + sub_region_masks
+    all_tacs = get_region_tacs(subj.volumes.frames(subj.pet4d), region_masks, region_labels, times) if region_masks else None
+    n_rows = len(all_tacs) // len(region_labels) * len(all_lab) if extract_regions else 0
 
     # Plotting TAC of the tumor lesion, the controlateral striatum and the controlateral cerebral white matter
     if type(qc_png) == str :
-        plt.figure()
-        plt.title('Time Activity Curves')
-        cmap = seaborn.color_palette(palette = "colorblind", n_colors = 3)
-        for idx, l in enumerate(all_lab):
-            time = df['time'][df['region'] == l].to_numpy()
-            value = df['value'][df['region'] == l].to_numpy()
-            std = df['std'][df['region'] == l].to_numpy()
-
-            if l == 2:
-                legend = 'Left Cortical White Matter'
-            elif l == 41:
-                legend = 'Right Cortical White Matter'
-            elif l == subj.striatum_label:
-                if subj.roi_labels[0] == 11:
-                    legend = 'Left Striatum'
-                else:
-                    legend = 'Right Striatum'
-            elif l == 12:
-                legend = 'Left Putamen'
-            elif l == 47:
-                legend = 'Right Cerebellum White Matter'
-            else:
-                legend = 'Tumor'
-            
-            
-            plt.plot(time, value,label = legend, color = cmap[idx])
-            plt.fill_between(time, value-std, value+std, alpha=0.1)
-            
-        plt.legend(loc= 'lower right')
-        plt.xlabel('Time [s]')
-        plt.ylabel('Value [Bq/ml]')
-        plt.savefig(qc_png, dpi = 600)
-        plt.close()
-            
+        df = all_tacs.iloc[:n_rows]
         df.to_csv(tac_csv)
+        subj.qc.submit(plot_tacs, tac_csv=tac_csv, labels=[int(l) for l in all_lab],
+                       legends=[tac_legend(subj, l) for l in all_lab], qc_png=qc_png)
 
     else :
         df = pd.read_csv(tac_csv)
 
-    # calculating atlases for tumor sub-regions
-    H_atlas_vol, HU_label = get_H_Uptake_lab(subj.striatum_atlas, tumor_avg, t_std, pet_3d, subj.tumor_atlas, subj.tumor_label)
-    M_atlas_vol, MU_label = get_M_Uptake_lab(subj.striatum_atlas, tumor_avg, t_std, pet_3d, subj.tumor_atlas, subj.tumor_label)
-    L_atlas_vol, LU_label = get_L_Uptake_lab(subj.striatum_atlas, tumor_avg, t_std, pet_3d, subj.tumor_atlas, subj.tumor_label)
-    all_new_lab = [HU_label, MU_label, LU_label]
-
-    if((np.any(H_atlas_vol == HU_label))):
+    if sub_region_masks:
 
         subj.bool_flag = True
         # These variables will be called in pediatric_fdopa_pipeline.py
-        tumor_voxel = np.shape(pet_3d[subj.tumor_atlas == subj.tumor_label])[0]
-        H_tumor_voxel = np.shape(pet_3d[H_atlas_vol == HU_label])[0]
+        tumor_voxel = np.count_nonzero(subj.tumor_atlas == subj.tumor_label)
+        H_tumor_voxel = np.count_nonzero(sub_region_masks[0])
 
         subj.tum_percentage = np.round((H_tumor_voxel / tumor_voxel) *100,3)
     
-        AT = np.zeros((*pet_3d.shape, 3))
-        AT[:,:,:,0] = H_atlas_vol
-        AT[:,:,:,1] = M_atlas_vol
-        AT[:,:,:,2] = L_atlas_vol
-    
-        for l in range(0, 3):
-            for frame in range(vol_4d.shape[3]) :
-                pet_frame = vol_4d[:,:,:,frame]
-                assert np.sum(AT[:,:,:,l] == all_new_lab[l]) > 0, f'Error: could not find {all_new_lab[l]} in atlas'
-                values = pet_frame[AT[:,:,:,l] == all_new_lab[l]]
-                if np.sum(np.abs(values)) > 0 :
-                    avg = np.mean(values)
-                    dev = np.std(values)
-                else:
-                    avg=0
-                    dev = 0
-            
-                new_row_sub_r = pd.DataFrame({'time':[times[frame]],'frame':[frame], 'region':[all_new_lab[l]], 'value':[avg],'std':[dev]})
-                rows_sub_r.append(new_row_sub_r)
-            
-        df_sub_r = pd.concat(rows_sub_r)
+        df_sub_r = all_tacs.iloc[n_rows:]
         df_sub_r.to_csv(subj.tacs_sub_regions_csv)
 
         #plotting the TACs of tumor sub-regions vs the mean of the tumor region
         if type(qc_sub_region_png) == str:
-            plt.figure()
-            plt.title('Tumor TAC vs tumor sub-regions TACs')
-            cmap = seaborn.color_palette(palette = "colorblind", n_colors = 10)
-            time = df['time'][df['region'] == subj.tumor_label].to_numpy()
-            value = df['value'][df['region'] == subj.tumor_label].to_numpy()
-            std = df['std'][df['region'] == subj.tumor_label].to_numpy()
-            color = [cmap[3], cmap[1], cmap[2]]
-        
-            for l in range(0, 3):
-                value_sub_r = df_sub_r['value'][df_sub_r['region'] == all_new_lab[l]].to_numpy()
-                std_sub_r = df_sub_r['std'][df_sub_r['region'] == all_new_lab[l]].to_numpy()
-                if all_new_lab[l] == HU_label:
-                    legend1 = 'Highest Uptake Tumor'
-                elif all_new_lab[l] == MU_label:
-                    legend1 = 'Mid Uptake Tumor'
-                else:
-                    legend1 = 'Lowest Uptake Tumor'
-                
-                plt.plot(time, value_sub_r,color = color[l], label = legend1)
-                plt.fill_between(time, value_sub_r-std_sub_r, value_sub_r+std_sub_r, color = color[l], alpha=0.1)
-            
-            legend = 'Tumor'
-            plt.plot(time, value,label = legend, color = cmap[0])
-            plt.fill_between(time, value-std, value+std, alpha=0.1)
-                
-        
-            plt.legend(loc= 'lower right')
-            plt.xlabel('Time [s]')
-            plt.ylabel('Value [Bq/ml]')
-            plt.savefig(subj.tacs_sub_regions_qc_plot, dpi = 600)
-            plt.close()
-
-        # saving the three masks as Nifti volumes
-        H_atlas_vol[H_atlas_vol != HU_label] = 0
-        M_atlas_vol[M_atlas_vol != MU_label] = 0
-        L_atlas_vol[L_atlas_vol != LU_label] = 0
-        
-        nib.Nifti1Image(H_atlas_vol, atlas_hd.affine , header = atlas_hd.header).to_filename(subj.prefix+'H_tumor_atlas.nii.gz')
-        nib.Nifti1Image(M_atlas_vol, atlas_hd.affine , header = atlas_hd.header).to_filename(subj.prefix+'M_tumor_atlas.nii.gz')
-        nib.Nifti1Image(L_atlas_vol, atlas_hd.affine , header = atlas_hd.header).to_filename(subj.prefix+'L_tumor_atlas.nii.gz')
+            subj.qc.submit(plot_sub_region_tacs, tac_csv=tac_csv, sub_regions_csv=subj.tacs_sub_regions_csv,
+                           tumor_label=int(subj.tumor_label), sub_labels=[int(l) for l in all_new_lab],
+                           qc_png=subj.tacs_sub_regions_qc_plot)
+
+        # saving the three masks as Nifti volumes, each with the label of its sub-region
+        for mask, sub_label, name in zip(sub_region_masks, all_new_lab, ['H', 'M', 'L']):
+            sub_atlas_vol = np.zeros(mask.shape, dtype=label_dtype(0, sub_label))
+            sub_atlas_vol[mask] = sub_label
+            nib.Nifti1Image(sub_atlas_vol, atlas_hd.affine , header = atlas_hd.header, dtype = sub_atlas_vol.dtype).to_filename(subj.prefix+name+'_tumor_atlas.nii.gz')
     else:
         subj.bool_flag = False
         
     return df
 
+def tac_legend(subj, l):
+    '''Legend of the TAC of a region in the TAC plot.'''
+    if l == 2:
+        return 'Left Cortical White Matter'
+    elif l == 41:
+        return 'Right Cortical White Matter'
+    elif l == subj.striatum_label:
+        if subj.roi_labels[0] == 11:
+            return 'Left Striatum'
+        else:
+            return 'Right Striatum'
+    elif l == 12:
+        return 'Left Putamen'
+    elif l == 47:
+        return 'Right Cerebellum White Matter'
+    else:
+        return 'Tumor'
+
+def plot_tacs(tac_csv, labels, legends, qc_png):
+    '''
+    Inputs:
+        tac_csv: csv file of the TACs written by get_tacs
+        labels: list, regions plotted
+        legends: list, legend of each region
+        qc_png: TAC image
+    '''
+    df = pd.read_csv(tac_csv)
+    plt.figure()
+    plt.title('Time Activity Curves')
+    cmap = seaborn.color_palette(palette = "colorblind", n_colors = 3)
+    for idx, (l, legend) in enumerate(zip(labels, legends)):
+        time = df['time'][df['region'] == l].to_numpy()
+        value = df['value'][df['region'] == l].to_numpy()
+        std = df['std'][df['region'] == l].to_numpy()
+        
+        plt.plot(time, value,label = legend, color = cmap[idx])
+        plt.fill_between(time, value-std, value+std, alpha=0.1)
+        
+    plt.legend(loc= 'lower right')
+    plt.xlabel('Time [s]')
+    plt.ylabel('Value [Bq/ml]')
+    plt.savefig(qc_png, dpi = 600)
+    plt.close()
+
+def plot_sub_region_tacs(tac_csv, sub_regions_csv, tumor_label, sub_labels, qc_png):
+    '''
+    Inputs:
+        tac_csv: csv file of the TACs written by get_tacs
+        sub_regions_csv: csv file of the TACs of the tumor sub-regions
+        tumor_label: int, label of the tumor
+        sub_labels: list, labels of the highest, mid and lowest uptake sub-regions
+        qc_png: TAC sub regions image
+    '''
+    df = pd.read_csv(tac_csv)
+    df_sub_r = pd.read_csv(sub_regions_csv)
+    plt.figure()
+    plt.title('Tumor TAC vs tumor sub-regions TACs')
+    cmap = seaborn.color_palette(palette = "colorblind", n_colors = 10)
+    time = df['time'][df['region'] == tumor_label].to_numpy()
+    value = df['value'][df['region'] == tumor_label].to_numpy()
+    std = df['std'][df['region'] == tumor_label].to_numpy()
+    color = [cmap[3], cmap[1], cmap[2]]
+
+    for l, legend1 in zip(range(0, 3), ['Highest Uptake Tumor', 'Mid Uptake Tumor', 'Lowest Uptake Tumor']):
+        value_sub_r = df_sub_r['value'][df_sub_r['region'] == sub_labels[l]].to_numpy()
+        std_sub_r = df_sub_r['std'][df_sub_r['region'] == sub_labels[l]].to_numpy()
+        
+        plt.plot(time, value_sub_r,color = color[l], label = legend1)
+        plt.fill_between(time, value_sub_r-std_sub_r, value_sub_r+std_sub_r, color = color[l], alpha=0.1)
+    
+    legend = 'Tumor'
+    plt.plot(time, value,label = legend, color = cmap[0])
+    plt.fill_between(time, value-std, value+std, alpha=0.1)
+
+    plt.legend(loc= 'lower right')
+    plt.xlabel('Time [s]')
+    plt.ylabel('Value [Bq/ml]')
+    plt.savefig(qc_png, dpi = 600)
+    plt.close()
+
 def get_dynamic_parameters(subject, qc_png=None):
 
     '''
@@ -269,36 +298,53 @@ def get_dynamic_parameters(subject, qc_png=None):
         
         DSR = slopeT/slopeS
 
-        plt.figure()
-        plt.title('Subject '+ str(subject.sub) + ' Regression line')
-        cmap = seaborn.color_palette(palette = "colorblind", n_colors = 10)
-        plt.scatter(t, tum,label = 'Tumor',s = 15, color = cmap[0])
-        plt.plot(t, tum,color = cmap[0], linewidth = 1.5)
-        plt.scatter(t[int(index_1[0])], reg_line[0], color = cmap[1],s = 15)
-        plt.scatter(t[index_l], reg_line[-1], color = cmap[1],s = 15)
-        plt.plot(t[int(index_1[0]):(index_l+1)], reg_line , color = cmap[1],ls='--', label = 'Regression Line Tumor',linewidth = 1.5)
-
-        plt.scatter(t, striatum, color = cmap[2],label = 'Striatum',s = 15)
-        plt.plot(t, striatum,color = cmap[2],linewidth = 1.5)
-        plt.scatter(t[int(index_1[0])], reg_line_s[0], color = cmap[3],s = 15)
-        plt.scatter(t[index_l], reg_line_s[-1], color = cmap[3],s = 15)
-        plt.plot(t[int(index_1[0]):(index_l+1)], reg_line_s , color = cmap[3],ls='--', label = 'Regression Line Striatum',linewidth = 1.5)
-
-        plt.legend(loc = 'lower right')
-        plt.xlabel('Time [s]')
-        plt.ylabel('Value [Bq/ml]')
-        plt.savefig(qc_png, dpi = 600)
-        plt.close()
-    
         dyn_dict = {'Subject':[subject.sub],'TTP':[TTP], 'Slope_Tumor':[slopeT],'Slope_Striatum':[slopeS], 'DSR':[DSR]}
         subject.dy_df = pd.DataFrame(dyn_dict)    
         subject.dy_df.to_csv(subject.dyn_csv, index=False)
 
+        # Drawn by the QC stage once the parameters are written
+        subject.qc.submit(plot_regression, sub=str(subject.sub), t=t.tolist(), tum=tum.tolist(), striatum=striatum.tolist(),
+                          index_1=int(index_1[0]), index_l=int(index_l), reg_line=reg_line.tolist(), reg_line_s=reg_line_s.tolist(),
+                          qc_png=qc_png)
+
     else :
         subject.dy_df = pd.read_csv(subject.dyn_csv)
 
     return subject
 
+def plot_regression(sub, t, tum, striatum, index_1, index_l, reg_line, reg_line_s, qc_png):
+    '''
+    Inputs:
+        sub: str, subject id
+        t: list, initial time frames (seconds)
+        tum, striatum: list, tumour and striatum TACs
+        index_1, index_l: int, first and last frames of the regression
+        reg_line, reg_line_s: list, tumour and striatum regression lines over these frames
+        qc_png: regression line image
+    '''
+    t, tum, striatum = np.asarray(t), np.asarray(tum), np.asarray(striatum)
+    reg_line, reg_line_s = np.asarray(reg_line), np.asarray(reg_line_s)
+    plt.figure()
+    plt.title('Subject '+ str(sub) + ' Regression line')
+    cmap = seaborn.color_palette(palette = "colorblind", n_colors = 10)
+    plt.scatter(t, tum,label = 'Tumor',s = 15, color = cmap[0])
+    plt.plot(t, tum,color = cmap[0], linewidth = 1.5)
+    plt.scatter(t[index_1], reg_line[0], color = cmap[1],s = 15)
+    plt.scatter(t[index_l], reg_line[-1], color = cmap[1],s = 15)
+    plt.plot(t[index_1:(index_l+1)], reg_line , color = cmap[1],ls='--', label = 'Regression Line Tumor',linewidth = 1.5)
+
+    plt.scatter(t, striatum, color = cmap[2],label = 'Striatum',s = 15)
+    plt.plot(t, striatum,color = cmap[2],linewidth = 1.5)
+    plt.scatter(t[index_1], reg_line_s[0], color = cmap[3],s = 15)
+    plt.scatter(t[index_l], reg_line_s[-1], color = cmap[3],s = 15)
+    plt.plot(t[index_1:(index_l+1)], reg_line_s , color = cmap[3],ls='--', label = 'Regression Line Striatum',linewidth = 1.5)
+
+    plt.legend(loc = 'lower right')
+    plt.xlabel('Time [s]')
+    plt.ylabel('Value [Bq/ml]')
+    plt.savefig(qc_png, dpi = 600)
+    plt.close()
+
 def get_file(data_dir, string):
     
     lst = list(Path(data_dir).rglob(string))
@@ -310,29 +356,88 @@ def get_file(data_dir, string):
         print(lst)
         exit(1)
 
-def transform(prefix, fx, mv, tfm, interpolator='linear', qc_filename=None, clobber=False):
-    print('\tTransforming')
-    print('\t\tFixed',fx)
-    print('\t\tMoving',mv)
-    print('\t\tTransformations:', tfm)
-    print('\t\tQC:', qc_filename)
-    print()
-    
-    out_fn = prefix +  re.sub('.nii.gz','_rsl.nii.gz', os.path.basename(mv))
-    if not os.path.exists(out_fn) or clobber :
-        img_rsl = ants.apply_transforms(fixed= ants.image_read(fx), 
-                                        moving=ants.image_read(mv), 
-                                        transformlist=tfm,
-                                        interpolator=interpolator,
-                                        verbose=True
-                                        )
+class TransformSession():
+
+    def __init__(self, prefix, fx, tfm, clobber=False, store=None, qc=None):
+        '''
+        Apply one transformation chain to several moving images.
+
+        The fixed image is read once for all the images, and every output is written (and its QC
+        animation submitted) in a background thread while the next image is being resampled.
+
+        Inputs:
+            prefix:  str, prefix of the output files
+            fx:      str, fixed image defining the output space
+            tfm:     str or list, transformation chain passed to ants.apply_transforms
+            clobber: bool, overwrite
+            store:   VolumeStore, receives the resampled arrays so that they are not read back
+            qc:      QCQueue rendering the QC animations (default: rendered inline)
+        '''
+        self.prefix = prefix
+        self.fx = fx
+        self.tfm = [tfm] if type(tfm) == str else list(tfm)
+        self.clobber = clobber
+        self.store = store
+        self.qc = qc or QCQueue()
+        self.fixed = None
+        self.writer = ThreadPoolExecutor(max_workers=1)
+        self.pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def transform(self, mv, interpolator='linear', qc_filename=None):
+        '''
+        Inputs:
+            mv: str, moving image
+            interpolator: str, ANTs interpolator of this image
+            qc_filename: str, QC animation of the output over the fixed image
+        Outputs:
+            out_fn: str, moving image resampled in the fixed space (written when the session is closed)
+        '''
+        print('\tTransforming')
+        print('\t\tFixed',self.fx)
+        print('\t\tMoving',mv)
+        print('\t\tTransformations:', self.tfm)
+        print('\t\tQC:', qc_filename)
+        print()
+
+        out_fn = self.prefix +  re.sub('.nii.gz','_rsl.nii.gz', os.path.basename(mv))
+        if not os.path.exists(out_fn) or self.clobber :
+            if self.fixed is None :
+                self.fixed = ants.image_read(self.fx)
+            img_rsl = ants.apply_transforms(fixed= self.fixed, 
+                                            moving=ants.image_read(mv), 
+                                            transformlist=self.tfm,
+                                            interpolator=interpolator,
+                                            verbose=True
+                                            )
+            if self.store is not None :
+                self.store.put(out_fn, img_rsl.numpy())
+            self.pending.append(self.writer.submit(self._write, img_rsl, out_fn, qc_filename))
+        return out_fn
+
+    def _write(self, img_rsl, out_fn, qc_filename):
         ants.image_write( img_rsl, out_fn )
         
         if type(qc_filename) == str :
-            ImageParam(fx, qc_filename, out_fn, duration=600,  nframes=15, dpi=200, alpha=[0.4]   ).volume2gif()
-    return out_fn
+            self.qc.submit(render_gif, in_fn=self.fx, out_fn=qc_filename, overlay_fn=out_fn, duration=600,  nframes=15, dpi=200, alpha=[0.4])
 
-def align(fx, mv, transform_method='SyNAggro', init=[], outprefix='', qc_filename=None) :
+    def close(self):
+        '''Wait for the outputs to be written; raises the first write error.'''
+        self.writer.shutdown(wait=True)
+        pending, self.pending = self.pending, []
+        for future in pending:
+            future.result()
+
+def transform(prefix, fx, mv, tfm, interpolator='linear', qc_filename=None, clobber=False, qc=None):
+    with TransformSession(prefix, fx, tfm, clobber=clobber, qc=qc) as session:
+        return session.transform(mv, interpolator=interpolator, qc_filename=qc_filename)
+
+def align(fx, mv, transform_method='SyNAggro', init=[], outprefix='', qc_filename=None, cache=None, qc=None) :
    
     warpedmovout =  outprefix + 'fwd.nii.gz'
     warpedfixout =  outprefix + 'inv.nii.gz'
@@ -343,19 +448,28 @@ def align(fx, mv, transform_method='SyNAggro', init=[], outprefix='', qc_filenam
     print(f'\t\tQC: {qc_filename}\n')
     output_files = warpedmovout, warpedfixout, fwdtransforms, invtransforms
     if False in [os.path.exists(fn) for fn in output_files ] :
-        out = ants.registration(fixed = ants.image_read(fx), 
-                                moving = ants.image_read(mv), 
-                                type_of_transform = transform_method, 
-                                init=init,
-                                verbose=True,
-                                outprefix=outprefix,
-                                write_composite_transform=True
-                                )
-        ants.image_write(out['warpedmovout'], warpedmovout)
-        ants.image_write(out['warpedfixout'], warpedfixout)
+        # Registrations of unchanged images are reused from previous runs of the workspace
+        registration_kwargs = dict(type_of_transform = transform_method, 
+                                   init=init,
+                                   verbose=True,
+                                   outprefix=outprefix,
+                                   write_composite_transform=True
+                                   )
+        key = cache.key(fx, mv, registration_kwargs, ants.__version__) if cache is not None else None
+        if key is not None and cache.fetch(key, output_files) :
+            print(f'\t\tReusing cached registration {key[:12]}\n')
+        else :
+            out = ants.registration(fixed = ants.image_read(fx), 
+                                    moving = ants.image_read(mv), 
+                                    **registration_kwargs
+                                    )
+            ants.image_write(out['warpedmovout'], warpedmovout)
+            ants.image_write(out['warpedfixout'], warpedfixout)
+            if key is not None :
+                cache.store(key, output_files)
         
         if type(qc_filename) == str :
-            ImageParam(fx, qc_filename, warpedmovout, duration=600,  nframes=15, dpi=200, alpha=[0.3],  edge_2=1, cmap1=plt.cm.Greys, cmap2=plt.cm.Reds ).volume2gif()
+            (qc or QCQueue()).submit(render_gif, in_fn=fx, out_fn=qc_filename, overlay_fn=warpedmovout, duration=600,  nframes=15, dpi=200, alpha=[0.3],  edge_2=1, cmap1='Greys', cmap2='Reds')
 
     return output_files
 
@@ -367,7 +481,15 @@ def log_error(message):
     """Stampa un messaggio di errore che verrà catturato dal processo padre."""
     print(f"ERROR: {message}", flush=True)
 
+def set_progress_handler(handler):
+    """Redirect log_progress to handler(current, total), e.g. from a worker process; None restores printing."""
+    global _progress_handler
+    _progress_handler = handler
+
 def log_progress(current, total = 100):
     """Stampa informazioni di progresso."""
+    if _progress_handler is not None:
+        _progress_handler(current, total)
+        return
     print(f"PROGRESS: {int(current)}/{total}", flush=True)
 
@@ -0,0 +1,177 @@
+'''
+Per-subject store of the volumes read by the analysis steps.
+
+Every file is loaded and decompressed once, in the dtype of its role (float32 images, float64 PET
+intensities for the statistics, label volumes in the smallest integer dtype holding their labels,
+read without a float64 copy), and the same array is handed to every function reading it. Steps
+that produce a volume (e.g. the resampling to PET space) can put the array in the store, so the
+next step does not read the file back. Stored arrays are read-only: callers that edit a volume
+work on a copy.
+
+4D images are not stored: frames() streams them one frame at a time, so the memory used by a
+dynamic PET does not grow with its number of frames. The PET intensities and frames are scaled in
+float64 as by get_fdata, so the TACs and SUVr do not depend on the way the file is read.
+'''
+import threading
+import numpy as np
+import nibabel as nib
+from nibabel.arrayproxy import ArrayProxy
+from nibabel.volumeutils import apply_read_scaling
+from pediatric_fdopa_pipeline.label_stats import LabelIndex, compact_labels
+
+
+class VolumeStore():
+
+    def __init__(self):
+        self._images = {}
+        self._arrays = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Subjects are sent back from the worker processes: the arrays are not pickled
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
+
+    def image(self, path):
+        '''
+        Inputs:
+            path: str, NIfTI file
+        Outputs:
+            img: nibabel image, for the affine and header (the data is not read)
+        '''
+        with self._lock:
+            img = self._images.get(path)
+        if img is None:
+            img = nib.load(path)
+            with self._lock:
+                img = self._images.setdefault(path, img)
+        return img
+
+    def volume(self, path):
+        '''
+        Inputs:
+            path: str, NIfTI file
+        Outputs:
+            vol: read-only float32 array of the image
+        '''
+        return self._get(path, 'volume', lambda: self._read(path))
+
+    def intensities(self, path):
+        '''
+        Inputs:
+            path: str, NIfTI file
+        Outputs:
+            vol: read-only float64 array of the image, scaled as by get_fdata (PET statistics)
+        '''
+        return self._get(path, 'intensities', lambda: self.image(path).get_fdata(caching='unchanged'))
+
+    def labels(self, path):
+        '''
+        Inputs:
+            path: str, NIfTI label volume
+        Outputs:
+            vol: read-only array of the labels (values rounded to the nearest integer), in the
+                 smallest integer dtype holding them
+        '''
+        return self._get(path, 'labels', lambda: self._read_labels(path))
+
+    def derived(self, path, role, compute):
+        '''
+        Inputs:
+            path:    str, NIfTI file the array is computed from
+            role:    str, name of the derived array (e.g. 'brain_mask')
+            compute: callable without arguments returning the array
+        Outputs:
+            vol: read-only array, computed once and dropped with the arrays of the file
+        '''
+        return self._get(path, role, compute)
+
+    def label_index(self, path):
+        '''
+        Inputs:
+            path: str, NIfTI label volume
+        Outputs:
+            index: LabelIndex of the labels, built once for all the label statistics of the subject
+        '''
+        key = (path, 'label_index')
+        with self._lock:
+            index = self._arrays.get(key)
+        if index is None:
+            index = LabelIndex(self.labels(path))
+            with self._lock:
+                index = self._arrays.setdefault(key, index)
+        return index
+
+    def frames(self, path, start=0, stop=None):
+        '''
+        Iterate over the frames of a 4D image without loading it whole.
+
+        Inputs:
+            path: str, NIfTI file (a 3D image has a single frame)
+            start: int, first frame
+            stop: int, frame after the last one (default: all the frames)
+        Outputs:
+            frames: generator of float64 3D arrays, read from the file one at a time and scaled as
+                    by get_fdata
+        '''
+        proxy = nib.load(path).dataobj
+        # Unscaled view of the file, kept open: the frames of a compressed file are read with forward
+        # seeks only. Slicing the scaled proxy would apply the scaling in the float32 of the header.
+        raw = ArrayProxy(proxy.file_like, (proxy.shape, proxy.dtype, proxy.offset, 1.0, 0.0), keep_file_open=True)
+        slope, inter = np.float64(proxy.slope), np.float64(proxy.inter)
+        n_frames = proxy.shape[3] if len(proxy.shape) == 4 else 1
+        stop = n_frames if stop is None else min(stop, n_frames)
+        for t in range(start, stop):
+            frame = raw[..., t] if len(proxy.shape) == 4 else raw[...]
+            yield np.asarray(apply_read_scaling(frame, slope, inter), dtype=np.float64)
+
+    def put(self, path, data):
+        '''
+        Store the content of a file that was just written, so that it is not read back.
+
+        Inputs:
+            path: str, NIfTI file holding the same data
+            data: np.ndarray, voxel values of the file
+        '''
+        vol = np.asarray(data, dtype=np.float32)
+        vol.setflags(write=False)
+        with self._lock:
+            self._arrays = {key: value for key, value in self._arrays.items() if key[0] != path}
+            self._images.pop(path, None)
+            self._arrays[(path, 'volume')] = vol
+
+    def release(self, path):
+        '''Drop the arrays of a file that is no longer needed.'''
+        with self._lock:
+            self._arrays = {key: value for key, value in self._arrays.items() if key[0] != path}
+
+    def clear(self):
+        '''Drop all the stored volumes.'''
+        with self._lock:
+            self._images.clear()
+            self._arrays.clear()
+
+    def _read(self, path):
+        # Not cached in the nibabel image as well: release() frees the memory
+        return self.image(path).get_fdata(caching='unchanged', dtype=np.float32)
+
+    def _read_labels(self, path):
+        with self._lock:
+            vol = self._arrays.get((path, 'volume'))
+        if vol is None:
+            # Straight from the proxy: integer files are not promoted to float
+            vol = np.asanyarray(self.image(path).dataobj)
+        return compact_labels(vol)
+
+    def _get(self, path, role, load):
+        key = (path, role)
+        with self._lock:
+            vol = self._arrays.get(key)
+        if vol is None:
+            vol = load()
+            vol.setflags(write=False)
+            with self._lock:
+                vol = self._arrays.setdefault(key, vol)
+        return vol
@@ -1,13 +1,108 @@
 import json
+import os
+import threading
+from collections import OrderedDict
+
 import nibabel as nib
 import numpy as np
 
+from numba import njit, prange
 from PyQt6.QtCore import QThread, pyqtSignal, QCoreApplication
+from dicom_series import DicomSeries
+from label_tacs import compute_label_tacs
 from logger import get_logger
 
 
 log = get_logger()
 
+PROJECTION_MODES = {"max": 0, "mean": 1, "min": 2}
+"""Supported intensity projections and their numba kernel codes."""
+
+MAX_LABELS = 1024
+"""Integer volumes with more distinct non-zero values are intensities, not label maps."""
+
+LABEL_NAME_HINTS = ("atlas", "label", "seg", "aseg", "aparc", "parc", "mask", "roi")
+"""File name fragments of label maps (atlases, segmentations, masks)."""
+
+
+@njit(parallel=True)
+def compute_projection_numba(volume, axis, mode):
+    """
+    Reduce a 3D volume along one axis (maximum, mean or minimum intensity projection).
+
+    The loops are ordered so that the innermost one always walks the contiguous
+    last axis of the volume.
+
+    Args:
+        volume (np.ndarray): 3D volume (X, Y, Z).
+        axis (int): Axis collapsed by the projection (0, 1 or 2).
+        mode (int): 0 = maximum, 1 = mean, 2 = minimum (see `PROJECTION_MODES`).
+
+    Returns:
+        np.ndarray: 2D float32 projection with the remaining axes in their original order.
+    """
+    nx, ny, nz = volume.shape
+    if axis == 0:
+        n, a, b = nx, ny, nz
+    elif axis == 1:
+        n, a, b = ny, nx, nz
+    else:
+        n, a, b = nz, nx, ny
+
+    out = np.empty((a, b), dtype=np.float32)
+    for p in prange(a):
+        acc = np.empty(b, dtype=np.float64)
+        for q in range(b):
+            if axis == 0:
+                acc[q] = volume[0, p, q]
+            elif axis == 1:
+                acc[q] = volume[p, 0, q]
+            else:
+                acc[q] = volume[p, q, 0]
+        if axis == 2:
+            # Reduction along the contiguous axis
+            for q in range(b):
+                for r in range(1, n):
+                    v = volume[p, q, r]
+                    if mode == 0:
+                        if v > acc[q]:
+                            acc[q] = v
+                    elif mode == 1:
+                        acc[q] += v
+                    else:
+                        if v < acc[q]:
+                            acc[q] = v
+        else:
+            for r in range(1, n):
+                for q in range(b):
+                    v = volume[r, p, q] if axis == 0 else volume[p, r, q]
+                    if mode == 0:
+                        if v > acc[q]:
+                            acc[q] = v
+                    elif mode == 1:
+                        acc[q] += v
+                    else:
+                        if v < acc[q]:
+                            acc[q] = v
+        for q in range(b):
+            out[p, q] = acc[q] / n if mode == 1 else acc[q]
+    return out
+
+
+def compute_projections(volume, mode):
+    """
+    Compute the projections of a 3D volume for the three viewer planes.
+
+    Args:
+        volume (np.ndarray): 3D volume (X, Y, Z).
+        mode (str): Projection type, one of `PROJECTION_MODES`.
+
+    Returns:
+        list[np.ndarray]: Axial (collapsed Z), coronal (collapsed Y) and sagittal (collapsed X) projections.
+    """
+    code = PROJECTION_MODES[mode]
+    return [compute_projection_numba(volume, axis, code) for axis in (2, 1, 0)]
+
 class SaveNiftiThread(QThread):
     """
     Background thread for saving a NIfTI image and its associated metadata
@@ -138,6 +233,24 @@ class ImageLoadThread(QThread):
     - `int`: Current progress percentage (0–100).  
     """
 
+    labels_loaded = pyqtSignal(object, bool)
+    """**Signal(object, bool):**  
+    Emitted before `finished` when an overlay can be displayed as an integer label map.  
+
+    Parameters:  
+    - `object`: label volume as uint8/uint16 (not normalized).  
+    - `bool`: whether the file is a label map by its name or header (label mode is then
+      enabled automatically; otherwise the user opts in).  
+    """
+
+    raw_loaded = pyqtSignal(object)
+    """**Signal(object):**  
+    Emitted before `finished` for base images with the raw intensities.  
+
+    Parameters:  
+    - `object`: float32 voxel data in the original units (not normalized).  
+    """
+
     def __init__(self, file_path, is_overlay):
         super().__init__()
         self.file_path = file_path
@@ -178,6 +291,17 @@ class ImageLoadThread(QThread):
             img_data = np.asanyarray(canonical_img.dataobj, dtype=np.float32)
             self.progress.emit(80)
 
+            # Keep original units (for ROI statistics) and integer label maps
+            # (atlases, segmentations) before normalization
+            if not self.is_overlay:
+                self.raw_loaded.emit(img_data)
+            else:
+                label_data = self.extract_label_map(img_data)
+                if label_data is not None:
+                    label_like = self.looks_like_label_map(self.file_path, img.header)
+                    log.debug(f"Overlay can be displayed as a label map (label-like: {label_like})")
+                    self.labels_loaded.emit(label_data, label_like)
+
             log.debug("Normalize image intensities")
             # Normalize image intensities
             img_data = self.normalize_data_matplotlib_style(img_data)
@@ -191,6 +315,58 @@ class ImageLoadThread(QThread):
             # Report any errors encountered
             self.error.emit(str(e))
 
+    @staticmethod
+    def extract_label_map(data):
+        """
+        Return a compact integer copy of `data` if it is a 3D label map.
+
+        A volume can be displayed as a label map when all its values are finite,
+        non-negative integers that fit in uint16, with at most `MAX_LABELS`
+        distinct non-zero values.
+
+        Args:
+            data (np.ndarray): Raw (non-normalized) voxel data.
+
+        Returns:
+            np.ndarray | None: uint8 or uint16 label volume, or None if `data` is not a label map.
+        """
+        if data.ndim != 3 or data.size == 0:
+            return None
+        if not np.all(np.isfinite(data)):
+            return None
+
+        vmin, vmax = data.min(), data.max()
+        if vmin < 0 or vmax > np.iinfo(np.uint16).max:
+            return None
+        if not np.array_equal(data, np.rint(data)):
+            return None
+
+        dtype = np.uint8 if vmax <= np.iinfo(np.uint8).max else np.uint16
+        labels = data.astype(dtype)
+        if np.count_nonzero(np.bincount(labels.ravel())[1:]) > MAX_LABELS:
+            return None
+        return labels
+
+    @staticmethod
+    def looks_like_label_map(path, header=None):
+        """
+        Tell whether an overlay is meant as a label map, from its NIfTI intent or its file name.
+
+        Integer MRI or PET volumes also pass `extract_label_map`: they are only shown
+        as labels when the user enables label mode.
+
+        Args:
+            path (str): File or DICOM folder of the overlay.
+            header (nib.Nifti1Header, optional): NIfTI header of the overlay.
+
+        Returns:
+            bool: True if the intent is NIFTI_INTENT_LABEL or the name contains one of `LABEL_NAME_HINTS`.
+        """
+        if header is not None and hasattr(header, "get_intent") and header.get_intent()[0] == "label":
+            return True
+        name = os.path.basename(os.path.normpath(path)).lower()
+        return any(hint in name for hint in LABEL_NAME_HINTS)
+
     def normalize_data_matplotlib_style(self, data):
         """
         Normalize NIfTI data using robust percentile scaling (0.5th–99.5th percentiles).
@@ -229,3 +405,456 @@ class ImageLoadThread(QThread):
             normalized = normalize_volume(data)
 
         return normalized
+
+
+class DicomSeriesLoadThread(QThread):
+    """
+    Thread opening a DICOM series folder for display without converting it.
+
+    Only the headers are read here (see `DicomSeries`); the emitted volumes are
+    views filled lazily as slices are displayed. Overlays are decoded entirely,
+    since they are used as whole-volume masks.
+
+    Signals: same as `ImageLoadThread` (finished, error, progress, labels_loaded, raw_loaded).
+
+    Args:
+        folder (str): Path to the DICOM series folder.
+        is_overlay (bool): Flag indicating whether the series is an overlay image.
+    """
+
+    finished = pyqtSignal(object, object, object, bool, bool)
+    """**Signal(object, object, object, bool, bool):**  
+    Emitted when the series is opened.  
+
+    Parameters:  
+    - `object`: img_data (lazily filled view).  
+    - `object`: dims.
+    - `object`: affine. 
+    - `bool`: is_4d. 
+    - `bool`: is_overlay.  
+    """
+
+    error = pyqtSignal(str)
+    """**Signal(str):**  
+    Emitted when the folder cannot be opened as a DICOM series.  
+
+    Parameters:  
+    - `str`: Description or message detailing the error.  
+    """
+
+    progress = pyqtSignal(int)
+    """**Signal(int):**  
+    Emitted to report progress updates during execution.  
+
+    Parameters:  
+    - `int`: Current progress percentage (0–100).  
+    """
+
+    labels_loaded = pyqtSignal(object, bool)
+    """**Signal(object, bool):**  
+    Emitted before `finished` when an overlay can be displayed as an integer label map.  
+
+    Parameters:  
+    - `object`: label volume as uint8/uint16 (not normalized).  
+    - `bool`: whether the file is a label map by its name or header (label mode is then
+      enabled automatically; otherwise the user opts in).  
+    """
+
+    raw_loaded = pyqtSignal(object)
+    """**Signal(object):**  
+    Emitted before `finished` for base images with the raw intensities.  
+
+    Parameters:  
+    - `object`: float32 view of the voxel data in the original units (lazily filled).  
+    """
+
+    def __init__(self, folder, is_overlay):
+        super().__init__()
+        self.folder = folder
+        self.is_overlay = is_overlay
+        self.series = None
+
+    def run(self):
+        """
+        Reads the headers of the series and emits its lazily decoded volume.
+        """
+        try:
+            self.series = DicomSeries(self.folder, progress=lambda value: self.progress.emit(int(value * 0.9)))
+            if self.is_overlay:
+                self.series.ensure_all()
+                label_data = ImageLoadThread.extract_label_map(self.series.raw)
+                if label_data is not None:
+                    label_like = ImageLoadThread.looks_like_label_map(self.folder)
+                    log.debug(f"Overlay can be displayed as a label map (label-like: {label_like})")
+                    self.labels_loaded.emit(label_data, label_like)
+            else:
+                self.raw_loaded.emit(self.series.raw)
+
+            self.progress.emit(100)
+            self.finished.emit(self.series.data, self.series.shape, self.series.affine,
+                               self.series.n_frames > 1, self.is_overlay)
+
+        except Exception as e:
+            # Report any errors encountered
+            self.error.emit(str(e))
+
+
+class ProjectionThread(QThread):
+    """
+    Background thread computing intensity projections of a 4D volume frame by frame.
+
+    Each computed frame is emitted as soon as it is ready, so the viewer can fill
+    its projection cache while the user keeps browsing.
+
+    Signals:
+        frame_ready (str, int, object): Emitted for every computed frame with
+            (mode, frame index, [axial, coronal, sagittal] projections).
+
+    Args:
+        img_data (np.ndarray): 4D image data (X, Y, Z, T).
+        mode (str): Projection type, one of `PROJECTION_MODES`.
+        frames (list[int]): Frame indices to compute, in order.
+    """
+
+    frame_ready = pyqtSignal(str, int, object)
+    """**Signal(str, int, object):**  
+    Emitted when the projections of a frame are available.  
+
+    Parameters:  
+    - `str`: projection mode.  
+    - `int`: frame index.  
+    - `object`: list with the axial, coronal and sagittal projections.  
+    """
+
+    def __init__(self, img_data, mode, frames):
+        super().__init__()
+        self.img_data = img_data
+        self.mode = mode
+        self.frames = list(frames)
+        self._is_canceled = False
+
+    def run(self):
+        """
+        Computes the projections of the requested frames until done or canceled.
+        """
+        try:
+            for t in self.frames:
+                if self._is_canceled:
+                    return
+                projections = compute_projections(self.img_data[..., t], self.mode)
+                self.frame_ready.emit(self.mode, t, projections)
+        except Exception as e:
+            log.error(f"Error computing projections: {e}")
+
+    def cancel(self):
+        """
+        Stops the computation after the frame currently being processed.
+        """
+        self._is_canceled = True
+
+
+class LabelTacThread(QThread):
+    """
+    Background thread computing the TACs of every label of an atlas overlay.
+
+    All the curves are computed in a single pass over the 4D volume (see
+    `compute_label_tacs`), so that hovering a region can show its curve at once.
+
+    Args:
+        labels (np.ndarray): 3D integer label map (X, Y, Z).
+        data (np.ndarray): 4D image data (X, Y, Z, T), in original units.
+    """
+
+    finished = pyqtSignal(object)
+    """**Signal(object):**  
+    Emitted when the TACs are available.  
+
+    Parameters:  
+    - `object`: `LabelTacTable` with the mean and std TAC of each label.  
+    """
+
+    def __init__(self, labels, data):
+        super().__init__()
+        self.labels = labels
+        self.data = data
+        self._is_canceled = False
+
+    def run(self):
+        """
+        Computes the TAC table and emits it, unless canceled meanwhile.
+        """
+        try:
+            table = compute_label_tacs(self.labels, self.data)
+            if not self._is_canceled:
+                self.finished.emit(table)
+        except Exception as e:
+            log.error(f"Error computing label TACs: {e}")
+
+    def cancel(self):
+        """
+        Discards the result of the computation in progress.
+        """
+        self._is_canceled = True
+
+
+class FrameCache:
+    """
+    Bounded, thread-safe cache of rendered frames.
+
+    Entries are evicted in insertion order once `capacity` is reached, which for
+    cine playback means the frames furthest behind the playhead go first.
+
+    Args:
+        capacity (int): Maximum number of entries.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the entry for `key`, or None if missing."""
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key, value):
+        """Store an entry, evicting the oldest ones beyond capacity."""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class CinePrefetchThread(QThread):
+    """
+    Background thread pre-rendering the frames ahead of the cine playhead.
+
+    The thread keeps the next `lookahead` frames rendered in a `FrameCache`, keyed
+    by (state key, frame). The state key identifies everything the rendering depends
+    on besides the frame (slices, colormap, overlays...), so entries rendered for an
+    outdated state are simply never hit. The viewer moves the playhead with
+    `set_playhead` and the thread follows it.
+
+    Signals:
+        frame_rendered (int): Emitted when a frame has been added to the cache.
+
+    Args:
+        render_frame (callable): Function rendering a frame index into the cached value.
+        cache (FrameCache): Cache receiving the rendered frames.
+        n_frames (int): Number of frames in the series.
+        lookahead (int, optional): Number of frames kept ready ahead of the playhead. Defaults to 8.
+        loop (bool, optional): Whether playback wraps around the series. Defaults to True.
+    """
+
+    frame_rendered = pyqtSignal(int)
+    """**Signal(int):**  
+    Emitted when a frame has been pre-rendered.  
+
+    Parameters:  
+    - `int`: frame index.  
+    """
+
+    def __init__(self, render_frame, cache, n_frames, lookahead=8, loop=True):
+        super().__init__()
+        self.render_frame = render_frame
+        self.cache = cache
+        self.n_frames = n_frames
+        self.lookahead = lookahead
+        self.loop = loop
+        self.playhead = 0
+        self.state_key = None
+        self._is_canceled = False
+
+    def set_playhead(self, frame, state_key):
+        """
+        Move the playhead the prefetch follows.
+
+        Args:
+            frame (int): Frame currently displayed.
+            state_key (hashable): Current rendering state.
+        """
+        self.playhead = frame
+        self.state_key = state_key
+
+    def next_missing_frame(self):
+        """
+        Find the closest frame ahead of the playhead that is not cached yet.
+
+        Returns:
+            tuple | None: (state key, frame) to render, or None if all are cached.
+        """
+        playhead, state_key = self.playhead, self.state_key
+        for i in range(1, self.lookahead + 1):
+            frame = playhead + i
+            if frame >= self.n_frames:
+                if not self.loop:
+                    return None
+                frame %= self.n_frames
+            if (state_key, frame) not in self.cache:
+                return state_key, frame
+        return None
+
+    def run(self):
+        """
+        Renders the missing frames ahead of the playhead until canceled.
+        """
+        while not self._is_canceled:
+            try:
+                missing = self.next_missing_frame()
+                if missing is None:
+                    self.msleep(5)
+                    continue
+                state_key, frame = missing
+                rendered = self.render_frame(frame)
+                # Discard the result if the state changed while rendering
+                if state_key == self.state_key and not self._is_canceled:
+                    self.cache.put((state_key, frame), rendered)
+                    self.frame_rendered.emit(frame)
+            except Exception as e:
+                log.error(f"Error prefetching cine frame: {e}")
+                self.msleep(50)
+
+    def cancel(self):
+        """
+        Stops the prefetch after the frame currently being rendered.
+        """
+        self._is_canceled = True
+
+
+class RenderQueue:
+    """
+    Thread-safe queue of rendering jobs shared by a pool of `RenderWorkerThread`.
+
+    Each target (e.g. a view of a comparison grid) has at most one pending job:
+    submitting a new job for a target replaces the outdated one, so the amount of
+    queued work stays bounded by the number of targets however fast the user
+    navigates. Jobs of the focused target (e.g. the view under the mouse) are
+    taken first, the others in submission order.
+    """
+
+    def __init__(self):
+        self._jobs = OrderedDict()
+        self._condition = threading.Condition()
+        self.focus = None
+
+    def submit(self, target, key, render):
+        """
+        Queue the rendering of `key` for a target, replacing its pending job.
+
+        Args:
+            target (hashable): Target receiving the result.
+            key (hashable): Cache key of the result.
+            render (callable): Function computing the result, without arguments.
+        """
+        with self._condition:
+            self._jobs.pop(target, None)
+            self._jobs[target] = (key, render)
+            self._condition.notify()
+
+    def set_focus(self, target):
+        """
+        Give priority to the jobs of a target.
+
+        Args:
+            target (hashable | None): Prioritized target, or None for submission order.
+        """
+        with self._condition:
+            self.focus = target
+
+    def take(self, timeout=None):
+        """
+        Remove and return the next job, waiting up to `timeout` seconds for one.
+
+        Returns:
+            tuple | None: (target, key, render), or None if the queue stayed empty.
+        """
+        with self._condition:
+            if not self._jobs:
+                self._condition.wait(timeout)
+                if not self._jobs:
+                    return None
+            target = self.focus if self.focus in self._jobs else next(iter(self._jobs))
+            key, render = self._jobs.pop(target)
+            return target, key, render
+
+    def clear(self):
+        """Drop all pending jobs."""
+        with self._condition:
+            self._jobs.clear()
+
+    def __len__(self):
+        with self._condition:
+            return len(self._jobs)
+
+
+class RenderWorkerThread(QThread):
+    """
+    Worker of a rendering pool: takes jobs from a shared `RenderQueue` and stores
+    the results in a shared `FrameCache`.
+
+    Several workers can share the same queue and cache; a job whose key is
+    already cached (rendered meanwhile for another target) is served from the cache.
+
+    Signals:
+        rendered (object, object, object): Emitted with (target, key, result) for every completed job.
+
+    Args:
+        queue (RenderQueue): Jobs to process.
+        cache (FrameCache): Cache receiving the results.
+    """
+
+    rendered = pyqtSignal(object, object, object)
+    """**Signal(object, object, object):**  
+    Emitted when a job has been completed.  
+
+    Parameters:  
+    - `object`: target of the job.  
+    - `object`: cache key of the result.  
+    - `object`: result.  
+    """
+
+    def __init__(self, queue, cache):
+        super().__init__()
+        self.queue = queue
+        self.cache = cache
+        self._is_canceled = False
+
+    def run(self):
+        """
+        Processes the queued jobs until canceled.
+        """
+        while not self._is_canceled:
+            job = self.queue.take(timeout=0.05)
+            if job is None:
+                continue
+            target, key, render = job
+            try:
+                result = self.cache.get(key)
+                if result is None:
+                    result = render()
+                    self.cache.put(key, result)
+                if not self._is_canceled:
+                    self.rendered.emit(target, key, result)
+            except Exception as e:
+                log.error(f"Error rendering {key}: {e}")
+
+    def cancel(self):
+        """
+        Stops the worker after the job currently being processed.
+        """
+        self._is_canceled = True
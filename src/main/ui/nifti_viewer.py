@@ -3,14 +3,22 @@ import sys
 import os
 import gc
 import json
+import time
+import threading
 
 import numpy as np
 import nibabel as nib
 
 from components.crosshair_graphic_view import CrosshairGraphicsView
 from components.nifti_file_dialog import NiftiFileDialog
+from components.roi_stats_panel import RoiStatsPanel, IncrementalRoiStats
+from components.render_profiler import RenderProfiler, RenderHud
+from components.lightbox_view import LightboxView
+from components.comparison_view import ComparisonView
+from derived_volumes import RatioToRoiMean, WeightedFrameSum, VolumeDifference, frame_duration_weights
 from logger import get_logger
-from threads.nifti_utils_threads import ImageLoadThread, SaveNiftiThread
+from threads.nifti_utils_threads import ImageLoadThread, SaveNiftiThread, ProjectionThread, compute_projections, \
+    FrameCache, CinePrefetchThread, DicomSeriesLoadThread, LabelTacThread
 
 log = get_logger()
 
@@ -112,6 +120,191 @@ def apply_overlay_numba(rgba_image, overlay_mask, overlay_intensity, overlay_col
     return rgba_image
 
 
+@njit(parallel=True)
+def apply_label_lut_numba(rgba_image, label_slice, lut, alpha):
+    """
+    Blend an integer label slice into an RGBA image through a label→RGBA lookup table.
+
+    Each pixel gathers its color from `lut[label]`; the LUT alpha (scaled by the
+    global overlay alpha) controls the blending, so hidden labels simply have
+    alpha 0 and are skipped.
+
+    Args:
+        rgba_image (np.ndarray): Base image (H, W, 4) in float format (0–1 range).
+        label_slice (np.ndarray): Integer label map (H, W), uint8 or uint16.
+        lut (np.ndarray): Lookup table (N, 4) with RGBA colors (0–1 range) per label.
+        alpha (float): Global overlay opacity (0–1).
+
+    Returns:
+        np.ndarray: Modified RGBA image with labels blended in.
+    """
+    h, w, c = rgba_image.shape
+    n_labels = lut.shape[0]
+    for y in prange(h):
+        for x in range(w):
+            label = label_slice[y, x]
+            if 0 < label < n_labels:
+                a = lut[label, 3] * alpha
+                if a > 0:
+                    for ch in range(3):
+                        rgba_image[y, x, ch] = rgba_image[y, x, ch] * (1.0 - a) + lut[label, ch] * a
+    return rgba_image
+
+
+def colormap_lut(colormap_name):
+    """
+    Lookup table of a matplotlib colormap.
+
+    Args:
+        colormap_name (str): Matplotlib colormap name.
+
+    Returns:
+        np.ndarray: Float32 array (N, 4) with the RGBA colors of the colormap entries.
+    """
+    cmap = matplotlib.colormaps.get_cmap(colormap_name)
+    return cmap(np.arange(cmap.N)).astype(np.float32)
+
+
+@njit(parallel=True)
+def apply_colormap_tiles_numba(tiles, lut, out):
+    """
+    Map a stack of normalized slices to RGBA through a colormap lookup table.
+
+    Same mapping as calling a matplotlib colormap on the data (values are binned
+    into the LUT entries, out-of-range values take the first/last color and NaNs
+    are transparent), with the rows of all tiles processed in parallel.
+
+    Args:
+        tiles (np.ndarray): Float32 slices (N, H, W) with values in the 0–1 range.
+        lut (np.ndarray): Colormap lookup table (K, 4), see `colormap_lut`.
+        out (np.ndarray): Float32 output array (N, H, W, 4), filled in place.
+    """
+    n, h, w = tiles.shape
+    n_colors = lut.shape[0]
+    for k in prange(n * h):
+        t = k // h
+        y = k % h
+        for x in range(w):
+            v = tiles[t, y, x]
+            if np.isnan(v):
+                for ch in range(4):
+                    out[t, y, x, ch] = 0.0
+                continue
+            idx = int(np.floor(v * n_colors))
+            if idx < 0:
+                idx = 0
+            elif idx >= n_colors:
+                idx = n_colors - 1
+            for ch in range(4):
+                out[t, y, x, ch] = lut[idx, ch]
+
+
+@njit(parallel=True)
+def reslice_trilinear_numba(volume, origin, du, dv, out):
+    """
+    Sample an arbitrary plane from a 3D volume with trilinear interpolation.
+
+    Only the output pixel grid is evaluated: pixel (r, c) is sampled at the voxel
+    position `origin + c * du + r * dv`. Samples falling outside the volume are 0.
+
+    Args:
+        volume (np.ndarray): 3D volume (X, Y, Z).
+        origin (np.ndarray): Voxel position of the top-left output pixel.
+        du (np.ndarray): Voxel step between adjacent columns.
+        dv (np.ndarray): Voxel step between adjacent rows.
+        out (np.ndarray): Output 2D array (H, W), filled in place.
+
+    Returns:
+        np.ndarray: The filled output array.
+    """
+    h, w = out.shape
+    nx, ny, nz = volume.shape
+    for r in prange(h):
+        for c in range(w):
+            x = origin[0] + c * du[0] + r * dv[0]
+            y = origin[1] + c * du[1] + r * dv[1]
+            z = origin[2] + c * du[2] + r * dv[2]
+            if x < 0 or y < 0 or z < 0 or x > nx - 1 or y > ny - 1 or z > nz - 1:
+                out[r, c] = 0
+                continue
+            x0, y0, z0 = int(x), int(y), int(z)
+            x1, y1, z1 = min(x0 + 1, nx - 1), min(y0 + 1, ny - 1), min(z0 + 1, nz - 1)
+            fx, fy, fz = x - x0, y - y0, z - z0
+            c00 = volume[x0, y0, z0] * (1 - fx) + volume[x1, y0, z0] * fx
+            c10 = volume[x0, y1, z0] * (1 - fx) + volume[x1, y1, z0] * fx
+            c01 = volume[x0, y0, z1] * (1 - fx) + volume[x1, y0, z1] * fx
+            c11 = volume[x0, y1, z1] * (1 - fx) + volume[x1, y1, z1] * fx
+            c0 = c00 * (1 - fy) + c10 * fy
+            c1 = c01 * (1 - fy) + c11 * fy
+            out[r, c] = c0 * (1 - fz) + c1 * fz
+    return out
+
+
+@njit(parallel=True)
+def reslice_nearest_numba(volume, origin, du, dv, out):
+    """
+    Sample an arbitrary plane from a 3D volume with nearest-neighbour interpolation.
+
+    Used for masks and label maps, whose values must not be interpolated.
+    Arguments are the same as `reslice_trilinear_numba`.
+
+    Returns:
+        np.ndarray: The filled output array.
+    """
+    h, w = out.shape
+    nx, ny, nz = volume.shape
+    for r in prange(h):
+        for c in range(w):
+            x = int(np.floor(origin[0] + c * du[0] + r * dv[0] + 0.5))
+            y = int(np.floor(origin[1] + c * du[1] + r * dv[1] + 0.5))
+            z = int(np.floor(origin[2] + c * du[2] + r * dv[2] + 0.5))
+            if 0 <= x < nx and 0 <= y < ny and 0 <= z < nz:
+                out[r, c] = volume[x, y, z]
+            else:
+                out[r, c] = 0
+    return out
+
+
+def rotation_matrix(angles_deg):
+    """
+    Build a 3D rotation matrix from rotations about the X, Y and Z axes.
+
+    Args:
+        angles_deg (Sequence[float]): Rotation angles (degrees) about X, Y and Z, applied in this order.
+
+    Returns:
+        np.ndarray: 3x3 rotation matrix.
+    """
+    ax, ay, az = np.radians(angles_deg)
+    rx = np.array([[1, 0, 0], [0, np.cos(ax), -np.sin(ax)], [0, np.sin(ax), np.cos(ax)]])
+    ry = np.array([[np.cos(ay), 0, np.sin(ay)], [0, 1, 0], [-np.sin(ay), 0, np.cos(ay)]])
+    rz = np.array([[np.cos(az), -np.sin(az), 0], [np.sin(az), np.cos(az), 0], [0, 0, 1]])
+    return rz @ ry @ rx
+
+
+def build_label_lut(max_label, colormap_name="tab20"):
+    """
+    Build a label→RGBA lookup table for integer label maps.
+
+    Label 0 is the background and is fully transparent; the other labels cycle
+    through the colors of a qualitative matplotlib colormap.
+
+    Args:
+        max_label (int): Highest label value present in the volume.
+        colormap_name (str, optional): Qualitative colormap used for label colors.
+
+    Returns:
+        np.ndarray: Float32 LUT of shape (max_label + 1, 4).
+    """
+    cmap = matplotlib.colormaps.get_cmap(colormap_name)
+    n_colors = getattr(cmap, "N", 20)
+    lut = np.zeros((max_label + 1, 4), dtype=np.float32)
+    for label in range(1, max_label + 1):
+        lut[label] = cmap((label - 1) % n_colors)
+    lut[1:, 3] = 1.0
+    return lut
+
+
 def _slice(data, plane_idx, slice_idx):
     slice = None
     if plane_idx == 0:
@@ -180,6 +373,8 @@ class NiftiViewer(QMainWindow):
         self.file_path = None
         self.stretch_factors = {}
         self.voxel_sizes = None
+        self.raw_data = None  # intensities in original units (normalization-free)
+        self.dicom_series = None  # DicomSeries decoded on demand, when a DICOM folder is open
 
         # === Overlay-related attributes ===
         self.overlay_data = None
@@ -191,6 +386,28 @@ class NiftiViewer(QMainWindow):
         self.overlay_max = 0
         self.overlay_thresholded_data = None
 
+        # === Label-map overlay (atlases, segmentations) ===
+        self.overlay_label_data = None
+        self.overlay_label_lut = None
+        self.overlay_label_mode = False
+        self.overlay_label_like = False  # label map by its file name or header
+        self.overlay_labels = []
+        self.label_tacs = None  # LabelTacTable of all the labels, computed in background
+        self.label_tac_thread = None
+        self.hovered_label = 0
+
+        # === Intensity projections (MIP / mean / MinIP) ===
+        self.projection_mode = None
+        self.projection_cache = {}  # (mode, frame) -> [axial, coronal, sagittal]
+        self.projection_thread = None
+
+        # === Oblique reslicing ===
+        self.oblique_enabled = False
+        self.oblique_angles = [0, 0, 0]  # rotation about X, Y, Z in degrees
+        self.oblique_geometry = {}  # plane_idx -> (origin, du, dv, width, height, crosshair)
+        self.oblique_sliders = []
+        self.oblique_spins = []
+
         # === UI element placeholders ===
         self.info_text = None
         self.plane_labels = None
@@ -258,6 +475,39 @@ class NiftiViewer(QMainWindow):
         self.addOrigin_btn = None
         self.cancelROI_btn = None
         self.incrementalROI_origins = []
+        self.automaticROI_bbox = None
+
+        # === Live ROI statistics ===
+        self.roi_stats = None
+        self.roi_stats_panel = None
+
+        # === Render profiling ===
+        self.profiler = RenderProfiler()
+        self.render_hud = None
+
+        # === Lightbox mosaic ===
+        self.lightbox = None
+        self.comparison = None
+
+        # === Derived volumes (lazily evaluated) ===
+        self.derived_volume = None
+        self.derived_operand = None  # Second volume of a difference, raw intensities
+        self.derived_operand_path = None
+
+        # === Cine playback (4D) ===
+        self.cine_timer = None
+        self.cine_thread = None
+        self.cine_cache = FrameCache(capacity=32)
+        self.cine_profiler = RenderProfiler()  # Timings of the prefetch thread
+        # Serializes plane rendering between the GUI and the prefetch thread
+        # (parallel numba kernels must not be launched concurrently)
+        self.render_lock = threading.Lock()
+        self.cine_lookahead = 8
+        self.cine_start_time = 0.0
+        self.cine_start_frame = 0
+        self.cine_last_step = 0
+        self.cine_skipped = 0
+        self.cine_plot_background = None  # (canvas size, saved pixels) used to blit the time indicator
 
         # === Initialize and connect the UI ===
         self.init_ui()
@@ -367,6 +617,13 @@ class NiftiViewer(QMainWindow):
         self.open_btn.setToolTip(QtCore.QCoreApplication.translate("NIfTIViewer", "Open NIfTI File"))
         file_layout.addWidget(self.open_btn)
 
+        # Button to view a DICOM series folder without converting it
+        self.open_dicom_btn = QPushButton(QtCore.QCoreApplication.translate("NIfTIViewer", "📂 Open DICOM Series"))
+        self.open_dicom_btn.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        self.open_dicom_btn.setToolTip(QtCore.QCoreApplication.translate(
+            "NIfTIViewer", "View a DICOM series folder, decoding only the displayed slices"))
+        file_layout.addWidget(self.open_dicom_btn)
+
         # Label displaying currently loaded file info
         self.file_info_label = QLabel(QtCore.QCoreApplication.translate("NIfTIViewer", "No file loaded"))
         self.file_info_label.setWordWrap(True)
@@ -495,6 +752,41 @@ class NiftiViewer(QMainWindow):
         time_controls_widget.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
         time_layout.addWidget(time_controls_widget)
 
+        # Cine playback controls
+        self.cine_widget = QWidget()
+        cine_layout = QHBoxLayout(self.cine_widget)
+        cine_layout.setContentsMargins(0, 0, 0, 0)
+        cine_layout.setSpacing(5)
+
+        self.cine_play_btn = QPushButton(QtCore.QCoreApplication.translate("NIfTIViewer", "Play"))
+        self.cine_play_btn.setCheckable(True)
+        self.cine_play_btn.setMaximumHeight(25)
+        self.cine_play_btn.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        cine_layout.addWidget(self.cine_play_btn)
+
+        self.cine_fps_spin = QSpinBox()
+        self.cine_fps_spin.setRange(1, 60)
+        self.cine_fps_spin.setValue(10)
+        self.cine_fps_spin.setSuffix(" fps")
+        self.cine_fps_spin.setMaximumWidth(80)
+        self.cine_fps_spin.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Fixed)
+        cine_layout.addWidget(self.cine_fps_spin)
+
+        self.cine_loop_checkbox = QCheckBox(QtCore.QCoreApplication.translate("NIfTIViewer", "Loop"))
+        self.cine_loop_checkbox.setChecked(True)
+        self.cine_loop_checkbox.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Fixed)
+        cine_layout.addWidget(self.cine_loop_checkbox)
+        self.cine_widget.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        time_layout.addWidget(self.cine_widget)
+
+        self.cine_fps_label = QLabel()
+        self.cine_fps_label.setSizePolicy(QSizePolicy.Policy.Ignored, QSizePolicy.Policy.Fixed)
+        self.cine_fps_label.setStyleSheet("font-size: 10px;")
+        time_layout.addWidget(self.cine_fps_label)
+
+        self.cine_timer = QTimer(self)
+        self.cine_timer.setTimerType(Qt.TimerType.PreciseTimer)
+
         self.time_group.setVisible(False)
         layout.addWidget(self.time_group)
 
@@ -533,8 +825,176 @@ class NiftiViewer(QMainWindow):
         colormap_layout.addWidget(self.colormap_combo)
         colormap_widget.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
         display_layout.addWidget(colormap_widget)
+
+        # Projection selection dropdown (single slice or intensity projection)
+        projection_widget = QWidget()
+        projection_layout = QVBoxLayout(projection_widget)
+        projection_layout.setContentsMargins(0, 0, 0, 0)
+        projection_layout.setSpacing(3)
+
+        self.projection_label = QLabel(QtCore.QCoreApplication.translate("NIfTIViewer", "Projection:"))
+        self.projection_label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        self.projection_label.setStyleSheet("font-size: 10px; font-weight: bold;")
+        projection_layout.addWidget(self.projection_label)
+
+        self.projection_combo = QComboBox()
+        self.projection_combo.addItem(QtCore.QCoreApplication.translate("NIfTIViewer", "Slice"), None)
+        self.projection_combo.addItem("MIP", "max")
+        self.projection_combo.addItem(QtCore.QCoreApplication.translate("NIfTIViewer", "Mean"), "mean")
+        self.projection_combo.addItem("MinIP", "min")
+        self.projection_combo.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        self.projection_combo.setMaximumHeight(25)
+        projection_layout.addWidget(self.projection_combo)
+        projection_widget.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        display_layout.addWidget(projection_widget)
+
+        # Lightbox mosaic of a whole plane
+        self.lightbox_btn = QPushButton(QtCore.QCoreApplication.translate("NIfTIViewer", "Lightbox"))
+        self.lightbox_btn.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        self.lightbox_btn.setMaximumHeight(25)
+        self.lightbox_btn.setEnabled(False)
+        display_layout.addWidget(self.lightbox_btn)
+
+        # Linked grid comparing the image with other volumes
+        self.compare_btn = QPushButton(QtCore.QCoreApplication.translate("NIfTIViewer", "Compare Volumes"))
+        self.compare_btn.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        self.compare_btn.setMaximumHeight(25)
+        self.compare_btn.setEnabled(False)
+        display_layout.addWidget(self.compare_btn)
+
+        # Render timing HUD and export
+        profiling_widget = QWidget()
+        profiling_layout = QHBoxLayout(profiling_widget)
+        profiling_layout.setContentsMargins(0, 0, 0, 0)
+
+        self.render_stats_checkbox = QCheckBox(QtCore.QCoreApplication.translate("NIfTIViewer", "Show Render Stats"))
+        self.render_stats_checkbox.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        self.render_stats_checkbox.setStyleSheet("font-size: 10px;")
+        profiling_layout.addWidget(self.render_stats_checkbox)
+
+        self.export_timings_btn = QPushButton(QtCore.QCoreApplication.translate("NIfTIViewer", "Export Timings"))
+        self.export_timings_btn.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        self.export_timings_btn.setMaximumHeight(25)
+        profiling_layout.addWidget(self.export_timings_btn)
+        profiling_widget.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        display_layout.addWidget(profiling_widget)
         layout.addWidget(display_group)
 
+        # ==========================
+        # Oblique Reslice Controls
+        # ==========================
+        oblique_group = QFrame()
+        oblique_layout = QVBoxLayout(oblique_group)
+        oblique_layout.setContentsMargins(5, 5, 5, 5)
+
+        self.oblique_checkbox = QCheckBox(QtCore.QCoreApplication.translate("NIfTIViewer", "Oblique Reslicing"))
+        self.oblique_checkbox.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        self.oblique_checkbox.setStyleSheet("font-size: 10px; font-weight: bold;")
+        oblique_layout.addWidget(self.oblique_checkbox)
+
+        self.oblique_labels = []
+        axis_names = [
+            QtCore.QCoreApplication.translate("NIfTIViewer", "Rotation X:"),
+            QtCore.QCoreApplication.translate("NIfTIViewer", "Rotation Y:"),
+            QtCore.QCoreApplication.translate("NIfTIViewer", "Rotation Z:")
+        ]
+        for axis_name in axis_names:
+            label = QLabel(axis_name)
+            label.setStyleSheet("font-size: 10px;")
+            label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+            oblique_layout.addWidget(label)
+            self.oblique_labels.append(label)
+
+            # Angle slider and spinbox container
+            angle_controls_widget = QWidget()
+            angle_controls_layout = QHBoxLayout(angle_controls_widget)
+            angle_controls_layout.setContentsMargins(0, 0, 0, 0)
+            angle_controls_layout.setSpacing(5)
+
+            slider = QSlider(Qt.Orientation.Horizontal)
+            slider.setMinimum(-90)
+            slider.setMaximum(90)
+            slider.setValue(0)
+            slider.setEnabled(False)
+            slider.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+            angle_controls_layout.addWidget(slider, stretch=3)
+
+            spinbox = QSpinBox()
+            spinbox.setMinimum(-90)
+            spinbox.setMaximum(90)
+            spinbox.setValue(0)
+            spinbox.setEnabled(False)
+            spinbox.setMaximumWidth(60)
+            spinbox.setMinimumWidth(50)
+            spinbox.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Fixed)
+            angle_controls_layout.addWidget(spinbox, stretch=0)
+
+            slider.valueChanged.connect(spinbox.setValue)
+            spinbox.valueChanged.connect(slider.setValue)
+
+            angle_controls_widget.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+            oblique_layout.addWidget(angle_controls_widget)
+            self.oblique_sliders.append(slider)
+            self.oblique_spins.append(spinbox)
+
+        self.oblique_reset_btn = QPushButton(QtCore.QCoreApplication.translate("NIfTIViewer", "Reset Rotation"))
+        self.oblique_reset_btn.setEnabled(False)
+        self.oblique_reset_btn.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        self.oblique_reset_btn.setMaximumHeight(30)
+        oblique_layout.addWidget(self.oblique_reset_btn)
+        layout.addWidget(oblique_group)
+
+        # ==========================
+        # Derived Volume Controls
+        # ==========================
+        derived_group = QFrame()
+        derived_layout = QVBoxLayout(derived_group)
+        derived_layout.setContentsMargins(5, 5, 5, 5)
+
+        self.derived_label = QLabel(QtCore.QCoreApplication.translate("NIfTIViewer", "Derived Volume:"))
+        self.derived_label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        self.derived_label.setStyleSheet("font-size: 10px; font-weight: bold;")
+        derived_layout.addWidget(self.derived_label)
+
+        self.derived_combo = QComboBox()
+        self.derived_combo.addItem(QtCore.QCoreApplication.translate("NIfTIViewer", "None"), None)
+        self.derived_combo.addItem(QtCore.QCoreApplication.translate("NIfTIViewer", "Ratio to overlay ROI mean (SUVr)"), "suvr")
+        self.derived_combo.addItem(QtCore.QCoreApplication.translate("NIfTIViewer", "Weighted frame sum"), "frame_sum")
+        self.derived_combo.addItem(QtCore.QCoreApplication.translate("NIfTIViewer", "Difference with volume"), "difference")
+        self.derived_combo.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        self.derived_combo.setMaximumHeight(25)
+        self.derived_combo.setEnabled(False)
+        derived_layout.addWidget(self.derived_combo)
+
+        # Frame range of the weighted sum
+        self.derived_frames_widget = QWidget()
+        derived_frames_layout = QHBoxLayout(self.derived_frames_widget)
+        derived_frames_layout.setContentsMargins(0, 0, 0, 0)
+        self.derived_frames_label = QLabel(QtCore.QCoreApplication.translate("NIfTIViewer", "Frames:"))
+        self.derived_frames_label.setStyleSheet("font-size: 10px;")
+        derived_frames_layout.addWidget(self.derived_frames_label)
+        self.derived_frame_start = QSpinBox()
+        self.derived_frame_end = QSpinBox()
+        for spin in (self.derived_frame_start, self.derived_frame_end):
+            spin.setMaximumWidth(60)
+            derived_frames_layout.addWidget(spin)
+        self.derived_frames_widget.setVisible(False)
+        derived_layout.addWidget(self.derived_frames_widget)
+
+        # Second operand of the difference
+        self.derived_operand_btn = QPushButton(QtCore.QCoreApplication.translate("NIfTIViewer", "Select Volume..."))
+        self.derived_operand_btn.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        self.derived_operand_btn.setMaximumHeight(25)
+        self.derived_operand_btn.setVisible(False)
+        derived_layout.addWidget(self.derived_operand_btn)
+
+        self.derived_info_label = QLabel()
+        self.derived_info_label.setSizePolicy(QSizePolicy.Policy.Ignored, QSizePolicy.Policy.Fixed)
+        self.derived_info_label.setStyleSheet("font-size: 10px;")
+        self.derived_info_label.setWordWrap(True)
+        derived_layout.addWidget(self.derived_info_label)
+        layout.addWidget(derived_group)
+
         # ==========================
         # Automatic ROI Controls
         # ==========================
@@ -696,6 +1156,11 @@ class NiftiViewer(QMainWindow):
 
         layout.addWidget(self.automaticROI_group)
 
+        # Live statistics of the ROI being drawn
+        self.roi_stats_panel = RoiStatsPanel()
+        self.roi_stats_panel.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Minimum)
+        layout.addWidget(self.roi_stats_panel)
+
         # Overlay controls
         overlay_group = QFrame()
         overlay_layout = QVBoxLayout(overlay_group)
@@ -788,6 +1253,26 @@ class NiftiViewer(QMainWindow):
         threshold_controls_widget.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
         overlay_layout.addWidget(threshold_controls_widget)
 
+        # Label map mode (integer atlases/segmentations colored through a LUT)
+        self.overlay_label_checkbox = QCheckBox(QtCore.QCoreApplication.translate("NIfTIViewer", "Show as Label Map"))
+        self.overlay_label_checkbox.setEnabled(False)
+        self.overlay_label_checkbox.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        overlay_layout.addWidget(self.overlay_label_checkbox)
+
+        # Per-label visibility list (each toggle only edits the LUT)
+        self.overlay_label_list = QListWidget()
+        self.overlay_label_list.setMaximumHeight(120)
+        self.overlay_label_list.setVisible(False)
+        self.overlay_label_list.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        overlay_layout.addWidget(self.overlay_label_list)
+
+        # Export of the TACs of all the labels (available once computed)
+        self.export_label_tacs_btn = QPushButton(QtCore.QCoreApplication.translate("NIfTIViewer", "Export Region TACs"))
+        self.export_label_tacs_btn.setEnabled(False)
+        self.export_label_tacs_btn.setVisible(False)
+        self.export_label_tacs_btn.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        overlay_layout.addWidget(self.export_label_tacs_btn)
+
         # Overlay info
         self.overlay_info_label = QLabel(QtCore.QCoreApplication.translate("NIfTIViewer", "No overlay loaded"))
         self.overlay_info_label.setWordWrap(True)
@@ -954,6 +1439,9 @@ class NiftiViewer(QMainWindow):
             self.scenes.append(scene)
             self.pixmap_items.append(pixmap_item)
 
+        # Render timings are drawn on top of the axial view
+        self.render_hud = RenderHud(self.views[0])
+
         # ==============================
         #  Fourth Panel (Info / Plot)
         # ==============================
@@ -1037,10 +1525,15 @@ class NiftiViewer(QMainWindow):
         # File-related connections
         # ----------------------------
         self.open_btn.clicked.connect(lambda: self.open_file())
+        self.open_dicom_btn.clicked.connect(self.open_dicom_folder)
         self.overlay_btn.clicked.connect(lambda: self.open_file(is_overlay=True))
         self.overlay_checkbox.toggled.connect(self.toggle_overlay)
         self.overlay_alpha_slider.valueChanged.connect(self.update_overlay_alpha)
         self.overlay_threshold_slider.valueChanged.connect(self.update_overlay_threshold)
+        self.overlay_label_checkbox.toggled.connect(self.toggle_label_mode)
+        self.overlay_label_list.itemChanged.connect(self.label_visibility_changed)
+        self.overlay_label_list.itemClicked.connect(self.label_item_clicked)
+        self.export_label_tacs_btn.clicked.connect(self.export_label_tacs)
 
         # ----------------------------
         # Slice navigation connections
@@ -1067,11 +1560,35 @@ class NiftiViewer(QMainWindow):
         self.time_checkbox.toggled.connect(self.toggle_time_controls)
         self.time_slider.valueChanged.connect(self.time_changed)
         self.time_spin.valueChanged.connect(self.time_changed)
+        self.cine_play_btn.toggled.connect(self.toggle_cine)
+        self.cine_fps_spin.valueChanged.connect(self.cine_fps_changed)
+        self.cine_timer.timeout.connect(self.cine_tick)
 
         # ----------------------------
         # Colormap control
         # ----------------------------
         self.colormap_combo.currentTextChanged.connect(self.colormap_changed)
+        self.projection_combo.currentIndexChanged.connect(self.projection_changed)
+        self.render_stats_checkbox.toggled.connect(self.toggle_render_hud)
+        self.lightbox_btn.clicked.connect(self.open_lightbox)
+        self.compare_btn.clicked.connect(self.open_comparison)
+
+        # ----------------------------
+        # Derived volumes
+        # ----------------------------
+        self.derived_combo.currentIndexChanged.connect(lambda _: self.derived_changed())
+        self.derived_frame_start.valueChanged.connect(lambda _: self.derived_changed())
+        self.derived_frame_end.valueChanged.connect(lambda _: self.derived_changed())
+        self.derived_operand_btn.clicked.connect(self.select_derived_operand)
+        self.export_timings_btn.clicked.connect(self.export_render_timings)
+
+        # ----------------------------
+        # Oblique reslicing
+        # ----------------------------
+        self.oblique_checkbox.toggled.connect(self.toggle_oblique)
+        for i, slider in enumerate(self.oblique_sliders):
+            slider.valueChanged.connect(lambda value, idx=i: self.oblique_angle_changed(idx, value))
+        self.oblique_reset_btn.clicked.connect(self.reset_oblique_rotation)
 
         # ----------------------------
         # Coordinate synchronization across views
@@ -1118,18 +1635,32 @@ class NiftiViewer(QMainWindow):
         if result:
             self.open_file(result[0], is_overlay=is_overlay)
 
+    def open_dicom_folder(self):
+        """
+        Select a DICOM series folder and open it as base image (see `open_file`).
+        """
+        folder = QFileDialog.getExistingDirectory(
+            self, QtCore.QCoreApplication.translate("NIfTIViewer", "Select DICOM Series Folder"),
+            self.context.get("workspace_path", "") if self.context else ""
+        )
+        if folder:
+            self.open_file(folder)
+
     def open_file(self, file_path=None, is_overlay=False):
         """
-        Load a NIfTI file (base or overlay) using a background thread.
+        Load a NIfTI file or a DICOM series folder (base or overlay) using a background thread.
 
         This method either opens a file dialog for selecting a NIfTI file
         or loads a specified path directly. The loading process runs in a
         separate thread to keep the UI responsive, with progress reported
         via a modal progress dialog.
 
+        A DICOM series folder is opened without conversion: only the headers are
+        read, and the pixel data of the displayed slices is decoded on demand.
+
         Args:
-            file_path (str, optional): Path to the NIfTI file to load. If None,
-                a file dialog will be displayed.
+            file_path (str, optional): Path to the NIfTI file or DICOM series folder
+                to load. If None, a file dialog will be displayed.
             is_overlay (bool, optional): Whether the file being opened is an overlay
                 (requires a base image to be already loaded). Defaults to False.
 
@@ -1169,7 +1700,13 @@ class NiftiViewer(QMainWindow):
             self.progress_dialog.setMinimumDuration(0)
 
             # Launch threaded image loading
-            self.threads.append(ImageLoadThread(file_path, is_overlay))
+            if is_overlay:
+                self.overlay_label_data = None
+                self.overlay_label_like = False
+            loader = DicomSeriesLoadThread if os.path.isdir(file_path) else ImageLoadThread
+            self.threads.append(loader(file_path, is_overlay))
+            self.threads[-1].labels_loaded.connect(self.on_labels_loaded)
+            self.threads[-1].raw_loaded.connect(self.on_raw_loaded)
             self.threads[-1].finished.connect(self.on_file_loaded)
             self.threads[-1].error.connect(self.on_load_error)
             self.threads[-1].progress.connect(self.progress_dialog.setValue)
@@ -1214,6 +1751,9 @@ class NiftiViewer(QMainWindow):
         # Handle overlay image loading
         # ---------------------------------------------------
         if is_overlay:
+            # Overlay statistics and TACs read the whole base volume
+            self.ensure_full_series()
+
             # Store overlay data and its dimensions
             self.overlay_data = img_data
             self.overlay_dims = dims
@@ -1226,9 +1766,15 @@ class NiftiViewer(QMainWindow):
                     f"The main image has dimensions {self.dims[:3]} and the overlay has dimensions {self.overlay_data.shape[:3]}."
                 )
                 self.overlay_data = self.pad_volume_to_shape(self.overlay_data, self.dims[:3])
+                if self.overlay_label_data is not None:
+                    self.overlay_label_data = self.pad_volume_to_shape(self.overlay_label_data, self.dims[:3])
 
             self.overlay_max = np.max(self.overlay_data) if np.max(self.overlay_data) > 0 else 1
 
+            log.debug("Setup label lookup table")
+            self.setup_label_lut()
+            self.start_label_tac_thread()
+
             # Update overlay information label
             filename = os.path.basename(self.overlay_file_path)
             self.overlay_info_label.setText(
@@ -1263,12 +1809,29 @@ class NiftiViewer(QMainWindow):
             # Reset any existing overlay and ROI tools
             self.reset_overlay()
 
+            # Projections of the previous image are no longer valid
+            self.reset_projections()
+            self.cine_play_btn.setChecked(False)
+            if self.lightbox is not None:
+                self.lightbox.clear_cache()
+            self.reset_derived_volume()
+
             # Store loaded base image attributes
             self.img_data = img_data
             self.dims = dims
             self.affine = affine
             self.is_4d = is_4d
             self.voxel_sizes = np.sqrt((self.affine[:3, :3] ** 2).sum(axis=0))  # Compute voxel size in mm
+            self.dicom_series = getattr(thread_to_cancel, "series", None)
+
+            # Running ROI statistics on the original intensities
+            # (for DICOM series, once decoded by the first ROI tool)
+            if self.raw_data is None or self.raw_data.shape != img_data.shape:
+                self.raw_data = img_data
+            self.roi_stats = None
+            if self.dicom_series is None:
+                self.roi_stats = IncrementalRoiStats(self.raw_data, float(np.prod(self.voxel_sizes)) / 1000.0)
+            self.roi_stats_panel.set_summary(None)
 
             # Compose file information text
             filename = os.path.basename(self.file_path)
@@ -1305,6 +1868,15 @@ class NiftiViewer(QMainWindow):
 
             # Enable ROI controls
             self.automaticROIbtn.setEnabled(True)
+            self.lightbox_btn.setEnabled(True)
+            self.compare_btn.setEnabled(True)
+            self.derived_combo.setEnabled(True)
+            last_frame = dims[3] - 1 if is_4d else 0
+            for spin, value in ((self.derived_frame_start, 0), (self.derived_frame_end, last_frame)):
+                spin.blockSignals(True)
+                spin.setRange(0, last_frame)
+                spin.setValue(value)
+                spin.blockSignals(False)
 
             self.automaticROIbtn.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Automatic ROI"))
 
@@ -1314,10 +1886,229 @@ class NiftiViewer(QMainWindow):
 
             # Initialize visual display of loaded data
             self.initialize_display()
+            if self.comparison is not None:
+                self.comparison.reset_volumes()
 
             self.resetROI()
             self.reset_overlay()
 
+    def on_labels_loaded(self, label_data, label_like=True):
+        """
+        Store the integer label volume emitted by the loading thread for an overlay.
+
+        Args:
+            label_data (np.ndarray): uint8/uint16 label map, kept separately from
+                the normalized overlay intensities.
+            label_like (bool, optional): Whether the overlay is a label map by its
+                file name or header. Defaults to True.
+        """
+        self.overlay_label_data = label_data
+        self.overlay_label_like = label_like
+
+    def on_raw_loaded(self, raw_data):
+        """
+        Store the raw intensities emitted by the loading thread for a base image.
+
+        Args:
+            raw_data (np.ndarray): Voxel data in original units, used for ROI statistics.
+        """
+        self.raw_data = raw_data
+
+    def ensure_full_series(self):
+        """
+        Decode the whole DICOM series before using a tool that reads the full volume.
+
+        DICOM series opened from a folder only decode the displayed slices, while
+        region growing, projections, derived volumes and overlay statistics need all
+        the voxels. The ROI statistics are also set up here, once the intensities are
+        available. Does nothing for NIfTI images.
+        """
+        if self.dicom_series is None:
+            return
+        if not self.dicom_series.is_fully_decoded():
+            self.status_bar.showMessage(QtCore.QCoreApplication.translate("NIfTIViewer", "Decoding DICOM series..."))
+            QCoreApplication.processEvents()
+            try:
+                self.dicom_series.ensure_all()
+            except Exception as e:
+                log.error(f"Error decoding DICOM series: {e}")
+            self.status_bar.clearMessage()
+        if self.roi_stats is None:
+            self.roi_stats = IncrementalRoiStats(self.raw_data, float(np.prod(self.voxel_sizes)) / 1000.0)
+
+    def setup_label_lut(self):
+        """
+        Build the label lookup table and the per-label visibility list for the current overlay.
+
+        Label map mode is enabled automatically when the overlay is a label map by its
+        file name or header and contains more than one non-zero label (binary masks keep
+        the thresholded display by default). Other integer overlays, e.g. MRI or PET
+        intensities, stay thresholded until the user enables label mode.
+        """
+        self.overlay_label_list.blockSignals(True)
+        self.overlay_label_list.clear()
+
+        if self.overlay_label_data is None:
+            self.overlay_label_lut = None
+            self.overlay_labels = []
+            self.overlay_label_list.blockSignals(False)
+            self.overlay_label_checkbox.blockSignals(True)
+            self.overlay_label_checkbox.setChecked(False)
+            self.overlay_label_checkbox.blockSignals(False)
+            self.overlay_label_checkbox.setEnabled(False)
+            self.toggle_label_mode(False, update_all=False)
+            return
+
+        counts = np.bincount(self.overlay_label_data.ravel())
+        self.overlay_labels = [int(label) for label in np.nonzero(counts)[0] if label > 0]
+        self.overlay_label_lut = build_label_lut(len(counts) - 1)
+
+        for label in self.overlay_labels:
+            item = QListWidgetItem(
+                QtCore.QCoreApplication.translate("NIfTIViewer", "Label") + f" {label} ({counts[label]} vox)"
+            )
+            r, g, b, _ = self.overlay_label_lut[label]
+            item.setData(Qt.ItemDataRole.DecorationRole, QColor(int(r * 255), int(g * 255), int(b * 255)))
+            item.setData(Qt.ItemDataRole.UserRole, label)
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            item.setCheckState(Qt.CheckState.Checked)
+            self.overlay_label_list.addItem(item)
+        self.overlay_label_list.blockSignals(False)
+
+        self.overlay_label_checkbox.setEnabled(True)
+        self.overlay_label_checkbox.blockSignals(True)
+        self.overlay_label_checkbox.setChecked(self.overlay_label_like and len(self.overlay_labels) > 1)
+        self.overlay_label_checkbox.blockSignals(False)
+        self.toggle_label_mode(self.overlay_label_checkbox.isChecked(), update_all=False)
+
+    def toggle_label_mode(self, enabled, update_all=True):
+        """
+        Switch the overlay between thresholded display and label map display.
+
+        Args:
+            enabled (bool): Whether the overlay is colored per label through the LUT.
+            update_all (bool, optional): Whether to refresh all views. Defaults to True.
+        """
+        self.overlay_label_mode = enabled and self.overlay_label_data is not None
+        self.overlay_label_list.setVisible(self.overlay_label_mode)
+        self.export_label_tacs_btn.setVisible(self.overlay_label_mode and self.is_4d)
+
+        # The threshold is ignored for labels: the thresholded mask is only
+        # recomputed when going back to intensity mode
+        if not self.overlay_label_mode:
+            self.update_overlay_threshold(self.overlay_threshold_slider.value(), update_all=False)
+        self.refresh_roi_stats()
+
+        if update_all:
+            self.update_all_displays()
+
+    def set_label_visible(self, label, visible):
+        """
+        Show or hide a single label by editing its LUT alpha.
+
+        Args:
+            label (int): Label value.
+            visible (bool): Whether the label is drawn.
+        """
+        if self.overlay_label_lut is None or not 0 < label < len(self.overlay_label_lut):
+            return
+        self.overlay_label_lut[label, 3] = 1.0 if visible else 0.0
+
+    def label_visibility_changed(self, item):
+        """
+        Handle the check state change of a label in the visibility list.
+
+        Args:
+            item (QListWidgetItem): The toggled label item.
+        """
+        label = item.data(Qt.ItemDataRole.UserRole)
+        self.set_label_visible(label, item.checkState() == Qt.CheckState.Checked)
+        if self.overlay_label_mode and self.overlay_enabled:
+            self.refresh_roi_stats()
+            self.update_all_displays()
+
+    def label_visible_mask(self):
+        """
+        Compute the boolean mask of voxels belonging to visible labels.
+
+        Returns:
+            np.ndarray | None: Boolean volume, or None if no label map is loaded.
+        """
+        if self.overlay_label_data is None or self.overlay_label_lut is None:
+            return None
+        return self.overlay_label_lut[self.overlay_label_data, 3] > 0
+
+    def start_label_tac_thread(self):
+        """
+        Start computing in background the TACs of all the labels of the overlay.
+
+        The curves are computed once per overlay on the intensities in original
+        units, so hovering or clicking a region only looks its curve up.
+        Only applies to 4D base images with a label map overlay.
+        """
+        self.stop_label_tac_thread()
+        self.label_tacs = None
+        self.export_label_tacs_btn.setEnabled(False)
+        if not self.is_4d or self.overlay_label_data is None or self.raw_data is None:
+            return
+        if self.overlay_label_data.shape != self.raw_data.shape[:3]:
+            return
+
+        self.label_tac_thread = LabelTacThread(self.overlay_label_data, self.raw_data)
+        self.label_tac_thread.finished.connect(self.on_label_tacs_ready)
+        self.label_tac_thread.start()
+
+    def on_label_tacs_ready(self, table):
+        """
+        Store the label TACs computed by the background thread.
+
+        Args:
+            table (LabelTacTable): Mean and std TAC of every label.
+        """
+        if self.label_tac_thread is None or self.sender() is not self.label_tac_thread:
+            return  # Result of a canceled computation for a previous overlay
+        self.label_tacs = table
+        self.export_label_tacs_btn.setEnabled(True)
+        if self.overlay_label_mode and self.overlay_enabled:
+            self.update_time_series_plot()
+
+    def stop_label_tac_thread(self):
+        """Cancel the background label TAC thread, if any."""
+        if self.label_tac_thread is not None:
+            self.label_tac_thread.cancel()
+            self.label_tac_thread.wait()
+            self.label_tac_thread.deleteLater()
+            self.label_tac_thread = None
+
+    def label_item_clicked(self, item):
+        """
+        Show the TAC of the label clicked in the visibility list.
+
+        Args:
+            item (QListWidgetItem): The clicked label item.
+        """
+        if self.overlay_label_mode and self.overlay_enabled:
+            self.update_time_series_plot(label=item.data(Qt.ItemDataRole.UserRole))
+
+    def export_label_tacs(self):
+        """Export the TACs of all the labels to a CSV file chosen by the user."""
+        if self.label_tacs is None:
+            return
+        path, _ = QFileDialog.getSaveFileName(
+            self,
+            QtCore.QCoreApplication.translate("NIfTIViewer", "Export Region TACs"),
+            "region_tacs.csv",
+            "CSV (*.csv)"
+        )
+        if not path:
+            return
+        try:
+            self.label_tacs.to_csv(path)
+            self.status_bar.showMessage(
+                QtCore.QCoreApplication.translate("NIfTIViewer", "Region TACs exported to ") + path)
+        except Exception as e:
+            log.error(f"Error exporting region TACs: {e}")
+
     def on_load_error(self, error_message):
         """
         Handle errors during NIfTI file loading.
@@ -1435,6 +2226,7 @@ class NiftiViewer(QMainWindow):
         self.overlay_threshold_spin.setEnabled(enabled or self.automaticROI_overlay or self.incrementalROI_enabled)
         self.ROI_save_btn.setEnabled(enabled or self.automaticROI_overlay or self.incrementalROI_enabled)
 
+        self.refresh_roi_stats()
 
         if update_all:
             # Redraw display if overlay data is available
@@ -1471,11 +2263,14 @@ class NiftiViewer(QMainWindow):
             when overlay is active and data is present.
         """
         self.overlay_threshold = value / 100.0
+        if self.overlay_label_mode:
+            return
         if self.overlay_enabled and self.overlay_data is not None and self.overlay_max is not None:
             # Determine overlay threshold
             threshold_value = self.overlay_threshold * self.overlay_max
             # Create boolean mask of overlay pixels above threshold
             self.overlay_thresholded_data = self.overlay_data > threshold_value
+            self.refresh_roi_stats()
             if update_all:
                 self.update_all_displays()
 
@@ -1540,9 +2335,208 @@ class NiftiViewer(QMainWindow):
         self.current_time = value
         self.time_slider.setValue(value)
         self.time_spin.setValue(value)
+        if self.cine_timer.isActive():
+            # Playback continues from the frame chosen by the user
+            self.restart_cine_clock()
+        if self.roi_stats is not None and self.is_4d:
+            self.roi_stats_panel.set_summary(self.roi_stats.summary(self.current_time))
         if update_all:
             self.update_all_displays()
 
+    def projection_changed(self, index, update_all=True):
+        """
+        Handle projection selection change from the dropdown.
+
+        Args:
+            index (int): Index of the selected entry (its data is the projection mode, or None for slices).
+
+        Notes:
+            For 4D data the projections of all the other frames are computed in
+            background, so that moving in time only requires a cache lookup.
+        """
+        self.projection_mode = self.projection_combo.itemData(index)
+        if self.projection_mode is not None:
+            self.ensure_full_series()
+        if self.projection_mode is not None and self.img_data is not None and self.is_4d:
+            self.start_projection_thread()
+        if update_all:
+            self.update_all_displays()
+
+    def get_projection(self, plane_idx, frame=None):
+        """
+        Return the cached projection of a frame for a plane, computing it if missing.
+
+        Args:
+            plane_idx (int): Index of the anatomical plane (0=axial, 1=coronal, 2=sagittal).
+            frame (int, optional): Time frame for 4D data. Defaults to the current one.
+
+        Returns:
+            np.ndarray: 2D projection in the same orientation as the raw (untransposed) slice.
+        """
+        frame = frame if frame is not None else self.current_time
+        key = (self.projection_mode, frame if self.is_4d else 0)
+        self.profiler.cache("projection", key in self.projection_cache)
+        if key not in self.projection_cache:
+            volume = self.img_data[..., frame] if self.is_4d else self.img_data
+            self.projection_cache[key] = compute_projections(volume, self.projection_mode)
+        return self.projection_cache[key][plane_idx]
+
+    def start_projection_thread(self):
+        """
+        Start computing in background the projections of the frames missing from the cache.
+
+        Frames are processed starting from the current one, wrapping around the series.
+        """
+        self.stop_projection_thread()
+        n_frames = self.dims[3]
+        order = [(self.current_time + i) % n_frames for i in range(n_frames)]
+        frames = [t for t in order if (self.projection_mode, t) not in self.projection_cache]
+        if not frames:
+            return
+
+        self.projection_thread = ProjectionThread(self.img_data, self.projection_mode, frames)
+        self.projection_thread.frame_ready.connect(self.on_projection_ready)
+        self.projection_thread.start()
+
+    def on_projection_ready(self, mode, frame, projections):
+        """
+        Store the projections computed by the background thread.
+
+        Args:
+            mode (str): Projection mode.
+            frame (int): Frame index.
+            projections (list[np.ndarray]): Axial, coronal and sagittal projections.
+        """
+        if self.projection_thread is None or self.sender() is not self.projection_thread:
+            return  # Result of a canceled computation for a previous image
+        self.projection_cache.setdefault((mode, frame), projections)
+
+    def stop_projection_thread(self):
+        """Cancel the background projection thread, if any."""
+        if self.projection_thread is not None:
+            self.projection_thread.cancel()
+            self.projection_thread.wait()
+            self.projection_thread.deleteLater()
+            self.projection_thread = None
+
+    def reset_projections(self):
+        """Drop all cached projections and go back to single slice display."""
+        self.stop_projection_thread()
+        self.projection_cache = {}
+        self.projection_combo.blockSignals(True)
+        self.projection_combo.setCurrentIndex(0)
+        self.projection_combo.blockSignals(False)
+        self.projection_mode = None
+
+    def toggle_oblique(self, enabled, update_all=True):
+        """
+        Enable or disable oblique reslicing of the three views.
+
+        Args:
+            enabled (bool): Whether the views are resliced along the rotated planes.
+        """
+        self.oblique_enabled = enabled
+        for slider, spinbox in zip(self.oblique_sliders, self.oblique_spins):
+            slider.setEnabled(enabled)
+            spinbox.setEnabled(enabled)
+        self.oblique_reset_btn.setEnabled(enabled)
+        if update_all:
+            self.update_all_displays()
+            self.update_cross_view_lines()
+
+    def oblique_angle_changed(self, axis, value):
+        """
+        Handle a change of one of the oblique rotation angles.
+
+        Args:
+            axis (int): Rotation axis (0=X, 1=Y, 2=Z).
+            value (int): New angle in degrees.
+        """
+        self.oblique_angles[axis] = value
+        if self.oblique_enabled:
+            self.update_all_displays()
+            self.update_cross_view_lines()
+
+    def reset_oblique_rotation(self):
+        """Bring the oblique planes back to the canonical orientation."""
+        for slider in self.oblique_sliders:
+            slider.blockSignals(True)
+            slider.setValue(0)
+            slider.blockSignals(False)
+        for spinbox in self.oblique_spins:
+            spinbox.blockSignals(True)
+            spinbox.setValue(0)
+            spinbox.blockSignals(False)
+        self.oblique_angles = [0, 0, 0]
+        if self.oblique_enabled:
+            self.update_all_displays()
+            self.update_cross_view_lines()
+
+    def compute_oblique_geometry(self, plane_idx):
+        """
+        Compute the sampling grid of a rotated plane passing through the current voxel.
+
+        The output grid is isotropic (spacing equal to the smallest voxel size) and,
+        with no rotation, coincides with the canonical slice displayed for the plane.
+        Rotations are applied in mm space around the current voxel.
+
+        Args:
+            plane_idx (int): Index of the anatomical plane (0=axial, 1=coronal, 2=sagittal).
+
+        Returns:
+            tuple: (origin, du, dv, width, height, crosshair) where origin/du/dv are
+            voxel-space vectors for `reslice_*_numba` and crosshair is the (column, row)
+            position of the current voxel in the output image.
+        """
+        shape = np.array(self.img_data.shape[:3])
+        vs = np.asarray(self.voxel_sizes, dtype=np.float64)
+        spacing = float(vs.min())
+        extent = (shape - 1) * vs
+        center = np.asarray(self.current_coordinates, dtype=np.float64) * vs
+
+        # In-plane axes (columns, rows) and top-left corner of the canonical slice, in mm
+        if plane_idx == 0:  # Axial (XY plane)
+            u, v = np.array([1.0, 0, 0]), np.array([0, -1.0, 0])
+            corner = np.array([0, extent[1], center[2]])
+            extent_u, extent_v = extent[0], extent[1]
+        elif plane_idx == 1:  # Coronal (XZ plane)
+            u, v = np.array([1.0, 0, 0]), np.array([0, 0, -1.0])
+            corner = np.array([0, center[1], extent[2]])
+            extent_u, extent_v = extent[0], extent[2]
+        else:  # Sagittal (YZ plane)
+            u, v = np.array([0, 1.0, 0]), np.array([0, 0, -1.0])
+            corner = np.array([center[0], 0, extent[2]])
+            extent_u, extent_v = extent[1], extent[2]
+
+        rotation = rotation_matrix(self.oblique_angles)
+        origin = (center + rotation @ (corner - center)) / vs
+        du = spacing * (rotation @ u) / vs
+        dv = spacing * (rotation @ v) / vs
+        width = int(round(extent_u / spacing)) + 1
+        height = int(round(extent_v / spacing)) + 1
+        crosshair = ((center - corner) @ u / spacing, (center - corner) @ v / spacing)
+        return origin, du, dv, width, height, crosshair
+
+    def oblique_slice(self, data, plane_idx, interpolate=True):
+        """
+        Sample the current oblique plane from a 3D volume.
+
+        Args:
+            data (np.ndarray): 3D volume aligned with the base image.
+            plane_idx (int): Index of the anatomical plane.
+            interpolate (bool, optional): Trilinear interpolation if True, nearest
+                neighbour otherwise (for masks and labels). Defaults to True.
+
+        Returns:
+            np.ndarray: 2D resliced image in display orientation.
+        """
+        origin, du, dv, width, height, _ = self.oblique_geometry[plane_idx]
+        if interpolate:
+            out = np.empty((height, width), dtype=np.float32)
+            return reslice_trilinear_numba(data, origin, du, dv, out)
+        out = np.empty((height, width), dtype=data.dtype)
+        return reslice_nearest_numba(data, origin, du, dv, out)
+
     def toggle_time_controls(self, enabled):
         """
         Enable or disable time navigation controls based on data dimensionality.
@@ -1560,6 +2554,200 @@ class NiftiViewer(QMainWindow):
         self.time_spin.setVisible(value)
         self.time_spin.setEnabled(value)
         self.time_point_label.setVisible(value)
+        self.cine_widget.setVisible(value)
+        self.cine_fps_label.setVisible(value)
+        if not value:
+            self.cine_play_btn.setChecked(False)
+
+    def toggle_cine(self, enabled):
+        """
+        Start or pause cine playback of the 4D frames.
+
+        While playing, a background thread pre-renders the next frames into a bounded
+        cache, and each timer tick only displays the frame due at that time.
+
+        Args:
+            enabled (bool): Whether playback is running.
+        """
+        if enabled and (self.img_data is None or not self.is_4d):
+            self.cine_play_btn.setChecked(False)
+            return
+
+        if enabled:
+            self.cine_play_btn.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Pause"))
+            self.cine_skipped = 0
+            self.cine_plot_background = None
+            self.profiler.frame_times.clear()
+            self.cine_profiler.reset()
+
+            self.cine_thread = CinePrefetchThread(
+                self.render_cine_frame, self.cine_cache, self.dims[3],
+                lookahead=self.cine_lookahead, loop=self.cine_loop_checkbox.isChecked()
+            )
+            self.cine_thread.set_playhead(self.current_time, self.cine_state_key())
+            self.cine_thread.start()
+
+            self.restart_cine_clock()
+            self.cine_timer.start(max(1, int(1000 / self.cine_fps_spin.value())))
+        else:
+            self.cine_play_btn.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Play"))
+            self.stop_cine_thread()
+            self.cine_plot_background = None
+            if self.img_data is not None:
+                # Full refresh, including the time-activity curve
+                self.update_all_displays()
+
+    def stop_cine_thread(self):
+        """Stop the cine timer and the prefetch thread, and drop the cached frames."""
+        if self.cine_timer is not None:
+            self.cine_timer.stop()
+        if self.cine_thread is not None:
+            self.cine_thread.cancel()
+            self.cine_thread.wait()
+            self.cine_thread.deleteLater()
+            self.cine_thread = None
+        self.cine_cache.clear()
+
+    def cine_fps_changed(self, value):
+        """
+        Apply a new target frame rate to the running playback.
+
+        Args:
+            value (int): Target frames per second.
+        """
+        if self.cine_timer.isActive():
+            self.restart_cine_clock()
+            self.cine_timer.start(max(1, int(1000 / value)))
+
+    def restart_cine_clock(self):
+        """Restart the playback clock from the current frame."""
+        self.cine_start_time = time.perf_counter()
+        self.cine_start_frame = self.current_time
+        self.cine_last_step = 0
+
+    def cine_state_key(self):
+        """
+        Identify everything the rendering of a frame depends on besides the frame.
+
+        Returns:
+            tuple: Hashable key; cached frames rendered for another key are not reused.
+        """
+        return (
+            tuple(self.current_slices), self.colormap, self.projection_mode,
+            self.oblique_enabled, tuple(self.oblique_angles), id(self.derived_volume),
+        ) + self.overlay_state_key()
+
+    def render_cine_frame(self, frame):
+        """
+        Render the three planes of a frame (called from the prefetch thread).
+
+        Args:
+            frame (int): Time frame index.
+
+        Returns:
+            list[tuple[np.ndarray, tuple]]: (RGBA image, pixel spacing) for each plane.
+        """
+        rendered = []
+        for i in range(3):
+            with self.render_lock:
+                rendered.append(self.render_plane(i, frame, self.cine_profiler))
+        return rendered
+
+    def update_cine_time_indicator(self, frame):
+        """
+        Move the time indicator of the curve without redrawing the whole plot.
+
+        The plot without the indicator is saved once, then every frame only restores
+        it and draws the indicator line on top (blitting).
+
+        Args:
+            frame (int): Time frame index.
+        """
+        if self.time_indicator_line is None or self.time_plot_canvas is None:
+            return
+        canvas = self.time_plot_canvas
+        size = (canvas.width(), canvas.height())
+        if self.cine_plot_background is None or self.cine_plot_background[0] != size:
+            self.time_indicator_line.set_animated(True)
+            canvas.draw()
+            self.cine_plot_background = (size, canvas.copy_from_bbox(self.time_plot_figure.bbox))
+
+        canvas.restore_region(self.cine_plot_background[1])
+        self.time_indicator_line.set_xdata([frame, frame])
+        self.time_plot_axes.draw_artist(self.time_indicator_line)
+        canvas.blit(self.time_plot_figure.bbox)
+
+    def cine_tick(self):
+        """
+        Display the frame due at the current time of the playback clock.
+
+        The due frame is derived from the elapsed time, so when rendering falls
+        behind the target rate the intermediate frames are skipped instead of
+        slowing playback down.
+        """
+        if self.img_data is None or not self.is_4d:
+            self.cine_play_btn.setChecked(False)
+            return
+
+        n_frames = self.dims[3]
+        step = int((time.perf_counter() - self.cine_start_time) * self.cine_fps_spin.value())
+        if step == self.cine_last_step:
+            return  # Next frame not due yet
+        self.cine_skipped += max(0, step - self.cine_last_step - 1)
+        self.cine_last_step = step
+
+        frame = self.cine_start_frame + step
+        if frame >= n_frames:
+            if not self.cine_loop_checkbox.isChecked():
+                self.show_cine_frame(n_frames - 1)
+                self.cine_play_btn.setChecked(False)
+                return
+            frame %= n_frames
+        self.show_cine_frame(frame)
+
+    def show_cine_frame(self, frame):
+        """
+        Display a frame during playback, from the prefetch cache when available.
+
+        Only the planes and the time indicator of the curve are refreshed.
+
+        Args:
+            frame (int): Time frame index.
+        """
+        try:
+            state_key = self.cine_state_key()
+            rendered = self.cine_cache.get((state_key, frame))
+            self.profiler.cache("cine", rendered is not None)
+            self.current_time = frame
+            if self.cine_thread is not None:
+                self.cine_thread.set_playhead(frame, state_key)
+            if rendered is None:
+                # Not prefetched (yet): render synchronously
+                with self.render_lock:
+                    rendered = [self.render_plane(i, frame) for i in range(3)]
+
+            for plane_idx, (rgba, pixel_spacing) in enumerate(rendered):
+                self.show_plane_image(plane_idx, rgba, pixel_spacing)
+
+            for widget in (self.time_slider, self.time_spin):
+                widget.blockSignals(True)
+                widget.setValue(frame)
+                widget.blockSignals(False)
+
+            self.update_cine_time_indicator(frame)
+            if self.roi_stats is not None:
+                self.roi_stats_panel.set_summary(self.roi_stats.summary(frame))
+
+            self.profiler.frame()
+            self.cine_fps_label.setText(
+                QtCore.QCoreApplication.translate("NIfTIViewer", "Achieved") +
+                f": {self.profiler.fps():.1f} fps, " +
+                QtCore.QCoreApplication.translate("NIfTIViewer", "skipped") + f": {self.cine_skipped}"
+            )
+            if self.render_hud.isVisible():
+                self.render_hud.set_summary(self.profiler.summary())
+        except Exception as e:
+            log.error(f"Error showing cine frame {frame}: {e}")
 
     def colormap_changed(self, colormap_name,update_all=True):
         """
@@ -1596,6 +2784,15 @@ class NiftiViewer(QMainWindow):
         if img_coords is None:
             return
 
+        self.set_current_coordinates(img_coords)
+
+    def set_current_coordinates(self, img_coords):
+        """
+        Move the crosshair to a voxel and synchronize the slices, controls and views.
+
+        Args:
+            img_coords (list[int]): Voxel indices [x, y, z] of the base image.
+        """
         # Update global coordinates
         self.current_coordinates = img_coords
 
@@ -1633,6 +2830,13 @@ class NiftiViewer(QMainWindow):
         if self.img_data is None:
             return None
 
+        # Oblique planes: map the output pixel back through the sampling grid
+        if self.oblique_enabled and view_idx in self.oblique_geometry:
+            origin, du, dv, _, _, _ = self.oblique_geometry[view_idx]
+            voxel = origin + x * du + y * dv
+            shape = self.img_data.shape[:3]
+            return [int(min(max(round(voxel[i]), 0), shape[i] - 1)) for i in range(3)]
+
         # Compensate for view stretching
         stretch_x, stretch_y = self.stretch_factors.get(view_idx, (1.0, 1.0))
         x = x / stretch_x
@@ -1681,7 +2885,9 @@ class NiftiViewer(QMainWindow):
 
         # Retrieve voxel value safely
         try:
-            if self.is_4d:
+            if self.derived_volume is not None:
+                value = self.derived_value(img_coords)
+            elif self.is_4d:
                 value = self.img_data[img_coords[0], img_coords[1], img_coords[2], self.current_time]
             else:
                 value = self.img_data[img_coords[0], img_coords[1], img_coords[2]]
@@ -1691,6 +2897,13 @@ class NiftiViewer(QMainWindow):
                 "NIfTIViewer", "Coordinates") + f": ({img_coords[0]}, {img_coords[1]}, {img_coords[2]})")
             self.value_label.setText(QtCore.QCoreApplication.translate(
                 "NIfTIViewer", "Value") + f": {value:.2f}")
+
+            # Hovering a region shows its precomputed TAC (redrawn only when the region changes)
+            if self.label_tacs is not None and self.overlay_label_mode and self.overlay_enabled:
+                label = int(self.overlay_label_data[img_coords[0], img_coords[1], img_coords[2]])
+                if label != self.hovered_label:
+                    self.hovered_label = label
+                    self.update_time_series_plot(label=label if label > 0 else None)
         except (IndexError, ValueError):
             log.exception("Failed to update coordinates")
 
@@ -1718,7 +2931,9 @@ class NiftiViewer(QMainWindow):
 
         # Update value label safely
         try:
-            if self.is_4d:
+            if self.derived_volume is not None:
+                value = self.derived_value(coords)
+            elif self.is_4d:
                 value = self.img_data[coords[0], coords[1], coords[2], self.current_time]
             else:
                 value = self.img_data[coords[0], coords[1], coords[2]]
@@ -1740,6 +2955,13 @@ class NiftiViewer(QMainWindow):
 
         coords = self.current_coordinates
 
+        if self.oblique_enabled:
+            # The oblique planes always pass through the current voxel
+            for i, view in enumerate(self.views):
+                self.oblique_geometry[i] = self.compute_oblique_geometry(i)
+                view.set_crosshair_position(*self.oblique_geometry[i][5])
+            return
+
         for i, view in enumerate(self.views):
             # Retrieve stretch correction factors (default to 1.0)
             stretch_x, stretch_y = self.stretch_factors.get(i, (1.0, 1.0))
@@ -1766,81 +2988,235 @@ class NiftiViewer(QMainWindow):
 
         try:
             log.debug(f"Update display: {plane_idx}")
-            # Select current 3D volume (for 4D data, use the selected time frame)
-            if self.is_4d:
-                current_data = self.img_data[..., self.current_time]
+            with self.render_lock:
+                rendered = self.render_plane(plane_idx)
+            if rendered is None:
+                return  # Invalid plane index
+            self.show_plane_image(plane_idx, *rendered)
+            log.debug("Updated display ended")
+        except Exception as e:
+            # Log any display update errors (e.g. shape mismatch or memory issue)
+            log.error(f"Error updating display {plane_idx}: {e}")
+
+    def render_plane(self, plane_idx, frame=None, profiler=None):
+        """
+        Render a plane into an RGBA image (slice extraction, colormap and overlays).
+
+        This step only uses numpy/numba and no Qt objects, so it can also run in the
+        cine prefetch thread.
+
+        Args:
+            plane_idx (int): Index of the anatomical plane (0=axial, 1=coronal, 2=sagittal).
+            frame (int, optional): Time frame for 4D data. Defaults to the current one.
+            profiler (RenderProfiler, optional): Collector of the stage timings.
+                Defaults to the viewer profiler.
+
+        Returns:
+            tuple[np.ndarray, tuple] | None: (uint8 RGBA image, pixel spacing in mm),
+            or None for an invalid plane index.
+        """
+        profiler = profiler if profiler is not None else self.profiler
+        frame = frame if frame is not None else self.current_time
+        t = time.perf_counter()
+        if self.dicom_series is not None:
+            # Decode only the DICOM files the rendered plane cuts through
+            if self.oblique_enabled:
+                self.dicom_series.ensure_frame(frame)
             else:
-                current_data = self.img_data
+                self.dicom_series.ensure_slice(plane_idx, self.current_slices[plane_idx], frame)
+            t = profiler.lap("dicom_decode", t)
 
-            # Get current slice index for the selected plane
-            slice_idx = self.current_slices[plane_idx]
+        # Select current 3D volume (for 4D data, use the selected time frame)
+        if self.is_4d:
+            current_data = self.img_data[..., frame]
+        else:
+            current_data = self.img_data
 
-            # Extract the corresponding slice depending on the plane
-            if plane_idx == 0:  # Axial (XY plane)
-                slice_data = current_data[:, :, slice_idx].T  # transpose to match orientation
-                slice_data = np.flipud(slice_data)  # flip vertically for correct visualization
-                pixel_spacing = self.voxel_sizes[0:2]  # spacing in X and Y directions
+        # Get current slice index for the selected plane
+        slice_idx = self.current_slices[plane_idx]
 
-            elif plane_idx == 1:  # Coronal (XZ plane)
-                slice_data = current_data[:, slice_idx, :].T
-                slice_data = np.flipud(slice_data)
-                pixel_spacing = (self.voxel_sizes[0], self.voxel_sizes[2])  # X and Z spacing
+        # Extract the corresponding slice depending on the plane
+        if plane_idx == 0:  # Axial (XY plane)
+            slice_data = current_data[:, :, slice_idx].T  # transpose to match orientation
+            slice_data = np.flipud(slice_data)  # flip vertically for correct visualization
+            pixel_spacing = self.voxel_sizes[0:2]  # spacing in X and Y directions
 
-            elif plane_idx == 2:  # Sagittal (YZ plane)
-                slice_data = current_data[slice_idx, :, :].T
-                slice_data = np.flipud(slice_data)
-                pixel_spacing = self.voxel_sizes[1:3]  # Y and Z spacing
+        elif plane_idx == 1:  # Coronal (XZ plane)
+            slice_data = current_data[:, slice_idx, :].T
+            slice_data = np.flipud(slice_data)
+            pixel_spacing = (self.voxel_sizes[0], self.voxel_sizes[2])  # X and Z spacing
 
-            else:
-                log.error("Plane index out of range")
-                return  # Invalid plane index
+        elif plane_idx == 2:  # Sagittal (YZ plane)
+            slice_data = current_data[slice_idx, :, :].T
+            slice_data = np.flipud(slice_data)
+            pixel_spacing = self.voxel_sizes[1:3]  # Y and Z spacing
+
+        else:
+            log.error("Plane index out of range")
+            return None
+
+        if self.derived_volume is not None:
+            # Derived volumes are evaluated only for the displayed slice
+            slice_data = self.derived_display_slice(plane_idx, slice_idx, frame)
+            overlay_slices = self.overlay_slices(plane_idx, slice_idx)
+        elif self.projection_mode is not None:
+            # Projections replace the slice; overlays and ROIs are slice-specific and not drawn
+            slice_data = np.flipud(self.get_projection(plane_idx, frame).T)
+            overlay_slices = (None,) * 4
+        elif self.oblique_enabled:
+            # Resample the rotated plane on an isotropic grid, only at the output pixels
+            self.oblique_geometry[plane_idx] = self.compute_oblique_geometry(plane_idx)
+            slice_data = self.oblique_slice(current_data, plane_idx)
+            spacing = float(np.min(self.voxel_sizes))
+            pixel_spacing = (spacing, spacing)
+            overlay_slices = tuple(self.oblique_slice(volume, plane_idx, False) if volume is not None else None
+                                   for volume in self.overlay_volumes())
+        else:
+            overlay_slices = self.overlay_slices(plane_idx, slice_idx)
+        t = profiler.lap("slice", t)
+
+        # Prepare RGBA composite for display
+        rgba_image = self.apply_colormap_matplotlib(slice_data, self.colormap)
+        t = profiler.lap("colormap", t)
+
+        rgba_image = self.composite_overlays(rgba_image, overlay_slices)
+        t = profiler.lap("overlay", t)
+
+        # Convert RGBA data to 8-bit format for QImage
+        rgba_data_uint8 = (rgba_image * 255).astype(np.uint8)
+        profiler.lap("to_uint8", t)
+        return rgba_data_uint8, tuple(pixel_spacing)
+
+    def overlay_volumes(self):
+        """
+        Collect the volumes drawn on top of the image, in blending order.
 
-            automaticROI_slice = _slice(self.automaticROI_data, plane_idx, slice_idx) if self.automaticROI_overlay and self.automaticROI_data is not None else None
+        Returns:
+            tuple: (automatic ROI, thresholded overlay, label map, incremental ROI);
+            disabled or missing layers are None.
+        """
+        return (
+            self.automaticROI_data if self.automaticROI_overlay else None,
+            self.overlay_thresholded_data if self.overlay_enabled and not self.overlay_label_mode and self.overlay_data is not None else None,
+            self.overlay_label_data if self.overlay_enabled and self.overlay_label_mode else None,
+            self.incrementalROI_data if self.incrementalROI_enabled else None,
+        )
 
-            # Prepare overlay if available and enabled
-            overlay_slice = _slice(self.overlay_thresholded_data,plane_idx, slice_idx)  if self.overlay_enabled and self.overlay_data is not None and self.overlay_thresholded_data is not None else None
+    def overlay_slices(self, plane_idx, slice_idx):
+        """
+        Extract the slices of the enabled overlay layers.
 
-            incrementalROI_slice = _slice(self.incrementalROI_data,plane_idx, slice_idx) if self.incrementalROI_enabled and self.incrementalROI_data is not None else None
+        Args:
+            plane_idx (int): Index of the anatomical plane (0=axial, 1=coronal, 2=sagittal).
+            slice_idx (int): Slice index along the plane normal.
 
-            # Prepare RGBA composite for display
-            height, width = slice_data.shape
-            rgba_image = self.apply_colormap_matplotlib(slice_data, self.colormap)
+        Returns:
+            tuple: Slices in the order of `overlay_volumes` (None for disabled layers).
+        """
+        return tuple(_slice(volume, plane_idx, slice_idx) if volume is not None else None
+                     for volume in self.overlay_volumes())
 
-            if automaticROI_slice is not None:
-                rgba_image = self.create_overlay_composite(rgba_image, automaticROI_slice, self.colormap)
+    def composite_overlays(self, rgba_image, overlay_slices):
+        """
+        Blend the overlay layers into a colormapped slice.
 
-            if overlay_slice is not None:
-                rgba_image = self.create_overlay_composite(rgba_image, overlay_slice, self.colormap)
+        Args:
+            rgba_image (np.ndarray): Base image (H, W, 4) in float format, modified in place.
+            overlay_slices (tuple): Output of `overlay_slices`.
 
-            if incrementalROI_slice is not None:
-                rgba_image = self.create_overlay_composite(rgba_image, incrementalROI_slice, self.colormap)
+        Returns:
+            np.ndarray: Composite RGBA image (0–1 range).
+        """
+        automaticROI_slice, overlay_slice, label_slice, incrementalROI_slice = overlay_slices
+        if automaticROI_slice is not None:
+            rgba_image = self.create_overlay_composite(rgba_image, automaticROI_slice, self.colormap)
 
-            # Convert RGBA data to 8-bit format for QImage
-            rgba_data_uint8 = (rgba_image * 255).astype(np.uint8)
-            qimage = QImage(rgba_data_uint8.data, width, height, width * 4, QImage.Format.Format_RGBA8888)
+        if overlay_slice is not None:
+            rgba_image = self.create_overlay_composite(rgba_image, overlay_slice, self.colormap)
 
-            if qimage is not None:
-                img_w, img_h = qimage.width(), qimage.height()
+        if label_slice is not None:
+            rgba_image = self.create_label_composite(rgba_image, label_slice)
 
-                # Scale the image according to voxel size ratio (convert to mm scale)
-                qimage_scaled = qimage.scaled(
-                    int(img_w),
-                    int(img_h * (pixel_spacing[1] / pixel_spacing[0])),
-                    Qt.AspectRatioMode.IgnoreAspectRatio,
-                    Qt.TransformationMode.SmoothTransformation
-                )
+        if incrementalROI_slice is not None:
+            rgba_image = self.create_overlay_composite(rgba_image, incrementalROI_slice, self.colormap)
+        return rgba_image
 
-                # Store stretch factors for coordinate conversion later
-                self.stretch_factors[plane_idx] = (1.0, pixel_spacing[1] / pixel_spacing[0])
+    def overlay_state_key(self):
+        """
+        Identify the state of the overlay layers, for caches of composited images.
 
-                # Update QGraphicsScene and QGraphicsView with new image
-                self.pixmap_items[plane_idx].setPixmap(QPixmap.fromImage(qimage_scaled))
-                self.scenes[plane_idx].setSceneRect(0, 0, qimage_scaled.width(), qimage_scaled.height())
-                self.views[plane_idx].fitInView(self.scenes[plane_idx].sceneRect(), Qt.AspectRatioMode.KeepAspectRatio)
-            log.debug("Updated display ended")
-        except Exception as e:
-            # Log any display update errors (e.g. shape mismatch or memory issue)
-            log.error(f"Error updating display {plane_idx}: {e}")
+        Returns:
+            tuple: Hashable key changing whenever the blended layers would change.
+        """
+        label_alpha = self.overlay_label_lut[:, 3].tobytes() if self.overlay_label_lut is not None else None
+        return (
+            self.overlay_alpha, self.overlay_enabled, self.overlay_label_mode, self.overlay_threshold, label_alpha,
+            id(self.overlay_thresholded_data),
+            self.automaticROI_overlay, id(self.automaticROI_data),
+            self.incrementalROI_enabled, id(self.incrementalROI_data),
+        )
+
+    def render_lightbox_bases(self, plane_idx, slice_indices, frame=None):
+        """
+        Colormap several slices of a plane at once, in parallel over the tiles.
+
+        Args:
+            plane_idx (int): Index of the anatomical plane (0=axial, 1=coronal, 2=sagittal).
+            slice_indices (list[int]): Slices to render.
+            frame (int, optional): Time frame for 4D data. Defaults to the current one.
+
+        Returns:
+            np.ndarray: Float32 RGBA tiles of shape (N, H, W, 4).
+        """
+        frame = frame if frame is not None else self.current_time
+        if self.dicom_series is not None:
+            for s in slice_indices:
+                self.dicom_series.ensure_slice(plane_idx, s, frame)
+        current_data = self.img_data[..., frame] if self.is_4d else self.img_data
+        if self.derived_volume is not None:
+            slices = [self.derived_display_slice(plane_idx, s, frame) for s in slice_indices]
+        else:
+            slices = [_slice(current_data, plane_idx, s) for s in slice_indices]
+        tiles = np.ascontiguousarray(np.stack(slices), dtype=np.float32)
+        out = np.empty(tiles.shape + (4,), dtype=np.float32)
+        apply_colormap_tiles_numba(tiles, colormap_lut(self.colormap), out)
+        return out
+
+    def show_plane_image(self, plane_idx, rgba_data_uint8, pixel_spacing):
+        """
+        Display a rendered RGBA image in a plane view, scaled to mm.
+
+        Args:
+            plane_idx (int): Index of the anatomical plane (0=axial, 1=coronal, 2=sagittal).
+            rgba_data_uint8 (np.ndarray): Image of shape (H, W, 4), dtype uint8.
+            pixel_spacing (tuple[float, float]): Pixel size in mm along width and height.
+        """
+        t = time.perf_counter()
+        height, width = rgba_data_uint8.shape[:2]
+        qimage = QImage(rgba_data_uint8.data, width, height, width * 4, QImage.Format.Format_RGBA8888)
+        t = self.profiler.lap("qimage", t)
+
+        if qimage is not None:
+            img_w, img_h = qimage.width(), qimage.height()
+
+            # Scale the image according to voxel size ratio (convert to mm scale)
+            qimage_scaled = qimage.scaled(
+                int(img_w),
+                int(img_h * (pixel_spacing[1] / pixel_spacing[0])),
+                Qt.AspectRatioMode.IgnoreAspectRatio,
+                Qt.TransformationMode.SmoothTransformation
+            )
+            t = self.profiler.lap("scale", t)
+
+            # Store stretch factors for coordinate conversion later
+            self.stretch_factors[plane_idx] = (1.0, pixel_spacing[1] / pixel_spacing[0])
+
+            # Update QGraphicsScene and QGraphicsView with new image
+            self.pixmap_items[plane_idx].setPixmap(QPixmap.fromImage(qimage_scaled))
+            self.scenes[plane_idx].setSceneRect(0, 0, qimage_scaled.width(), qimage_scaled.height())
+            t = self.profiler.lap("pixmap", t)
+            self.views[plane_idx].fitInView(self.scenes[plane_idx].sceneRect(), Qt.AspectRatioMode.KeepAspectRatio)
+            self.profiler.lap("fit_in_view", t)
 
     def setup_time_series_plot(self):
         """Setup time series plot for 4D data"""
@@ -1878,17 +3254,41 @@ class NiftiViewer(QMainWindow):
         self.fourth_title.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Image Information"))
         self.info_text.show()
 
-    def update_time_series_plot(self):
-        """Update the time series plot with current voxel or ROI data"""
+    def update_time_series_plot(self, label=None):
+        """
+        Update the time series plot with current voxel or ROI data.
+
+        Args:
+            label (int, optional): Label whose TAC is shown in label map mode, instead
+                of the label under the crosshair (e.g. the hovered region).
+        """
         if not self.is_4d or self.time_plot_canvas is None or self.img_data is None:
             return
 
         try:
+            t = time.perf_counter()
             coords = self.current_coordinates
             bool_in_mask = False
+            if self.dicom_series is not None:
+                self.dicom_series.ensure_voxel(*coords)
 
             # Check if overlay is active and apply ROI-based averaging
-            if self.overlay_data is not None and self.overlay_enabled:
+            if self.overlay_label_mode and self.overlay_enabled:
+                if label is None:
+                    label = self.overlay_label_data[coords[0], coords[1], coords[2]]
+                if label > 0 and self.overlay_label_lut[label, 3] > 0:
+                    bool_in_mask = True
+                    if self.label_tacs is not None and label in self.label_tacs:
+                        # Precomputed curve of the region
+                        time_series, std_series = self.label_tacs.curve(label)
+                    else:
+                        roi_voxels = self.raw_data[self.overlay_label_data == label, :]
+                        time_series = roi_voxels.mean(axis=0)
+                        std_series = roi_voxels.std(axis=0)
+                else:
+                    time_series = self.img_data[coords[0], coords[1], coords[2], :]
+                    std_series = None
+            elif self.overlay_data is not None and self.overlay_enabled:
                 overlay_max = np.max(self.overlay_data) if np.max(self.overlay_data) > 0 else 1
                 threshold_value = self.overlay_threshold * overlay_max
                 threshold_mask = self.overlay_data > threshold_value
@@ -1908,11 +3308,14 @@ class NiftiViewer(QMainWindow):
                 time_series = self.img_data[coords[0], coords[1], coords[2], :]
                 std_series = None
 
+            t = self.profiler.lap("tac_extract", t)
+
             # X-axis values = time points
             time_points = np.arange(self.dims[3])
 
-            # Clear previous plot content
+            # Clear previous plot content (the cine background is no longer valid)
             self.time_plot_axes.clear()
+            self.cine_plot_background = None
             self.time_plot_axes.set_facecolor('black')
 
             # Plot time series curve
@@ -1937,7 +3340,9 @@ class NiftiViewer(QMainWindow):
                                            color='white')
 
             # Title reflects whether inside ROI or single voxel
-            if bool_in_mask:
+            if bool_in_mask and self.overlay_label_mode:
+                self.time_plot_axes.set_title(f'Mean in label {label}', color='white')
+            elif bool_in_mask:
                 self.time_plot_axes.set_title(f'Mean in overlay mask', color='white')
             else:
                 self.time_plot_axes.set_title(f'Voxel ({coords[0]}, {coords[1]}, {coords[2]})', color='white')
@@ -1949,6 +3354,7 @@ class NiftiViewer(QMainWindow):
 
             # Redraw updated plot on canvas
             self.time_plot_canvas.draw()
+            self.profiler.lap("tac_plot", t)
 
         except Exception as e:
             # Log error if plotting fails (e.g., index error)
@@ -1972,6 +3378,7 @@ class NiftiViewer(QMainWindow):
 
     def update_all_displays(self):
         """Update all plane displays"""
+        t = time.perf_counter()
         # Loop over all 3 orthogonal views (axial, coronal, sagittal)
         for i in range(3):
             self.update_display(i)
@@ -1994,6 +3401,238 @@ class NiftiViewer(QMainWindow):
                               f": {self.current_time + 1}/{self.dims[3]}"
             self.slice_info_label.setText(slice_info)
 
+        if self.lightbox is not None and self.lightbox.isVisible():
+            self.lightbox.refresh()
+        if self.comparison is not None and self.comparison.isVisible():
+            self.comparison.refresh()
+
+        self.profiler.lap("frame", t)
+        self.profiler.frame()
+        if self.render_hud.isVisible():
+            self.render_hud.set_summary(self.profiler.summary())
+
+    def derived_changed(self, update_all=True):
+        """
+        Build the derived volume selected in the dropdown from the loaded volumes.
+
+        Nothing is computed here besides small per-frame quantities: the volume is
+        evaluated lazily by the displayed slices.
+
+        Args:
+            update_all (bool, optional): Whether to refresh the views. Defaults to True.
+        """
+        kind = self.derived_combo.currentData()
+        self.derived_frames_widget.setVisible(kind == "frame_sum")
+        self.derived_operand_btn.setVisible(kind == "difference")
+        self.derived_volume = None
+        self.derived_info_label.setText("")
+
+        if kind is not None and self.img_data is not None:
+            self.ensure_full_series()
+            source = self.raw_data if self.raw_data is not None else self.img_data
+            try:
+                if kind == "suvr":
+                    self.derived_volume = self.build_suvr_volume(source)
+                elif kind == "frame_sum":
+                    self.derived_volume = self.build_frame_sum_volume(source)
+                elif kind == "difference":
+                    self.derived_volume = self.build_difference_volume(source)
+            except ValueError as e:
+                self.derived_info_label.setText(str(e))
+            except Exception as e:
+                log.error(f"Error building derived volume: {e}")
+
+        if update_all:
+            self.update_all_displays()
+            self.update_coordinate_displays()
+
+    def build_suvr_volume(self, source):
+        """
+        Ratio of the image to the mean of the overlay ROI (thresholded or visible labels).
+
+        Args:
+            source (np.ndarray): Raw image intensities.
+
+        Returns:
+            RatioToRoiMean | None: Derived volume, or None without an overlay.
+        """
+        if not self.overlay_enabled or (self.overlay_thresholded_data is None and not self.overlay_label_mode):
+            self.derived_info_label.setText(QtCore.QCoreApplication.translate(
+                "NIfTIViewer", "Enable an overlay to use as reference region."))
+            return None
+        roi = self.label_visible_mask() if self.overlay_label_mode else self.overlay_thresholded_data
+        volume = RatioToRoiMean(source, roi)
+        self.derived_info_label.setText(QtCore.QCoreApplication.translate(
+            "NIfTIViewer", "Reference mean") + f": {volume.roi_mean(self.current_time if self.is_4d else 0):.4g}")
+        return volume
+
+    def build_frame_sum_volume(self, source):
+        """
+        Sum of the selected frames weighted by FrameDuration / sum(FrameDuration).
+
+        Weights come from the JSON sidecar of the image (uniform weights if missing),
+        as in the pipeline's static PET image.
+
+        Args:
+            source (np.ndarray): Raw 4D image intensities.
+
+        Returns:
+            WeightedFrameSum | None: Derived volume, or None for 3D images.
+        """
+        if not self.is_4d:
+            self.derived_info_label.setText(QtCore.QCoreApplication.translate(
+                "NIfTIViewer", "A 4D image is required."))
+            return None
+        n_frames = self.dims[3]
+        weights = frame_duration_weights(self.file_path, n_frames)
+        if weights is None:
+            weights = np.full(n_frames, 1.0 / n_frames)
+            self.derived_info_label.setText(QtCore.QCoreApplication.translate(
+                "NIfTIViewer", "FrameDuration not found, using uniform weights."))
+        start, end = self.derived_frame_start.value(), self.derived_frame_end.value()
+        selected = np.zeros(n_frames)
+        selected[min(start, end):max(start, end) + 1] = 1
+        return WeightedFrameSum(source, weights * selected)
+
+    def build_difference_volume(self, source):
+        """
+        Difference between the image and the volume chosen with `select_derived_operand`.
+
+        Args:
+            source (np.ndarray): Raw image intensities.
+
+        Returns:
+            VolumeDifference | None: Derived volume, or None if no volume was chosen.
+        """
+        if self.derived_operand is None:
+            self.derived_info_label.setText(QtCore.QCoreApplication.translate(
+                "NIfTIViewer", "Select the volume to subtract."))
+            return None
+        volume = VolumeDifference(source, self.derived_operand)
+        self.derived_info_label.setText(QtCore.QCoreApplication.translate(
+            "NIfTIViewer", "Subtracting") + f": {os.path.basename(self.derived_operand_path)}")
+        return volume
+
+    def select_derived_operand(self, file_path=None):
+        """
+        Choose the volume subtracted from the image in the difference mode.
+
+        Args:
+            file_path (str, optional): Path of the volume. A file dialog is shown if None.
+        """
+        if not file_path:
+            result = NiftiFileDialog.get_files(
+                self.context,
+                allow_multiple=False,
+                has_existing_func=False,
+                label=None,
+                forced_filters=None
+            )
+            if not result:
+                return
+            file_path = result[0]
+        try:
+            img = nib.as_closest_canonical(nib.load(file_path))
+            self.derived_operand = img.get_fdata(dtype=np.float32)
+            self.derived_operand_path = file_path
+        except Exception as e:
+            log.error(f"Error loading volume {file_path}: {e}")
+            return
+        self.derived_changed()
+
+    def derived_display_slice(self, plane_idx, slice_idx, frame):
+        """
+        Evaluate a slice of the derived volume, normalized for display.
+
+        Args:
+            plane_idx (int): Index of the anatomical plane (0=axial, 1=coronal, 2=sagittal).
+            slice_idx (int): Slice index along the plane normal.
+            frame (int): Time frame.
+
+        Returns:
+            np.ndarray: Slice in display orientation, with values in the 0–1 range.
+        """
+        volume = self.derived_volume
+        hits = volume.cache_hits
+        data = volume.get_slice(plane_idx, slice_idx, frame)
+        self.profiler.cache("derived", volume.cache_hits > hits)
+        vmin, vmax = volume.display_range()
+        return np.flipud(np.clip((data - vmin) / (vmax - vmin), 0, 1).T)
+
+    def derived_value(self, coords):
+        """
+        Value of the derived volume at a voxel of the current frame.
+
+        Args:
+            coords (list[int]): Voxel coordinates (x, y, z).
+
+        Returns:
+            float: Derived value.
+        """
+        index = tuple(np.array([c]) for c in coords[:3])
+        return float(self.derived_volume.get_values(index, self.current_time if self.is_4d else 0)[0])
+
+    def reset_derived_volume(self):
+        """Drop the derived volume and its operands (e.g. when a new image is loaded)."""
+        self.derived_volume = None
+        self.derived_operand = None
+        self.derived_operand_path = None
+        self.derived_combo.blockSignals(True)
+        self.derived_combo.setCurrentIndex(0)
+        self.derived_combo.blockSignals(False)
+        self.derived_frames_widget.setVisible(False)
+        self.derived_operand_btn.setVisible(False)
+        self.derived_info_label.setText("")
+
+    def open_lightbox(self):
+        """Open (or bring to front) the lightbox mosaic window."""
+        if self.img_data is None:
+            return
+        if self.lightbox is None:
+            self.lightbox = LightboxView(self)
+        self.lightbox.show()
+        self.lightbox.raise_()
+        self.lightbox.refresh()
+
+    def open_comparison(self):
+        """Open (or bring to front) the linked multi-volume comparison window."""
+        if self.img_data is None:
+            return
+        if self.comparison is None:
+            self.comparison = ComparisonView(self)
+        self.comparison.show()
+        self.comparison.raise_()
+        self.comparison.refresh()
+
+    def toggle_render_hud(self, enabled):
+        """
+        Show or hide the render timing HUD on the axial view.
+
+        Args:
+            enabled (bool): Whether the HUD is visible.
+        """
+        self.render_hud.setVisible(enabled)
+        if enabled:
+            self.render_hud.set_summary(self.profiler.summary())
+            self.render_hud.raise_()
+
+    def export_render_timings(self):
+        """Export the recorded render timings to a JSON file chosen by the user."""
+        path, _ = QFileDialog.getSaveFileName(
+            self,
+            QtCore.QCoreApplication.translate("NIfTIViewer", "Export Render Timings"),
+            "render_timings.json",
+            "JSON (*.json)"
+        )
+        if not path:
+            return
+        try:
+            self.profiler.export_json(path, extra={"cine_prefetch": self.cine_profiler.summary()})
+            self.status_bar.showMessage(
+                QtCore.QCoreApplication.translate("NIfTIViewer", "Render timings exported to ") + path)
+        except Exception as e:
+            log.error(f"Error exporting render timings: {e}")
+
     def create_overlay_composite(self, rgba_image, overlay_slice, colormap):
         """Create a composite image with colormap base and red overlay."""
         try:
@@ -2025,6 +3664,18 @@ class NiftiViewer(QMainWindow):
             log.error(f"Error creating overlay composite: {e}")
             return rgba_image
 
+    def create_label_composite(self, rgba_image, label_slice):
+        """Blend an integer label slice into the base image through the label LUT."""
+        try:
+            if self.overlay_label_lut is None or not np.any(label_slice):
+                return rgba_image
+            rgba_image = apply_label_lut_numba(rgba_image, label_slice, self.overlay_label_lut, self.overlay_alpha)
+            return np.clip(rgba_image, 0, 1)
+
+        except Exception as e:
+            log.error(f"Error creating label composite: {e}")
+            return rgba_image
+
     def resizeEvent(self, event: QResizeEvent):
         """Handle window resize to maintain aspect ratios"""
         # Call parent resize handler
@@ -2047,6 +3698,9 @@ class NiftiViewer(QMainWindow):
 
     def automaticROI_clicked(self):
         """Handle click on 'Automatic ROI' button to start or reset the ROI tool"""
+        # Region growing and ROI statistics read the whole volume
+        self.ensure_full_series()
+
         # Save current voxel coordinates as ROI seed point
         self.automaticROI_seed_coordinates = self.current_coordinates
 
@@ -2118,6 +3772,8 @@ class NiftiViewer(QMainWindow):
         self.automaticROI_sliders_group.setEnabled(enabled)
         self.automaticROIbtn.setEnabled(enabled)
 
+        self.refresh_roi_stats()
+
         if update_all:
             # Redraw display if overlay data is available
             self.update_all_displays()
@@ -2156,6 +3812,59 @@ class NiftiViewer(QMainWindow):
         # Store result as overlay for visualization
         self.automaticROI_data = mask
 
+        # Only the union of the previous and new bounding boxes can have changed
+        bbox = (slice(x_min, x_max), slice(y_min, y_max), slice(z_min, z_max))
+        previous_bbox = self.automaticROI_bbox
+        self.automaticROI_bbox = bbox
+        if previous_bbox is not None:
+            bbox = tuple(slice(min(a.start, b.start), max(a.stop, b.stop)) for a, b in zip(bbox, previous_bbox))
+        self.refresh_roi_stats(bbox)
+
+    def roi_union_mask(self, bbox=None):
+        """
+        Compute the mask of the ROI that would be saved (overlay, incremental and automatic ROIs).
+
+        Args:
+            bbox (tuple[slice, slice, slice], optional): Restrict the computation to this region.
+
+        Returns:
+            np.ndarray: Boolean mask of the region (full volume if `bbox` is None).
+        """
+        region = bbox if bbox is not None else (slice(None),) * 3
+        shape = tuple(len(range(*s.indices(n))) for s, n in zip(region, self.img_data.shape[:3]))
+        mask = np.zeros(shape, dtype=bool)
+
+        if self.overlay_enabled and self.overlay_label_mode and self.overlay_label_data is not None:
+            mask |= self.overlay_label_lut[self.overlay_label_data[region], 3] > 0
+        elif self.overlay_enabled and self.overlay_thresholded_data is not None:
+            mask |= self.overlay_thresholded_data[region]
+        if self.incrementalROI_enabled and self.incrementalROI_data is not None:
+            mask |= self.incrementalROI_data[region] > 0
+        if self.automaticROI_overlay and self.automaticROI_data is not None:
+            mask |= self.automaticROI_data[region] > 0
+        return mask
+
+    def refresh_roi_stats(self, bbox=None):
+        """
+        Update the live ROI statistics after an ROI edit.
+
+        Only the voxels entering or leaving the ROI contribute to the update, so
+        small edits do not rescan the image intensities.
+
+        Args:
+            bbox (tuple[slice, slice, slice], optional): Region where the ROI may have
+                changed. The whole volume is compared when None.
+        """
+        if self.roi_stats is None or self.img_data is None:
+            return
+        if self.roi_stats.mask.shape != self.img_data.shape[:3]:
+            return  # Statistics of a previous image, about to be replaced
+        try:
+            self.roi_stats.update(self.roi_union_mask(bbox), bbox)
+            self.roi_stats_panel.set_summary(self.roi_stats.summary(self.current_time if self.is_4d else 0))
+        except Exception as e:
+            log.error(f"Error updating ROI statistics: {e}")
+
     def ROI_save(self):
         """Save the automatically generated ROI mask to disk"""
         log.debug("Saving ROI mask to disk")
@@ -2219,7 +3928,13 @@ class NiftiViewer(QMainWindow):
         origin_dict = {}
 
         total_ROI = np.zeros(self.dims)
-        if self.overlay_data is not None and self.overlay_enabled and self.overlay_thresholded_data is not None:
+        if self.overlay_label_mode and self.overlay_enabled:
+            total_ROI = np.logical_or(self.label_visible_mask(), total_ROI).astype(np.uint8)
+            origin_dict["Original overlay"] = self.overlay_file_path
+            origin_dict["Original overlay labels"] = [
+                label for label in self.overlay_labels if self.overlay_label_lut[label, 3] > 0
+            ]
+        elif self.overlay_data is not None and self.overlay_enabled and self.overlay_thresholded_data is not None:
             total_ROI = np.logical_or(self.overlay_thresholded_data, total_ROI).astype(np.uint8)
             origin_dict["Original overlay"] = self.overlay_file_path
             origin_dict["Original overlay threshold"] = self.overlay_threshold
@@ -2318,6 +4033,7 @@ class NiftiViewer(QMainWindow):
 
         self.incrementalROI_enabled = enabled
         self.incrementalROI_checkbox.setChecked(enabled)
+        self.refresh_roi_stats()
 
         # Enable or disable overlay-related UI controls
         self.overlay_alpha_slider.setEnabled(enabled or self.automaticROI_overlay or self.overlay_enabled)
@@ -2344,8 +4060,19 @@ class NiftiViewer(QMainWindow):
                 t.deleteLater()
             self.threads.clear()
 
+        self.stop_projection_thread()
+        self.stop_cine_thread()
+        self.stop_label_tac_thread()
+        if self.lightbox is not None:
+            self.lightbox.close()
+        if self.comparison is not None:
+            self.comparison.close()
+            self.comparison.stop_workers()
+
         # Clear large data arrays to release memory
         self.img_data = None
+        self.raw_data = None
+        self.roi_stats = None
         self.overlay_data = None
 
         # Trigger garbage collection
@@ -2365,6 +4092,22 @@ class NiftiViewer(QMainWindow):
         self.overlay_data = None
         self.overlay_dims = None
         self.overlay_file_path = None
+        self.overlay_label_data = None
+        self.overlay_label_lut = None
+        self.overlay_labels = []
+        self.overlay_label_mode = False
+        self.overlay_label_like = False
+        self.overlay_label_list.clear()
+        self.overlay_label_list.setVisible(False)
+        self.stop_label_tac_thread()
+        self.label_tacs = None
+        self.hovered_label = 0
+        self.export_label_tacs_btn.setEnabled(False)
+        self.export_label_tacs_btn.setVisible(False)
+        self.overlay_label_checkbox.blockSignals(True)
+        self.overlay_label_checkbox.setChecked(False)
+        self.overlay_label_checkbox.blockSignals(False)
+        self.overlay_label_checkbox.setEnabled(False)
         # Hide and disable the overlay parameter sliders group (radius/difference)
         self.automaticROI_sliders_group.setVisible(False)
         self.automaticROI_sliders_group.setEnabled(False)
@@ -2395,6 +4138,8 @@ class NiftiViewer(QMainWindow):
 
         self.incrementalROI_data = None
         self.automaticROI_data = None
+        self.automaticROI_bbox = None
+        self.refresh_roi_stats()
 
         self.automaticROI_sliders_group.setVisible(False)
         self.automaticROI_sliders_group.setEnabled(False)
@@ -2493,6 +4238,9 @@ class NiftiViewer(QMainWindow):
 
         # File open button label
         self.open_btn.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "📁 Open NIfTI File"))
+        self.open_dicom_btn.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "📂 Open DICOM Series"))
+        self.open_dicom_btn.setToolTip(QtCore.QCoreApplication.translate(
+            "NIfTIViewer", "View a DICOM series folder, decoding only the displayed slices"))
 
         # Default file information message
         self.file_info_label.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "No file loaded"))
@@ -2520,6 +4268,13 @@ class NiftiViewer(QMainWindow):
 
         # Label for colormap and overlay control sections
         self.colormap_label.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Colormap:"))
+        self.projection_label.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Projection:"))
+        self.oblique_checkbox.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Oblique Reslicing"))
+        self.oblique_reset_btn.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Reset Rotation"))
+        for label, text in zip(self.oblique_labels, ["Rotation X:", "Rotation Y:", "Rotation Z:"]):
+            label.setText(QtCore.QCoreApplication.translate("NIfTIViewer", text))
+        self.projection_combo.setItemText(0, QtCore.QCoreApplication.translate("NIfTIViewer", "Slice"))
+        self.projection_combo.setItemText(2, QtCore.QCoreApplication.translate("NIfTIViewer", "Mean"))
         self.overlay_control_label.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Overlay Controls:"))
 
         # Overlay loading and visibility controls
@@ -2527,6 +4282,27 @@ class NiftiViewer(QMainWindow):
         self.overlay_checkbox.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Show Overlay"))
         self.alpha_overlay_label.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Overlay Transparency:"))
         self.overlay_threshold_label.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Overlay Threshold:"))
+        self.overlay_label_checkbox.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Show as Label Map"))
+        self.export_label_tacs_btn.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Export Region TACs"))
+        self.roi_stats_panel.retranslate()
+        self.render_stats_checkbox.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Show Render Stats"))
+        self.export_timings_btn.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Export Timings"))
+        self.cine_play_btn.setText(QtCore.QCoreApplication.translate(
+            "NIfTIViewer", "Pause" if self.cine_play_btn.isChecked() else "Play"))
+        self.cine_loop_checkbox.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Loop"))
+        self.lightbox_btn.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Lightbox"))
+        if self.lightbox is not None:
+            self.lightbox.retranslate()
+        self.compare_btn.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Compare Volumes"))
+        if self.comparison is not None:
+            self.comparison.retranslate()
+        self.derived_label.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Derived Volume:"))
+        self.derived_combo.setItemText(0, QtCore.QCoreApplication.translate("NIfTIViewer", "None"))
+        self.derived_combo.setItemText(1, QtCore.QCoreApplication.translate("NIfTIViewer", "Ratio to overlay ROI mean (SUVr)"))
+        self.derived_combo.setItemText(2, QtCore.QCoreApplication.translate("NIfTIViewer", "Weighted frame sum"))
+        self.derived_combo.setItemText(3, QtCore.QCoreApplication.translate("NIfTIViewer", "Difference with volume"))
+        self.derived_frames_label.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Frames:"))
+        self.derived_operand_btn.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Select Volume..."))
         self.overlay_info_label.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "No overlay loaded"))
 
         # Titles for image view panels
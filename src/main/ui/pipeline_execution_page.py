@@ -19,6 +19,12 @@ from logger import get_logger
 
 log = get_logger()
 
+# Pending QC products of a patient folder, recorded by the pipeline runner when its QC is deferred
+QC_MANIFEST = "qc_pending.json"
+# --qc-policy values of the pipeline runner; by default the QC of a patient is rendered when its card opens it
+QC_POLICIES = ("inline", "background", "on-demand")
+DEFAULT_QC_POLICY = "on-demand"
+
 
 class PipelineExecutionPage(Page):
     """
@@ -79,6 +85,8 @@ class PipelineExecutionPage(Page):
         log.debug(f"Pipeline binary path: {self.pipeline_bin_path}")
 
         self.folder_cards = {}
+        # QC folder -> QProcess rendering its pending QC on demand
+        self.qc_processes = {}
 
         # Build UI
         self._setup_ui()
@@ -236,6 +244,7 @@ class PipelineExecutionPage(Page):
         for d in self.watch_dirs:
             card = FolderCard(self.context, d)
             card.open_folder_requested.connect(self.context["tree_view"]._open_in_explorer)
+            card.qc_requested.connect(self._on_qc_requested)
             self.scroll_layout.addWidget(card)
             self.folder_cards[d] = card
 
@@ -261,9 +270,10 @@ class PipelineExecutionPage(Page):
             self.pipeline_bin_path,
             "--config", self.config_path,
             "--work-dir", self.workspace_path,
-            "--out-dir", self.pipeline_output_dir
+            "--out-dir", self.pipeline_output_dir,
+            "--qc-policy", self._qc_policy()
         ]
-        log.debug(f"{self.pipeline_bin_path} --config {self.config_path} --work-dir {self.workspace_path} --out-dir {self.pipeline_output_dir}")
+        log.debug(" ".join(cmd))
 
         self.pipeline_process.start(cmd[0], cmd[1:])
 
@@ -273,6 +283,85 @@ class PipelineExecutionPage(Page):
             self._on_pipeline_error(
                 QCoreApplication.translate("PipelineExecutionPage", "Failed to start pipeline process"))
 
+    def _qc_policy(self):
+        """
+        QC policy passed to the pipeline runner.
+
+        Read from the ``pipeline_qc_policy`` application setting; unknown values fall back
+        to the default, which defers the QC rendering to the folder cards.
+
+        Returns:
+            str: one of ``QC_POLICIES``.
+        """
+        settings = self.context.get("settings")
+        policy = DEFAULT_QC_POLICY if settings is None else settings.value("pipeline_qc_policy", DEFAULT_QC_POLICY, type=str)
+        if policy not in QC_POLICIES:
+            log.warning(f"Unknown QC policy '{policy}', using '{DEFAULT_QC_POLICY}'")
+            return DEFAULT_QC_POLICY
+        return policy
+
+    def _on_qc_requested(self, qc_folder):
+        """
+        Open the QC folder of a patient, rendering its pending QC products first.
+
+        With the deferred QC policies the pipeline only records the QC products; they are
+        rendered by the pipeline runner (``--render-qc``) when the folder is first opened.
+
+        Args:
+            qc_folder (str): QC folder of the patient.
+        """
+        if qc_folder in self.qc_processes:
+            return  # Already rendering
+        if self.pipeline_process:
+            return  # The QC folder is only rendered here once the pipeline has exited
+
+        if not os.path.exists(os.path.join(qc_folder, QC_MANIFEST)):
+            self.context["tree_view"]._open_in_explorer(qc_folder)
+            return
+
+        process = QProcess()
+        process.readyReadStandardOutput.connect(lambda: self._on_qc_output(process))
+        process.finished.connect(
+            lambda exit_code, exit_status: self._on_qc_rendered(qc_folder, exit_code, exit_status))
+        self.qc_processes[qc_folder] = process
+        self._set_qc_rendering(qc_folder, True)
+        self._log_message(
+            QCoreApplication.translate("PipelineExecutionPage", "Rendering QC for: {folder}").format(folder=qc_folder))
+
+        process.start(self.pipeline_bin_path, ["--render-qc", qc_folder])
+        if not process.waitForStarted(3000):
+            self._log_message(
+                QCoreApplication.translate("PipelineExecutionPage", "ERROR: Failed to start QC rendering"))
+            self.qc_processes.pop(qc_folder, None)
+            self._set_qc_rendering(qc_folder, False)
+
+    def _on_qc_output(self, process):
+        """Log the output of a QC rendering process."""
+        output = process.readAllStandardOutput().data().decode('utf-8').strip()
+        for line in output.split('\n'):
+            if line.startswith("LOG: "):
+                self._log_message(line[5:])
+
+    def _on_qc_rendered(self, qc_folder, exit_code, exit_status):
+        """Open the QC folder once its QC products are rendered."""
+        self.qc_processes.pop(qc_folder, None)
+        self._set_qc_rendering(qc_folder, False)
+        if exit_code != 0 or exit_status != QProcess.ExitStatus.NormalExit:
+            self._log_message(
+                QCoreApplication.translate("PipelineExecutionPage", "ERROR: QC rendering exited with code {exit_code}")
+                .format(exit_code=exit_code))
+        self.context["tree_view"]._open_in_explorer(qc_folder)
+
+    def _unlock_qc(self):
+        """Enable the QC buttons of the cards once the pipeline process has exited."""
+        for card in self.folder_cards.values():
+            card.set_qc_locked(False)
+
+    def _set_qc_rendering(self, qc_folder, rendering):
+        for card in self.folder_cards.values():
+            if card.qc_folder == qc_folder:
+                card.set_qc_rendering(rendering)
+
     # ─────────────────────────────────────────────
     # PROCESS SIGNAL HANDLERS
     # ─────────────────────────────────────────────
@@ -372,6 +461,7 @@ class PipelineExecutionPage(Page):
         self.pipeline_process = None
         for card in self.folder_cards.values():
             card.set_finished_state()
+        self._unlock_qc()
         self.context["update_main_buttons"]()
 
     def _on_pipeline_error(self, error_message):
@@ -387,6 +477,7 @@ class PipelineExecutionPage(Page):
         self.stop_button.setEnabled(False)
         self._log_message(QCoreApplication.translate("PipelineExecutionPage", "ERROR: {error_message}").format(error_message=error_message))
         self.pipeline_process = None
+        self._unlock_qc()
         self.context["update_main_buttons"]()
 
     # ─────────────────────────────────────────────
@@ -419,6 +510,8 @@ class PipelineExecutionPage(Page):
                         if sub_id in folder_name:
                             log.debug(f"Setting finished state for card: {folder_name}")
                             card.set_finished_state()
+                            # The runner may still render its QC folder
+                            card.set_qc_locked(True)
                             break
                     else:
                         log.warning(f"No matching FolderCard found for {sub_id}")
@@ -528,6 +621,7 @@ class PipelineExecutionPage(Page):
             self.stop_button.setEnabled(False)
 
             self.pipeline_process = None
+            self._unlock_qc()
             self.context["update_main_buttons"]()
 
     def _return_to_import(self):
@@ -680,6 +774,10 @@ class PipelineExecutionPage(Page):
         if self.pipeline_process and self.pipeline_process.state() == QProcess.ProcessState.Running:
             self.pipeline_process.kill()
             self.pipeline_process.waitForFinished(1000)
+        for process in getattr(self, "qc_processes", {}).values():
+            if process.state() == QProcess.ProcessState.Running:
+                process.kill()
+                process.waitForFinished(1000)
 
     def _translate_ui(self):
         """Update all translatable UI text (used for multilingual support)."""
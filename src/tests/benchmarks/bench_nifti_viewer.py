@@ -0,0 +1,404 @@
+"""
+Headless rendering benchmarks for the NIfTI viewer.
+
+Every scenario loads a synthetic volume (3D or 4D, of a given size and voxel
+anisotropy, optionally with an overlay and an automatic ROI) in an offscreen
+`NiftiViewer` and measures:
+
+- `load_s`: time spent by the loading thread reading and normalizing the image;
+- `first_frame_s`: time from `open_file` to the first displayed frame;
+- `overlay_load_s` / `roi_s`: time to load the overlay / grow the automatic ROI;
+- `render_<plane>_ms`: median time of `update_display` for each plane;
+- `sweep_slices_per_s`: axial slider sweep throughput (one render per slice);
+- `sweep_frames_per_s`: time slider sweep throughput (4D only, all planes per frame);
+- `peak_rss_mb`: peak resident memory of the scenario process.
+
+Each scenario runs in its own process so that peak memory is not shared between
+scenarios, after a warm-up load that compiles the numba kernels.
+
+Results are written as JSON and compared against the committed baseline
+(`baseline.json`): a metric regresses when it is worse than the baseline by
+more than its relative tolerance (times and memory higher, throughputs lower)
+and by more than a small absolute slack, so sub-millisecond jitter is ignored.
+
+Usage (from `src`):
+
+    python tests/benchmarks/bench_nifti_viewer.py                   # run and compare
+    python tests/benchmarks/bench_nifti_viewer.py --output out.json # also keep the results
+    python tests/benchmarks/bench_nifti_viewer.py --update-baseline # record a new baseline
+    python tests/benchmarks/bench_nifti_viewer.py --scenarios 3d_small_iso 4d_pet_labels
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+# Same layout as the test suite: `main.*` imports from src, top-level imports from src/main
+# (src must come first, or `main` would resolve to src/main/main.py)
+for path in (os.path.join(SRC_DIR, "main"), SRC_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import nibabel as nib
+import numpy as np
+from PyQt6.QtCore import Qt
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+SCENARIOS = {
+    "3d_small_iso": {"shape": (128, 128, 96), "voxel_sizes": (1.0, 1.0, 1.0)},
+    "3d_large_aniso": {"shape": (256, 256, 64), "voxel_sizes": (0.9, 0.9, 3.0), "overlay": "mask"},
+    "3d_thin_slices_roi": {"shape": (160, 160, 200), "voxel_sizes": (1.5, 1.5, 0.6), "roi": True},
+    "4d_pet_labels": {"shape": (128, 128, 64, 24), "voxel_sizes": (2.0, 2.0, 2.8), "overlay": "labels"},
+    "4d_pet_mask_roi": {"shape": (128, 128, 64, 24), "voxel_sizes": (2.0, 2.0, 2.8), "overlay": "mask",
+                        "roi": True},
+}
+"""Benchmark scenarios: image shape, voxel sizes (mm), overlay kind (None, "mask", "labels") and ROI."""
+
+DEFAULT_TOLERANCES = {"default": 0.5, "peak_rss_mb": 0.2}
+"""Relative tolerances used when the baseline does not define its own."""
+
+DEFAULT_ABSOLUTE_SLACK = {"ms": 1.0, "s": 0.05, "mb": 20.0}
+"""Changes smaller than these (by metric unit suffix) never count as regressions, whatever their relative size."""
+
+PLANES = ("axial", "coronal", "sagittal")
+
+
+def synthetic_volume(shape, seed=0):
+    """
+    Build a PET-like phantom: a bright ellipsoid with hot spots and noise.
+
+    4D volumes rise and wash out over the frames, with a different speed inside the hot spots.
+
+    Args:
+        shape (tuple[int, ...]): (X, Y, Z) or (X, Y, Z, T).
+        seed (int, optional): Seed of the noise.
+
+    Returns:
+        np.ndarray: float32 volume.
+    """
+    rng = np.random.default_rng(seed)
+    x, y, z = np.meshgrid(*(np.linspace(-1, 1, n, dtype=np.float32) for n in shape[:3]), indexing="ij")
+    body = (x ** 2 + y ** 2 + z ** 2 < 0.8).astype(np.float32)
+    spots = np.exp(-((x - 0.3) ** 2 + y ** 2 + (z + 0.2) ** 2) / 0.02) + \
+        np.exp(-((x + 0.4) ** 2 + (y - 0.3) ** 2 + z ** 2) / 0.01)
+    static = body + 3.0 * spots
+    if len(shape) == 3:
+        return (static + 0.1 * rng.standard_normal(shape[:3], dtype=np.float32)).astype(np.float32)
+
+    t = np.linspace(0.0, 1.0, shape[3], dtype=np.float32)
+    body_curve = 1.0 - np.exp(-5.0 * t)
+    spot_curve = 4.0 * t * np.exp(-2.0 * t)
+    volume = body[..., None] * body_curve + 3.0 * spots[..., None] * spot_curve
+    return (volume + 0.1 * rng.standard_normal(shape, dtype=np.float32)).astype(np.float32)
+
+
+def synthetic_overlay(shape, kind):
+    """
+    Build an overlay for a scenario.
+
+    Args:
+        shape (tuple[int, int, int]): Spatial shape.
+        kind (str): "mask" for a smooth float overlay (thresholded display),
+            "labels" for an integer atlas with 16 regions (label map display).
+
+    Returns:
+        np.ndarray: Overlay volume.
+    """
+    x, y, z = np.meshgrid(*(np.linspace(-1, 1, n, dtype=np.float32) for n in shape), indexing="ij")
+    if kind == "mask":
+        return np.clip(1.0 - 2.0 * (x ** 2 + y ** 2 + z ** 2), 0.0, 1.0).astype(np.float32)
+    labels = (1 + (x > 0) + 2 * (y > 0) + 4 * (z > 0) + 8 * (np.abs(x) > 0.5)).astype(np.int16)
+    labels[x ** 2 + y ** 2 + z ** 2 > 0.9] = 0
+    return labels
+
+
+def write_nifti(path, data, voxel_sizes):
+    """Save a volume with a diagonal affine of the given voxel sizes."""
+    nib.save(nib.Nifti1Image(data, np.diag(list(voxel_sizes) + [1.0])), path)
+
+
+def peak_rss_mb():
+    """
+    Peak resident memory of the current process.
+
+    Returns:
+        float | None: Peak RSS in MB, or None where `resource` is unavailable (Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def wait_until(app, condition, timeout=120.0):
+    """
+    Process Qt events until a condition holds.
+
+    Raises:
+        TimeoutError: If the condition does not hold within `timeout` seconds.
+    """
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("Benchmark step timed out")
+        app.processEvents()
+        time.sleep(0.0005)
+
+
+def load_image(app, viewer, path, is_overlay=False):
+    """
+    Open an image in the viewer and wait until it is displayed.
+
+    Returns:
+        tuple[float, float]: (time spent in the loading thread, time to the first displayed frame).
+    """
+    thread_done = {}
+    start = time.perf_counter()
+    viewer.open_file(path, is_overlay=is_overlay)
+    loader = viewer.threads[-1]
+    # Direct connection: recorded in the loading thread, when it emits its result
+    loader.finished.connect(lambda *args: thread_done.setdefault("t", time.perf_counter()),
+                            Qt.ConnectionType.DirectConnection)
+    wait_until(app, lambda: loader not in viewer.threads)
+    displayed = time.perf_counter()
+    return thread_done.get("t", displayed) - start, displayed - start
+
+
+def median_render_ms(viewer, plane_idx, repeats):
+    """Median time (ms) of `update_display` for one plane."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        viewer.update_display(plane_idx)
+        timings.append(time.perf_counter() - start)
+    return 1000.0 * float(np.median(timings))
+
+
+def run_scenario(name, spec, repeats=15):
+    """
+    Run a scenario in the current process.
+
+    Args:
+        name (str): Scenario name (used for the file names).
+        spec (dict): Scenario specification, see `SCENARIOS`.
+        repeats (int, optional): Renders per plane for the median render time.
+
+    Returns:
+        dict[str, float]: Metrics of the scenario.
+    """
+    from PyQt6.QtWidgets import QApplication
+    from main.ui.nifti_viewer import NiftiViewer
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    metrics = {}
+    with tempfile.TemporaryDirectory() as workspace:
+        subject_dir = os.path.join(workspace, "sub-01")
+        os.makedirs(subject_dir)
+        shape, voxel_sizes = tuple(spec["shape"]), tuple(spec["voxel_sizes"])
+
+        # Warm-up on a tiny image of the same kind: numba kernels are compiled on first use
+        warmup_path = os.path.join(subject_dir, "warmup.nii")
+        write_nifti(warmup_path, synthetic_volume((8, 8, 8) + shape[3:4]), voxel_sizes)
+        image_path = os.path.join(subject_dir, f"{name}.nii")
+        write_nifti(image_path, synthetic_volume(shape), voxel_sizes)
+        overlay_path = None
+        if spec.get("overlay"):
+            overlay_path = os.path.join(subject_dir, f"{name}_{spec['overlay']}.nii")
+            write_nifti(overlay_path, synthetic_overlay(shape[:3], spec["overlay"]), voxel_sizes)
+
+        viewer = NiftiViewer(context={"workspace_path": workspace})
+        viewer.show()
+        try:
+            load_image(app, viewer, warmup_path)
+
+            metrics["load_s"], metrics["first_frame_s"] = load_image(app, viewer, image_path)
+
+            if overlay_path is not None:
+                metrics["overlay_load_s"] = load_image(app, viewer, overlay_path, is_overlay=True)[1]
+                # Region TACs are computed in background: let them finish before timing renders
+                wait_until(app, lambda: viewer.label_tac_thread is None or viewer.label_tac_thread.isFinished())
+
+            if spec.get("roi"):
+                start = time.perf_counter()
+                viewer.automaticROI_clicked()
+                metrics["roi_s"] = time.perf_counter() - start
+
+            for plane_idx, plane in enumerate(PLANES):
+                metrics[f"render_{plane}_ms"] = median_render_ms(viewer, plane_idx, repeats)
+
+            n_slices = viewer.slice_sliders[0].maximum() + 1
+            start = time.perf_counter()
+            for value in range(n_slices):
+                viewer.slice_sliders[0].setValue(value)
+            metrics["sweep_slices_per_s"] = n_slices / (time.perf_counter() - start)
+
+            if viewer.is_4d:
+                n_frames = viewer.dims[3]
+                start = time.perf_counter()
+                for value in range(n_frames):
+                    viewer.time_slider.setValue(value)
+                metrics["sweep_frames_per_s"] = n_frames / (time.perf_counter() - start)
+        finally:
+            viewer.close()
+            app.processEvents()
+
+    rss = peak_rss_mb()
+    if rss is not None:
+        metrics["peak_rss_mb"] = rss
+    return {key: round(value, 4) for key, value in metrics.items()}
+
+
+def run_isolated(name, repeats=15):
+    """
+    Run a scenario in a separate Python process.
+
+    Returns:
+        dict[str, float]: Metrics of the scenario.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "metrics.json")
+        env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", name, "--repeats", str(repeats),
+             "--output", output],
+            check=True, cwd=SRC_DIR, env=env
+        )
+        with open(output) as f:
+            return json.load(f)
+
+
+def environment_info():
+    """Machine description stored with the results, to tell apart baselines of different machines."""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+
+
+def higher_is_better(metric):
+    """Whether a larger value of the metric is an improvement (throughputs)."""
+    return metric.endswith("_per_s")
+
+
+def compare(results, baseline):
+    """
+    Compare benchmark results against a baseline.
+
+    Scenarios or metrics missing from either side are ignored.
+
+    Args:
+        results (dict): Results, with a `scenarios` mapping of name -> metrics.
+        baseline (dict): Baseline in the same format, with optional `tolerances`
+            (metric -> relative tolerance, plus a `default`) and `absolute_slack`
+            (unit suffix -> smallest change that can be a regression).
+
+    Returns:
+        list[dict]: One entry per compared metric, with keys scenario, metric,
+        baseline, value, change (relative, positive = worse) and regression.
+    """
+    tolerances = dict(DEFAULT_TOLERANCES)
+    tolerances.update(baseline.get("tolerances", {}))
+    absolute_slack = dict(DEFAULT_ABSOLUTE_SLACK)
+    absolute_slack.update(baseline.get("absolute_slack", {}))
+    rows = []
+    for scenario, reference in baseline.get("scenarios", {}).items():
+        current = results.get("scenarios", {}).get(scenario)
+        if current is None:
+            continue
+        for metric, expected in reference.items():
+            value = current.get(metric)
+            if value is None or not expected:
+                continue
+            change = (expected - value) / expected if higher_is_better(metric) else (value - expected) / expected
+            tolerance = tolerances.get(metric, tolerances["default"])
+            slack = absolute_slack.get(metric.rsplit("_", 1)[-1], 0.0)
+            rows.append({
+                "scenario": scenario,
+                "metric": metric,
+                "baseline": expected,
+                "value": value,
+                "change": change,
+                "regression": change > tolerance and abs(value - expected) > slack,
+            })
+    return rows
+
+
+def format_report(rows):
+    """Format the comparison as a text table, regressions marked with '!!'."""
+    lines = [f"{'scenario':<20} {'metric':<22} {'baseline':>10} {'current':>10} {'change':>8}"]
+    for row in rows:
+        mark = "  !!" if row["regression"] else ""
+        lines.append(f"{row['scenario']:<20} {row['metric']:<22} {row['baseline']:>10.3f} "
+                     f"{row['value']:>10.3f} {100 * row['change']:>+7.1f}%{mark}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless rendering benchmarks for the NIfTI viewer")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), help="Scenarios to run (default: all)")
+    parser.add_argument("--output", help="JSON file where the results are written")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON to compare against")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Write the results as the new baseline (keeping its tolerances)")
+    parser.add_argument("--repeats", type=int, default=15, help="Renders per plane for the median render time")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        metrics = run_scenario(args.child, SCENARIOS[args.child], repeats=args.repeats)
+        with open(args.output, "w") as f:
+            json.dump(metrics, f)
+        return 0
+
+    results = {"environment": environment_info(), "scenarios": {}}
+    for name in args.scenarios or SCENARIOS:
+        print(f"Running {name}...", flush=True)
+        results["scenarios"][name] = run_isolated(name, repeats=args.repeats)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    if args.update_baseline:
+        baseline = baseline or {"tolerances": DEFAULT_TOLERANCES, "absolute_slack": DEFAULT_ABSOLUTE_SLACK}
+        baseline["environment"] = results["environment"]
+        baseline.setdefault("scenarios", {}).update(results["scenarios"])
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if baseline is None:
+        print(f"No baseline found at {args.baseline}")
+        return 0
+
+    rows = compare(results, baseline)
+    print(format_report(rows))
+    regressions = [row for row in rows if row["regression"]]
+    if regressions:
+        print(f"\n{len(regressions)} metric(s) regressed beyond tolerance")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
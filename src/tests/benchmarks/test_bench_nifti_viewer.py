@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+from tests.benchmarks.bench_nifti_viewer import compare, format_report, run_scenario, main, synthetic_overlay
+
+
+@pytest.fixture
+def baseline():
+    return {
+        "tolerances": {"default": 0.5, "peak_rss_mb": 0.2},
+        "absolute_slack": {"ms": 1.0, "s": 0.05, "mb": 20.0},
+        "scenarios": {"small": {"load_s": 1.0, "render_axial_ms": 10.0, "sweep_slices_per_s": 100.0,
+                                "peak_rss_mb": 500.0}},
+    }
+
+
+def _regressions(results, baseline):
+    return {row["metric"] for row in compare({"scenarios": {"small": results}}, baseline) if row["regression"]}
+
+
+class TestCompare:
+    """Tests for the comparison of benchmark results with the baseline"""
+
+    def test_within_tolerance(self, baseline):
+        results = {"load_s": 1.4, "render_axial_ms": 5.0, "sweep_slices_per_s": 60.0, "peak_rss_mb": 590.0}
+        assert _regressions(results, baseline) == set()
+
+    def test_slower_times_and_more_memory_regress(self, baseline):
+        results = {"load_s": 1.6, "render_axial_ms": 16.0, "sweep_slices_per_s": 100.0, "peak_rss_mb": 620.0}
+        assert _regressions(results, baseline) == {"load_s", "render_axial_ms", "peak_rss_mb"}
+
+    def test_lower_throughput_regresses(self, baseline):
+        assert _regressions({"sweep_slices_per_s": 40.0}, baseline) == {"sweep_slices_per_s"}
+
+    def test_absolute_slack_ignores_jitter(self, baseline):
+        baseline["scenarios"]["small"]["render_axial_ms"] = 0.5
+        assert _regressions({"render_axial_ms": 1.2}, baseline) == set()
+        assert _regressions({"render_axial_ms": 1.6}, baseline) == {"render_axial_ms"}
+
+    def test_missing_scenarios_and_metrics_are_skipped(self, baseline):
+        rows = compare({"scenarios": {"small": {"load_s": 1.0}, "other": {"load_s": 9.0}}}, baseline)
+        assert [(row["scenario"], row["metric"]) for row in rows] == [("small", "load_s")]
+        assert "load_s" in format_report(rows)
+
+
+class TestBenchmarkRun:
+    """Smoke tests of the benchmark scenarios"""
+
+    def test_labels_overlay_has_regions(self):
+        labels = synthetic_overlay((16, 16, 16), "labels")
+        assert labels.dtype.kind == "i"
+        assert len(set(labels.ravel().tolist()) - {0}) == 16
+
+    def test_run_small_4d_scenario(self):
+        spec = {"shape": (12, 10, 8, 3), "voxel_sizes": (2.0, 2.0, 3.0), "overlay": "labels", "roi": True}
+        metrics = run_scenario("smoke", spec, repeats=2)
+        for metric in ("load_s", "first_frame_s", "overlay_load_s", "roi_s", "render_axial_ms",
+                       "render_coronal_ms", "render_sagittal_ms", "sweep_slices_per_s", "sweep_frames_per_s"):
+            assert metrics[metric] > 0, metric
+
+    def test_update_baseline_keeps_tolerances(self, tmp_path, baseline, monkeypatch):
+        path = tmp_path / "baseline.json"
+        path.write_text(json.dumps(baseline))
+        monkeypatch.setattr("tests.benchmarks.bench_nifti_viewer.run_isolated", lambda name, repeats: {"load_s": 2.0})
+        assert main(["--scenarios", "3d_small_iso", "--baseline", str(path), "--update-baseline"]) == 0
+        updated = json.loads(path.read_text())
+        assert updated["tolerances"] == baseline["tolerances"]
+        assert updated["scenarios"]["3d_small_iso"] == {"load_s": 2.0}
+        assert "small" in updated["scenarios"]
+
+        # A slower run fails the comparison
+        monkeypatch.setattr("tests.benchmarks.bench_nifti_viewer.run_isolated", lambda name, repeats: {"load_s": 4.0})
+        assert main(["--scenarios", "3d_small_iso", "--baseline", str(path)]) == 1
@@ -0,0 +1,116 @@
+import matplotlib
+import numpy as np
+import pytest
+from unittest.mock import MagicMock
+
+from main.components.comparison_view import ComparisonView, ComparisonVolume, render_volume_slice
+
+
+@pytest.fixture
+def viewer():
+    viewer = MagicMock()
+    rng = np.random.default_rng(0)
+    viewer.img_data = rng.random((20, 20, 20)).astype(np.float32)
+    viewer.affine = np.eye(4)
+    viewer.file_path = "/data/sub-01/anat/sub-01_T1w.nii.gz"
+    viewer.dicom_series = None
+    viewer.current_coordinates = [10, 4, 6]
+    viewer.current_time = 0
+    viewer.colormap = "gray"
+    return viewer
+
+
+@pytest.fixture
+def comparison(qtbot, viewer):
+    widget = ComparisonView(None)
+    widget.viewer = viewer
+    widget.reset_volumes()
+    qtbot.addWidget(widget)
+    yield widget
+    widget.stop_workers()
+
+
+def _half_resolution_affine():
+    affine = np.diag([2.0, 2.0, 2.0, 1.0])
+    affine[:3, 3] = 0.25
+    return affine
+
+
+class TestRenderVolumeSlice:
+    """Tests for the thread-safe slice rendering"""
+
+    @pytest.mark.parametrize("plane_idx", [0, 1, 2])
+    def test_matches_matplotlib_colormap(self, plane_idx):
+        data = np.random.default_rng(1).random((6, 7, 8, 2)).astype(np.float32)
+        index = [slice(None)] * 3
+        index[2 - plane_idx] = 3
+        expected_slice = np.flipud(data[..., 1][tuple(index)].T)
+        cmap = matplotlib.colormaps.get_cmap("viridis")
+        lut = cmap(np.arange(cmap.N)).astype(np.float32)
+
+        image = render_volume_slice(data, plane_idx, 3, 1, lut)
+
+        assert image.dtype == np.uint8 and image.flags["C_CONTIGUOUS"]
+        np.testing.assert_array_equal(image, (cmap(expected_slice).astype(np.float32) * 255).astype(np.uint8))
+
+
+class TestComparisonVolume:
+    """Tests for the world/voxel mapping of each volume"""
+
+    def test_world_to_voxel_uses_own_affine(self):
+        volume = ComparisonVolume("pet", np.zeros((10, 10, 10)), _half_resolution_affine())
+        assert volume.world_to_voxel(np.array([10.0, 4.0, 6.0])) == [5, 2, 3]
+        np.testing.assert_allclose(volume.voxel_to_world([5, 2, 3]), [10.25, 4.25, 6.25])
+
+    def test_world_to_voxel_clamps_outside_field_of_view(self):
+        volume = ComparisonVolume("pet", np.zeros((10, 10, 10, 3)), np.eye(4))
+        assert volume.world_to_voxel(np.array([-5.0, 50.0, 3.0])) == [0, 9, 3]
+        assert volume.n_frames == 3
+
+
+class TestComparisonView:
+    """Tests for the linked comparison grid"""
+
+    def test_base_volume_is_viewer_image(self, comparison):
+        assert len(comparison.volumes) == 1
+        assert comparison.volumes[0].name == "sub-01_T1w.nii.gz"
+        assert len(comparison.cells) == 1
+
+    def test_at_most_four_volumes(self, comparison):
+        for _ in range(3):
+            assert comparison.add_volume("extra", np.zeros((5, 5, 5)), np.eye(4))
+        assert not comparison.add_volume("extra", np.zeros((5, 5, 5)), np.eye(4))
+        assert not comparison.add_btn.isEnabled()
+
+        comparison.reset_volumes()
+        assert len(comparison.volumes) == 1
+        assert comparison.add_btn.isEnabled()
+
+    def test_views_follow_world_crosshair(self, qtbot, comparison):
+        pet = np.random.default_rng(2).random((10, 10, 10)).astype(np.float32)
+        comparison.add_volume("pet", pet, _half_resolution_affine())
+        comparison.show()
+
+        qtbot.waitUntil(lambda: len(comparison.cache) == 2, timeout=2000)
+        assert comparison.titles[1].text().endswith("(5, 2, 3)")
+        # The slice rendered for the PET view is its own axial slice 3
+        key = comparison.wanted_keys[1]
+        assert key[1:4] == (0, 3, 0)
+        np.testing.assert_allclose(comparison.cache.get(key)[..., 0], np.flipud(pet[:, :, 3].T) * 255, atol=1.5)
+
+    def test_cached_slices_are_reused(self, qtbot, comparison, viewer):
+        comparison.show()
+        qtbot.waitUntil(lambda: len(comparison.cache) == 1, timeout=2000)
+        viewer.current_coordinates = [3, 3, 6]  # Same axial slice
+        comparison.refresh()
+        assert len(comparison.queue) == 0
+        assert len(comparison.cache) == 1
+
+    def test_click_moves_viewer_crosshair(self, qtbot, comparison, viewer):
+        comparison.add_volume("pet", np.zeros((10, 10, 10), dtype=np.float32), _half_resolution_affine())
+        comparison.show()
+        qtbot.waitUntil(lambda: len(comparison.cache) == 2, timeout=2000)
+
+        # Axial view of the PET: column 7, row 10 - 1 - 8 (display is flipped vertically)
+        comparison.cell_clicked(1, 7.5, 1.5)
+        viewer.set_current_coordinates.assert_called_once_with([14, 16, 6])
@@ -444,6 +444,73 @@ class TestOpenFolderSignal:
         assert signal_received[0] == test_folder_with_files
 
 
+class TestQCButton:
+    """Tests for the QC button."""
+
+    def test_qc_button_hidden_initially(self, qtbot, mock_context_card, test_folder_with_files):
+        """Test that the QC button is hidden while the folder is processed."""
+        os.makedirs(os.path.join(test_folder_with_files, "qc"))
+        card = FolderCard(mock_context_card, test_folder_with_files)
+        qtbot.addWidget(card)
+
+        assert card.qc_folder == os.path.join(test_folder_with_files, "qc")
+        assert card.qc_btn.isHidden()
+
+    def test_qc_button_shown_when_finished(self, qtbot, mock_context_card, test_folder_with_files):
+        """Test that the QC button is shown once finished, if the QC folder exists."""
+        os.makedirs(os.path.join(test_folder_with_files, "qc"))
+        card = FolderCard(mock_context_card, test_folder_with_files)
+        qtbot.addWidget(card)
+
+        card.set_finished_state()
+
+        assert not card.qc_btn.isHidden()
+        assert card.qc_btn.isEnabled()
+
+    def test_qc_button_hidden_without_qc_folder(self, qtbot, mock_context_card, test_folder_with_files):
+        """Test that the QC button stays hidden without a QC folder."""
+        card = FolderCard(mock_context_card, test_folder_with_files)
+        qtbot.addWidget(card)
+
+        card.set_finished_state()
+
+        assert card.qc_btn.isHidden()
+
+    def test_qc_button_emits_qc_folder(self, qtbot, mock_context_card, test_folder_with_files):
+        """Test that clicking the QC button requests the QC folder."""
+        card = FolderCard(mock_context_card, test_folder_with_files)
+        qtbot.addWidget(card)
+
+        with qtbot.waitSignal(card.qc_requested) as blocker:
+            card.qc_btn.click()
+
+        assert blocker.args == [card.qc_folder]
+
+    def test_set_qc_rendering(self, qtbot, mock_context_card, test_folder_with_files):
+        """Test that the QC button is disabled while the QC is rendered."""
+        card = FolderCard(mock_context_card, test_folder_with_files)
+        qtbot.addWidget(card)
+
+        card.set_qc_rendering(True)
+        assert not card.qc_btn.isEnabled()
+        assert card.qc_btn.text() == "Rendering QC..."
+
+        card.set_qc_rendering(False)
+        assert card.qc_btn.isEnabled()
+        assert card.qc_btn.text() == "QC"
+
+    def test_set_qc_locked(self, qtbot, mock_context_card, test_folder_with_files):
+        """Test that the QC button is disabled while the pipeline is running."""
+        card = FolderCard(mock_context_card, test_folder_with_files)
+        qtbot.addWidget(card)
+
+        card.set_qc_locked(True)
+        assert not card.qc_btn.isEnabled()
+
+        card.set_qc_locked(False)
+        assert card.qc_btn.isEnabled()
+
+
 class TestEdgeCases:
     """Tests for edge cases."""
 
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from unittest.mock import MagicMock
+
+from main.components.lightbox_view import LightboxView
+
+
+@pytest.fixture
+def lightbox(qtbot):
+    viewer = MagicMock()
+    viewer.img_data = np.zeros((10, 20, 30), dtype=np.float32)
+    widget = LightboxView(None)
+    widget.viewer = viewer
+    qtbot.addWidget(widget)
+    return widget
+
+
+class TestLightboxSlices:
+    """Tests for the slice selection of the mosaic."""
+
+    def test_auto_step_fits_one_page(self, lightbox):
+        lightbox.rows_spin.setValue(2)
+        lightbox.cols_spin.setValue(4)
+        slices = lightbox.mosaic_slices()  # Axial: 30 slices
+
+        assert len(slices) <= 8
+        assert np.all(np.diff(slices) == 4)
+        assert lightbox.page_count() == 1
+
+    def test_slices_per_plane(self, lightbox):
+        lightbox.step_spin.setValue(1)
+        for plane, n_slices in [(0, 30), (1, 20), (2, 10)]:
+            lightbox.plane_combo.setCurrentIndex(plane)
+            assert lightbox.mosaic_slices() == list(range(n_slices))
+
+    def test_paging(self, lightbox):
+        lightbox.rows_spin.setValue(3)
+        lightbox.cols_spin.setValue(3)
+        lightbox.step_spin.setValue(1)
+        assert lightbox.page_count() == 4  # 30 slices, 9 per page
+
+        lightbox.set_page(3)
+        assert lightbox.page_slices() == [27, 28, 29]
+        lightbox.set_page(10)
+        assert lightbox.page == 3
+        lightbox.set_page(-1)
+        assert lightbox.page == 0
+        assert lightbox.page_slices() == list(range(9))
+
+    def test_step_is_centered(self, lightbox):
+        lightbox.step_spin.setValue(8)
+        assert lightbox.mosaic_slices() == [2, 10, 18, 26]
@@ -0,0 +1,93 @@
+import json
+import time
+
+import pytest
+
+from main.components.render_profiler import RenderProfiler, RenderHud
+
+
+class TestRenderProfiler:
+    """Tests for the render timing collector."""
+
+    def test_lap_records_stage(self):
+        profiler = RenderProfiler()
+        t = time.perf_counter()
+        t2 = profiler.lap("slice", t)
+
+        assert t2 >= t
+        assert len(profiler.samples["slice"]) == 1
+        assert profiler.samples["slice"][0] == pytest.approx(t2 - t)
+
+    def test_ring_buffer_is_bounded(self):
+        profiler = RenderProfiler(capacity=8)
+        for i in range(20):
+            profiler.record("colormap", i / 1000.0)
+            profiler.frame()
+
+        assert len(profiler.samples["colormap"]) == 8
+        assert len(profiler.frame_times) == 8
+        assert list(profiler.samples["colormap"])[0] == pytest.approx(0.012)
+
+    def test_summary(self):
+        profiler = RenderProfiler()
+        for seconds in (0.001, 0.002, 0.003):
+            profiler.record("overlay", seconds)
+        profiler.cache("projection", True)
+        profiler.cache("projection", True)
+        profiler.cache("projection", False)
+
+        summary = profiler.summary()
+        stats = summary["stages"]["overlay"]
+        assert stats["count"] == 3
+        assert stats["last_ms"] == pytest.approx(3.0)
+        assert stats["mean_ms"] == pytest.approx(2.0)
+        assert stats["max_ms"] == pytest.approx(3.0)
+        assert summary["caches"]["projection"] == {"hits": 2, "misses": 1, "hit_rate": pytest.approx(2 / 3)}
+
+    def test_fps(self):
+        profiler = RenderProfiler()
+        assert profiler.fps() == 0.0
+        profiler.frame_times.extend([10.0, 10.1, 10.2, 10.3, 10.4])
+        assert profiler.fps() == pytest.approx(10.0)
+        # Frames older than the window are ignored
+        assert profiler.fps(window=0.25) == pytest.approx(10.0)
+
+    def test_export_json(self, tmp_path):
+        profiler = RenderProfiler()
+        profiler.record("scale", 0.004)
+        path = tmp_path / "timings.json"
+        profiler.export_json(str(path))
+
+        data = json.loads(path.read_text())
+        assert data["stages"]["scale"]["mean_ms"] == pytest.approx(4.0)
+        assert data["samples_ms"]["scale"] == [pytest.approx(4.0)]
+        assert "fps" in data
+
+    def test_reset(self):
+        profiler = RenderProfiler()
+        profiler.record("slice", 0.001)
+        profiler.cache("tiles", False)
+        profiler.reset()
+        assert profiler.summary() == {"stages": {}, "fps": 0.0, "caches": {}}
+
+
+class TestRenderHud:
+    """Tests for the render timing HUD."""
+
+    def test_hidden_by_default(self, qtbot):
+        hud = RenderHud()
+        qtbot.addWidget(hud)
+        assert not hud.isVisible()
+
+    def test_set_summary(self, qtbot):
+        hud = RenderHud()
+        qtbot.addWidget(hud)
+        profiler = RenderProfiler()
+        profiler.record("colormap", 0.0015)
+        profiler.cache("projection", True)
+        hud.set_summary(profiler.summary())
+
+        text = hud.text()
+        assert "fps" in text
+        assert "colormap: 1.50 ms" in text
+        assert "projection cache: 100% hit" in text
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from main.components.roi_stats_panel import IncrementalRoiStats, RoiStatsPanel
+
+
+@pytest.fixture
+def volume():
+    rng = np.random.default_rng(0)
+    return rng.normal(100, 20, size=(20, 20, 20)).astype(np.float32)
+
+
+class TestIncrementalRoiStats:
+    """Tests for the incremental ROI statistics engine."""
+
+    def test_empty_roi(self, volume):
+        stats = IncrementalRoiStats(volume, 0.008)
+        assert stats.summary() is None
+        assert stats.tac() is None
+        assert stats.percentile(50) is None
+
+    def test_matches_direct_computation(self, volume):
+        stats = IncrementalRoiStats(volume, 0.008)
+        mask = np.zeros(volume.shape, dtype=bool)
+        mask[5:12, 3:15, 8:18] = True
+
+        added, removed = stats.update(mask)
+        assert (added, removed) == (mask.sum(), 0)
+
+        summary = stats.summary()
+        values = volume[mask]
+        assert summary["count"] == values.size
+        assert summary["volume_ml"] == pytest.approx(values.size * 0.008)
+        assert summary["mean"] == pytest.approx(values.mean(), rel=1e-6)
+        assert summary["std"] == pytest.approx(values.std(), rel=1e-4)
+
+        tolerance = stats.bin_width
+        assert summary["max"] == pytest.approx(values.max(), abs=tolerance)
+        for q in (5, 50, 95):
+            assert summary[f"p{q}"] == pytest.approx(np.percentile(values, q), abs=2 * tolerance)
+
+    def test_bbox_update_adds_and_removes(self, volume):
+        stats = IncrementalRoiStats(volume, 1.0)
+        mask = np.zeros(volume.shape, dtype=bool)
+        mask[2:6, 2:6, 2:6] = True
+        stats.update(mask)
+
+        # Move a cube inside a region: only the region is compared
+        bbox = (slice(0, 12), slice(0, 12), slice(0, 12))
+        mask[:] = False
+        mask[6:10, 6:10, 6:10] = True
+        added, removed = stats.update(mask[bbox], bbox)
+
+        assert (added, removed) == (64, 64)
+        assert np.array_equal(stats.mask, mask)
+        assert stats.summary()["mean"] == pytest.approx(volume[mask].mean(), rel=1e-6)
+
+        stats.update(np.zeros(volume.shape, dtype=bool))
+        assert stats.count == 0
+        assert stats.hist.sum() == 0
+
+    def test_4d_tac(self):
+        data = np.ones((6, 6, 6, 4), dtype=np.float32) * np.array([1, 5, 3, 2], dtype=np.float32)
+        stats = IncrementalRoiStats(data, 1.0)
+        mask = np.zeros((6, 6, 6), dtype=bool)
+        mask[1:3, 1:3, 1:3] = True
+        stats.update(mask)
+
+        np.testing.assert_allclose(stats.tac(), [1, 5, 3, 2])
+        summary = stats.summary(frame=2)
+        assert summary["mean"] == pytest.approx(3)
+        assert summary["tac_peak_frame"] == 1
+        assert summary["tac_peak"] == pytest.approx(5)
+
+
+class TestRoiStatsPanel:
+    """Tests for the ROI statistics panel."""
+
+    def test_no_roi(self, qtbot):
+        panel = RoiStatsPanel()
+        qtbot.addWidget(panel)
+        assert panel.stats_label.text() == "No ROI"
+
+    def test_set_summary(self, qtbot):
+        panel = RoiStatsPanel()
+        qtbot.addWidget(panel)
+        panel.set_summary({
+            "count": 42, "volume_ml": 1.5, "mean": 10.0, "std": 2.0, "max": 20.0,
+            "p5": 1.0, "p50": 10.0, "p95": 19.0, "tac_peak": 12.0, "tac_peak_frame": 3,
+        })
+        text = panel.stats_label.text()
+        assert "42" in text
+        assert "1.50 ml" in text
+        assert "TAC peak" in text and "frame 3" in text
+
+        panel.set_summary(None)
+        assert panel.stats_label.text() == "No ROI"
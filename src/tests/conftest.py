@@ -147,6 +147,60 @@ def mock_file_selector_dl():
     ) as mock:
         yield mock
 
+@pytest.fixture
+def write_dicom_series():
+    """
+    Factory writing a synthetic axial PET series as single-frame DICOM files.
+
+    The returned function takes (folder, volume) with `volume` of shape
+    (columns, rows, slices, frames) in integer-valued units, plus optional
+    `slopes` (one RescaleSlope per frame) and `series_uid`. Files are named in
+    shuffled order, so readers cannot rely on the file names.
+    """
+    import numpy as np
+    import pydicom
+    from pydicom.dataset import Dataset, FileMetaDataset
+    from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
+    def write(folder, volume, slopes=None, series_uid=None, pixel_spacing=(2.0, 1.5), slice_spacing=3.0):
+        os.makedirs(folder, exist_ok=True)
+        series_uid = series_uid or generate_uid()
+        n_cols, n_rows, n_slices, n_frames = volume.shape
+        slopes = slopes if slopes is not None else [1.0] * n_frames
+        order = np.random.default_rng(0).permutation(n_slices * n_frames)
+        for t in range(n_frames):
+            for k in range(n_slices):
+                meta = FileMetaDataset()
+                meta.MediaStorageSOPClassUID = "1.2.840.10008.5.1.4.1.1.128"
+                meta.MediaStorageSOPInstanceUID = generate_uid()
+                meta.TransferSyntaxUID = ExplicitVRLittleEndian
+                ds = Dataset()
+                ds.file_meta = meta
+                ds.SOPClassUID = meta.MediaStorageSOPClassUID
+                ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+                ds.SeriesInstanceUID = series_uid
+                ds.Modality = "PT"
+                ds.Rows, ds.Columns = n_rows, n_cols
+                ds.PixelSpacing = list(pixel_spacing)
+                ds.SliceThickness = slice_spacing
+                ds.ImageOrientationPatient = [1, 0, 0, 0, 1, 0]
+                ds.ImagePositionPatient = [-10.0, -20.0, k * slice_spacing]
+                ds.InstanceNumber = t * n_slices + k + 1
+                ds.FrameReferenceTime = t * 1000.0
+                ds.RescaleSlope = slopes[t]
+                ds.RescaleIntercept = 0
+                ds.SamplesPerPixel = 1
+                ds.PhotometricInterpretation = "MONOCHROME2"
+                ds.BitsAllocated, ds.BitsStored, ds.HighBit, ds.PixelRepresentation = 16, 16, 15, 0
+                stored = np.rint(volume[:, :, k, t].T / slopes[t]).astype(np.uint16)
+                ds.PixelData = stored.tobytes()
+                name = f"IM{order[t * n_slices + k]:05d}_{series_uid[-6:]}.dcm"
+                ds.save_as(os.path.join(folder, name), enforce_file_format=True)
+        return folder
+
+    return write
+
+
 # Pytest configuration
 def pytest_configure(config):
     """Global pytest configuration"""
@@ -0,0 +1,144 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from main.derived_volumes import ArrayVolume, DerivedVolume, RatioToRoiMean, WeightedFrameSum, VolumeDifference, \
+    frame_duration_weights
+
+
+def _slice(data, plane_idx, slice_idx):
+    index = [slice(None)] * 3
+    index[2 - plane_idx] = slice_idx
+    return data[tuple(index)]
+
+
+@pytest.fixture
+def pet_4d():
+    rng = np.random.default_rng(0)
+    return rng.uniform(1, 10, size=(8, 9, 10, 5)).astype(np.float32)
+
+
+@pytest.fixture
+def roi():
+    mask = np.zeros((8, 9, 10), dtype=bool)
+    mask[2:5, 3:6, 4:8] = True
+    return mask
+
+
+class TestArrayVolume:
+    """Tests for the array adapter"""
+
+    @pytest.mark.parametrize("plane_idx", [0, 1, 2])
+    def test_get_slice(self, pet_4d, plane_idx):
+        volume = ArrayVolume(pet_4d)
+        np.testing.assert_array_equal(volume.get_slice(plane_idx, 3, 2), _slice(pet_4d[..., 2], plane_idx, 3))
+
+    def test_get_values_3d(self, pet_4d):
+        volume = ArrayVolume(pet_4d[..., 0])
+        coords = (np.array([0, 1]), np.array([2, 3]), np.array([4, 5]))
+        np.testing.assert_array_equal(volume.get_values(coords, frame=3), pet_4d[coords + (0,)])
+
+
+class TestRatioToRoiMean:
+    """Tests for the ROI mean ratio (SUVr)"""
+
+    def test_matches_full_computation(self, pet_4d, roi):
+        volume = RatioToRoiMean(pet_4d, roi)
+        assert volume.n_frames == 5
+        for frame in (0, 4):
+            expected = pet_4d[..., frame] / pet_4d[..., frame][roi].mean()
+            np.testing.assert_allclose(volume.get_slice(0, 6, frame), _slice(expected, 0, 6), rtol=1e-5)
+            assert volume.roi_mean(frame) == pytest.approx(pet_4d[..., frame][roi].mean(), rel=1e-5)
+
+    def test_slices_are_cached(self, pet_4d, roi):
+        volume = RatioToRoiMean(pet_4d, roi)
+        first = volume.get_slice(1, 2, 3)
+        assert volume.get_slice(1, 2, 3) is first
+        assert (volume.cache_hits, volume.cache_misses) == (1, 1)
+
+    def test_invalid_roi(self, pet_4d, roi):
+        with pytest.raises(ValueError):
+            RatioToRoiMean(pet_4d, np.zeros_like(roi))
+        with pytest.raises(ValueError):
+            RatioToRoiMean(pet_4d, roi[:4])
+
+
+class TestWeightedFrameSum:
+    """Tests for the frame sum weighted by frame duration"""
+
+    def test_matches_pipeline_static_image(self, pet_4d):
+        weights = np.array([10, 10, 20, 30, 60], dtype=float)
+        weights /= weights.sum()
+        volume = WeightedFrameSum(pet_4d, weights)
+        expected = np.sum(pet_4d * weights, axis=3)
+
+        assert volume.n_frames == 1
+        np.testing.assert_allclose(volume.get_slice(2, 4), _slice(expected, 2, 4), rtol=1e-5)
+        coords = np.nonzero(np.ones(expected.shape, dtype=bool))
+        np.testing.assert_allclose(volume.get_values(coords), expected[coords], rtol=1e-5)
+
+    def test_skips_zero_weight_frames(self, pet_4d):
+        volume = WeightedFrameSum(pet_4d, [0.5, 0.5, 0, 0, 0])
+        assert volume.frames == [0, 1]
+        np.testing.assert_allclose(volume.get_slice(0, 1), _slice(pet_4d[..., :2].mean(axis=3), 0, 1), rtol=1e-5)
+
+    def test_weight_count_mismatch(self, pet_4d):
+        with pytest.raises(ValueError):
+            WeightedFrameSum(pet_4d, [1, 1])
+
+
+class TestVolumeDifference:
+    """Tests for the difference of volumes"""
+
+    def test_broadcasts_3d_operand(self, pet_4d):
+        baseline = pet_4d[..., 0]
+        volume = VolumeDifference(pet_4d, baseline)
+        assert volume.n_frames == 5
+        np.testing.assert_allclose(volume.get_slice(0, 2, 3), _slice(pet_4d[..., 3] - baseline, 0, 2))
+
+    def test_composition(self, pet_4d, roi):
+        suvr = RatioToRoiMean(pet_4d[..., 0], roi)
+        volume = VolumeDifference(suvr, np.ones((8, 9, 10), dtype=np.float32))
+        expected = pet_4d[..., 0] / pet_4d[..., 0][roi].mean() - 1
+        np.testing.assert_allclose(volume.get_slice(1, 4), _slice(expected, 1, 4), rtol=1e-5, atol=1e-6)
+
+    def test_shape_mismatch(self, pet_4d):
+        with pytest.raises(ValueError):
+            VolumeDifference(pet_4d, pet_4d[:4])
+
+    def test_display_range_from_subsample(self, pet_4d):
+        volume = VolumeDifference(pet_4d, np.zeros((8, 9, 10), dtype=np.float32))
+        vmin, vmax = volume.display_range(stride=1)
+        assert vmin == pytest.approx(np.percentile(pet_4d[..., [0, 1, 2, 3, 4]], 0.1), rel=1e-2)
+        assert vmax <= pet_4d.max()
+
+
+class TestDerivedVolume:
+    """Tests for the base class of the expressions"""
+
+    def test_incomplete_subclass_not_instantiable(self):
+        class Incomplete(DerivedVolume):
+            def get_values(self, coords, frame=0):
+                return np.zeros(len(coords[0]), dtype=np.float32)
+
+        with pytest.raises(TypeError):
+            Incomplete((8, 9, 10), 1)
+
+
+class TestFrameDurationWeights:
+    """Tests for reading FrameDuration from the JSON sidecar"""
+
+    def test_reads_sidecar(self, tmp_path):
+        nifti_path = os.path.join(tmp_path, "sub-01_pet.nii.gz")
+        with open(os.path.join(tmp_path, "sub-01_pet.json"), "w") as f:
+            json.dump({"FrameDuration": [10, 30, 60]}, f)
+        np.testing.assert_allclose(frame_duration_weights(nifti_path, 3), [0.1, 0.3, 0.6])
+
+    def test_missing_or_inconsistent(self, tmp_path):
+        nifti_path = os.path.join(tmp_path, "sub-01_pet.nii")
+        assert frame_duration_weights(nifti_path, 3) is None
+        with open(os.path.join(tmp_path, "sub-01_pet.json"), "w") as f:
+            json.dump({"FrameDuration": [10, 30]}, f)
+        assert frame_duration_weights(nifti_path, 3) is None
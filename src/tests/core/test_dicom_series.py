@@ -0,0 +1,119 @@
+import os
+
+import nibabel as nib
+import numpy as np
+import pytest
+
+from main.dicom_series import DicomSeries
+
+
+NATIVE_AFFINE = np.array([
+    [-1.5, 0.0, 0.0, 10.0],
+    [0.0, -2.0, 0.0, 20.0],
+    [0.0, 0.0, 3.0, 0.0],
+    [0.0, 0.0, 0.0, 1.0],
+])
+"""RAS affine of the series written by `write_dicom_series` (LPS axial, pixel spacing 2.0 x 1.5, 3 mm slices)."""
+
+
+@pytest.fixture
+def pet_volume():
+    rng = np.random.default_rng(1)
+    return 2 * rng.integers(0, 250, size=(6, 5, 7, 3)).astype(np.float32)
+
+
+@pytest.fixture
+def series_dir(tmp_path, write_dicom_series, pet_volume):
+    return write_dicom_series(str(tmp_path / "pet"), pet_volume, slopes=[1.0, 0.5, 2.0])
+
+
+def _canonical(volume):
+    return np.asanyarray(nib.as_closest_canonical(nib.Nifti1Image(volume, NATIVE_AFFINE)).dataobj)
+
+
+class TestDicomSeriesGeometry:
+    """Tests for the header-only assembly of the series"""
+
+    def test_shape_and_affine_match_canonical_nifti(self, series_dir, pet_volume):
+        series = DicomSeries(series_dir)
+        canonical = nib.as_closest_canonical(nib.Nifti1Image(pet_volume, NATIVE_AFFINE))
+        assert series.shape == canonical.shape
+        assert series.n_frames == 3
+        np.testing.assert_allclose(series.affine, canonical.affine)
+
+    def test_opening_decodes_no_pixel_data(self, series_dir):
+        series = DicomSeries(series_dir)
+        assert series.decode_count == 0
+        assert not series.decoded.any()
+
+    def test_ensure_all_matches_volume(self, series_dir, pet_volume):
+        series = DicomSeries(series_dir)
+        series.ensure_all()
+        assert series.is_fully_decoded()
+        np.testing.assert_allclose(series.raw, _canonical(pet_volume))
+        assert 0.0 <= series.data.min() and series.data.max() <= 1.0
+
+    def test_3d_series(self, tmp_path, write_dicom_series, pet_volume):
+        folder = write_dicom_series(str(tmp_path / "static"), pet_volume[..., :1])
+        series = DicomSeries(folder)
+        series.ensure_all()
+        assert series.raw.ndim == 3
+        np.testing.assert_allclose(series.raw, _canonical(pet_volume[..., 0]))
+
+    def test_non_dicom_files_are_skipped(self, series_dir):
+        with open(os.path.join(series_dir, "README.txt"), "w") as f:
+            f.write("not a DICOM file")
+        assert DicomSeries(series_dir).shape[3] == 3
+
+    def test_largest_series_is_kept(self, series_dir, write_dicom_series, pet_volume):
+        write_dicom_series(series_dir, pet_volume[:, :, :2, :1])
+        series = DicomSeries(series_dir)
+        assert series.shape[2] == 7
+
+    def test_empty_folder_raises(self, tmp_path):
+        with pytest.raises(ValueError):
+            DicomSeries(str(tmp_path))
+
+    def test_incomplete_series_raises(self, series_dir):
+        os.remove(os.path.join(series_dir, sorted(os.listdir(series_dir))[0]))
+        with pytest.raises(ValueError):
+            DicomSeries(series_dir)
+
+
+class TestDicomSeriesLazyDecoding:
+    """Tests for the on-demand decoding"""
+
+    def test_axial_slice_decodes_single_file_besides_samples(self, series_dir, pet_volume):
+        series = DicomSeries(series_dir, sample_slices=2)
+        series.ensure_slice(0, 3, frame=1)
+        # Two sample slices for the normalization range, plus the requested one
+        assert series.decode_count == 3
+        np.testing.assert_allclose(series.raw[:, :, 3, 1], _canonical(pet_volume)[:, :, 3, 1])
+        assert series.normalized[:, 1].sum() == 1
+        assert not series.decoded[:, [0, 2]].any()
+
+    def test_coronal_slice_decodes_whole_frame(self, series_dir):
+        series = DicomSeries(series_dir)
+        series.ensure_slice(1, 2, frame=2)
+        assert series.normalized[:, 2].all()
+        assert not series.decoded[:, :2].any()
+
+    def test_files_are_decoded_once(self, series_dir):
+        series = DicomSeries(series_dir)
+        series.ensure_frame(0)
+        count = series.decode_count
+        series.ensure_slice(0, 4, frame=0)
+        series.ensure_frame(0)
+        assert series.decode_count == count
+
+    def test_ensure_voxel_decodes_slice_in_all_frames(self, series_dir, pet_volume):
+        series = DicomSeries(series_dir, sample_slices=1)
+        series.ensure_voxel(1, 2, 5)
+        np.testing.assert_allclose(series.raw[1, 2, 5, :], _canonical(pet_volume)[1, 2, 5, :])
+
+    def test_normalization_matches_frame_percentiles(self, series_dir, pet_volume):
+        series = DicomSeries(series_dir, sample_slices=100)
+        series.ensure_frame(1)
+        frame = _canonical(pet_volume)[..., 1]
+        vmin, vmax = np.percentile(frame, [0.1, 99.9])
+        np.testing.assert_allclose(series.data[..., 1], np.clip((frame - vmin) / (vmax - vmin), 0, 1), atol=1e-6)
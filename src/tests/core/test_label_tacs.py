@@ -0,0 +1,84 @@
+import csv
+
+import numpy as np
+import pytest
+
+from main.label_tacs import compute_label_tacs, LabelTacTable
+
+
+@pytest.fixture
+def atlas():
+    labels = np.zeros((9, 8, 7), dtype=np.uint8)
+    labels[1:4, 1:4, 1:4] = 1
+    labels[5:8, 2:6, 3:6] = 3
+    labels[0, 7, 6] = 7
+    return labels
+
+
+@pytest.fixture
+def pet(atlas):
+    rng = np.random.default_rng(0)
+    return rng.normal(10.0, 3.0, size=atlas.shape + (5,)).astype(np.float32)
+
+
+class TestComputeLabelTacs:
+    """Tests for the single-pass computation of all the label TACs"""
+
+    def test_matches_per_label_masking(self, atlas, pet):
+        table = compute_label_tacs(atlas, pet)
+        assert table.labels.tolist() == [1, 3, 7]
+        for label in (1, 3, 7):
+            voxels = pet[atlas == label, :].astype(np.float64)
+            mean, std = table.curve(label)
+            np.testing.assert_allclose(mean, voxels.mean(axis=0), rtol=1e-6)
+            np.testing.assert_allclose(std, voxels.std(axis=0), rtol=1e-5, atol=1e-6)
+        assert table.counts.tolist() == [27, 36, 1]
+
+    def test_uint16_atlas_and_float64_image(self, atlas, pet):
+        reference = compute_label_tacs(atlas, pet)
+        table = compute_label_tacs(atlas.astype(np.uint16), pet.astype(np.float64))
+        np.testing.assert_allclose(table.mean, reference.mean)
+        np.testing.assert_allclose(table.std, reference.std, atol=1e-9)
+
+    def test_3d_image_has_single_frame(self, atlas, pet):
+        table = compute_label_tacs(atlas, pet[..., 2])
+        assert table.n_frames == 1
+        np.testing.assert_allclose(table.curve(1)[0], [pet[atlas == 1, 2].mean()], rtol=1e-6)
+
+    def test_non_finite_values_count_as_zero(self, atlas, pet):
+        pet[2, 2, 2, 0] = np.nan
+        mean, _ = compute_label_tacs(atlas, pet).curve(1)
+        expected = pet[atlas == 1, 0]
+        assert np.isfinite(mean).all()
+        np.testing.assert_allclose(mean[0], np.nan_to_num(expected).mean(), rtol=1e-6)
+
+    def test_absent_label(self, atlas, pet):
+        table = compute_label_tacs(atlas, pet)
+        assert 2 not in table
+        assert table.curve(2) is None
+
+    def test_shape_mismatch_raises(self, atlas, pet):
+        with pytest.raises(ValueError):
+            compute_label_tacs(atlas[:-1], pet)
+
+
+class TestLabelTacTableCsv:
+    """Tests for the CSV export of the label TACs"""
+
+    def test_long_format(self, tmp_path):
+        table = LabelTacTable([1, 4], [10, 3], np.array([[1.0, 2.0], [3.0, 4.0]]), np.array([[0.1, 0.2], [0.3, 0.4]]))
+        path = str(tmp_path / "tacs.csv")
+        table.to_csv(path)
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+        assert len(rows) == 4
+        assert rows[0] == {"frame": "0", "region": "1", "voxels": "10", "value": "1.0", "std": "0.1"}
+        assert [(r["region"], r["frame"], float(r["value"])) for r in rows[2:]] == [("4", "0", 3.0), ("4", "1", 4.0)]
+
+    def test_frame_times_column(self, tmp_path):
+        table = LabelTacTable([2], [5], np.array([[1.0, 2.0]]), np.zeros((1, 2)))
+        path = str(tmp_path / "tacs.csv")
+        table.to_csv(path, frame_times=[0.0, 60.0])
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+        assert [r["time"] for r in rows] == ["0.0", "60.0"]
@@ -0,0 +1,101 @@
+import statistics
+
+import numpy as np
+import pytest
+
+# label_stats reduces the labels with scipy.ndimage
+pytest.importorskip("scipy")
+
+from pediatric_fdopa_pipeline.label_stats import LabelIndex, get_label_stats
+
+
+def per_label_stats(vol, atlas, labels):
+    """Original get_stats_for_labels: every label masks the whole atlas."""
+    total = 0
+    n = 0
+    maximum = np.min(vol)
+    for l in labels:
+        idx = atlas == l
+        label_n = np.sum(idx)
+        assert label_n > 0
+        total += np.sum(vol[idx])
+        max_in_label = np.max(vol[idx])
+        median_in_label = statistics.median(vol[idx])
+        l_std = np.std(vol[idx])
+        maximum = max_in_label if max_in_label > maximum else maximum
+        n += label_n
+    return total / n, maximum, l_std, median_in_label
+
+
+@pytest.fixture
+def atlas():
+    rng = np.random.default_rng(0)
+    labels = rng.choice([0, 0, 0, 2, 7, 41, 120], size=(20, 22, 18)).astype(np.uint8)
+    labels[:5] = 0
+    return labels
+
+
+@pytest.fixture
+def pet(atlas):
+    rng = np.random.default_rng(1)
+    return rng.gamma(2.0, 3.0, size=atlas.shape)
+
+
+@pytest.fixture
+def analysis():
+    for module in ("sklearn", "skimage", "seaborn"):
+        pytest.importorskip(module)
+    from pediatric_fdopa_pipeline import analysis
+    return analysis
+
+
+class TestLabelIndex:
+    """Tests for the bounding boxes of the labels"""
+
+    def test_values_in_mask_order(self, atlas, pet):
+        index = LabelIndex(atlas)
+        for label in (2, 7, 41, 120):
+            np.testing.assert_array_equal(index.values(pet, label), pet[atlas == label])
+            assert index.count(label) == np.count_nonzero(atlas == label)
+
+    def test_absent_and_background_labels(self, atlas, pet):
+        index = LabelIndex(atlas)
+        assert index.values(pet, 3).size == 0
+        assert index.count(200) == 0
+        np.testing.assert_array_equal(index.values(pet, 0), pet[atlas == 0])
+
+
+class TestGetLabelStats:
+    """Tests for the per-label statistics"""
+
+    def test_matches_masking(self, atlas, pet):
+        stats = get_label_stats(pet, atlas, [7, 41, 3])
+        values = pet[atlas == 7]
+        assert stats[7]["n"] == values.size
+        assert stats[7]["sum"] == pytest.approx(values.sum(), rel=1e-12)
+        assert stats[7]["max"] == values.max()
+        assert stats[7]["std"] == pytest.approx(values.std(), rel=1e-12)
+        assert stats[7]["median"] == statistics.median(values)
+        assert stats[3] is None
+
+    def test_float32_volume_accumulated_in_float64(self, atlas, pet):
+        stats = get_label_stats(pet.astype(np.float32), LabelIndex(atlas), [41])
+        assert stats[41]["sum"].dtype == np.float64
+        assert stats[41]["sum"] == pytest.approx(pet[atlas == 41].astype(np.float32).astype(np.float64).sum())
+
+
+class TestGetStatsForLabels:
+    """Tests for get_stats_for_labels against the original per-label implementation"""
+
+    @pytest.mark.parametrize("labels", [[2], [7, 41], [120, 2, 41], [41, 7, 2, 120]])
+    def test_matches_original(self, analysis, atlas, pet, labels):
+        expected = per_label_stats(pet, atlas, labels)
+        for atlas_arg in (atlas, LabelIndex(atlas)):
+            result = analysis.get_stats_for_labels(pet, atlas_arg, labels)
+            np.testing.assert_allclose(result, expected, rtol=1e-12)
+
+    def test_uint16_atlas(self, analysis, atlas, pet):
+        expected = per_label_stats(pet, atlas, [41, 120])
+        result = analysis.get_stats_for_labels(pet, atlas.astype(np.uint16), [41, 120])
+        np.testing.assert_allclose(result, expected, rtol=1e-12)
+
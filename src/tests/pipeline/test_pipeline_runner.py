@@ -0,0 +1,156 @@
+import json
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+
+class StubSubject:
+    """Processed subject, as read by run_pipeline_from_config."""
+
+    def __init__(self, patient_id, files, work_dir, out_dir):
+        self.sub = patient_id.replace("sub-", "")
+        self.data_dir = work_dir
+        self.qc_dir = os.path.join(out_dir, patient_id, "qc")
+        self.roi_labels = [11]
+        self.ref_labels = 2
+        self.suvr_df = pd.DataFrame({"subject": [self.sub], "suvr": [files["suvr"]]})
+        self.dy_df = pd.DataFrame({"subject": [self.sub], "slope": [files["suvr"] / 10]})
+        self.bool_flag = True
+        self.tum_percentage = files["suvr"] * 10
+        self.peak_memory_mb = files["suvr"] * 1000
+
+
+def stub_process_patient(patient_id, files, work_dir, out_dir, atlas_dir, progress, registration_cache=None,
+                         memory_warning_mb=0, refinement=None, qc_policy='inline'):
+    """process_patient without the processing: runs in the worker processes of the parallel runs."""
+    from pediatric_fdopa_pipeline.utils import log_progress
+    for percent in (25, 50, 100):
+        log_progress(progress[0] + progress[1] * percent / 100)
+    return StubSubject(patient_id, files, work_dir, out_dir)
+
+
+def failing_process_patient(patient_id, files, *args, **kwargs):
+    if patient_id == "sub-02":
+        raise ValueError("registration of sub-02 failed")
+    return stub_process_patient(patient_id, files, *args, **kwargs)
+
+
+@pytest.fixture
+def runner(monkeypatch):
+    for module in ("ants", "sklearn", "skimage", "seaborn"):
+        pytest.importorskip(module)
+    from pediatric_fdopa_pipeline import pipeline_runner
+    # The runner sets the thread budget in the environment: restored after the test
+    for var in pipeline_runner.THREAD_ENV_VARS:
+        monkeypatch.setenv(var, "1")
+    monkeypatch.setattr(pipeline_runner, "tumor_striatum_analysis", lambda subj, roi, ref: subj)
+    return pipeline_runner
+
+
+@pytest.fixture
+def config(tmp_path):
+    config = {f"sub-0{i}": {"suvr": 1.5 + i} for i in range(1, 4)}
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps(config))
+    # Dynamic acquisitions of sub-02 and sub-03
+    for patient_id in ("sub-02", "sub-03"):
+        os.makedirs(tmp_path / "work" / patient_id / "ses-02")
+    return str(path)
+
+
+def run(runner, monkeypatch, config, tmp_path, name, jobs, process=stub_process_patient, memory_warning_mb=0):
+    out_dir = tmp_path / name
+    out_dir.mkdir()
+    monkeypatch.setattr(runner, "process_patient", process)
+    runner.run_pipeline_from_config(config, str(tmp_path / "work"), str(out_dir), jobs=jobs, threads=2,
+                                    cache_size_mb=0, memory_warning_mb=memory_warning_mb)
+    return {fn: (out_dir / fn).read_text() for fn in sorted(os.listdir(out_dir))}
+
+
+def progress_values(output):
+    return [int(line.split()[1].split("/")[0]) for line in output.splitlines() if line.startswith("PROGRESS:")]
+
+
+class TestProgressAggregator:
+    """Tests for the progress of the patients processed concurrently"""
+
+    def test_average_of_the_patients(self, runner, capsys):
+        aggregator = runner.ProgressAggregator(["sub-01", "sub-02"])
+        aggregator.update("sub-01", 50)
+        aggregator.update("sub-02", 20)
+        assert progress_values(capsys.readouterr().out) == [32, 41]
+
+    def test_monotonic_and_capped(self, runner, capsys):
+        aggregator = runner.ProgressAggregator(["sub-01", "sub-02"])
+        aggregator.update("sub-01", 50)
+        aggregator.update("sub-01", 30)
+        aggregator.update("sub-01", 150)
+        aggregator.update("sub-02", 100)
+        assert progress_values(capsys.readouterr().out) == [32, 55, 100]
+
+
+class TestParallelRun:
+    """Tests for the patients processed in parallel worker processes"""
+
+    def test_same_csvs_as_serial(self, runner, monkeypatch, config, tmp_path):
+        serial = run(runner, monkeypatch, config, tmp_path, "serial", jobs=1)
+        parallel = run(runner, monkeypatch, config, tmp_path, "parallel", jobs=2)
+
+        assert parallel == serial
+        assert sorted(serial) == ["Dynamic_Parameters_ibrido.csv", "H_tumor_percentage_ibrido.csv",
+                                  "tumor_striatum_ibrido.csv"]
+        assert pd.read_csv(tmp_path / "parallel" / "tumor_striatum_ibrido.csv")["subject"].tolist() == [1, 2, 3]
+        assert pd.read_csv(tmp_path / "parallel" / "Dynamic_Parameters_ibrido.csv")["subject"].tolist() == [2, 3]
+
+    def test_progress_reaches_the_end(self, runner, monkeypatch, config, tmp_path, capfd):
+        run(runner, monkeypatch, config, tmp_path, "parallel", jobs=2)
+        out = capfd.readouterr().out
+        progress = progress_values(out)
+        assert progress == sorted(progress)
+        assert progress[-1] == 100
+        assert out.count("PATIENT: ") == 3
+        assert "Running 2 patients in parallel" in out
+
+    def test_serialised_over_memory_threshold(self, runner, monkeypatch, config, tmp_path, capfd):
+        serial = run(runner, monkeypatch, config, tmp_path, "serial", jobs=1)
+        # Whatever the memory available here, the run starts with 2 patients
+        monkeypatch.setattr(runner, "max_jobs_for_memory", lambda jobs, memory_warning_mb: jobs)
+        capfd.readouterr()
+        # The stub patients peak at 2500, 3500 and 4500 MB
+        parallel = run(runner, monkeypatch, config, tmp_path, "parallel", jobs=2, memory_warning_mb=2000)
+
+        assert parallel == serial
+        out = capfd.readouterr().out
+        assert out.count("processing the remaining patients one at a time") == 1
+        # sub-03 is only submitted once both of the first patients are done
+        assert [line.split()[1] for line in out.splitlines() if line.startswith("PATIENT: ")][-1] == "sub-03"
+
+    def test_worker_error_reported(self, runner, monkeypatch, config, tmp_path, capfd):
+        monkeypatch.setattr(runner, "process_patient", failing_process_patient)
+        monkeypatch.setattr(sys, "argv", ["pipeline_runner", "--config", config, "--work-dir", str(tmp_path / "work"),
+                                          "--out-dir", str(tmp_path), "--jobs", "2", "--registration-cache-mb", "0",
+                                          "--memory-warning-mb", "0"])
+        with pytest.raises(SystemExit) as exit_info:
+            runner.main()
+        assert exit_info.value.code == 1
+        out = capfd.readouterr().out
+        assert "Running 2 patients in parallel" in out
+        assert "ERROR: Pipeline failed: registration of sub-02 failed" in out
+        assert not os.path.exists(tmp_path / "tumor_striatum_ibrido.csv")
+
+
+class TestThreadBudget:
+    """Tests for the thread budget given on the command line"""
+
+    def test_from_argv(self, runner):
+        assert runner.thread_budget_from_argv(["--config", "c.json", "--threads", "3"]) == 3
+        assert runner.thread_budget_from_argv(["--threads=4", "--jobs", "2"]) == 4
+        assert runner.thread_budget_from_argv(["--jobs", "2"]) is None
+
+    def test_set_in_environment(self, runner):
+        runner.set_thread_budget(3)
+        assert all(os.environ[var] == "3" for var in runner.THREAD_ENV_VARS)
+        runner.set_thread_budget(0)
+        assert os.environ["OMP_NUM_THREADS"] == "1"
@@ -0,0 +1,66 @@
+import nibabel as nib
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def qc():
+    for module in ("scipy", "skimage", "PIL"):
+        pytest.importorskip(module)
+    from pediatric_fdopa_pipeline import qc
+    return qc
+
+
+@pytest.fixture
+def volumes(tmp_path):
+    """Small isotropic volume and a label overlay in its grid."""
+    rng = np.random.default_rng(49)
+    vol = rng.random((12, 12, 12)) * 100
+    labels = np.zeros((12, 12, 12), dtype=np.uint8)
+    labels[3:9, 3:9, 3:9] = 1
+    vol_fn, labels_fn = str(tmp_path / "pet.nii.gz"), str(tmp_path / "labels.nii.gz")
+    nib.Nifti1Image(vol, np.eye(4)).to_filename(vol_fn)
+    nib.Nifti1Image(labels, np.eye(4)).to_filename(labels_fn)
+    return vol_fn, labels_fn
+
+
+def read_frames(gif):
+    from PIL import Image, ImageSequence
+    with Image.open(gif) as img:
+        return [(frame.mode, frame.size, frame.convert("RGB")) for frame in ImageSequence.Iterator(img)]
+
+
+def used_colors(frames):
+    return {color for _, _, rgb in frames for _, color in rgb.getcolors(maxcolors=256 * 256)}
+
+
+class TestRenderGif:
+    """Tests for the QC animations"""
+
+    def test_frames(self, qc, volumes, tmp_path):
+        vol_fn, labels_fn = volumes
+        gif = str(tmp_path / "qc.gif")
+        qc.render_gif(vol_fn, gif, overlay_fn=labels_fn, cmap1="gray", cmap2="Reds", alpha=[0.3, 0.6], dpi=20,
+                      nframes=5)
+
+        frames = read_frames(gif)
+        # nframes slices for every alpha level
+        assert len(frames) == 10
+        # Three square panels of 2 * dpi pixels, separated by gaps of 4 pixels
+        assert {size for _, size, _ in frames} == {(3 * 40 + 4 * 4, 40)}
+        # Pillow reads the frames after the first one as RGB
+        assert frames[0][0] == "P"
+        # The overlay is blended in red over the gray volume
+        assert any(r > g for r, g, b in used_colors(frames))
+
+    def test_palette_of_the_volume(self, qc, volumes, tmp_path):
+        vol_fn, _ = volumes
+        gif = str(tmp_path / "qc.gif")
+        qc.render_gif(vol_fn, gif, cmap1="gray", dpi=20, nframes=4)
+
+        frames = read_frames(gif)
+        assert len(frames) == 4
+        colors = used_colors(frames)
+        assert all(r == g == b for r, g, b in colors)
+        # The gray levels of the colormap are kept, not banded by the quantization
+        assert (255, 255, 255) in colors and len(colors) > 128
@@ -0,0 +1,108 @@
+import os
+import pickle
+import subprocess
+import sys
+
+import pytest
+
+from pediatric_fdopa_pipeline import qc_stage
+from pediatric_fdopa_pipeline.qc_stage import QCQueue, QCBusyError, qc_lock, load_jobs, save_jobs, render_pending
+from pediatric_fdopa_pipeline.scheduler import get_thread_budget
+
+# Rendering functions of the package that need no heavy dependency
+SUCCEEDS = {'function': 'pediatric_fdopa_pipeline.scheduler:get_thread_budget', 'kwargs': {}}
+# label_dtype needs its two labels
+FAILS = {'function': 'pediatric_fdopa_pipeline.label_stats:label_dtype', 'kwargs': {}}
+
+
+class TestQCQueue:
+    """Tests for the submission of the QC products"""
+
+    def test_inline_renders_now(self, tmp_path):
+        rendered = []
+        QCQueue(str(tmp_path)).submit(lambda **kwargs: rendered.append(kwargs), gif='a.gif')
+        assert rendered == [{'gif': 'a.gif'}]
+        assert not qc_stage.has_pending(str(tmp_path))
+
+    @pytest.mark.parametrize("policy", ["background", "on-demand"])
+    def test_deferred_recorded_once(self, tmp_path, policy):
+        queue = QCQueue(str(tmp_path), policy)
+        queue.submit(get_thread_budget)
+        queue.submit(get_thread_budget)
+        assert load_jobs(str(tmp_path)) == [SUCCEEDS]
+        assert sorted(os.listdir(tmp_path)) == [qc_stage.QC_MANIFEST]
+
+    def test_manifest_round_trip(self, tmp_path):
+        job = {'function': 'pediatric_fdopa_pipeline.qc:render_gif',
+               'kwargs': {'vol_fn': 'pet.nii.gz', 'labels': [1, 2], 'alpha': 0.5}}
+        save_jobs(str(tmp_path), [job, SUCCEEDS])
+        assert load_jobs(str(tmp_path)) == [job, SUCCEEDS]
+        assert not os.path.exists(qc_stage.manifest_file(str(tmp_path)) + '.tmp')
+
+    def test_invalid_policy(self, tmp_path):
+        with pytest.raises(ValueError):
+            QCQueue(str(tmp_path), 'later')
+        with pytest.raises(ValueError):
+            QCQueue(None, 'background')
+
+    def test_pickled_without_lock(self, tmp_path):
+        queue = pickle.loads(pickle.dumps(QCQueue(str(tmp_path), 'background')))
+        assert (queue.qc_dir, queue.policy) == (str(tmp_path), 'background')
+        queue.submit(get_thread_budget)
+        assert load_jobs(str(tmp_path)) == [SUCCEEDS]
+
+
+class TestRenderPending:
+    """Tests for the rendering of the recorded QC products"""
+
+    def test_all_rendered(self, tmp_path):
+        save_jobs(str(tmp_path), [SUCCEEDS])
+        assert render_pending(str(tmp_path)) == (1, [])
+        assert os.listdir(tmp_path) == []
+
+    def test_failed_jobs_kept(self, tmp_path):
+        save_jobs(str(tmp_path), [FAILS, SUCCEEDS])
+        n_done, errors = render_pending(str(tmp_path))
+        assert n_done == 1
+        assert len(errors) == 1 and errors[0].startswith(FAILS['function'])
+        assert load_jobs(str(tmp_path)) == [FAILS]
+
+    def test_nothing_pending(self, tmp_path):
+        assert render_pending(str(tmp_path)) == (0, [])
+
+    def test_functions_outside_package_rejected(self, tmp_path):
+        save_jobs(str(tmp_path), [{'function': 'os:remove', 'kwargs': {'path': str(tmp_path / 'x')}}])
+        n_done, errors = render_pending(str(tmp_path))
+        assert n_done == 0
+        assert 'outside of the pipeline' in errors[0]
+        with pytest.raises(ValueError):
+            qc_stage.resolve('subprocess:run')
+
+
+class TestQCLock:
+    """Tests for the lock of the QC directories"""
+
+    def test_busy_directory(self, tmp_path):
+        with qc_lock(str(tmp_path)):
+            with pytest.raises(QCBusyError):
+                with qc_lock(str(tmp_path), timeout=0.2):
+                    pass
+            with pytest.raises(QCBusyError):
+                render_pending(str(tmp_path))
+        assert not os.path.exists(qc_stage.lock_file(str(tmp_path)))
+
+    def test_released_on_error(self, tmp_path):
+        with pytest.raises(RuntimeError):
+            with qc_lock(str(tmp_path)):
+                raise RuntimeError
+        with qc_lock(str(tmp_path)):
+            pass
+
+    @pytest.mark.skipif(not os.path.isdir('/proc/self'), reason="the owner of a lock is checked in /proc")
+    def test_stale_lock_taken_over(self, tmp_path):
+        exited = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                                capture_output=True, text=True, check=True)
+        with open(qc_stage.lock_file(str(tmp_path)), 'w') as f:
+            f.write(exited.stdout.strip())
+        save_jobs(str(tmp_path), [SUCCEEDS])
+        assert render_pending(str(tmp_path)) == (1, [])
@@ -0,0 +1,95 @@
+from types import SimpleNamespace
+
+import nibabel as nib
+import numpy as np
+import pytest
+
+# The refinement filters and labels the tumour with scipy.ndimage
+pytest.importorskip("scipy")
+
+from scipy.ndimage import gaussian_filter
+
+from pediatric_fdopa_pipeline.volume_store import VolumeStore
+
+
+@pytest.fixture
+def ref_tumor_seg():
+    for module in ("sklearn", "skimage", "seaborn"):
+        pytest.importorskip(module)
+    from pediatric_fdopa_pipeline import ref_tumor_seg
+    return ref_tumor_seg
+
+
+def full_distance_map(volume):
+    """Original calculate_distance_map: the gaussian filter of the whole float64 volume."""
+    distance_map = gaussian_filter(volume.astype(float), sigma=5 / 2.355)
+    return distance_map / np.max(distance_map)
+
+
+def slice_eroded_mask(brain):
+    """Original binary_mask: 3x3 erosion of every sagittal slice."""
+    from skimage.morphology import erosion
+    brain_mask = brain.astype(float)
+    brain_mask[brain_mask != 0] = 1
+    brain_mask_eroded = np.zeros_like(brain_mask)
+    for i in range(brain_mask.shape[0]):
+        brain_mask_eroded[i, :, :] = erosion(brain_mask[i, :, :], np.ones([3, 3]))
+    return brain_mask_eroded, brain_mask
+
+
+def tumor_volume(shape, box):
+    volume = np.zeros(shape, dtype=np.uint8)
+    volume[box] = 1
+    return volume
+
+
+class TestDistanceMap:
+    """Tests for the distance map computed in the bounding box of the tumour"""
+
+    @pytest.mark.parametrize("box", [
+        (slice(14, 19), slice(12, 17), slice(10, 14)),
+        # Tumours touching the border of the volume
+        (slice(0, 4), slice(20, 30), slice(5, 9)),
+        (slice(28, 32), slice(0, 30), slice(22, 24)),
+    ])
+    def test_matches_full_volume_filter(self, ref_tumor_seg, box):
+        shape = (32, 30, 24)
+        volume = tumor_volume(shape, box)
+        distance_map, map_box = ref_tumor_seg.calculate_distance_map(volume)
+
+        assert distance_map.dtype == np.float32
+        np.testing.assert_allclose(ref_tumor_seg.embed(distance_map, map_box, shape), full_distance_map(volume),
+                                   rtol=1e-5, atol=1e-7)
+
+    def test_zero_beyond_radius(self, ref_tumor_seg):
+        shape = (40, 40, 40)
+        volume = tumor_volume(shape, (slice(18, 22),) * 3)
+        full = full_distance_map(volume)
+        box = ref_tumor_seg.bounding_box(volume, ref_tumor_seg.DISTANCE_RADIUS)
+        outside = np.ones(shape, dtype=bool)
+        outside[box] = False
+        assert outside.any() and not full[outside].any()
+
+
+class TestBinaryMask:
+    """Tests for the brain masks shared by the steps of a subject"""
+
+    def test_matches_slice_erosion(self, ref_tumor_seg, tmp_path):
+        rng = np.random.default_rng(47)
+        brain = rng.random((10, 16, 14)) * 100
+        brain[rng.random(brain.shape) < 0.15] = 0
+        # Brain touching the border of the volume
+        brain[:, :2] = 0
+        brain[:, :, -1] = 50
+        path = str(tmp_path / "brain.nii.gz")
+        nib.Nifti1Image(brain, np.eye(4)).to_filename(path)
+
+        subject = SimpleNamespace(volumes=VolumeStore(), brain=path)
+        eroded, mask = ref_tumor_seg.binary_mask(subject)
+        expected_eroded, expected_mask = slice_eroded_mask(nib.load(path).get_fdata())
+
+        np.testing.assert_array_equal(mask, expected_mask)
+        np.testing.assert_array_equal(eroded, expected_eroded)
+        assert eroded.any() and not eroded.all()
+        # Computed once for the steps of the subject
+        assert ref_tumor_seg.binary_mask(subject)[0] is eroded
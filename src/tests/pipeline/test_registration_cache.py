@@ -0,0 +1,130 @@
+import os
+import time
+
+import pytest
+
+from pediatric_fdopa_pipeline.registration_cache import RegistrationCache, file_digest, default_cache_dir
+
+
+def _write(path, content):
+    with open(path, "wb") as f:
+        f.write(content)
+    return str(path)
+
+
+@pytest.fixture
+def images(tmp_path):
+    return _write(tmp_path / "pet.nii.gz", b"pet"), _write(tmp_path / "mri.nii.gz", b"mri")
+
+
+@pytest.fixture
+def kwargs():
+    return dict(type_of_transform="Rigid", init=[], verbose=True, outprefix="/out/sub-01_mri2pet_Rigid_",
+                write_composite_transform=True)
+
+
+@pytest.fixture
+def outputs(tmp_path):
+    """Files of a registration: warped images and composite transforms."""
+    out = tmp_path / "out"
+    out.mkdir()
+    names = ("fwd.nii.gz", "inv.nii.gz", "Composite.h5", "InverseComposite.h5")
+    return tuple(_write(out / name, name.encode() * 10) for name in names)
+
+
+class TestKey:
+    """Tests for the registration keys"""
+
+    def test_same_registration_same_key(self, tmp_path, images, kwargs):
+        cache = RegistrationCache(str(tmp_path / "cache"))
+        other_run = dict(kwargs, outprefix="/other/run_", verbose=False)
+        assert cache.key(*images, kwargs, "0.6.3") == cache.key(*images, other_run, "0.6.3")
+
+    def test_images_by_content(self, tmp_path, images, kwargs):
+        cache = RegistrationCache(str(tmp_path / "cache"))
+        copy = _write(tmp_path / "copy.nii.gz", b"pet")
+        changed = _write(tmp_path / "changed.nii.gz", b"pet2")
+        key = cache.key(*images, kwargs, "0.6.3")
+        assert cache.key(copy, images[1], kwargs, "0.6.3") == key
+        assert cache.key(changed, images[1], kwargs, "0.6.3") != key
+
+    def test_every_argument_and_version(self, tmp_path, images, kwargs):
+        cache = RegistrationCache(str(tmp_path / "cache"))
+        key = cache.key(*images, kwargs, "0.6.3")
+        assert cache.key(*images, dict(kwargs, type_of_transform="SyNAggro"), "0.6.3") != key
+        assert cache.key(*images, dict(kwargs, reg_iterations=(40, 20, 0)), "0.6.3") != key
+        assert cache.key(*images, kwargs, "0.6.4") != key
+
+    def test_initial_transforms_by_content(self, tmp_path, images, kwargs):
+        cache = RegistrationCache(str(tmp_path / "cache"))
+        init = _write(tmp_path / "init.h5", b"init")
+        key = cache.key(*images, dict(kwargs, init=[init]), "0.6.3")
+        _write(init, b"changed")
+        assert cache.key(*images, dict(kwargs, init=[init]), "0.6.3") != key
+
+    def test_file_digest_follows_changes(self, tmp_path):
+        path = _write(tmp_path / "a.nii.gz", b"a")
+        digest = file_digest(path)
+        time.sleep(0.01)
+        _write(path, b"b")
+        assert file_digest(path) != digest
+
+
+class TestStoreFetch:
+    """Tests for storing and reusing registrations"""
+
+    def test_round_trip(self, tmp_path, outputs):
+        cache = RegistrationCache(str(tmp_path / "cache"))
+        contents = [open(fn, "rb").read() for fn in outputs]
+        cache.store("key", outputs)
+        for fn in outputs:
+            os.remove(fn)
+
+        assert cache.fetch("key", outputs)
+        assert [open(fn, "rb").read() for fn in outputs] == contents
+
+    def test_miss(self, tmp_path, outputs):
+        cache = RegistrationCache(str(tmp_path / "cache"))
+        assert not cache.fetch("unknown", outputs)
+
+    def test_existing_entry_kept(self, tmp_path, outputs):
+        cache = RegistrationCache(str(tmp_path / "cache"))
+        cache.store("key", outputs)
+        _write(outputs[0], b"other")
+        cache.store("key", outputs)
+
+        os.remove(outputs[0])
+        assert cache.fetch("key", outputs)
+        assert open(outputs[0], "rb").read() != b"other"
+
+    def test_no_temporary_directories_left(self, tmp_path, outputs):
+        cache = RegistrationCache(str(tmp_path / "cache"))
+        cache.store("key", outputs)
+        assert os.listdir(cache.cache_dir) == ["key"]
+
+    def test_default_cache_dir(self, tmp_path):
+        assert default_cache_dir(str(tmp_path)) == os.path.join(str(tmp_path), "pipeline", ".registration_cache")
+
+
+class TestEviction:
+    """Tests for the size limit of the cache"""
+
+    def test_least_recently_used_evicted(self, tmp_path, outputs):
+        entry_size = sum(os.path.getsize(fn) for fn in outputs)
+        cache = RegistrationCache(str(tmp_path / "cache"), max_size_mb=2.5 * entry_size / (1024 * 1024))
+        cache.store("first", outputs)
+        cache.store("second", outputs)
+        first, second = (os.path.join(cache.cache_dir, key) for key in ("first", "second"))
+        os.utime(first, (1000, 1000))
+        os.utime(second, (2000, 2000))
+
+        # Reusing an entry makes it the most recently used
+        assert cache.fetch("first", outputs)
+        cache.store("third", outputs)
+
+        assert sorted(os.listdir(cache.cache_dir)) == ["first", "third"]
+
+    def test_zero_size_keeps_nothing(self, tmp_path, outputs):
+        cache = RegistrationCache(str(tmp_path / "cache"), max_size_mb=0)
+        cache.store("key", outputs)
+        assert cache.entries() == []
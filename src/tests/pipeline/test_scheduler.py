@@ -0,0 +1,210 @@
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from pediatric_fdopa_pipeline.scheduler import Step, run_steps, run_in_process, step_dependencies, get_thread_budget, \
+    ITK_THREADS_VAR
+
+
+def process_threads(value):
+    """Runs in the process started by run_in_process."""
+    return value, os.getpid(), os.environ.get(ITK_THREADS_VAR)
+
+
+class Recorder:
+    """Records the start and end of the steps and the number of threads in use."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = []
+        self.used = 0
+        self.max_used = 0
+
+    def step(self, name, threads=1, duration=0.05, error=None):
+        def run():
+            with self.lock:
+                self.events.append(("start", name))
+                self.used += threads
+                self.max_used = max(self.max_used, self.used)
+            time.sleep(duration)
+            with self.lock:
+                self.used -= threads
+                self.events.append(("end", name))
+            if error is not None:
+                raise error
+        return run
+
+    def order(self, kind):
+        return [name for event, name in self.events if event == kind]
+
+    def index(self, kind, name):
+        return self.events.index((kind, name))
+
+
+class TestStepDependencies:
+    """Tests for the dependency graph built from the inputs and outputs"""
+
+    def test_latest_producer(self):
+        steps = [Step("a", None, outputs=("x",)),
+                 Step("b", None, inputs=("x",), outputs=("x", "y")),
+                 Step("c", None, inputs=("x", "y", "z"))]
+        assert step_dependencies(steps) == {"a": set(), "b": {"a"}, "c": {"b"}}
+
+    def test_duplicate_name(self):
+        with pytest.raises(ValueError):
+            step_dependencies([Step("a", None), Step("a", None)])
+
+
+class TestRunSteps:
+    """Tests for the concurrent execution of the steps"""
+
+    def test_dependencies_run_first(self):
+        rec = Recorder()
+        steps = [Step("mri2pet", rec.step("mri2pet"), outputs=("mri2pet_tfm",)),
+                 Step("stx2mri", rec.step("stx2mri"), outputs=("stx2mri_tfm",)),
+                 Step("stx2pet", rec.step("stx2pet"), inputs=("mri2pet_tfm", "stx2mri_tfm"), outputs=("stx2pet_tfm",)),
+                 Step("resample", rec.step("resample"), inputs=("stx2pet_tfm",))]
+        run_steps(steps, threads=4)
+
+        assert sorted(rec.order("end")) == ["mri2pet", "resample", "stx2mri", "stx2pet"]
+        assert rec.index("start", "stx2pet") > rec.index("end", "mri2pet")
+        assert rec.index("start", "stx2pet") > rec.index("end", "stx2mri")
+        assert rec.index("start", "resample") > rec.index("end", "stx2pet")
+
+    def test_independent_steps_overlap(self):
+        rec = Recorder()
+        steps = [Step("a", rec.step("a", duration=0.2)), Step("b", rec.step("b", duration=0.2))]
+        run_steps(steps, threads=2)
+        assert rec.max_used == 2
+
+    def test_budget_is_respected(self):
+        rec = Recorder()
+        steps = [Step(name, rec.step(name, threads=2), threads=2) for name in "abcd"]
+        run_steps(steps, threads=4)
+        assert rec.max_used == 4
+
+    def test_step_over_budget_runs_alone(self):
+        rec = Recorder()
+        steps = [Step("big", rec.step("big", threads=8), threads=8), Step("small", rec.step("small"))]
+        run_steps(steps, threads=2)
+        assert rec.max_used == 8
+        assert rec.index("start", "small") > rec.index("end", "big")
+
+    def test_serial_with_single_thread(self):
+        rec = Recorder()
+        steps = [Step(name, rec.step(name)) for name in "abc"]
+        run_steps(steps, threads=1)
+        assert rec.max_used == 1
+        assert rec.order("start") == ["a", "b", "c"]
+
+    def test_progress_callback(self):
+        done = []
+        steps = [Step("a", lambda: None, outputs=("x",)), Step("b", lambda: None, inputs=("x",))]
+        run_steps(steps, threads=2, on_step_done=lambda step, n_done, n_steps: done.append((step.name, n_done, n_steps)))
+        assert done == [("a", 1, 2), ("b", 2, 2)]
+
+    def test_error_stops_new_steps(self):
+        rec = Recorder()
+        steps = [Step("fails", rec.step("fails", error=RuntimeError("registration failed")), outputs=("x",)),
+                 Step("slow", rec.step("slow", duration=0.2)),
+                 Step("after", rec.step("after"), inputs=("x",))]
+
+        with pytest.raises(RuntimeError, match="registration failed"):
+            run_steps(steps, threads=2)
+
+        assert "after" not in rec.order("start")
+        # The running step is awaited before the error is raised
+        assert "slow" in rec.order("end")
+
+    def test_no_steps(self):
+        run_steps([], threads=2)
+
+
+class TestThreadBudget:
+    """Tests for the thread budget of a subject"""
+
+    def test_from_itk_limit(self, monkeypatch):
+        monkeypatch.setenv("ITK_GLOBAL_DEFAULT_NUMBER_OF_THREADS", "3")
+        assert get_thread_budget() == 3
+
+    def test_defaults_to_cpus(self, monkeypatch):
+        monkeypatch.setenv("ITK_GLOBAL_DEFAULT_NUMBER_OF_THREADS", "invalid")
+        assert get_thread_budget() >= 1
+
+
+class TestRunInProcess:
+    """Tests for the steps running their work in a process of their own"""
+
+    def test_result_and_itk_threads(self):
+        value, pid, threads = run_in_process(process_threads, "registration", threads=3)
+        assert value == "registration"
+        assert pid != os.getpid()
+        assert threads == "3"
+
+    def test_error_raised(self):
+        with pytest.raises(ValueError):
+            run_in_process(int, "not a number")
+
+    def test_steps_overlap(self):
+        rec = Recorder()
+
+        def step(name):
+            def run():
+                with rec.lock:
+                    rec.events.append(("start", name))
+                run_in_process(time.sleep, 0.5, threads=1)
+                with rec.lock:
+                    rec.events.append(("end", name))
+            return run
+
+        run_steps([Step("mri2pet", step("mri2pet")), Step("stx2mri", step("stx2mri"))], threads=2)
+        assert rec.index("start", "stx2mri") < rec.index("end", "mri2pet")
+        assert rec.index("start", "mri2pet") < rec.index("end", "stx2mri")
+
+
+class TestSubjectSteps:
+    """Tests for the step graph of a subject"""
+
+    @pytest.fixture
+    def subject(self, tmp_path):
+        pytest.importorskip("ants")
+        for module in ("sklearn", "skimage", "seaborn"):
+            pytest.importorskip(module)
+        from pediatric_fdopa_pipeline.subject import Subject
+
+        rec = Recorder()
+        subj = SimpleNamespace(work_dir=str(tmp_path), sub="01", rec=rec, threads={})
+
+        def step(name, duration):
+            def run(threads=None):
+                subj.threads[name] = threads
+                rec.step(name, duration=duration)()
+            return run
+
+        for name, duration in (("mri2pet", 0.1), ("stx2mri", 0.4), ("stx2pet", 0), ("mri2pet_resample", 0.1),
+                               ("stx2pet_resample", 0.1), ("select_regions", 0), ("define_variables", 0)):
+            setattr(subj, name, step(name, duration))
+        subj.steps = lambda threads: Subject.steps(subj, threads)
+        return subj
+
+    def test_registrations_overlap(self, subject):
+        run_steps(subject.steps(4), threads=4)
+        rec = subject.rec
+
+        assert subject.threads["mri2pet"] == 2 and subject.threads["stx2mri"] == 2
+        assert rec.index("start", "stx2mri") < rec.index("end", "mri2pet")
+        # The MRI resampling runs during the stereotaxic registration
+        assert rec.index("start", "mri2pet_resample") < rec.index("end", "stx2mri")
+        assert rec.index("start", "stx2pet_resample") > rec.index("end", "stx2mri")
+        assert rec.max_used == 2
+
+    def test_serial_with_single_thread(self, subject):
+        run_steps(subject.steps(1), threads=1)
+        rec = subject.rec
+
+        assert subject.threads["mri2pet"] is None and subject.threads["stx2mri"] is None
+        assert rec.order("start") == ["mri2pet", "stx2mri", "stx2pet", "mri2pet_resample", "stx2pet_resample",
+                                      "select_regions", "define_variables"]
@@ -0,0 +1,170 @@
+import os
+from types import SimpleNamespace
+
+import nibabel as nib
+import numpy as np
+import pytest
+
+pd = pytest.importorskip("pandas")
+# The label statistics and the VolumeStore use scipy.ndimage
+pytest.importorskip("scipy")
+
+from pediatric_fdopa_pipeline.qc_stage import QCQueue, load_jobs
+from pediatric_fdopa_pipeline.label_stats import label_dtype, compact_labels, atlas_copy
+from pediatric_fdopa_pipeline.volume_store import VolumeStore
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+STRIATUM_LABEL = 13
+REF_LABEL = 2
+TUMOR_LABEL = 1
+TIMES = [0, 60, 120, 240, 480, 900]
+
+
+def synthetic_subject(out_dir):
+    """
+    Dynamic PET, striatum and tumor atlases of a small synthetic subject.
+
+    The reference CSVs in data/ were extracted from these volumes with the original
+    get_tacs loop, which masked the whole 4D PET once per region and frame.
+    """
+    rng = np.random.default_rng(46)
+    shape = (14, 12, 10)
+
+    striatum_atlas = np.zeros(shape, dtype=np.uint8)
+    striatum_atlas[2:5, 3:7, 2:6] = STRIATUM_LABEL
+    striatum_atlas[8:12, 1:4, 1:9] = REF_LABEL
+    tumor_atlas = np.zeros(shape, dtype=np.uint8)
+    tumor_atlas[6:11, 6:11, 3:9] = TUMOR_LABEL
+
+    data = rng.gamma(4.0, 250.0, size=shape + (len(TIMES),))
+    data[tumor_atlas == TUMOR_LABEL] *= np.linspace(1.0, 3.0, len(TIMES))
+    # The reference region has no activity in the first frame
+    data[striatum_atlas == REF_LABEL, 0] = 0
+    img = nib.Nifti1Image(np.rint(data).astype(np.int16), np.diag([2.0, 2.0, 2.0, 1.0]))
+    img.header.set_slope_inter(0.0123457, 0.0)
+    pet4d = os.path.join(str(out_dir), "pet4d.nii.gz")
+    img.to_filename(pet4d)
+
+    pet_3d = nib.load(pet4d).get_fdata().mean(axis=3)
+    return pet4d, pet_3d, striatum_atlas, tumor_atlas
+
+
+def tacs_subject(out_dir):
+    """Subject with the attributes read and written by get_tacs, its QC products recorded for later."""
+    pet4d, pet_3d, striatum_atlas, tumor_atlas = synthetic_subject(out_dir)
+    affine = np.diag([2.0, 2.0, 2.0, 1.0])
+    pet = os.path.join(str(out_dir), "pet.nii.gz")
+    nib.Nifti1Image(pet_3d, affine).to_filename(pet)
+    atlas = os.path.join(str(out_dir), "atlas_space_pet.nii.gz")
+    nib.Nifti1Image(striatum_atlas, affine).to_filename(atlas)
+    qc_dir = os.path.join(str(out_dir), "qc")
+    os.makedirs(qc_dir)
+
+    return SimpleNamespace(volumes=VolumeStore(), pet=pet, pet4d=pet4d, atlas_space_pet=atlas, sub="01",
+                           prefix=os.path.join(str(out_dir), "sub-01_"), roi_labels=[11],
+                           striatum_atlas=striatum_atlas, striatum_label=STRIATUM_LABEL,
+                           tumor_atlas=tumor_atlas, tumor_label=TUMOR_LABEL, qc=QCQueue(qc_dir, "on-demand"),
+                           tacs_sub_regions_csv=os.path.join(str(out_dir), "tacs_sub_regions.csv"),
+                           tacs_sub_regions_qc_plot=os.path.join(qc_dir, "tacs_sub_regions.png"))
+
+
+def read_tacs(csv):
+    return pd.read_csv(csv, index_col=0)
+
+
+@pytest.fixture
+def pipeline():
+    for module in ("ants", "sklearn", "skimage", "seaborn"):
+        pytest.importorskip(module)
+    from pediatric_fdopa_pipeline import analysis, utils
+    return analysis, utils
+
+
+class TestRegionTacs:
+    """Tests for the TACs written by get_tacs against the CSVs of the original implementation"""
+
+    def test_matches_reference_csv(self, pipeline, tmp_path):
+        _, utils = pipeline
+        subj = tacs_subject(tmp_path)
+        tac_csv = str(tmp_path / "tacs.csv")
+        utils.get_tacs(subj, [11], REF_LABEL, TIMES, tac_csv, qc_png=str(tmp_path / "qc" / "tacs.png"),
+                       qc_sub_region_png=subj.tacs_sub_regions_qc_plot)
+
+        for name in ("tacs.csv", "tacs_sub_regions.csv"):
+            pd.testing.assert_frame_equal(read_tacs(tmp_path / name), read_tacs(os.path.join(DATA_DIR, name)),
+                                          check_exact=False, rtol=1e-12)
+        assert subj.bool_flag
+        assert [job["function"] for job in load_jobs(subj.qc.qc_dir)] == [
+            "pediatric_fdopa_pipeline.utils:plot_tacs", "pediatric_fdopa_pipeline.utils:plot_sub_region_tacs"]
+        high = nib.load(subj.prefix + "H_tumor_atlas.nii.gz").get_fdata()
+        assert subj.tum_percentage == np.round(np.count_nonzero(high) / np.count_nonzero(subj.tumor_atlas) * 100, 3)
+
+    def test_regions_read_back_without_qc(self, pipeline, tmp_path):
+        _, utils = pipeline
+        subj = tacs_subject(tmp_path)
+        tac_csv = str(tmp_path / "tacs.csv")
+        utils.get_tacs(subj, [11], REF_LABEL, TIMES, tac_csv, qc_png=str(tmp_path / "qc" / "tacs.png"))
+        os.remove(subj.tacs_sub_regions_csv)
+
+        df = utils.get_tacs(subj, [11], REF_LABEL, TIMES, tac_csv)
+        pd.testing.assert_frame_equal(df, pd.read_csv(tac_csv))
+        # The sub-regions are still extracted
+        pd.testing.assert_frame_equal(read_tacs(subj.tacs_sub_regions_csv),
+                                      read_tacs(os.path.join(DATA_DIR, "tacs_sub_regions.csv")),
+                                      check_exact=False, rtol=1e-12)
+
+    def test_sub_region_labels_follow_atlas(self, pipeline, tmp_path):
+        analysis, _ = pipeline
+        _, pet_3d, striatum_atlas, tumor_atlas = synthetic_subject(tmp_path)
+        sub_region_vol, sub_labels = analysis.get_uptake_sub_regions(striatum_atlas, 0.0, 1.0, pet_3d,
+                                                                     tumor_atlas, TUMOR_LABEL)
+        assert sub_labels == [STRIATUM_LABEL + 1, STRIATUM_LABEL + 2, STRIATUM_LABEL + 3]
+        assert not np.any(sub_region_vol[tumor_atlas != TUMOR_LABEL])
+
+    def test_frames_without_activity(self, pipeline):
+        _, utils = pipeline
+        frames = [np.zeros((3, 3, 3)), np.full((3, 3, 3), 2.0)]
+        mask = np.zeros((3, 3, 3), dtype=bool)
+        mask[1, 1] = True
+        df = utils.get_region_tacs(frames, [mask], [7], [0, 30])
+        assert df["value"].tolist() == [0.0, 2.0]
+        assert df["std"].tolist() == [0.0, 0.0]
+        assert df["frame"].tolist() == [0, 1]
+
+    def test_regions_reduced_together(self, pipeline):
+        _, utils = pipeline
+        rng = np.random.default_rng(43)
+        frames = rng.random((4, 5, 6, 3))
+        masks = [rng.random((5, 6, 3)) > 0.5, np.zeros((5, 6, 3), dtype=bool), rng.random((5, 6, 3)) > 0.8]
+        df = utils.get_region_tacs(list(frames), masks, [3, 8, 5], [0, 10, 20, 30])
+
+        assert df["region"].tolist() == [3] * 4 + [8] * 4 + [5] * 4
+        for region, mask in zip((3, 5), (masks[0], masks[2])):
+            rows = df[df["region"] == region]
+            np.testing.assert_allclose(rows["value"], [frame[mask].mean() for frame in frames], rtol=1e-12)
+            np.testing.assert_allclose(rows["std"], [frame[mask].std() for frame in frames], rtol=1e-12)
+        # Empty regions have no activity
+        assert not df[df["region"] == 8][["value", "std"]].to_numpy().any()
+
+
+class TestLabelDtypes:
+    """Tests for the compact dtypes of the label volumes"""
+
+    def test_label_dtype(self):
+        assert label_dtype(0, 120) == np.uint8
+        assert label_dtype(0, 256) == np.uint16
+        assert label_dtype(-1, 100) == np.int8
+        assert label_dtype(-1, 128) == np.int16
+
+    def test_compact_labels_rounds_floats(self):
+        labels = compact_labels(np.array([[[0.0, 2.9999], [300.0001, 7.0]]]))
+        assert labels.dtype == np.uint16
+        assert labels.ravel().tolist() == [0, 3, 300, 7]
+
+    def test_atlas_copy_holds_new_label(self):
+        atlas = np.zeros((2, 2, 2), dtype=np.uint8)
+        copy = atlas_copy(atlas, 300)
+        assert copy.dtype == np.uint16
+        copy[0, 0, 0] = 300
+        assert atlas[0, 0, 0] == 0
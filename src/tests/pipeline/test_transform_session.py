@@ -0,0 +1,103 @@
+import os
+import time
+
+import nibabel as nib
+import numpy as np
+import pytest
+
+# The VolumeStore indexes the labels with scipy.ndimage (label_stats)
+pytest.importorskip("scipy")
+
+from pediatric_fdopa_pipeline.qc_stage import QCQueue, load_jobs
+from pediatric_fdopa_pipeline.volume_store import VolumeStore
+
+
+@pytest.fixture
+def utils():
+    ants = pytest.importorskip("ants")
+    for module in ("sklearn", "skimage", "seaborn"):
+        pytest.importorskip(module)
+    from pediatric_fdopa_pipeline import utils
+    return utils, ants
+
+
+@pytest.fixture
+def images(tmp_path, utils):
+    """Fixed and moving images and an identity transform between them."""
+    _, ants = utils
+    rng = np.random.default_rng(41)
+    affine = np.diag([2.0, 2.0, 2.0, 1.0])
+    fx = str(tmp_path / "pet.nii.gz")
+    nib.Nifti1Image(rng.random((12, 12, 12)).astype(np.float32), affine).to_filename(fx)
+    moving = []
+    for name in ("brain", "tumor"):
+        mv = str(tmp_path / f"{name}.nii.gz")
+        nib.Nifti1Image(rng.random((12, 12, 12)), affine).to_filename(mv)
+        moving.append(mv)
+    tfm = str(tmp_path / "identity.mat")
+    ants.write_transform(ants.create_ants_transform(transform_type="AffineTransform", dimension=3), tfm)
+    return fx, moving, tfm
+
+
+class TestTransformSession:
+    """Tests for the resamplings written by a background thread"""
+
+    def test_close_drains_pending_writes(self, utils, images, tmp_path, monkeypatch):
+        utils, _ = utils
+        fx, moving, tfm = images
+        write = utils.TransformSession._write
+
+        def slow_write(self, *args):
+            time.sleep(0.3)
+            write(self, *args)
+        monkeypatch.setattr(utils.TransformSession, "_write", slow_write)
+
+        session = utils.TransformSession(str(tmp_path / "sub-01_"), fx, tfm)
+        out_fns = [session.transform(mv) for mv in moving]
+        assert not all(os.path.exists(fn) for fn in out_fns)
+        session.close()
+
+        assert session.pending == []
+        for mv, fn in zip(moving, out_fns):
+            np.testing.assert_allclose(nib.load(fn).get_fdata(), nib.load(mv).get_fdata(), atol=1e-6)
+
+    def test_write_error_raised_on_close(self, utils, images, tmp_path):
+        utils, _ = utils
+        fx, moving, tfm = images
+        session = utils.TransformSession(str(tmp_path / "missing" / "sub-01_"), fx, tfm)
+        session.transform(moving[0])
+        with pytest.raises(RuntimeError):
+            session.close()
+
+    def test_resampled_images_in_store(self, utils, images, tmp_path):
+        utils, _ = utils
+        fx, moving, tfm = images
+        store = VolumeStore()
+        with utils.TransformSession(str(tmp_path / "sub-01_"), fx, tfm, store=store) as session:
+            out_fns = [session.transform(mv) for mv in moving]
+
+        for fn in out_fns:
+            vol = store.volume(fn)
+            assert vol.dtype == np.float32
+            np.testing.assert_array_equal(vol, nib.load(fn).get_fdata().astype(np.float32))
+
+    def test_existing_outputs_kept(self, utils, images, tmp_path):
+        utils, _ = utils
+        fx, moving, tfm = images
+        out_fn = utils.transform(str(tmp_path / "sub-01_"), fx, moving[0], tfm)
+        mtime = os.path.getmtime(out_fn)
+        time.sleep(0.01)
+        assert utils.transform(str(tmp_path / "sub-01_"), fx, moving[0], tfm) == out_fn
+        assert os.path.getmtime(out_fn) == mtime
+
+    def test_qc_submitted_after_write(self, utils, images, tmp_path):
+        utils, _ = utils
+        fx, moving, tfm = images
+        qc_dir = tmp_path / "qc"
+        qc_dir.mkdir()
+        with utils.TransformSession(str(tmp_path / "sub-01_"), fx, tfm, qc=QCQueue(str(qc_dir), "on-demand")) as session:
+            out_fn = session.transform(moving[0], qc_filename=str(qc_dir / "brain.gif"))
+
+        jobs = load_jobs(str(qc_dir))
+        assert [job["kwargs"]["overlay_fn"] for job in jobs] == [out_fn]
+        assert jobs[0]["function"] == "pediatric_fdopa_pipeline.qc:render_gif"
@@ -0,0 +1,128 @@
+import json
+
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def refinement():
+    pytest.importorskip("sklearn")
+    pytest.importorskip("joblib")
+    from pediatric_fdopa_pipeline import tumor_refinement
+    return tumor_refinement
+
+
+@pytest.fixture
+def voxels():
+    """(distance, sinus) features of the tumour voxels: a core and a rim overlapping it."""
+    rng = np.random.default_rng(48)
+    core = np.column_stack([rng.normal(2.0, 1.0, 150), rng.uniform(0.0, 0.4, 150)])
+    rim = np.column_stack([rng.normal(6.0, 1.5, 150), rng.uniform(0.2, 1.0, 150)])
+    return np.concatenate([core, rim])
+
+
+def original_refinement(X, seed=42):
+    """KMeans clusters and SVM labels of the original ref_seg, seeded."""
+    from sklearn.cluster import KMeans
+    from sklearn.model_selection import GridSearchCV
+    from sklearn.svm import SVC
+
+    kmeans = KMeans(n_clusters=2, init='k-means++', n_init=10, random_state=seed)
+    kmeans.fit(X)
+    labels = kmeans.predict(X)
+    param_grid = {
+        'C': [0.1, 1, 10, 100],
+        'gamma': [1, 0.1, 0.01, 0.001],
+        'kernel': ['rbf']
+    }
+    grid_search = GridSearchCV(SVC(), param_grid, cv=5)
+    grid_search.fit(X, labels)
+    return labels, grid_search.best_estimator_.predict(X)
+
+
+def same_partition(labels_a, labels_b):
+    return np.array_equal(labels_a, labels_b) or np.array_equal(labels_a, 1 - labels_b)
+
+
+class TestSettings:
+    """Tests for the choice of the refinement mode"""
+
+    def test_exact_by_default(self, refinement):
+        settings = refinement.RefinementSettings()
+        assert settings.mode == 'exact'
+        assert settings.select_mode(10 ** 6) == 'exact'
+        assert settings.fit_size('exact', 10 ** 6) == 10 ** 6
+
+    def test_auto_by_tumour_size(self, refinement):
+        settings = refinement.RefinementSettings('auto', max_samples=100, approximate_min_voxels=1000)
+        assert settings.select_mode(100) == 'exact'
+        assert settings.select_mode(500) == 'subsample'
+        assert settings.fit_size('subsample', 500) == 100
+        assert settings.select_mode(1000) == 'approximate'
+
+    def test_unknown_mode(self, refinement):
+        with pytest.raises(ValueError):
+            refinement.RefinementSettings('fast')
+
+
+class TestStratifiedSample:
+    """Tests for the sample of the voxels fitted by the bounded modes"""
+
+    def test_classes_keep_their_share(self, refinement):
+        labels = np.array([0] * 900 + [1] * 100)
+        index = refinement.stratified_sample(labels, 100)
+        assert np.all(np.diff(index) > 0)
+        assert np.count_nonzero(labels[index] == 0) == 90
+        assert np.count_nonzero(labels[index] == 1) == 10
+
+    def test_small_class_kept_for_cross_validation(self, refinement):
+        labels = np.array([0] * 997 + [1] * 3)
+        index = refinement.stratified_sample(labels, 50)
+        assert np.count_nonzero(labels[index] == 1) == 3
+
+    def test_all_voxels_when_small(self, refinement):
+        np.testing.assert_array_equal(refinement.stratified_sample(np.zeros(20), 50), np.arange(20))
+
+
+class TestRefineTumor:
+    """Tests for the tumour refinement"""
+
+    def test_exact_matches_original(self, refinement, voxels):
+        expected_clusters, expected_svm = original_refinement(voxels)
+        clusters, svm = refinement.refine_tumor(voxels, refinement.RefinementSettings('exact'), n_jobs=1)
+        assert same_partition(clusters, expected_clusters)
+        assert same_partition(svm, expected_svm)
+
+    def test_models_reused(self, refinement, voxels, tmp_path, monkeypatch):
+        model_file = str(tmp_path / "models.joblib")
+        first = refinement.refine_tumor(voxels, model_file=model_file, n_jobs=1)
+
+        def no_fit(*args, **kwargs):
+            raise AssertionError("the cached models should be reused")
+        monkeypatch.setattr(refinement, "fit_kmeans", no_fit)
+        second = refinement.refine_tumor(voxels, model_file=model_file, n_jobs=1)
+        for a, b in zip(first, second):
+            np.testing.assert_array_equal(a, b)
+
+    def test_models_refitted_when_voxels_change(self, refinement, voxels, tmp_path):
+        model_file = str(tmp_path / "models.joblib")
+        refinement.refine_tumor(voxels, model_file=model_file, n_jobs=1)
+        clusters, _ = refinement.refine_tumor(voxels[:200], model_file=model_file, n_jobs=1)
+        assert clusters.shape == (200,)
+
+    def test_agreement_report(self, refinement, voxels, tmp_path):
+        report_file = tmp_path / "report.json"
+        settings = refinement.RefinementSettings('subsample', report=True, max_samples=100)
+        refinement.refine_tumor(voxels, settings, report_file=str(report_file), n_jobs=1)
+
+        report = json.loads(report_file.read_text())
+        assert report['mode'] == 'subsample'
+        assert report['n_voxels'] == len(voxels)
+        assert report['n_fit'] == 100
+        assert 0.5 <= report['agreement'] <= 1.0
+        assert 0.5 <= report['cluster_agreement'] <= 1.0
+
+    def test_agreement_compares_farthest_class(self, refinement, voxels):
+        labels = (voxels[:, 0] > 4).astype(int)
+        assert refinement.agreement(voxels, labels, 1 - labels) == 1.0
+        assert refinement.agreement(voxels[:0], labels[:0], labels[:0]) == 1.0
@@ -0,0 +1,129 @@
+import pickle
+
+import nibabel as nib
+import numpy as np
+import pytest
+
+# The VolumeStore indexes the labels with scipy.ndimage (label_stats)
+pytest.importorskip("scipy")
+
+from pediatric_fdopa_pipeline.volume_store import VolumeStore
+
+
+def _save(path, data, slope=None, inter=None):
+    img = nib.Nifti1Image(data, np.diag([2.0, 2.0, 2.0, 1.0]))
+    if slope is not None:
+        img.header.set_slope_inter(slope, inter)
+    img.to_filename(str(path))
+    return str(path)
+
+
+@pytest.fixture
+def pet4d(tmp_path):
+    """Dynamic PET stored as int16 with a float scaling, as written by the scanners."""
+    rng = np.random.default_rng(0)
+    data = rng.integers(0, 3000, size=(6, 7, 8, 5)).astype(np.int16)
+    return _save(tmp_path / "pet4d.nii.gz", data, slope=0.0123457, inter=1.5)
+
+
+@pytest.fixture
+def atlas(tmp_path):
+    labels = np.zeros((6, 7, 8))
+    labels[1:3, 1:4, 2:6] = 3
+    labels[4:6, 2:5, 1:3] = 12.0000001
+    return _save(tmp_path / "atlas.nii.gz", labels.astype(np.float32))
+
+
+class TestVolumes:
+    """Tests for the volumes shared by the analysis steps"""
+
+    def test_read_once_and_read_only(self, atlas):
+        store = VolumeStore()
+        vol = store.volume(atlas)
+        assert vol.dtype == np.float32
+        assert store.volume(atlas) is vol
+        with pytest.raises(ValueError):
+            vol[0, 0, 0] = 1
+
+    def test_intensities_as_get_fdata(self, pet4d):
+        store = VolumeStore()
+        vol = store.intensities(pet4d)
+        assert vol.dtype == np.float64
+        np.testing.assert_array_equal(vol, nib.load(pet4d).get_fdata())
+
+    def test_labels_compact_and_rounded(self, atlas):
+        labels = VolumeStore().labels(atlas)
+        assert labels.dtype == np.uint8
+        assert sorted(np.unique(labels).tolist()) == [0, 3, 12]
+
+    def test_label_index_shared(self, atlas):
+        store = VolumeStore()
+        index = store.label_index(atlas)
+        assert store.label_index(atlas) is index
+        assert index.count(3) == 2 * 3 * 4
+
+    def test_derived_computed_once(self, atlas):
+        store = VolumeStore()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return store.volume(atlas) != 0
+
+        mask = store.derived(atlas, "mask", compute)
+        assert store.derived(atlas, "mask", compute) is mask
+        assert len(calls) == 1
+
+    def test_put_replaces_file_content(self, tmp_path):
+        store = VolumeStore()
+        path = _save(tmp_path / "brain.nii.gz", np.zeros((4, 4, 4), dtype=np.float32))
+        store.volume(path)
+        data = np.ones((4, 4, 4))
+        store.put(path, data)
+        vol = store.volume(path)
+        assert vol.dtype == np.float32
+        np.testing.assert_array_equal(vol, data)
+        # The labels are derived from the stored content
+        assert store.labels(path).max() == 1
+
+    def test_release(self, atlas):
+        store = VolumeStore()
+        vol = store.volume(atlas)
+        store.release(atlas)
+        assert store.volume(atlas) is not vol
+
+    def test_not_pickled(self, atlas):
+        store = VolumeStore()
+        store.volume(atlas)
+        copy = pickle.loads(pickle.dumps(store))
+        assert copy._arrays == {}
+
+
+class TestFrames:
+    """Tests for the frame by frame reading of the dynamic PET"""
+
+    def test_frames_as_get_fdata(self, pet4d):
+        reference = nib.load(pet4d).get_fdata()
+        frames = list(VolumeStore().frames(pet4d))
+        assert len(frames) == 5
+        for t, frame in enumerate(frames):
+            assert frame.dtype == np.float64
+            np.testing.assert_array_equal(frame, reference[..., t])
+
+    def test_frame_range(self, pet4d):
+        reference = nib.load(pet4d).get_fdata()
+        frames = list(VolumeStore().frames(pet4d, start=1, stop=3))
+        assert len(frames) == 2
+        np.testing.assert_array_equal(frames[0], reference[..., 1])
+        assert len(list(VolumeStore().frames(pet4d, stop=50))) == 5
+
+    def test_unscaled_image(self, tmp_path):
+        data = np.arange(4 * 5 * 6 * 2, dtype=np.float32).reshape(4, 5, 6, 2)
+        path = _save(tmp_path / "float.nii", data)
+        frames = list(VolumeStore().frames(path))
+        np.testing.assert_array_equal(frames[1], data[..., 1])
+
+    def test_3d_image_single_frame(self, atlas):
+        frames = list(VolumeStore().frames(atlas))
+        assert len(frames) == 1
+        np.testing.assert_array_equal(frames[0], nib.load(atlas).get_fdata())
@@ -17,7 +17,9 @@ import pytest
 import numpy as np
 import nibabel as nib
 
-from main.threads.nifti_utils_threads import SaveNiftiThread, ImageLoadThread
+from main.threads.nifti_utils_threads import SaveNiftiThread, ImageLoadThread, ProjectionThread, MAX_LABELS, \
+    compute_projection_numba, compute_projections, PROJECTION_MODES, FrameCache, CinePrefetchThread, \
+    DicomSeriesLoadThread, RenderQueue, RenderWorkerThread, LabelTacThread
 
 
 class TestSaveNiftiThreadInitialization:
@@ -1148,6 +1150,91 @@ class TestImageLoadThreadNormalization:
         assert np.all(result == 0)
 
 
+class TestImageLoadThreadLabelMaps:
+    """Tests for label map detection on overlays"""
+
+    def test_extract_label_map_uint8(self):
+        data = np.zeros((5, 5, 5), dtype=np.float32)
+        data[1:3, 1:3, 1:3] = 3
+        labels = ImageLoadThread.extract_label_map(data)
+        assert labels.dtype == np.uint8
+        assert np.array_equal(labels, data.astype(np.uint8))
+
+    def test_extract_label_map_uint16(self):
+        data = np.zeros((5, 5, 5), dtype=np.float32)
+        data[0, 0, 0] = 1000
+        labels = ImageLoadThread.extract_label_map(data)
+        assert labels.dtype == np.uint16
+        assert labels[0, 0, 0] == 1000
+
+    @pytest.mark.parametrize("data", [
+        np.random.rand(5, 5, 5).astype(np.float32),
+        -np.ones((5, 5, 5), dtype=np.float32),
+        np.full((5, 5, 5), 70000, dtype=np.float32),
+        np.zeros((5, 5, 5, 2), dtype=np.float32),
+    ])
+    def test_extract_label_map_rejects_non_labels(self, data):
+        assert ImageLoadThread.extract_label_map(data) is None
+
+    def test_extract_label_map_rejects_many_values(self):
+        data = np.arange(6 * 6 * 40, dtype=np.float32).reshape(6, 6, 40)
+        assert ImageLoadThread.extract_label_map(data) is None
+        data[data > MAX_LABELS] = 0
+        assert ImageLoadThread.extract_label_map(data) is not None
+
+    def test_looks_like_label_map(self):
+        assert ImageLoadThread.looks_like_label_map("/data/sub-01/aparc+aseg.nii.gz")
+        assert ImageLoadThread.looks_like_label_map("/data/sub-01/tumor_SEG/")
+        assert not ImageLoadThread.looks_like_label_map("/data/sub-01/T1w.nii.gz")
+
+        header = nib.Nifti1Header()
+        header.set_intent("label")
+        assert ImageLoadThread.looks_like_label_map("/data/sub-01/T1w.nii.gz", header)
+
+    def test_labels_emitted_only_for_overlays(self, temp_workspace):
+        data = np.zeros((6, 6, 6), dtype=np.int16)
+        data[1:4, 1:4, 1:4] = 2
+        path = os.path.join(temp_workspace, "atlas.nii.gz")
+        nib.save(nib.Nifti1Image(data, np.eye(4)), path)
+
+        for is_overlay, expected_calls in [(True, 1), (False, 0)]:
+            thread = ImageLoadThread(path, is_overlay)
+            labels_mock = Mock()
+            thread.labels_loaded.connect(labels_mock)
+            thread.run()
+            assert labels_mock.call_count == expected_calls
+            if expected_calls:
+                emitted, label_like = labels_mock.call_args[0]
+                assert emitted.dtype == np.uint8
+                assert emitted.max() == 2
+                assert label_like
+
+    def test_integer_intensities_not_label_like(self, temp_workspace):
+        data = np.arange(216, dtype=np.int16).reshape(6, 6, 6)
+        path = os.path.join(temp_workspace, "T1w.nii.gz")
+        nib.save(nib.Nifti1Image(data, np.eye(4)), path)
+
+        thread = ImageLoadThread(path, True)
+        labels_mock = Mock()
+        thread.labels_loaded.connect(labels_mock)
+        thread.run()
+        assert not labels_mock.call_args[0][1]
+
+    def test_raw_data_emitted_only_for_base_images(self, temp_workspace):
+        data = np.linspace(-50, 400, 216, dtype=np.float32).reshape(6, 6, 6)
+        path = os.path.join(temp_workspace, "pet.nii.gz")
+        nib.save(nib.Nifti1Image(data, np.eye(4)), path)
+
+        for is_overlay, expected_calls in [(False, 1), (True, 0)]:
+            thread = ImageLoadThread(path, is_overlay)
+            raw_mock = Mock()
+            thread.raw_loaded.connect(raw_mock)
+            thread.run()
+            assert raw_mock.call_count == expected_calls
+            if expected_calls:
+                np.testing.assert_allclose(raw_mock.call_args[0][0], data)
+
+
 class TestImageLoadThreadCanonicalOrientation:
     """Tests for conversion to canonical RAS+ orientation"""
 
@@ -1456,3 +1543,224 @@ class TestEdgeCasesAndIntegration:
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
+
+
+class TestProjections:
+    """Tests for intensity projections and ProjectionThread"""
+
+    @pytest.mark.parametrize("mode,reducer", [("max", np.max), ("mean", np.mean), ("min", np.min)])
+    @pytest.mark.parametrize("axis", [0, 1, 2])
+    def test_projection_matches_numpy(self, mode, reducer, axis):
+        volume = np.random.rand(7, 9, 11).astype(np.float32)
+        result = compute_projection_numba(volume, axis, PROJECTION_MODES[mode])
+        assert result.dtype == np.float32
+        np.testing.assert_allclose(result, reducer(volume, axis=axis), rtol=1e-5)
+
+    def test_compute_projections_plane_order(self):
+        volume = np.random.rand(4, 5, 6).astype(np.float32)
+        axial, coronal, sagittal = compute_projections(volume, "max")
+        assert axial.shape == (4, 5)
+        assert coronal.shape == (4, 6)
+        assert sagittal.shape == (5, 6)
+
+    def test_thread_emits_requested_frames(self):
+        data = np.random.rand(5, 5, 5, 4).astype(np.float32)
+        thread = ProjectionThread(data, "max", [2, 3, 0])
+        ready = Mock()
+        thread.frame_ready.connect(ready)
+        thread.run()
+
+        assert [c[0][1] for c in ready.call_args_list] == [2, 3, 0]
+        mode, frame, projections = ready.call_args_list[0][0]
+        assert mode == "max"
+        np.testing.assert_allclose(projections[0], data[..., 2].max(axis=2))
+
+    def test_thread_cancel(self):
+        data = np.random.rand(5, 5, 5, 4).astype(np.float32)
+        thread = ProjectionThread(data, "mean", [0, 1, 2, 3])
+        ready = Mock()
+        thread.frame_ready.connect(ready)
+        thread.cancel()
+        thread.run()
+        ready.assert_not_called()
+
+
+class TestLabelTacThread:
+    """Tests for the background computation of the label TACs"""
+
+    def test_emits_table(self):
+        labels = np.zeros((4, 4, 4), dtype=np.uint8)
+        labels[:2] = 1
+        labels[2:, :2] = 2
+        data = np.random.rand(4, 4, 4, 3).astype(np.float32)
+        thread = LabelTacThread(labels, data)
+        finished = Mock()
+        thread.finished.connect(finished)
+        thread.run()
+
+        table = finished.call_args[0][0]
+        assert table.labels.tolist() == [1, 2]
+        np.testing.assert_allclose(table.curve(2)[0], data[labels == 2].mean(axis=0), rtol=1e-6)
+
+    def test_cancel_discards_result(self):
+        thread = LabelTacThread(np.ones((2, 2, 2), dtype=np.uint8), np.random.rand(2, 2, 2, 2))
+        finished = Mock()
+        thread.finished.connect(finished)
+        thread.cancel()
+        thread.run()
+        finished.assert_not_called()
+
+
+class TestFrameCache:
+    """Tests for the bounded frame cache"""
+
+    def test_put_get(self):
+        cache = FrameCache(capacity=2)
+        cache.put(("k", 0), "frame0")
+        assert ("k", 0) in cache
+        assert cache.get(("k", 0)) == "frame0"
+        assert cache.get(("k", 1)) is None
+
+    def test_evicts_oldest(self):
+        cache = FrameCache(capacity=2)
+        for frame in range(3):
+            cache.put(frame, frame)
+        assert len(cache) == 2
+        assert 0 not in cache
+        assert 1 in cache and 2 in cache
+
+        cache.clear()
+        assert len(cache) == 0
+
+
+class TestCinePrefetchThread:
+    """Tests for the cine prefetch thread"""
+
+    def test_next_missing_frame_wraps_when_looping(self):
+        cache = FrameCache(capacity=10)
+        thread = CinePrefetchThread(Mock(), cache, n_frames=5, lookahead=3, loop=True)
+        thread.set_playhead(3, "state")
+        assert thread.next_missing_frame() == ("state", 4)
+        cache.put(("state", 4), [])
+        assert thread.next_missing_frame() == ("state", 0)
+
+    def test_next_missing_frame_stops_at_end(self):
+        cache = FrameCache(capacity=10)
+        thread = CinePrefetchThread(Mock(), cache, n_frames=5, lookahead=3, loop=False)
+        thread.set_playhead(3, "state")
+        cache.put(("state", 4), [])
+        assert thread.next_missing_frame() is None
+
+    def test_state_change_invalidates_frames(self):
+        cache = FrameCache(capacity=10)
+        thread = CinePrefetchThread(Mock(), cache, n_frames=5, lookahead=2)
+        thread.set_playhead(0, "old")
+        cache.put(("old", 1), [])
+        cache.put(("old", 2), [])
+        assert thread.next_missing_frame() is None
+        thread.set_playhead(0, "new")
+        assert thread.next_missing_frame() == ("new", 1)
+
+    def test_run_fills_lookahead(self, qtbot):
+        cache = FrameCache(capacity=10)
+        render = Mock(side_effect=lambda frame: f"rendered {frame}")
+        thread = CinePrefetchThread(render, cache, n_frames=6, lookahead=3)
+        thread.set_playhead(0, "state")
+
+        with qtbot.waitSignals([thread.frame_rendered] * 3, timeout=2000):
+            thread.start()
+        thread.cancel()
+        thread.wait()
+
+        assert [cache.get(("state", f)) for f in (1, 2, 3)] == ["rendered 1", "rendered 2", "rendered 3"]
+        assert ("state", 4) not in cache
+
+
+
+class TestDicomSeriesLoadThread:
+    """Tests for opening DICOM series folders"""
+
+    @pytest.fixture
+    def volume(self):
+        return np.random.default_rng(0).integers(0, 100, size=(4, 5, 6, 2)).astype(np.float32)
+
+    def test_base_series_is_emitted_without_decoding(self, tmp_path, write_dicom_series, volume):
+        folder = write_dicom_series(str(tmp_path / "pet"), volume)
+        thread = DicomSeriesLoadThread(folder, is_overlay=False)
+        finished, raw = Mock(), Mock()
+        thread.finished.connect(finished)
+        thread.raw_loaded.connect(raw)
+        thread.run()
+
+        img_data, dims, affine, is_4d, is_overlay = finished.call_args[0]
+        assert dims == (4, 5, 6, 2)
+        assert is_4d and not is_overlay
+        assert img_data is thread.series.data
+        assert raw.call_args[0][0] is thread.series.raw
+        assert thread.series.decode_count == 0
+
+    def test_overlay_series_is_fully_decoded(self, tmp_path, write_dicom_series):
+        labels = np.zeros((4, 5, 6, 1), dtype=np.float32)
+        labels[1:3, 1:3, 2:4] = 2
+        folder = write_dicom_series(str(tmp_path / "seg"), labels)
+        thread = DicomSeriesLoadThread(folder, is_overlay=True)
+        finished, labels_loaded = Mock(), Mock()
+        thread.finished.connect(finished)
+        thread.labels_loaded.connect(labels_loaded)
+        thread.run()
+
+        assert thread.series.is_fully_decoded()
+        assert finished.call_args[0][4]
+        assert labels_loaded.call_args[0][0].max() == 2
+
+    def test_error_for_folder_without_dicom(self, tmp_path):
+        thread = DicomSeriesLoadThread(str(tmp_path), is_overlay=False)
+        error = Mock()
+        thread.error.connect(error)
+        thread.run()
+        error.assert_called_once()
+
+
+class TestRenderQueue:
+    """Tests for the shared rendering queue"""
+
+    def test_one_pending_job_per_target(self):
+        queue = RenderQueue()
+        queue.submit("a", 1, Mock())
+        queue.submit("b", 2, Mock())
+        queue.submit("a", 3, Mock())
+        assert len(queue) == 2
+        assert queue.take()[:2] == ("b", 2)
+        assert queue.take()[:2] == ("a", 3)
+        assert queue.take(timeout=0.01) is None
+
+    def test_focused_target_first(self):
+        queue = RenderQueue()
+        for target in ("a", "b", "c"):
+            queue.submit(target, target, Mock())
+        queue.set_focus("c")
+        assert [queue.take()[0] for _ in range(3)] == ["c", "a", "b"]
+
+
+class TestRenderWorkerThread:
+    """Tests for the rendering pool workers"""
+
+    def test_workers_share_cache(self, qtbot):
+        queue, cache = RenderQueue(), FrameCache(capacity=10)
+        render = Mock(return_value="image")
+        workers = [RenderWorkerThread(queue, cache) for _ in range(2)]
+        results = []
+        for worker in workers:
+            worker.rendered.connect(lambda target, key, result: results.append((target, key, result)))
+            worker.start()
+
+        queue.submit("a", "slice", render)
+        qtbot.waitUntil(lambda: len(results) == 1, timeout=2000)
+        queue.submit("b", "slice", render)
+        qtbot.waitUntil(lambda: len(results) == 2, timeout=2000)
+        for worker in workers:
+            worker.cancel()
+            worker.wait()
+
+        assert sorted(results) == [("a", "slice", "image"), ("b", "slice", "image")]
+        render.assert_called_once()
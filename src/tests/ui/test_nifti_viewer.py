@@ -1,15 +1,20 @@
 import sys
 import os
+import json
+import time
 import unittest
 import numpy as np
 import nibabel as nib
+import pytest
 import tempfile
 from PyQt6.QtWidgets import QApplication, QMessageBox
 from PyQt6.QtTest import QTest
 from PyQt6.QtCore import Qt, QEventLoop, QTimer
 from unittest.mock import patch, MagicMock
 
-from main.ui.nifti_viewer import NiftiViewer, compute_mask_numba_mm, apply_overlay_numba
+from main.ui.nifti_viewer import NiftiViewer, compute_mask_numba_mm, apply_overlay_numba, apply_label_lut_numba, \
+    build_label_lut, reslice_trilinear_numba, reslice_nearest_numba, rotation_matrix, apply_colormap_tiles_numba, \
+    colormap_lut
 
 app = QApplication(sys.argv)
 
@@ -31,6 +36,13 @@ class TestNiftiViewer(unittest.TestCase):
         overlay = nib.Nifti1Image(np.random.rand(20, 20, 20), np.eye(4))
         nib.save(overlay, cls.test_overlay_path)
 
+        cls.test_label_overlay_path = os.path.join(cls.temp_dir.name, 'sub-01', 'atlas.nii')
+        atlas = np.zeros((20, 20, 20), dtype=np.int16)
+        atlas[2:8, 2:8, 2:8] = 1
+        atlas[10:15, 10:15, 10:15] = 2
+        atlas[15:18, 2:5, 2:5] = 5
+        nib.save(nib.Nifti1Image(atlas, np.eye(4)), cls.test_label_overlay_path)
+
         cls.test_save_dir = os.path.join(cls.temp_dir.name, 'derivatives/manual_masks/sub-01/anat')
         os.makedirs(cls.test_save_dir, exist_ok=True)
 
@@ -117,6 +129,463 @@ class TestNiftiViewer(unittest.TestCase):
         self.assertEqual(result[5, 5, 1], 0.5, "Green channel should reflect overlay intensity")
         self.assertEqual(result[5, 5, 2], 0.0, "Blue channel should be zero for green overlay")
 
+    def test_apply_label_lut_numba(self):
+        rgba_image = np.zeros((4, 4, 4), dtype=np.float64)
+        labels = np.zeros((4, 4), dtype=np.uint8)
+        labels[0, 0] = 1
+        labels[1, 1] = 2
+        labels[2, 2] = 9  # Out of LUT range, must be ignored
+        lut = np.zeros((3, 4), dtype=np.float32)
+        lut[1] = (1.0, 0.0, 0.0, 1.0)
+        lut[2] = (0.0, 1.0, 0.0, 0.0)  # Hidden label
+
+        result = apply_label_lut_numba(rgba_image, labels, lut, 0.5)
+
+        self.assertAlmostEqual(result[0, 0, 0], 0.5, msg="Visible label should be blended with alpha")
+        self.assertEqual(result[1, 1, 1], 0.0, "Hidden label should leave image unchanged")
+        self.assertEqual(result[2, 2, :3].sum(), 0.0, "Labels outside the LUT should be ignored")
+        self.assertEqual(result[3, 3, :3].sum(), 0.0, "Background should be unchanged")
+
+    def test_build_label_lut(self):
+        lut = build_label_lut(5)
+        self.assertEqual(lut.shape, (6, 4))
+        self.assertEqual(lut.dtype, np.float32)
+        self.assertEqual(lut[0, 3], 0.0, "Background should be transparent")
+        self.assertTrue(np.all(lut[1:, 3] == 1.0), "Labels should be opaque")
+        self.assertFalse(np.array_equal(lut[1], lut[2]), "Consecutive labels should have distinct colors")
+
+    def test_load_label_overlay(self):
+        self.viewer.open_file(self.test_nii_path)
+        loop = QEventLoop()
+        QTimer.singleShot(1000, loop.quit)
+        loop.exec()
+
+        self.viewer.open_file(self.test_label_overlay_path, is_overlay=True)
+        QTimer.singleShot(1000, loop.quit)
+        loop.exec()
+
+        self.assertIsNotNone(self.viewer.overlay_label_data, "Label data should be kept for integer overlays")
+        self.assertEqual(self.viewer.overlay_label_data.dtype, np.uint8)
+        self.assertEqual(self.viewer.overlay_labels, [1, 2, 5])
+        self.assertTrue(self.viewer.overlay_label_mode, "Multi-label overlays should open in label mode")
+        self.assertEqual(self.viewer.overlay_label_list.count(), 3)
+
+        # Hiding a label only edits the LUT
+        label_data_before = self.viewer.overlay_label_data
+        self.viewer.overlay_label_list.item(1).setCheckState(Qt.CheckState.Unchecked)
+        self.assertEqual(self.viewer.overlay_label_lut[2, 3], 0.0, "Hidden label should have zero alpha")
+        self.assertIs(self.viewer.overlay_label_data, label_data_before, "Label volume should not be recomputed")
+
+        mask = self.viewer.label_visible_mask()
+        self.assertEqual(mask.sum(), 6 ** 3 + 3 ** 3, "Only visible labels should be in the mask")
+
+        self.viewer.overlay_label_checkbox.setChecked(False)
+        self.assertFalse(self.viewer.overlay_label_mode)
+        self.assertIsNotNone(self.viewer.overlay_thresholded_data, "Threshold mode should rebuild its mask")
+
+    def test_integer_intensity_overlay_not_in_label_mode(self):
+        path = os.path.join(self.temp_dir.name, 'sub-01', 'T1w_int.nii')
+        mri = np.arange(20 * 20 * 20, dtype=np.int16).reshape(20, 20, 20) % 300
+        nib.save(nib.Nifti1Image(mri, np.eye(4)), path)
+
+        self.viewer.open_file(self.test_nii_path)
+        loop = QEventLoop()
+        QTimer.singleShot(1000, loop.quit)
+        loop.exec()
+
+        self.viewer.open_file(path, is_overlay=True)
+        QTimer.singleShot(1000, loop.quit)
+        loop.exec()
+
+        self.assertFalse(self.viewer.overlay_label_mode, "Integer intensities should keep the thresholded display")
+        self.assertFalse(self.viewer.overlay_label_checkbox.isChecked())
+
+        # The user can still opt in
+        self.assertTrue(self.viewer.overlay_label_checkbox.isEnabled())
+        self.viewer.overlay_label_checkbox.setChecked(True)
+        self.assertTrue(self.viewer.overlay_label_mode)
+
+    def test_live_roi_stats(self):
+        self.viewer.open_file(self.test_nii_path)
+        loop = QEventLoop()
+        QTimer.singleShot(1000, loop.quit)
+        loop.exec()
+        self.assertEqual(self.viewer.roi_stats_panel.stats_label.text(), "No ROI")
+
+        self.viewer.open_file(self.test_label_overlay_path, is_overlay=True)
+        QTimer.singleShot(1000, loop.quit)
+        loop.exec()
+
+        raw = nib.load(self.test_nii_path).get_fdata()
+        mask = self.viewer.label_visible_mask()
+        stats = self.viewer.roi_stats
+        self.assertEqual(stats.count, 6 ** 3 + 5 ** 3 + 3 ** 3)
+        self.assertAlmostEqual(stats.summary()["mean"], raw[mask].mean(), places=5,
+                               msg="Statistics should use raw intensities")
+
+        # Hiding a label removes only its voxels
+        self.viewer.overlay_label_list.item(1).setCheckState(Qt.CheckState.Unchecked)
+        self.assertEqual(stats.count, 6 ** 3 + 3 ** 3)
+
+        self.viewer.overlay_checkbox.setChecked(False)
+        self.assertEqual(stats.count, 0)
+        self.assertEqual(self.viewer.roi_stats_panel.stats_label.text(), "No ROI")
+
+    @patch('PyQt6.QtWidgets.QFileDialog.getSaveFileName')
+    def test_label_tacs_precomputed(self, mock_save):
+        self.viewer.open_file(self.test_4d_nii_path)
+        loop = QEventLoop()
+        QTimer.singleShot(1000, loop.quit)
+        loop.exec()
+
+        self.viewer.open_file(self.test_label_overlay_path, is_overlay=True)
+        # The TACs are computed by a background thread: wait for it (up to 10 s)
+        for _ in range(100):
+            if self.viewer.label_tacs is not None:
+                break
+            QTimer.singleShot(100, loop.quit)
+            loop.exec()
+
+        table = self.viewer.label_tacs
+        self.assertIsNotNone(table, "Label TACs should be computed at overlay load")
+        self.assertEqual(table.labels.tolist(), [1, 2, 5])
+        self.assertTrue(self.viewer.export_label_tacs_btn.isEnabled())
+
+        raw = nib.load(self.test_4d_nii_path).get_fdata()
+        atlas = self.viewer.overlay_label_data
+        np.testing.assert_allclose(table.curve(2)[0], raw[atlas == 2].mean(axis=0), rtol=1e-5,
+                                   err_msg="Curves should use raw intensities")
+
+        # Hovering a region shows its curve
+        self.viewer.current_coordinates = [0, 0, 0]
+        self.viewer.screen_to_image_coords = lambda view_idx, x, y: [16, 3, 3]
+        self.viewer.update_coordinates(0, 0, 0)
+        self.assertEqual(self.viewer.hovered_label, 5)
+        self.assertEqual(self.viewer.time_plot_axes.get_title(), "Mean in label 5")
+        np.testing.assert_allclose(self.viewer.time_plot_axes.lines[0].get_ydata(), table.curve(5)[0])
+
+        export_path = os.path.join(self.temp_dir.name, "region_tacs.csv")
+        mock_save.return_value = (export_path, "CSV (*.csv)")
+        self.viewer.export_label_tacs()
+        with open(export_path) as f:
+            self.assertEqual(len(f.readlines()), 1 + 3 * 10)
+
+        self.viewer.reset_overlay()
+        self.assertIsNone(self.viewer.label_tacs)
+        self.assertFalse(self.viewer.export_label_tacs_btn.isEnabled())
+
+    @patch('PyQt6.QtWidgets.QFileDialog.getSaveFileName')
+    def test_render_profiling(self, mock_save):
+        self.viewer.open_file(self.test_4d_nii_path)
+        loop = QEventLoop()
+        QTimer.singleShot(1000, loop.quit)
+        loop.exec()
+
+        self.viewer.profiler.reset()
+        self.viewer.update_all_displays()
+        stages = self.viewer.profiler.summary()["stages"]
+        for stage in ("slice", "colormap", "overlay", "qimage", "scale", "pixmap", "fit_in_view", "frame"):
+            self.assertEqual(stages[stage]["count"], 3 if stage != "frame" else 1, f"Stage {stage} not recorded")
+        self.assertIn("tac_plot", stages)
+
+        self.viewer.render_stats_checkbox.setChecked(True)
+        self.assertFalse(self.viewer.render_hud.isHidden())
+        self.assertIn("colormap", self.viewer.render_hud.text())
+
+        export_path = os.path.join(self.temp_dir.name, "render_timings.json")
+        mock_save.return_value = (export_path, "JSON (*.json)")
+        self.viewer.export_render_timings()
+        with open(export_path) as f:
+            self.assertIn("fit_in_view", json.load(f)["stages"])
+
+    def test_cine_playback(self):
+        self.viewer.open_file(self.test_4d_nii_path)
+        loop = QEventLoop()
+        QTimer.singleShot(1000, loop.quit)
+        loop.exec()
+
+        self.viewer.cine_fps_spin.setValue(20)
+        self.viewer.cine_play_btn.setChecked(True)
+        self.assertIsNotNone(self.viewer.cine_thread, "Prefetch thread should run while playing")
+        QTest.qWait(700)
+
+        self.assertNotEqual(self.viewer.current_time, 0, "Playback should advance the frame")
+        self.assertEqual(self.viewer.time_slider.value(), self.viewer.current_time)
+        self.assertGreater(self.viewer.profiler.cache_counters["cine"][0], 0, "Prefetched frames should be hit")
+        self.assertIn("fps", self.viewer.cine_fps_label.text())
+
+        # A late tick skips the frames that are no longer due
+        self.viewer.cine_timer.stop()
+        self.viewer.cine_last_step = 0
+        self.viewer.cine_skipped = 0
+        self.viewer.cine_start_frame = 0
+        self.viewer.cine_start_time = time.perf_counter() - 5.5 / 20
+        self.viewer.cine_tick()
+        self.assertEqual(self.viewer.current_time, 5)
+        self.assertEqual(self.viewer.cine_skipped, 4)
+
+        self.viewer.cine_play_btn.setChecked(False)
+        self.assertIsNone(self.viewer.cine_thread)
+        self.assertEqual(len(self.viewer.cine_cache), 0)
+
+    def test_cine_stops_at_end_without_loop(self):
+        self.viewer.open_file(self.test_4d_nii_path)
+        loop = QEventLoop()
+        QTimer.singleShot(1000, loop.quit)
+        loop.exec()
+
+        self.viewer.cine_loop_checkbox.setChecked(False)
+        self.viewer.cine_play_btn.setChecked(True)
+        self.viewer.cine_start_time = time.perf_counter() - 100
+        self.viewer.cine_tick()
+
+        self.assertEqual(self.viewer.current_time, 9)
+        self.assertFalse(self.viewer.cine_play_btn.isChecked())
+
+    def test_apply_colormap_tiles_numba(self):
+        import matplotlib
+        tiles = np.random.rand(3, 8, 12).astype(np.float32)
+        tiles[0, 0, :4] = [1.0, -0.5, 1.5, np.nan]
+        out = np.empty(tiles.shape + (4,), dtype=np.float32)
+        for name in ("gray", "viridis", "hot"):
+            apply_colormap_tiles_numba(tiles, colormap_lut(name), out)
+            np.testing.assert_allclose(out, matplotlib.colormaps[name](tiles), atol=1e-6)
+
+    def test_lightbox(self):
+        self.viewer.open_file(self.test_nii_path)
+        loop = QEventLoop()
+        QTimer.singleShot(1000, loop.quit)
+        loop.exec()
+        self.viewer.open_file(self.test_overlay_path, is_overlay=True)
+        QTimer.singleShot(1000, loop.quit)
+        loop.exec()
+
+        self.viewer.open_lightbox()
+        lightbox = self.viewer.lightbox
+        lightbox.rows_spin.setValue(2)
+        lightbox.cols_spin.setValue(2)
+        lightbox.step_spin.setValue(1)
+        self.assertEqual(lightbox.page_count(), 5)
+        self.assertEqual(len(lightbox.tile_keys), 4)
+
+        # Tiles match the main view rendering of the same slice
+        slice_idx = lightbox.page_slices()[1]
+        self.viewer.current_slices[0] = slice_idx
+        expected, _ = self.viewer.render_plane(0)
+        tile = lightbox.tile_cache.get(lightbox.tile_keys[1])
+        self.assertLessEqual(np.abs(tile.astype(int) - expected.astype(int)).max(), 1)
+
+        # Changing the overlay alpha re-blends only the visible tiles from cached bases
+        self.viewer.profiler.reset()
+        self.viewer.overlay_alpha_slider.setValue(40)
+        caches = self.viewer.profiler.summary()["caches"]
+        self.assertEqual(caches["lightbox_tile"]["misses"], 4)
+        self.assertEqual(caches["lightbox_base"]["misses"], 0)
+
+        # Paging back reuses the composited tiles
+        lightbox.set_page(1)
+        self.viewer.profiler.reset()
+        lightbox.set_page(0)
+        caches = self.viewer.profiler.summary()["caches"]
+        self.assertEqual(caches["lightbox_tile"], {"hits": 4, "misses": 0, "hit_rate": 1.0})
+
+    def test_derived_frame_sum(self):
+        data = np.random.rand(20, 20, 20, 4).astype(np.float32) * 100
+        path = os.path.join(self.temp_dir.name, 'sub-01', 'dynamic_pet.nii')
+        nib.save(nib.Nifti1Image(data, np.eye(4)), path)
+        with open(os.path.join(self.temp_dir.name, 'sub-01', 'dynamic_pet.json'), 'w') as f:
+            json.dump({"FrameDuration": [10, 30, 60, 100]}, f)
+
+        self.viewer.open_file(path)
+        loop = QEventLoop()
+        QTimer.singleShot(1000, loop.quit)
+        loop.exec()
+
+        self.viewer.derived_frame_end.setValue(1)
+        self.viewer.derived_combo.setCurrentIndex(self.viewer.derived_combo.findData("frame_sum"))
+        derived = self.viewer.derived_volume
+        self.assertIsNotNone(derived)
+        np.testing.assert_allclose(derived.weights, [0.05, 0.15, 0, 0], rtol=1e-6)
+
+        # Only displayed slices are evaluated
+        self.assertEqual(derived.cache_misses, 3)
+        z = self.viewer.current_slices[0]
+        expected = data[:, :, z, 0] * 0.05 + data[:, :, z, 1] * 0.15
+        np.testing.assert_allclose(derived.get_slice(0, z), expected, rtol=1e-5)
+
+        x, y, z = self.viewer.current_coordinates
+        self.assertAlmostEqual(self.viewer.derived_value([x, y, z]), data[x, y, z, 0] * 0.05 + data[x, y, z, 1] * 0.15,
+                               places=3)
+
+        self.viewer.derived_combo.setCurrentIndex(0)
+        self.assertIsNone(self.viewer.derived_volume)
+
+    def test_derived_suvr_and_difference(self):
+        self.viewer.open_file(self.test_nii_path)
+        loop = QEventLoop()
+        QTimer.singleShot(1000, loop.quit)
+        loop.exec()
+        raw = nib.load(self.test_nii_path).get_fdata()
+
+        # SUVr needs a reference region
+        self.viewer.derived_combo.setCurrentIndex(self.viewer.derived_combo.findData("suvr"))
+        self.assertIsNone(self.viewer.derived_volume)
+
+        self.viewer.open_file(self.test_label_overlay_path, is_overlay=True)
+        QTimer.singleShot(1000, loop.quit)
+        loop.exec()
+        self.viewer.derived_changed()
+        roi = self.viewer.label_visible_mask()
+        self.assertAlmostEqual(self.viewer.derived_volume.roi_mean(), raw[roi].mean(), places=4)
+
+        self.viewer.derived_combo.setCurrentIndex(self.viewer.derived_combo.findData("difference"))
+        self.assertIsNone(self.viewer.derived_volume)
+        self.viewer.select_derived_operand(self.test_nii_path)
+        derived = self.viewer.derived_volume
+        self.assertIsNotNone(derived)
+        self.assertTrue(np.allclose(derived.get_slice(1, 5), 0), "Image minus itself should be zero")
+
+        # A new base image drops the derived volume
+        self.viewer.open_file(self.test_nii_path)
+        QTimer.singleShot(1000, loop.quit)
+        loop.exec()
+        self.assertIsNone(self.viewer.derived_volume)
+        self.assertEqual(self.viewer.derived_combo.currentIndex(), 0)
+
+    def test_comparison_linked_to_crosshair(self):
+        self.viewer.open_file(self.test_nii_path)
+        loop = QEventLoop()
+        QTimer.singleShot(1000, loop.quit)
+        loop.exec()
+
+        self.viewer.open_comparison()
+        comparison = self.viewer.comparison
+        comparison.add_volume_file(self.test_overlay_path)
+        QTimer.singleShot(1000, loop.quit)
+        loop.exec()
+        self.assertEqual(len(comparison.volumes), 2)
+
+        # Clicking the second volume moves the viewer crosshair (same grid here)
+        comparison.cell_clicked(1, 3.5, 20 - 1 - 7 + 0.5)
+        self.assertEqual(self.viewer.current_coordinates[:2], [3, 7])
+        self.assertTrue(comparison.titles[1].text().endswith(f"(3, 7, {self.viewer.current_coordinates[2]})"))
+
+        # A new base image resets the grid to the viewer image
+        self.viewer.open_file(self.test_nii_path)
+        QTimer.singleShot(1000, loop.quit)
+        loop.exec()
+        self.assertEqual(len(comparison.volumes), 1)
+
+    @pytest.fixture(autouse=True)
+    def _dicom_writer(self, write_dicom_series):
+        self.write_dicom_series = write_dicom_series
+
+    def test_open_dicom_series_decodes_on_demand(self):
+        volume = np.random.default_rng(0).integers(0, 100, size=(12, 10, 8, 4)).astype(np.float32)
+        folder = self.write_dicom_series(os.path.join(self.temp_dir.name, 'sub-01', 'dicom_pet'), volume)
+        self.viewer.open_file(folder)
+        loop = QEventLoop()
+        QTimer.singleShot(1000, loop.quit)
+        loop.exec()
+
+        series = self.viewer.dicom_series
+        self.assertIsNotNone(series)
+        self.assertTrue(self.viewer.is_4d)
+        self.assertEqual(self.viewer.dims, (12, 10, 8, 4))
+        self.assertIsNone(self.viewer.roi_stats)
+        # The displayed frame is decoded; other frames only for the TAC of the current voxel
+        self.assertEqual(self.viewer.current_time, 0)
+        self.assertTrue(series.normalized[:, 0].all())
+        self.assertFalse(series.is_fully_decoded())
+        self.assertEqual(series.normalized[:, 1:].sum(axis=0).tolist(), [1, 1, 1])
+
+        # Region growing needs the whole volume
+        self.viewer.automaticROI_clicked()
+        self.assertTrue(series.is_fully_decoded())
+        self.assertIsNotNone(self.viewer.roi_stats)
+
+        # Loading a NIfTI image afterwards leaves DICOM mode
+        self.viewer.open_file(self.test_nii_path)
+        QTimer.singleShot(1000, loop.quit)
+        loop.exec()
+        self.assertIsNone(self.viewer.dicom_series)
+
+    def test_projection_mode_4d(self):
+        self.viewer.open_file(self.test_4d_nii_path)
+        loop = QEventLoop()
+        QTimer.singleShot(1000, loop.quit)
+        loop.exec()
+
+        self.viewer.projection_combo.setCurrentIndex(self.viewer.projection_combo.findData("max"))
+        self.assertEqual(self.viewer.projection_mode, "max")
+        self.viewer.projection_thread.wait()
+        QTest.qWait(200)
+
+        self.assertEqual(len(self.viewer.projection_cache), 10, "All frames should be projected in background")
+        expected = self.viewer.img_data[..., 3].max(axis=2)
+        self.viewer.time_slider.setValue(3)
+        np.testing.assert_allclose(self.viewer.get_projection(0), expected, rtol=1e-5)
+
+        # A new base image invalidates the cache
+        self.viewer.open_file(self.test_nii_path)
+        QTimer.singleShot(1000, loop.quit)
+        loop.exec()
+        self.assertIsNone(self.viewer.projection_mode)
+        self.assertEqual(self.viewer.projection_cache, {})
+
+    def test_reslice_kernels(self):
+        volume = np.random.rand(6, 7, 8).astype(np.float32)
+        origin = np.array([0.0, 6.0, 3.0])
+        du = np.array([1.0, 0.0, 0.0])
+        dv = np.array([0.0, -1.0, 0.0])
+
+        # Axis-aligned sampling reproduces the canonical axial slice
+        out = reslice_trilinear_numba(volume, origin, du, dv, np.empty((7, 6), dtype=np.float32))
+        np.testing.assert_allclose(out, np.flipud(volume[:, :, 3].T), rtol=1e-6)
+
+        labels = (volume > 0.5).astype(np.uint8)
+        out = reslice_nearest_numba(labels, origin, du, dv, np.empty((7, 6), dtype=np.uint8))
+        np.testing.assert_array_equal(out, np.flipud(labels[:, :, 3].T))
+
+        # Half-voxel offsets are interpolated, outside samples are zero
+        out = reslice_trilinear_numba(volume, np.array([0.5, 0.0, 0.0]), du, np.array([0.0, 0.0, 1.0]),
+                                      np.empty((1, 7), dtype=np.float32))
+        self.assertAlmostEqual(out[0, 0], (volume[0, 0, 0] + volume[1, 0, 0]) / 2, places=5)
+        self.assertEqual(out[0, 6], 0.0)
+
+    def test_rotation_matrix(self):
+        np.testing.assert_allclose(rotation_matrix([0, 0, 0]), np.eye(3))
+        np.testing.assert_allclose(rotation_matrix([0, 0, 90]) @ np.array([1, 0, 0]), [0, 1, 0], atol=1e-12)
+
+    def test_oblique_mode(self):
+        self.viewer.open_file(self.test_nii_path)
+        loop = QEventLoop()
+        QTimer.singleShot(1000, loop.quit)
+        loop.exec()
+
+        self.viewer.oblique_checkbox.setChecked(True)
+        self.assertTrue(self.viewer.oblique_enabled)
+
+        # With no rotation the oblique planes match the canonical slices
+        z = self.viewer.current_coordinates[2]
+        resliced = self.viewer.oblique_slice(self.viewer.img_data, 0)
+        np.testing.assert_allclose(resliced, np.flipud(self.viewer.img_data[:, :, z].T), rtol=1e-5)
+
+        # Clicking maps back through the sampling grid
+        coords = self.viewer.screen_to_image_coords(0, 3.0, 4.0)
+        self.assertEqual(coords, [3, 19 - 4, z])
+
+        # Rotating keeps the current voxel on every plane
+        self.viewer.oblique_sliders[0].setValue(30)
+        self.viewer.oblique_sliders[2].setValue(-20)
+        for plane_idx in range(3):
+            col, row = self.viewer.oblique_geometry[plane_idx][5]
+            self.assertEqual(self.viewer.screen_to_image_coords(plane_idx, col, row),
+                             list(self.viewer.current_coordinates))
+
+        self.viewer.oblique_reset_btn.click()
+        self.assertEqual(self.viewer.oblique_angles, [0, 0, 0])
+
     def test_pad_volume_to_shape(self):
         volume = np.ones((5, 5, 5))
         target_shape = (7, 7, 7)
@@ -869,6 +869,114 @@ class TestFolderCards:
             assert watch_dir in page.folder_cards
 
 
+class TestQCRendering:
+    """Tests for the QC folders opened from the folder cards."""
+
+    def test_folder_cards_connected_to_qc(self, qtbot, mock_context_exec, pipeline_config_exec, mock_get_bin_path):
+        """Test that a QC request of a card reaches the page."""
+        page = PipelineExecutionPage(mock_context_exec)
+        qtbot.addWidget(page)
+        page.on_enter()
+
+        with patch.object(page, '_on_qc_requested') as mock_request:
+            page._setup_folder_cards()
+            card = list(page.folder_cards.values())[0]
+            card.qc_requested.emit(card.qc_folder)
+
+        mock_request.assert_called_once_with(card.qc_folder)
+
+    def test_qc_without_pending_opens_folder(self, qtbot, mock_context_exec, pipeline_config_exec, mock_get_bin_path,
+                                             mock_tree_view, temp_workspace):
+        """Test that a rendered QC folder is opened directly."""
+        page = PipelineExecutionPage(mock_context_exec)
+        qtbot.addWidget(page)
+        qc_folder = os.path.join(temp_workspace, "qc")
+        os.makedirs(qc_folder)
+
+        with patch.object(QProcess, 'start') as mock_start:
+            page._on_qc_requested(qc_folder)
+
+        mock_start.assert_not_called()
+        mock_tree_view._open_in_explorer.assert_called_once_with(qc_folder)
+
+    def test_qc_pending_is_rendered(self, qtbot, mock_context_exec, pipeline_config_exec, mock_get_bin_path,
+                                   mock_tree_view, temp_workspace):
+        """Test that pending QC is rendered by the pipeline runner before the folder is opened."""
+        page = PipelineExecutionPage(mock_context_exec)
+        qtbot.addWidget(page)
+        qc_folder = os.path.join(temp_workspace, "qc")
+        os.makedirs(qc_folder)
+        with open(os.path.join(qc_folder, "qc_pending.json"), "w") as f:
+            json.dump([], f)
+
+        with patch.object(QProcess, 'start') as mock_start, \
+                patch.object(QProcess, 'waitForStarted', return_value=True):
+            page._on_qc_requested(qc_folder)
+
+            mock_start.assert_called_once_with("/fake/path/pipeline_runner", ["--render-qc", qc_folder])
+            assert qc_folder in page.qc_processes
+            mock_tree_view._open_in_explorer.assert_not_called()
+
+            # A second request while rendering does not start another process
+            page._on_qc_requested(qc_folder)
+            mock_start.assert_called_once()
+
+        page._on_qc_rendered(qc_folder, 0, QProcess.ExitStatus.NormalExit)
+
+        assert qc_folder not in page.qc_processes
+        mock_tree_view._open_in_explorer.assert_called_once_with(qc_folder)
+
+    def test_qc_rendering_failed_to_start(self, qtbot, mock_context_exec, pipeline_config_exec, mock_get_bin_path,
+                                          mock_tree_view, temp_workspace):
+        """Test that a QC process that does not start is forgotten."""
+        page = PipelineExecutionPage(mock_context_exec)
+        qtbot.addWidget(page)
+        qc_folder = os.path.join(temp_workspace, "qc")
+        os.makedirs(qc_folder)
+        with open(os.path.join(qc_folder, "qc_pending.json"), "w") as f:
+            json.dump([], f)
+
+        with patch.object(QProcess, 'start'), \
+                patch.object(QProcess, 'waitForStarted', return_value=False):
+            page._on_qc_requested(qc_folder)
+
+        assert qc_folder not in page.qc_processes
+        assert "Failed to start QC rendering" in page.log_text.toPlainText()
+
+    def test_qc_not_rendered_while_pipeline_runs(self, qtbot, mock_context_exec, pipeline_config_exec,
+                                                 mock_get_bin_path, mock_tree_view, temp_workspace):
+        """Test that the QC is not rendered while the pipeline process may still render it."""
+        page = PipelineExecutionPage(mock_context_exec)
+        qtbot.addWidget(page)
+        qc_folder = os.path.join(temp_workspace, "qc")
+        os.makedirs(qc_folder)
+        with open(os.path.join(qc_folder, "qc_pending.json"), "w") as f:
+            json.dump([], f)
+        page.pipeline_process = Mock()
+
+        with patch.object(QProcess, 'start') as mock_start:
+            page._on_qc_requested(qc_folder)
+
+        mock_start.assert_not_called()
+        assert qc_folder not in page.qc_processes
+
+    def test_qc_locked_until_pipeline_finished(self, qtbot, mock_context_exec, pipeline_config_exec,
+                                               mock_get_bin_path):
+        """Test that the QC button of a finished patient is enabled once the pipeline exits."""
+        page = PipelineExecutionPage(mock_context_exec)
+        qtbot.addWidget(page)
+        page.on_enter()
+        page._setup_folder_cards()
+        folder, card = list(page.folder_cards.items())[0]
+        page.pipeline_process = Mock()
+
+        page._update_progress(os.path.basename(folder))
+        assert not card.qc_btn.isEnabled()
+
+        page._on_pipeline_finished()
+        assert card.qc_btn.isEnabled()
+
+
 class TestEdgeCases:
     """Tests for edge cases."""
 
@@ -1093,4 +1201,38 @@ class TestIntegration:
         mock_process.terminate.assert_called_once()
         assert page.pipeline_process is None
         assert not page.stop_button.isEnabled()
-        assert page.progress_bar.value == 0
\ No newline at end of file
+        assert page.progress_bar.value == 0
+    def start_arguments(self, page):
+        with patch.object(QProcess, 'start') as mock_start, \
+                patch.object(QProcess, 'waitForStarted', return_value=True):
+            page._start_pipeline()
+        return mock_start.call_args[0][1]
+
+    def test_qc_deferred_by_default(self, qtbot, mock_context_exec, pipeline_config_exec, mock_get_bin_path):
+        """Test that the pipeline leaves the QC to the folder cards by default."""
+        page = PipelineExecutionPage(mock_context_exec)
+        qtbot.addWidget(page)
+
+        args = self.start_arguments(page)
+        assert args[args.index('--qc-policy') + 1] == "on-demand"
+
+    @pytest.mark.parametrize("setting, policy", [("background", "background"), ("inline", "inline"),
+                                                 ("later", "on-demand")])
+    def test_qc_policy_from_settings(self, qtbot, mock_context_exec, pipeline_config_exec, mock_get_bin_path,
+                                     setting, policy):
+        """Test that the QC policy setting is passed to the pipeline runner."""
+        settings = Mock()
+        settings.value.return_value = setting
+        mock_context_exec["settings"] = settings
+        page = PipelineExecutionPage(mock_context_exec)
+        qtbot.addWidget(page)
+
+        args = self.start_arguments(page)
+        assert args[args.index('--qc-policy') + 1] == policy
+        settings.value.assert_any_call("pipeline_qc_policy", "on-demand", type=str)
+
+    def test_qc_policies_of_the_runner(self):
+        """Test that the page offers the QC policies of the pipeline runner."""
+        from main.ui.pipeline_execution_page import QC_POLICIES
+        from pediatric_fdopa_pipeline.qc_stage import QC_POLICIES as RUNNER_QC_POLICIES
+        assert set(QC_POLICIES) == set(RUNNER_QC_POLICIES)